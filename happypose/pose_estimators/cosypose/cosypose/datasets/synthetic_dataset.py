@@ -9,6 +9,9 @@ import torch
 import torch.multiprocessing
 import yaml
 
+from happypose.pose_estimators.cosypose.cosypose.recording.packed_chunk import (
+    PackedChunksReader,
+)
 from happypose.toolbox.datasets.datasets_cfg import make_urdf_dataset
 from happypose.toolbox.datasets.scene_dataset import (
     CameraData,
@@ -41,6 +44,12 @@ class SyntheticSceneDataset:
             {"scene_id": np.arange(len(keys)), "view_id": np.arange(len(keys))},
         )
 
+        # Datasets recorded with packed=True store each chunk in a single file,
+        # the reader falls back to the dumps of the seeds without a chunk.
+        self.chunks_reader = None
+        if (self.ds_dir / "chunks").exists():
+            self.chunks_reader = PackedChunksReader(self.ds_dir)
+
     def __len__(self):
         return len(self.frame_index)
 
@@ -58,8 +67,11 @@ class SyntheticSceneDataset:
 
     def __getitem__(self, idx):
         key = self.keys[idx]
-        pkl_path = (self.ds_dir / "dumps" / key).with_suffix(".pkl")
-        dic = pkl.loads(pkl_path.read_bytes())
+        if self.chunks_reader is not None:
+            dic = pkl.loads(self.chunks_reader.read(key))
+        else:
+            pkl_path = (self.ds_dir / "dumps" / key).with_suffix(".pkl")
+            dic = pkl.loads(pkl_path.read_bytes())
 
         cam = dic["camera"]
         rgb = self._deserialize_im_cv2(cam["rgb"])
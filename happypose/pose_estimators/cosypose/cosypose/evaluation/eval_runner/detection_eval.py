@@ -92,7 +92,7 @@ class DetectionEvaluation:
     def summary(self):
         summary, dfs = {}, {}
         for meter_k, meter in sorted(self.meters.items()):
-            meter.gather_distributed(tmp_dir=self.tmp_dir)
+            meter.gather_distributed()
             if get_rank() == 0 and len(meter.datas) > 0:
                 summary_, df_ = meter.summary()
                 dfs[meter_k] = df_
@@ -45,8 +45,9 @@ from happypose.toolbox.datasets.datasets_cfg import (
     make_object_dataset,
     make_scene_dataset,
 )
+from happypose.toolbox.datasets.frame_cache import FrameCache
 from happypose.toolbox.lib3d.rigid_mesh_database import MeshDataBase
-from happypose.toolbox.utils.distributed import get_rank, get_tmp_dir
+from happypose.toolbox.utils.distributed import get_rank
 from happypose.toolbox.utils.logging import get_logger
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -182,6 +183,12 @@ def run_eval(
         scene_ds.frame_index = scene_ds.frame_index[: cfg.n_frames].reset_index(
             drop=True,
         )
+    if cfg.frame_cache_dir is not None:
+        scene_ds.frame_cache = FrameCache(
+            cfg.frame_cache_dir,
+            max_bytes=cfg.frame_cache_max_gb * 1e9,
+            namespace=cfg.ds_name,
+        )
 
     # Load detector model
     if cfg.inference.detection_type == "detector":
@@ -288,7 +295,7 @@ def run_eval(
     torch.distributed.barrier()
     logger.info("Gathering predictions from all processes.")
     for k, v in all_preds.items():
-        all_preds[k] = v.gather_distributed(tmp_dir=get_tmp_dir()).cpu()
+        all_preds[k] = v.gather_distributed().cpu()
 
     torch.distributed.barrier()
     logger.info("Finished gathering predictions from all processes.")
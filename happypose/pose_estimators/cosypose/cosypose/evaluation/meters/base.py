@@ -1,11 +1,8 @@
 from collections import defaultdict
-from pathlib import Path
 
-import torch
-
-from happypose.pose_estimators.cosypose.cosypose.utils.distributed import (
-    get_rank,
-    get_world_size,
+from happypose.toolbox.utils.distributed import (
+    DEFAULT_CHUNK_SIZE,
+    iter_gathered_objects,
 )
 
 
@@ -22,28 +19,11 @@ class Meter:
     def is_data_valid(self, data):
         raise NotImplementedError
 
-    def gather_distributed(self, tmp_dir):
-        tmp_dir = Path(tmp_dir)
-        tmp_dir.mkdir(exist_ok=True, parents=True)
-        rank, world_size = get_rank(), get_world_size()
-        tmp_file_template = (tmp_dir / "rank={rank}.pth.tar").as_posix()
-        if rank > 0:
-            tmp_file = tmp_file_template.format(rank=rank)
-            torch.save(self.datas, tmp_file)
-
-        if world_size > 1:
-            torch.distributed.barrier()
-
-        if rank == 0 and world_size > 1:
-            all_datas = self.datas
-            for n in range(1, world_size):
-                tmp_file = tmp_file_template.format(rank=n)
-                datas = torch.load(tmp_file)
-                for k in all_datas.keys():
-                    all_datas[k].extend(datas.get(k, []))
-                Path(tmp_file).unlink()
-            self.datas = all_datas
-
-        if world_size > 1:
-            torch.distributed.barrier()
+    def gather_distributed(self, tmp_dir=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Gathers the datas of all the ranks on rank 0, tmp_dir is not used."""
+        datas_iterator = iter_gathered_objects(self.datas, chunk_size=chunk_size)
+        for rank, datas in enumerate(datas_iterator):
+            if rank > 0:
+                for k, v in datas.items():
+                    self.datas[k].extend(v)
         return
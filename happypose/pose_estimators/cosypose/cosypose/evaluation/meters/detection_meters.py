@@ -5,6 +5,7 @@ import xarray as xr
 from sklearn.metrics import average_precision_score
 from torch.utils.data import DataLoader, TensorDataset
 
+from happypose.toolbox.utils.rle_masks import RLEMasks
 from happypose.toolbox.utils.xarray import xr_merge
 
 from .base import Meter
@@ -26,8 +27,14 @@ class DetectionMeter(Meter):
         targets=None,
         visib_gt_min=-1,
         n_top=-1,
+        use_masks=False,
     ):
+        """With use_masks, the IoU of the masks of the predictions and of the
+        ground truth (dense or RLEMasks) is used instead of the IoU of the
+        boxes. It is computed on the run-length encodings of the masks.
+        """
         self.iou_threshold = iou_threshold
+        self.use_masks = use_masks
         self.consider_all_predictions = consider_all_predictions
         self.targets = targets
         self.visib_gt_min = visib_gt_min
@@ -35,6 +42,15 @@ class DetectionMeter(Meter):
         self.n_top = n_top
         self.reset()
 
+    @staticmethod
+    def get_rle_masks(data):
+        if isinstance(data.masks, RLEMasks):
+            return data.masks
+        return RLEMasks.encode(data.masks > 0.5)
+
+    def compute_mask_metrics(self, masks_pred, masks_gt):
+        return {"iou": masks_pred.elementwise_iou(masks_gt)}
+
     def compute_metrics(self, bbox_pred, bbox_gt):
         iou_all = torchvision.ops.box_iou(bbox_pred, bbox_gt)
         arange_n = torch.arange(len(bbox_pred))
@@ -123,11 +139,16 @@ class DetectionMeter(Meter):
         )
         pred_ids = cand_infos["pred_id"].values.tolist()
         gt_ids = cand_infos["gt_id"].values.tolist()
-        cand_bbox_gt = gt_data.bboxes[gt_ids]
-        cand_bbox_pred = pred_data_filtered.bboxes[pred_ids]
+        if self.use_masks:
+            cand_masks_gt = self.get_rle_masks(gt_data)[gt_ids]
+            cand_masks_pred = self.get_rle_masks(pred_data_filtered)[pred_ids]
+            metrics = self.compute_mask_metrics(cand_masks_pred, cand_masks_gt)
+        else:
+            cand_bbox_gt = gt_data.bboxes[gt_ids]
+            cand_bbox_pred = pred_data_filtered.bboxes[pred_ids]
 
-        # Compute metrics for tentative matches
-        metrics = self.compute_metrics_batch(cand_bbox_pred, cand_bbox_gt)
+            # Compute metrics for tentative matches
+            metrics = self.compute_metrics_batch(cand_bbox_pred, cand_bbox_gt)
 
         # Matches can only be candidates within thresholds
         cand_infos["iou"] = metrics["iou"].cpu().numpy()
@@ -4,7 +4,6 @@ import pandas as pd
 
 from happypose.pose_estimators.cosypose.cosypose.utils.distributed import (
     get_rank,
-    get_tmp_dir,
 )
 from happypose.pose_estimators.cosypose.cosypose.utils.logging import get_logger
 
@@ -40,7 +39,7 @@ def run_pred_eval(pred_runner, pred_kwargs, eval_runner, eval_preds=None):
 
 def gather_predictions(all_predictions):
     for k, v in all_predictions.items():
-        all_predictions[k] = v.gather_distributed(tmp_dir=get_tmp_dir()).cpu()
+        all_predictions[k] = v.gather_distributed().cpu()
     return all_predictions
 
 
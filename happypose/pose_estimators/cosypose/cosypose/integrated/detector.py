@@ -1,14 +1,11 @@
 from typing import Optional
 
-import numpy as np
-import pandas as pd
 import torch
 
 # MegaPose
-import happypose.toolbox.utils.tensor_collection as tc
 from happypose.toolbox.inference.detector import DetectorModule
 from happypose.toolbox.inference.types import DetectionsType, ObservationTensor
-from happypose.toolbox.inference.utils import add_instance_id, filter_detections
+from happypose.toolbox.inference.utils import make_detections_from_model_outputs
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -38,6 +35,7 @@ class Detector(DetectorModule):
         output_masks: bool = False,
         mask_th: float = 0.8,
         one_instance_per_class: bool = False,
+        rle_masks: bool = False,
     ) -> DetectionsType:
         """Runs the detector on the given images.
 
@@ -48,6 +46,7 @@ class Detector(DetectorModule):
             mask_th: Threshold to use when computing masks
             one_instance_per_class: If True, keep only the highest scoring
                 detection within each class.
+            rle_masks: If True, the masks are stored as RLEMasks.
 
 
         """
@@ -58,74 +57,16 @@ class Detector(DetectorModule):
         # TODO (lmanuelli): Why are we splitting this up into a list of tensors?
         outputs_ = self.model(list(images))
 
-        infos = []
-        bboxes = []
-        masks = []
-        for n, outputs_n in enumerate(outputs_):
-            outputs_n["labels"] = [
-                self.category_id_to_label[category_id.item()]
-                for category_id in outputs_n["labels"]
-            ]
-            for obj_id in range(len(outputs_n["boxes"])):
-                bbox = outputs_n["boxes"][obj_id]
-                info = {
-                    "batch_im_id": n,
-                    "label": outputs_n["labels"][obj_id],
-                    "score": outputs_n["scores"][obj_id].item(),
-                }
-                mask = outputs_n["masks"][obj_id, 0] > mask_th
-                bboxes.append(torch.as_tensor(bbox))
-                masks.append(torch.as_tensor(mask))
-                infos.append(info)
-
-        if len(bboxes) > 0:
-            if torch.cuda.is_available():
-                bboxes = torch.stack(bboxes).to(device).float()
-                masks = torch.stack(masks).to(device)
-            else:
-                bboxes = torch.stack(bboxes).float()
-                masks = torch.stack(masks)
-        else:
-            infos = {"score": [], "label": [], "batch_im_id": []}
-            if torch.cuda.is_available():
-                bboxes = torch.empty(0, 4).to(device).float()
-                masks = torch.empty(
-                    0,
-                    images.shape[1],
-                    images.shape[2],
-                    dtype=torch.bool,
-                ).to(device)
-            else:
-                bboxes = torch.empty(0, 4).float()
-                masks = torch.empty(
-                    0,
-                    images.shape[1],
-                    images.shape[2],
-                    dtype=torch.bool,
-                )
-
-        outputs = tc.PandasTensorCollection(
-            infos=pd.DataFrame(infos),
-            bboxes=bboxes,
+        return make_detections_from_model_outputs(
+            outputs_,
+            self.category_id_to_label,
+            detection_th=detection_th,
+            output_masks=output_masks,
+            mask_th=mask_th,
+            one_instance_per_class=one_instance_per_class,
+            device=device,
+            rle_masks=rle_masks,
         )
-        if output_masks:
-            outputs.register_tensor("masks", masks)
-        if detection_th is not None:
-            keep = np.where(outputs.infos["score"] > detection_th)[0]
-            outputs = outputs[keep]
-
-        # Keep only the top-detection for each class label
-        if one_instance_per_class:
-            outputs = filter_detections(
-                outputs,
-                one_instance_per_class=True,
-            )
-
-        # Add instance_id column to dataframe
-        # Each detection is now associated with an `instance_id` that
-        # identifies multiple instances of the same object
-        outputs = add_instance_id(outputs)
-        return outputs
 
     def __call__(self, *args, **kwargs):
         return self.get_detections(*args, **kwargs)
@@ -14,13 +14,19 @@ from happypose.pose_estimators.cosypose.cosypose.lib3d.cosypose_ops import (
 from happypose.pose_estimators.cosypose.cosypose.utils.logging import get_logger
 from happypose.pose_estimators.cosypose.cosypose.utils.timer import Timer
 from happypose.pose_estimators.megapose.training.utils import CudaTimer, SimpleTimer
+from happypose.toolbox.inference.early_exit import (
+    RefinerConvergence,
+    forward_refiner_early_exit,
+)
 from happypose.toolbox.inference.pose_estimator import PoseEstimationModule
+from happypose.toolbox.inference.precision import InferencePrecision
 from happypose.toolbox.inference.types import (
     DetectionsType,
     ObservationTensor,
     PoseEstimatesType,
 )
 from happypose.toolbox.inference.utils import filter_detections
+from happypose.toolbox.utils.profiler import profile_function
 from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
 
 logger = get_logger(__name__)
@@ -40,6 +46,7 @@ class PoseEstimator(PoseEstimationModule):
         bsz_objects: int = 8,
         bsz_images: int = 256,
         # SO3_grid_size: int = 576,
+        inference_precision: Optional[InferencePrecision] = None,
     ) -> None:
         super().__init__()
         self.coarse_model = coarse_model
@@ -49,6 +56,11 @@ class PoseEstimator(PoseEstimationModule):
         self.bsz_objects = bsz_objects
         self.bsz_images = bsz_images
 
+        if inference_precision is not None:
+            for model in (self.coarse_model, self.refiner_model):
+                if model is not None:
+                    model.set_inference_precision(inference_precision)
+
         # Load the SO3 grid if was passed in
         # if SO3_grid_size is not None:
         #    self.load_SO3_grid(SO3_grid_size)
@@ -134,6 +146,7 @@ class PoseEstimator(PoseEstimationModule):
         return tc.PandasTensorCollection(infos=detections.infos, poses=TCO_init)
 
     @torch.no_grad()
+    @profile_function("run_inference_pipeline")
     def run_inference_pipeline(
         self,
         observation: ObservationTensor,
@@ -148,6 +161,7 @@ class PoseEstimator(PoseEstimationModule):
         detection_th: float = 0.7,
         mask_th: float = 0.8,
         labels_to_keep: Optional[List[str]] = None,
+        refiner_convergence: Optional[RefinerConvergence] = None,
     ) -> Tuple[PoseEstimatesType, dict]:
         timing_str = ""
         timer = SimpleTimer()
@@ -208,6 +222,7 @@ class PoseEstimator(PoseEstimationModule):
                 observation,
                 data_TCO_coarse,
                 n_iterations=n_refiner_iterations,
+                convergence=refiner_convergence,
             )
             for n in range(1, n_refiner_iterations + 1):
                 preds[f"refiner/iteration={n}"] = refiner_preds[f"iteration={n}"]
@@ -228,6 +243,7 @@ class PoseEstimator(PoseEstimationModule):
 
         return data_TCO, extra_data
 
+    @profile_function("detection")
     def forward_detection_model(
         self,
         observation: ObservationTensor,
@@ -247,6 +263,7 @@ class PoseEstimator(PoseEstimationModule):
         return detections
 
     @torch.no_grad()
+    @profile_function("coarse")
     def forward_coarse_model(
         self,
         observation: ObservationTensor,
@@ -356,6 +373,7 @@ class PoseEstimator(PoseEstimationModule):
         return preds, extra_data
 
     @torch.no_grad()
+    @profile_function("refiner")
     def forward_refiner(
         self,
         observation: ObservationTensor,
@@ -363,6 +381,7 @@ class PoseEstimator(PoseEstimationModule):
         n_iterations: int = 5,
         keep_all_outputs: bool = False,
         cuda_timer: bool = False,
+        convergence: Optional[RefinerConvergence] = None,
     ) -> Tuple[dict, dict]:
         """Runs the refiner model for the specified number of iterations.
 
@@ -382,12 +401,33 @@ class PoseEstimator(PoseEstimationModule):
             extra_data:
                 A dict containing additional information such as timing
 
+        If convergence is set, the converged objects are not refined in the
+        next iterations, see `forward_refiner_early_exit`.
         """
         timer = Timer()
         timer.start()
 
         start_time = time.time()
 
+        if convergence is not None:
+            preds, all_outputs = forward_refiner_early_exit(
+                self.refiner_model,
+                observation,
+                data_TCO_input,
+                n_iterations=n_iterations,
+                convergence=convergence,
+                bsz_objects=self.bsz_objects,
+                keep_all_outputs=keep_all_outputs,
+            )
+            elapsed = time.time() - start_time
+            extra_data = {
+                "n_iterations": n_iterations,
+                "outputs": all_outputs,
+                "model_time": elapsed,
+                "time": elapsed,
+            }
+            return preds, extra_data
+
         B = data_TCO_input.poses.shape[0]
         ids = torch.arange(B)
         ds = TensorDataset(ids)
@@ -19,6 +19,11 @@ from happypose.pose_estimators.cosypose.cosypose.utils.logging import get_logger
 from happypose.pose_estimators.megapose.models.pose_rigid import (
     PosePredictorOutputCosypose,
 )
+from happypose.toolbox.inference.precision import (
+    InferencePrecision,
+    configure_backbone,
+    run_backbone,
+)
 from happypose.toolbox.lib3d.rotations import (
     compute_rotation_matrix_from_ortho6d,
     compute_rotation_matrix_from_quaternions,
@@ -46,9 +51,15 @@ class PosePredictor(nn.Module):
         self.pose_fc = nn.Linear(n_features, pose_dim, bias=True)
         self.heads["pose"] = self.pose_fc
 
+        self.inference_precision = InferencePrecision()
+
         self.debug = False
         self.tmp_debug = {}
 
+    def set_inference_precision(self, precision):
+        configure_backbone(self.backbone, precision)
+        self.inference_precision = precision
+
     def enable_debug(self):
         self.debug = True
 
@@ -106,7 +117,7 @@ class PosePredictor(nn.Module):
         return TCO_updated
 
     def net_forward(self, x):
-        x = self.backbone(x)
+        x = run_backbone(self.backbone, x, self.inference_precision)
         x = x.flatten(2).mean(dim=-1)
         outputs = {}
         for k, head in self.heads.items():
@@ -64,9 +64,20 @@ class BopRecordingScene(BaseScene):
         self.gpu_renderer = gpu_renderer
 
         # Seeding
+        self.set_seed(seed)
+
+    def set_seed(self, seed):
+        """Seeds the sampling of the scenes.
+
+        The caches are not reloaded, but the textures used for domain
+        randomization are drawn again from the texture cache, as in a scene
+        connected with this seed.
+        """
         self.np_random = np.random.RandomState(seed)
         pin.seed(seed)
         self.seed = seed
+        if getattr(self, "texture_cache", None) is not None:
+            self.draw_textures()
 
     def load_background(self):
         cage_path = Path(ASSET_DIR / "cage" / "cage.urdf").as_posix()
@@ -93,12 +104,23 @@ class BopRecordingScene(BaseScene):
 
     def load_texture_cache(self):
         assert self._connected
+        self.texture_cache = TextureCache(self.texture_ds, self.client_id)
+        self.draw_textures()
+
+    def draw_textures(self):
+        """Draws the n_textures_cache textures used by the scene.
+
+        The textures are loaded by the texture cache when first drawn and
+        kept loaded for the next draws.
+        """
         ds_texture_ids = self.np_random.choice(
             len(self.texture_ds),
             size=self.n_textures_cache,
         )
-        self.texture_cache = TextureCache(self.texture_ds, self.client_id)
-        [self.texture_cache.get_texture(idx) for idx in ds_texture_ids]
+        self.textures = [
+            self.texture_cache.get_texture(idx)
+            for idx in dict.fromkeys(ds_texture_ids.tolist())
+        ]
 
     def connect(self, load=True):
         super().connect(gpu_renderer=self.gpu_renderer)
@@ -112,6 +134,7 @@ class BopRecordingScene(BaseScene):
 
     def disconnect(self):
         super().disconnect()
+        self.texture_cache = None
 
     def pick_rand_objects(self):
         n_min, n_max = self.n_objects_interval
@@ -126,7 +149,7 @@ class BopRecordingScene(BaseScene):
         for body in bodies:
             apply_random_textures(
                 body,
-                self.texture_cache.cached_textures,
+                self.textures,
                 np_random=self.np_random,
             )
 
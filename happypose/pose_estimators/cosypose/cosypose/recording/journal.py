@@ -0,0 +1,83 @@
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Union
+
+from .packed_chunk import parse_key
+
+
+class RecordingJournal:
+    """Append-only log of the chunks recorded in a dataset.
+
+    One json line is appended to `journal.jsonl` for each chunk once its frames
+    have been written, and synced to disk. A line that was partially written
+    when the recording was interrupted is ignored, so the chunks listed in the
+    journal are always complete and the recording can be resumed from it.
+    Datasets recorded with `seeds_recorded.txt` and `keys_recorded.txt` are
+    imported when the journal does not exist.
+    """
+
+    def __init__(self, ds_dir: Union[str, Path]):
+        self.ds_dir = Path(ds_dir)
+        self.path = self.ds_dir / "journal.jsonl"
+        self.entries: List[Dict] = []
+        self._file = None
+        if self.path.exists():
+            self.entries = self._load_entries()
+        elif (self.ds_dir / "seeds_recorded.txt").exists():
+            for entry in self._load_legacy_entries():
+                self.append(**entry)
+
+    def _load_entries(self) -> List[Dict]:
+        entries = []
+        for line in self.path.read_text().split("\n"):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries.append(entry)
+        return entries
+
+    def _load_legacy_entries(self) -> List[Dict]:
+        seeds = (self.ds_dir / "seeds_recorded.txt").read_text().split()
+        keys = (self.ds_dir / "keys_recorded.txt").read_text().split()
+        seed_to_keys = defaultdict(list)
+        for key in keys:
+            seed_to_keys[parse_key(key)[0]].append(key)
+        return [{"seed": int(seed), "keys": seed_to_keys[int(seed)]} for seed in seeds]
+
+    @property
+    def done_seeds(self) -> List[int]:
+        return [entry["seed"] for entry in self.entries]
+
+    @property
+    def keys(self) -> List[str]:
+        return [key for entry in self.entries for key in entry["keys"]]
+
+    def append(self, seed: int, keys: List[str], **infos) -> None:
+        """Records that the frames `keys` of the chunk `seed` are on disk.
+
+        infos: additional json-serializable information, e.g. timings.
+        """
+        if self._file is None:
+            self.ds_dir.mkdir(exist_ok=True, parents=True)
+            self._file = self.path.open("a")
+            # Starts a new line after a partially written entry.
+            if self._file.tell() > 0 and not self._ends_with_newline():
+                self._file.write("\n")
+        entry = dict(seed=seed, keys=keys, **infos)
+        self.entries.append(entry)
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
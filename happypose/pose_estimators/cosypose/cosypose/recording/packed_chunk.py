@@ -0,0 +1,179 @@
+"""Packed storage of the chunks of a synthetic dataset.
+
+All the frames recorded with one seed are stored in a single file
+`chunks/{seed}.chunk`:
+
+    magic (8 bytes) | n_frames (uint64) | offsets (n_frames + 1 uint64) | frames
+
+Frame n is stored between offsets[n] and offsets[n + 1] and contains the same
+pickled state as the `dumps/{seed}-{n}.pkl` files, so single frames can be read
+with `os.pread` without loading the whole chunk.
+"""
+
+import os
+import struct
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+MAGIC = b"HPCHUNK1"
+HEADER = struct.Struct("<8sQ")
+
+# Maximum number of chunk files kept open by a PackedChunksReader.
+MAX_OPEN_CHUNKS = 32
+
+
+def get_chunk_path(ds_dir: Union[str, Path], seed: int) -> Path:
+    return Path(ds_dir) / "chunks" / f"{seed}.chunk"
+
+
+def get_dump_path(ds_dir: Union[str, Path], key: str) -> Path:
+    return Path(ds_dir) / "dumps" / f"{key}.pkl"
+
+
+def parse_key(key: str) -> Tuple[int, int]:
+    """Returns the seed and frame index of a key `{seed}-{n}`."""
+    seed, n = key.split("-")
+    return int(seed), int(n)
+
+
+def write_packed_chunk(path: Union[str, Path], frame_bufs: List[bytes]) -> None:
+    """Writes the serialized frames of a chunk into a single file.
+
+    The file is written to a temporary path and then renamed, so that chunks
+    are never partially written.
+    """
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    n_frames = len(frame_bufs)
+    sizes = np.array([len(buf) for buf in frame_bufs], dtype=np.uint64)
+    offsets = np.zeros(n_frames + 1, dtype=np.uint64)
+    offsets[0] = HEADER.size + offsets.nbytes
+    offsets[1:] = offsets[0] + np.cumsum(sizes)
+
+    tmp_path = path.with_suffix(".chunk.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, n_frames))
+        f.write(offsets.astype("<u8").tobytes())
+        for buf in frame_bufs:
+            f.write(buf)
+    os.replace(tmp_path, path)
+
+
+class PackedChunkReader:
+    """Reads single frames of a packed chunk."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._fd = None
+        self._fd = os.open(self.path, os.O_RDONLY)
+        magic, n_frames = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+        if magic != MAGIC:
+            self.close()
+            msg = f"{self.path} is not a packed chunk"
+            raise ValueError(msg)
+        offsets_buf = os.pread(self._fd, (n_frames + 1) * 8, HEADER.size)
+        self.offsets = np.frombuffer(offsets_buf, dtype="<u8").astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def read(self, idx: int) -> bytes:
+        if not 0 <= idx < len(self):
+            msg = f"Frame {idx} out of range for {self.path} ({len(self)} frames)"
+            raise IndexError(msg)
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return os.pread(self._fd, int(end - start), int(start))
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self) -> None:
+        self.close()
+
+
+class PackedChunksReader:
+    """Reads the frames of a dataset from their keys `{seed}-{n}`.
+
+    The chunk files are opened lazily and the max_open_chunks most recently
+    read are kept open, the others are closed. As `os.pread` does not
+    move the file offset, readers can be shared with forked dataloader workers.
+    Pickled readers (e.g. sent to spawned workers) reopen the files.
+
+    Frames whose chunk does not exist are read from `dumps/{seed}-{n}.pkl`,
+    e.g. for recordings resumed from a legacy dumps recording or partially
+    converted by `convert_dumps_to_packed`.
+    """
+
+    def __init__(
+        self,
+        ds_dir: Union[str, Path],
+        max_open_chunks: int = MAX_OPEN_CHUNKS,
+    ):
+        assert max_open_chunks > 0
+        self.ds_dir = Path(ds_dir)
+        self.max_open_chunks = max_open_chunks
+        self._readers: OrderedDict[int, PackedChunkReader] = OrderedDict()
+
+    def read(self, key: str) -> bytes:
+        seed, n = parse_key(key)
+        reader = self._readers.get(seed)
+        if reader is None:
+            chunk_path = get_chunk_path(self.ds_dir, seed)
+            if not chunk_path.exists():
+                return get_dump_path(self.ds_dir, key).read_bytes()
+            reader = PackedChunkReader(chunk_path)
+            self._readers[seed] = reader
+            while len(self._readers) > self.max_open_chunks:
+                _, evicted_reader = self._readers.popitem(last=False)
+                evicted_reader.close()
+        else:
+            self._readers.move_to_end(seed)
+        return reader.read(n)
+
+    @property
+    def n_open_chunks(self) -> int:
+        return len(self._readers)
+
+    def __getstate__(self) -> Dict:
+        return {"ds_dir": self.ds_dir, "max_open_chunks": self.max_open_chunks}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__(state["ds_dir"], max_open_chunks=state["max_open_chunks"])
+
+    def close(self) -> None:
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = OrderedDict()
+
+
+def convert_dumps_to_packed(
+    ds_dir: Union[str, Path],
+    remove_dumps: bool = False,
+) -> List[int]:
+    """Packs the `dumps/{seed}-{n}.pkl` files of a dataset into chunks.
+
+    Chunks that already exist are skipped. Returns the converted seeds.
+    """
+    ds_dir = Path(ds_dir)
+    seed_to_paths: Dict[int, Dict[int, Path]] = defaultdict(dict)
+    for path in (ds_dir / "dumps").glob("*.pkl"):
+        seed, n = parse_key(path.stem)
+        seed_to_paths[seed][n] = path
+
+    converted_seeds = []
+    for seed, paths in sorted(seed_to_paths.items()):
+        chunk_path = get_chunk_path(ds_dir, seed)
+        if not chunk_path.exists():
+            assert set(paths.keys()) == set(range(len(paths))), f"Missing frames {seed}"
+            frame_bufs = [paths[n].read_bytes() for n in range(len(paths))]
+            write_packed_chunk(chunk_path, frame_bufs)
+            converted_seeds.append(seed)
+        if remove_dumps:
+            for path in paths.values():
+                path.unlink()
+    return converted_seeds
@@ -6,6 +6,8 @@ from pathlib import Path
 import numpy as np
 from PIL import Image
 
+from .packed_chunk import get_chunk_path, write_packed_chunk
+
 
 def get_cls(cls_str):
     split = cls_str.split(".")
@@ -39,23 +41,25 @@ def _get_dic_buf(state, jpeg=True, jpeg_compression=100):
     return pickle.dumps(state)
 
 
-def write_chunk(state_list, seed, ds_dir):
+def write_chunk(state_list, seed, ds_dir, packed=False):
     key_to_buf = {}
-    dumps_dir = Path(ds_dir) / "dumps"
-    dumps_dir.mkdir(exist_ok=True)
-
     for n, state in enumerate(state_list):
         key = f"{seed}-{n}"
         key_to_buf[key] = _get_dic_buf(state)
 
     # Write on disk
-    for key, buf in key_to_buf.items():
-        (dumps_dir / key).with_suffix(".pkl").write_bytes(buf)
+    if packed:
+        write_packed_chunk(get_chunk_path(ds_dir, seed), list(key_to_buf.values()))
+    else:
+        dumps_dir = Path(ds_dir) / "dumps"
+        dumps_dir.mkdir(exist_ok=True)
+        for key, buf in key_to_buf.items():
+            (dumps_dir / key).with_suffix(".pkl").write_bytes(buf)
     keys = list(key_to_buf.keys())
     return keys
 
 
-def record_chunk(ds_dir, scene_cls, scene_kwargs, seed, n_frames):
+def record_chunk(ds_dir, scene_cls, scene_kwargs, seed, n_frames, packed=False):
     ds_dir = Path(ds_dir)
     ds_dir.mkdir(exist_ok=True)
 
@@ -69,7 +73,7 @@ def record_chunk(ds_dir, scene_cls, scene_kwargs, seed, n_frames):
     for _ in range(n_frames):
         state = scene.make_new_scene()
         state_list.append(state)
-    keys = write_chunk(state_list, seed, ds_dir)
+    keys = write_chunk(state_list, seed, ds_dir, packed=packed)
 
     scene.disconnect()
     del scene
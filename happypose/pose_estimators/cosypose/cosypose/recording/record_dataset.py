@@ -2,10 +2,7 @@ import pickle
 import shutil
 from pathlib import Path
 
-import dask
 import yaml
-from dask_jobqueue import SLURMCluster
-from distributed import Client, LocalCluster, as_completed
 from tqdm import tqdm
 
 from happypose.pose_estimators.cosypose.cosypose.config import (
@@ -18,9 +15,9 @@ from happypose.pose_estimators.cosypose.cosypose.config import (
     SLURM_QOS,
 )
 
+from .journal import RecordingJournal
 from .record_chunk import record_chunk
-
-dask.config.set({"distributed.scheduler.allowed-failures": 1000})
+from .record_local import record_dataset_local
 
 
 def record_dataset_dask(
@@ -32,14 +29,14 @@ def record_dataset_dask(
     n_frames_per_chunk,
     start_seed=0,
     resume=False,
+    packed=False,
 ):
+    from distributed import as_completed
+
+    journal = RecordingJournal(ds_dir)
     seeds = set(range(start_seed, start_seed + n_chunks))
     if resume:
-        done_seeds = (ds_dir / "seeds_recorded.txt").read_text().strip().split("\n")
-        seeds = set(seeds) - set(map(int, done_seeds))
-        all_keys = (ds_dir / "keys_recorded.txt").read_text().strip().split("\n")
-    else:
-        all_keys = []
+        seeds = set(seeds) - set(journal.done_seeds)
     seeds = tuple(seeds)
 
     future_kwargs = []
@@ -50,6 +47,7 @@ def record_dataset_dask(
             "n_frames": n_frames_per_chunk,
             "scene_cls": scene_cls,
             "scene_kwargs": scene_kwargs,
+            "packed": packed,
         }
         future_kwargs.append(kwargs)
 
@@ -69,21 +67,21 @@ def record_dataset_dask(
         ncols=80,
     )
 
-    seeds_file = open(ds_dir / "seeds_recorded.txt", "a")
-    keys_file = open(ds_dir / "keys_recorded.txt", "a")
-
     for future in tqdm_iterator:
         keys, seed = future.result()
-        all_keys += keys
-        seeds_file.write(f"{seed}\n")
-        seeds_file.flush()
-        keys_file.write("\n".join(keys) + "\n")
-        keys_file.flush()
+        journal.append(seed, keys)
         client.cancel(future)
 
-    seeds_file.close()
-    keys_file.close()
-    return all_keys
+    journal.close()
+    return journal.keys
+
+
+def write_keys(ds_dir, all_keys, train_ratio):
+    n_train = int(train_ratio * len(all_keys))
+    train_keys, val_keys = all_keys[:n_train], all_keys[n_train:]
+    Path(ds_dir / "keys.pkl").write_bytes(pickle.dumps(all_keys))
+    Path(ds_dir / "train_keys.pkl").write_bytes(pickle.dumps(train_keys))
+    Path(ds_dir / "val_keys.pkl").write_bytes(pickle.dumps(val_keys))
 
 
 def record_dataset(args):
@@ -96,7 +94,7 @@ def record_dataset(args):
     args.ds_dir = Path(args.ds_dir)
     if args.ds_dir.is_dir():
         if args.resume:
-            assert (args.ds_dir / "seeds_recorded.txt").exists()
+            assert len(RecordingJournal(args.ds_dir).entries) > 0
         elif args.overwrite:
             shutil.rmtree(args.ds_dir)
         else:
@@ -106,6 +104,27 @@ def record_dataset(args):
 
     (args.ds_dir / "config.yaml").write_text(yaml.dump(args))
 
+    if getattr(args, "backend", "dask") == "local":
+        all_keys = record_dataset_local(
+            ds_dir=args.ds_dir,
+            scene_cls=args.scene_cls,
+            scene_kwargs=args.scene_kwargs,
+            n_chunks=int(args.n_chunks),
+            n_frames_per_chunk=int(args.n_frames_per_chunk),
+            start_seed=0,
+            n_workers=args.n_local_workers,
+            packed=getattr(args, "packed", False),
+        )
+        write_keys(args.ds_dir, all_keys, args.train_ratio)
+        return
+
+    # dask is only required by this backend.
+    import dask
+    from dask_jobqueue import SLURMCluster
+    from distributed import Client, LocalCluster
+
+    dask.config.set({"distributed.scheduler.allowed-failures": 1000})
+
     log_dir = DASK_LOGS_DIR.as_posix()
     if args.distributed:
         env_extra = [
@@ -155,13 +174,10 @@ def record_dataset(args):
         n_chunks=int(args.n_chunks),
         n_frames_per_chunk=int(args.n_frames_per_chunk),
         resume=args.resume,
+        packed=getattr(args, "packed", False),
     )
 
-    n_train = int(args.train_ratio * len(all_keys))
-    train_keys, val_keys = all_keys[:n_train], all_keys[n_train:]
-    Path(args.ds_dir / "keys.pkl").write_bytes(pickle.dumps(all_keys))
-    Path(args.ds_dir / "train_keys.pkl").write_bytes(pickle.dumps(train_keys))
-    Path(args.ds_dir / "val_keys.pkl").write_bytes(pickle.dumps(val_keys))
+    write_keys(args.ds_dir, all_keys, args.train_ratio)
 
     client.close()
     del cluster
@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from tqdm import tqdm
+
+from happypose.pose_estimators.cosypose.cosypose.utils.logging import get_logger
+
+from .journal import RecordingJournal
+from .record_chunk import get_cls, write_chunk
+
+logger = get_logger(__name__)
+
+_WORKER_RECORDER = None
+
+
+class ChunkRecorder:
+    """Records chunks with a scene that stays connected between chunks.
+
+    The scene and its body and texture caches are loaded once, the scene is
+    only reseeded for each chunk. The scene class must implement `set_seed`,
+    which also draws the randomized textures of the chunk.
+    """
+
+    def __init__(self, scene_cls, scene_kwargs, ds_dir, packed=False):
+        self.ds_dir = Path(ds_dir)
+        self.packed = packed
+        self.scene = get_cls(scene_cls)(**scene_kwargs)
+        self.scene.connect(load=True)
+
+    def record(self, seed, n_frames):
+        start = time.time()
+        self.scene.set_seed(seed)
+        state_list = [self.scene.make_new_scene() for _ in range(n_frames)]
+        keys = write_chunk(state_list, seed, self.ds_dir, packed=self.packed)
+        infos = {"worker": os.getpid(), "duration": time.time() - start}
+        return seed, keys, infos
+
+    def close(self):
+        self.scene.disconnect()
+
+
+def _init_worker(scene_cls, scene_kwargs, ds_dir, packed):
+    global _WORKER_RECORDER
+    _WORKER_RECORDER = ChunkRecorder(scene_cls, scene_kwargs, ds_dir, packed=packed)
+
+
+def _record_chunk_in_worker(seed, n_frames):
+    return _WORKER_RECORDER.record(seed, n_frames)
+
+
+def get_worker_throughputs(entries):
+    """Returns the frames/s of each worker while recording the entries."""
+    worker_frames = defaultdict(int)
+    worker_durations = defaultdict(float)
+    for entry in entries:
+        if "worker" in entry:
+            worker_frames[entry["worker"]] += len(entry["keys"])
+            worker_durations[entry["worker"]] += entry["duration"]
+    return {
+        worker: worker_frames[worker] / max(worker_durations[worker], 1e-6)
+        for worker in worker_frames
+    }
+
+
+def record_dataset_local(
+    ds_dir,
+    scene_cls,
+    scene_kwargs,
+    n_chunks,
+    n_frames_per_chunk,
+    start_seed=0,
+    n_workers=4,
+    packed=False,
+    max_pool_restarts=3,
+):
+    """Records a dataset with a pool of local processes.
+
+    The chunks already listed in the journal of `ds_dir` are not recorded
+    again, so an interrupted recording is resumed by calling this function
+    with the same arguments. If a worker process dies, the pool is restarted
+    and the missing chunks are recorded, up to `max_pool_restarts` times.
+    With n_workers=0, the chunks are recorded in the current process.
+
+    Returns the keys of all the frames of the dataset.
+    """
+    ds_dir = Path(ds_dir)
+    ds_dir.mkdir(exist_ok=True, parents=True)
+    scene_kwargs = dict(scene_kwargs, seed=start_seed)
+    journal = RecordingJournal(ds_dir)
+    seeds = range(start_seed, start_seed + n_chunks)
+
+    def get_remaining_seeds():
+        done_seeds = set(journal.done_seeds)
+        return [seed for seed in seeds if seed not in done_seeds]
+
+    remaining_seeds = get_remaining_seeds()
+    n_entries_start = len(journal.entries)
+    tqdm_iterator = tqdm(
+        total=len(remaining_seeds) * n_frames_per_chunk,
+        unit="frame",
+        ncols=80,
+    )
+
+    def on_chunk_recorded(seed, keys, infos):
+        journal.append(seed, keys, **infos)
+        tqdm_iterator.update(len(keys))
+
+    start = time.time()
+    try:
+        if n_workers == 0:
+            recorder = ChunkRecorder(scene_cls, scene_kwargs, ds_dir, packed=packed)
+            try:
+                for seed in remaining_seeds:
+                    on_chunk_recorded(*recorder.record(seed, n_frames_per_chunk))
+            finally:
+                recorder.close()
+
+        n_restarts = 0
+        while n_workers > 0 and len(remaining_seeds) > 0:
+            executor = ProcessPoolExecutor(
+                max_workers=n_workers,
+                # pybullet clients cannot be forked.
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(scene_cls, scene_kwargs, ds_dir, packed),
+            )
+            futures = [
+                executor.submit(_record_chunk_in_worker, seed, n_frames_per_chunk)
+                for seed in remaining_seeds
+            ]
+            try:
+                while futures:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        on_chunk_recorded(*future.result())
+            except BrokenProcessPool:
+                if n_restarts == max_pool_restarts:
+                    raise
+                n_restarts += 1
+                logger.info(f"A worker died, restarting the pool ({n_restarts}).")
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+            remaining_seeds = get_remaining_seeds()
+    finally:
+        tqdm_iterator.close()
+        journal.close()
+
+    new_entries = journal.entries[n_entries_start:]
+    n_frames = sum(len(entry["keys"]) for entry in new_entries)
+    worker_throughputs = get_worker_throughputs(new_entries)
+    logger.info(
+        f"Recorded {n_frames} frames, {n_frames / (time.time() - start):.2f} frames/s",
+    )
+    for worker, throughput in worker_throughputs.items():
+        logger.info(f"Worker {worker}: {throughput:.2f} frames/s")
+    return journal.keys
@@ -0,0 +1,32 @@
+import argparse
+
+from happypose.pose_estimators.cosypose.cosypose.recording.packed_chunk import (
+    convert_dumps_to_packed,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser("Synthetic dataset dumps/*.pkl -> packed chunks")
+    parser.add_argument(
+        "--ds_name",
+        default="",
+        type=str,
+        help="Name of the dataset in local_data/synt_datasets, e.g. ycbv-1M.",
+    )
+    parser.add_argument(
+        "--remove_dumps",
+        action="store_true",
+        help="Remove the pickle files once they are packed.",
+    )
+    args = parser.parse_args()
+
+    from happypose.pose_estimators.cosypose.cosypose.config import LOCAL_DATA_DIR
+
+    ds_dir = LOCAL_DATA_DIR / "synt_datasets" / args.ds_name
+    assert ds_dir.exists(), ds_dir
+    seeds = convert_dumps_to_packed(ds_dir, remove_dumps=args.remove_dumps)
+    print(f"Packed {len(seeds)} chunks in {ds_dir / 'chunks'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,12 @@ import shutil
 import subprocess
 
 import torch
-from bop_toolkit_lib import inout
-from tqdm import tqdm
 
 from happypose.pose_estimators.cosypose.cosypose.config import (
     BOP_POSE_EVAL_SCRIPT_NAME,
     RESULTS_DIR,
 )
+from happypose.toolbox.utils.bop_results import write_bop_results
 
 
 def main():
@@ -50,27 +49,8 @@ def convert_results(results_path, out_csv_path, method):
     print("Method:", method)
     print("Number of predictions: ", len(predictions))
 
-    preds = []
-    for n in tqdm(range(len(predictions))):
-        TCO_n = predictions.poses[n]
-        t = TCO_n[:3, -1] * 1e3  # m -> mm conversion
-        R = TCO_n[:3, :3]
-        row = predictions.infos.iloc[n]
-        obj_id = int(row.label.split("_")[-1])
-        score = row.score
-        time = row.time
-        pred = {
-            "scene_id": row.scene_id,
-            "im_id": row.view_id,
-            "obj_id": obj_id,
-            "score": score,
-            "t": t,
-            "R": R,
-            "time": time,
-        }
-        preds.append(pred)
+    write_bop_results(out_csv_path, predictions)
     print("Wrote:", out_csv_path)
-    inout.save_bop_results(out_csv_path, preds)
     return out_csv_path
 
 
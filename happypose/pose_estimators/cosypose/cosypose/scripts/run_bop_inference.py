@@ -62,7 +62,6 @@ from happypose.pose_estimators.cosypose.cosypose.training.pose_models_cfg import
 )
 from happypose.pose_estimators.cosypose.cosypose.utils.distributed import (
     get_rank,
-    get_tmp_dir,
     init_distributed_mode,
 )
 from happypose.pose_estimators.cosypose.cosypose.utils.logging import get_logger
@@ -196,7 +195,7 @@ def run_inference(args):
     torch.distributed.barrier()
 
     for k, v in all_predictions.items():
-        all_predictions[k] = v.gather_distributed(tmp_dir=get_tmp_dir()).cpu()
+        all_predictions[k] = v.gather_distributed().cpu()
 
     if get_rank() == 0:
         save_dir = Path(args.save_dir)
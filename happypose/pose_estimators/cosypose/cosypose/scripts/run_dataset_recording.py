@@ -15,6 +15,8 @@ def make_cfg(
     distributed=False,
     overwrite=False,
     datasets_dir=LOCAL_DATA_DIR,
+    backend="dask",
+    packed=False,
 ):
     datasets_dir = datasets_dir / "synt_datasets"
     datasets_dir.mkdir(exist_ok=True)
@@ -28,10 +30,16 @@ def make_cfg(
     cfg.n_frames_per_chunk = 100
     cfg.n_chunks = n_frames // cfg.n_frames_per_chunk
     cfg.train_ratio = 0.95
+    # Store each chunk in a single file instead of one file per frame in
+    # dumps/, see recording/packed_chunk.py
+    cfg.packed = packed
 
+    # 'dask' (SLURM or local cluster) or 'local' (process pool on this node)
+    cfg.backend = backend
     cfg.distributed = distributed
     cfg.n_workers = 6
     cfg.n_processes_per_gpu = 10
+    cfg.n_local_workers = 10
 
     cfg.scene_cls = "cosypose.recording.bop_recording_scene.BopRecordingScene"
     cfg.scene_kwargs = {
@@ -94,6 +102,12 @@ def main():
     parser.add_argument("--debug", action="store_true")
     parser.add_argument("--local", action="store_true")
     parser.add_argument("--overwrite", action="store_true")
+    parser.add_argument("--backend", default="dask", choices=["dask", "local"])
+    parser.add_argument(
+        "--packed",
+        action="store_true",
+        help="Store each chunk in a single file, see recording/packed_chunk.py",
+    )
     args = parser.parse_args()
 
     print(f"{Fore.RED}using config {args.config} {Style.RESET_ALL}")
@@ -103,6 +117,8 @@ def main():
         debug=args.debug,
         distributed=not args.local,
         overwrite=args.overwrite,
+        backend=args.backend,
+        packed=args.packed,
     )
     for k, v in vars(cfg).items():
         print(k, v)
@@ -37,7 +37,6 @@ from happypose.pose_estimators.cosypose.cosypose.training.detector_models_cfg im
 )
 from happypose.pose_estimators.cosypose.cosypose.utils.distributed import (
     get_rank,
-    get_tmp_dir,
     init_distributed_mode,
 )
 from happypose.pose_estimators.cosypose.cosypose.utils.logging import get_logger
@@ -169,7 +168,7 @@ def run_detection_eval(args, detector=None):
                 logger.info(f"Skipped: {preds_k}")
 
     for k, v in all_predictions.items():
-        all_predictions[k] = v.gather_distributed(tmp_dir=get_tmp_dir()).cpu()
+        all_predictions[k] = v.gather_distributed().cpu()
 
     results = None
     if get_rank() == 0:
@@ -51,7 +51,7 @@ from happypose.pose_estimators.megapose.inference.teaserpp_refiner import (
 from happypose.toolbox.datasets.datasets_cfg import make_object_dataset
 from happypose.toolbox.lib3d.rigid_mesh_database import MeshDataBase
 from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
-from happypose.toolbox.utils.distributed import get_rank, get_tmp_dir
+from happypose.toolbox.utils.distributed import get_rank
 from happypose.toolbox.utils.logging import get_logger
 
 # """" Temporary imports
@@ -291,7 +291,7 @@ def run_eval(
     torch.distributed.barrier()
     logger.info("Gathering predictions from all processes.")
     for k, v in all_preds.items():
-        all_preds[k] = v.gather_distributed(tmp_dir=get_tmp_dir()).cpu()
+        all_preds[k] = v.gather_distributed().cpu()
 
     torch.distributed.barrier()
     logger.info("Finished gathering predictions from all processes.")
@@ -1,12 +1,12 @@
-from pathlib import Path
-
 import pandas as pd
 import torch
 
-from happypose.pose_estimators.cosypose.cosypose.utils.distributed import (
-    get_rank,
-    get_world_size,
+from happypose.pose_estimators.cosypose.cosypose.utils.distributed import get_rank
+from happypose.toolbox.utils.distributed import (
+    DEFAULT_CHUNK_SIZE,
+    iter_gathered_objects,
 )
+from happypose.toolbox.utils.rle_masks import RLEMasks
 
 
 def concatenate(datas):
@@ -22,7 +22,11 @@ def concatenate(datas):
     tensor_keys = datas[0].tensors.keys()
     tensors = {}
     for k in tensor_keys:
-        tensors[k] = torch.cat([getattr(data, k) for data in datas], dim=0)
+        values = [getattr(data, k) for data in datas]
+        if isinstance(values[0], RLEMasks):
+            tensors[k] = RLEMasks.concatenate(values)
+        else:
+            tensors[k] = torch.cat(values, dim=0)
     return PandasTensorCollection(infos=infos, **tensors)
 
 
@@ -147,27 +151,15 @@ class PandasTensorCollection(TensorCollection):
     def __len__(self):
         return len(self.infos)
 
-    def gather_distributed(self, tmp_dir=None):
-        rank, world_size = get_rank(), get_world_size()
-        tmp_file_template = (tmp_dir / "rank={rank}.pth.tar").as_posix()
-
-        if rank > 0:
-            tmp_file = tmp_file_template.format(rank=rank)
-            torch.save(self, tmp_file)
-
-        if world_size > 1:
-            torch.distributed.barrier()
-
-        datas = [self]
-        if rank == 0 and world_size > 1:
-            for n in range(1, world_size):
-                tmp_file = tmp_file_template.format(rank=n)
-                data = torch.load(tmp_file)
-                datas.append(data)
-                Path(tmp_file).unlink()
+    def gather_distributed(self, tmp_dir=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Concatenation of the collections of all the ranks, on rank 0.
 
-        if world_size > 1:
-            torch.distributed.barrier()
+        The collections are streamed to rank 0 with `iter_gathered_objects`,
+        the other ranks return their own collection. tmp_dir is not used.
+        """
+        datas = list(iter_gathered_objects(self, chunk_size=chunk_size))
+        if get_rank() > 0:
+            datas = [self]
         return concatenate(datas)
 
     def __getstate__(self):
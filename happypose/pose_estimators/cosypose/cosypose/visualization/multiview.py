@@ -10,6 +10,7 @@ import transforms3d
 from happypose.pose_estimators.cosypose.cosypose.datasets.datasets_cfg import (
     make_urdf_dataset,
 )
+from happypose.toolbox.lib3d.nms3d import nms3d as batched_nms3d
 from happypose.toolbox.lib3d.rotations import euler2quat
 from happypose.toolbox.lib3d.transform import Transform
 from happypose.toolbox.lib3d.transform_ops import invert_transform_matrices
@@ -31,30 +32,10 @@ def filter_predictions(preds, group_id):
 
 
 def nms3d(preds, th=0.04, poses_attr="poses"):
-    TCO, TCO_infos = getattr(preds, poses_attr).cpu(), preds.infos
-    is_tested = set()
-    TCO = np.array(TCO)
-    scores = TCO_infos["score"].values
-    all_t = TCO[:, :3, -1]
-    argsort = np.argsort(-scores)
-    keep = []
-    for idx, TCO_n in zip(argsort, TCO[argsort]):
-        if idx in is_tested:
-            continue
-        t_n = TCO_n[:3, -1]
-        dists = np.linalg.norm(t_n - all_t, axis=-1)
-        dists[idx] = np.inf
-        ids_merge = np.where(dists <= th)[0]
-        for id_merge in ids_merge:
-            is_tested.add(id_merge)
-        keep.append(idx)
-    TCO = TCO[keep]
-    TCO_infos = TCO_infos.loc[keep].reset_index(drop=True)
-
-    new_preds = preds.clone()
-    new_preds.infos = TCO_infos
-    new_preds.poses = torch.as_tensor(TCO)
-    return new_preds
+    TCO = getattr(preds, poses_attr).cpu()
+    scores = torch.as_tensor(preds.infos["score"].values)
+    keep = batched_nms3d(TCO, scores, threshold=th)
+    return preds[keep.tolist()]
 
 
 def make_scene_renderings(
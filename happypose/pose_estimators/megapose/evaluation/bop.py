@@ -39,6 +39,7 @@ from happypose.pose_estimators.megapose.config import (
 from happypose.pose_estimators.megapose.evaluation.eval_config import BOPEvalConfig
 from happypose.toolbox.datasets.scene_dataset import ObjectData
 from happypose.toolbox.inference.utils import make_detections_from_object_data
+from happypose.toolbox.utils.bop_results import load_bop_detections, write_bop_results
 from happypose.toolbox.utils.tensor_collection import (
     PandasTensorCollection,
     filter_top_pose_estimates,
@@ -113,35 +114,9 @@ def convert_results_to_bop(
     print("Method:", method)
     print("Number of predictions: ", len(predictions))
 
-    preds = []
-    for n in tqdm(range(len(predictions))):
-        TCO_n = predictions.poses[n]
-        t = TCO_n[:3, -1] * 1e3  # m -> mm conversion
-        R = TCO_n[:3, :3]
-        row = predictions.infos.iloc[n]
-        print("row =", row)
-        obj_id = int(row.label.split("_")[-1])
-        if use_pose_score:
-            score = row["pose_score"]
-        else:
-            score = row["score"]
-        if "time" in row:
-            time = row["time"]
-        else:
-            time = -1
-        pred = dict(
-            scene_id=row["scene_id"],
-            im_id=row["view_id"],
-            obj_id=obj_id,
-            score=score,
-            t=t,
-            R=R,
-            time=time,
-        )
-        preds.append(pred)
+    score_column = "pose_score" if use_pose_score else "score"
+    write_bop_results(out_csv_path, predictions, score_column=score_column)
     print("Wrote:", out_csv_path)
-    Path(out_csv_path).parent.mkdir(exist_ok=True)
-    inout.save_bop_results(out_csv_path, preds)
     return out_csv_path
 
 
@@ -236,12 +211,10 @@ def load_external_detections(scene_ds_dir: Path):
     bop_detections_paths = get_external_detections_paths()
     detections_path = bop_detections_paths[ds_name]
 
-    dets_lst = []
-    for det in json.loads(detections_path.read_text()):
-        det = format_det_bop2megapose(det, ds_name)
-        dets_lst.append(det)
-
-    df_all_dets = pd.DataFrame.from_records(dets_lst)
+    # HACK: object models are same in lm and lmo
+    # -> lmo obj labels actually start with 'lm'
+    label_prefix = "lm" if ds_name == "lmo" else ds_name
+    df_all_dets = load_bop_detections(detections_path, label_prefix=label_prefix)
     df_targets = pd.read_json(scene_ds_dir / "test_targets_bop19.json")
     return df_all_dets, df_targets
 
@@ -265,28 +238,6 @@ def get_external_detections_paths():
     return bop_detections_paths
 
 
-def format_det_bop2megapose(det, ds_name):
-    # Segmentation mask not needed
-    if "segmentation" in det:
-        del det["segmentation"]
-    # Bounding box formats:
-    # - BOP format: [xmin, ymin, width, height]
-    # - Megapose expects: [xmin, ymin, xmax, ymax]
-    x, y, w, h = det["bbox"]
-    x1, y1, x2, y2 = x, y, x + w, y + h
-    det["bbox"] = [float(v) for v in [x1, y1, x2, y2]]
-    det["bbox_modal"] = det["bbox"]
-
-    # HACK: object models are same in lm and lmo
-    # -> lmo obj labels actually start with 'lm'
-    if ds_name == "lmo":
-        ds_name = "lm"
-
-    det["label"] = "{}-obj_{}".format(ds_name, str(det["category_id"]).zfill(6))
-
-    return det
-
-
 def filter_detections_scene_view(scene_id, view_id, df_all_dets, df_targets):
     """
     Retrieve detections of scene/view id pair and filter using bop targets.
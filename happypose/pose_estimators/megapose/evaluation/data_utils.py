@@ -16,13 +16,7 @@ limitations under the License.
 # Standard Library
 from typing import List, Optional
 
-# Third Party
-import numpy as np
-import pandas as pd
-import torch
-
 # MegaPose
-import happypose.toolbox.utils.tensor_collection as tc
 from happypose.toolbox.datasets.scene_dataset import SceneObservation
 from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
 
@@ -33,6 +27,9 @@ def parse_obs_data(
 ) -> PandasTensorCollection:
     """Parses object data into PandasTensorCollection.
 
+    Same as `SceneObservation.as_pandas_tensor_collection`, the binary
+    masks of the observation can be arrays or RLEMasks.
+
     Args:
     ----
         obs: The scene observation.
@@ -52,59 +49,4 @@ def parse_obs_data(
                 masks: (optional)
 
     """
-    msg = "This function is deprecated."
-    raise ValueError(msg)
-    infos = []
-    TWO = []
-    bboxes = []
-    masks = []
-    TWC = torch.as_tensor(obs.camera_data.TWC.matrix).float()
-    for _n, obj_data in enumerate(obs.object_datas):
-        if object_labels is not None and obj_data.label not in object_labels:
-            continue
-
-        info = {
-            "label": obj_data.label,
-            "scene_id": obs.infos.scene_id,
-            "view_id": obs.infos.view_id,
-            "visib_fract": getattr(obj_data, "visib_fract", 1),
-        }
-        infos.append(info)
-        TWO.append(torch.tensor(obj_data.TWO.matrix).float())
-        bboxes.append(torch.tensor(obj_data.bbox_modal).float())
-
-        if obs.binary_masks is not None:
-            binary_mask = torch.tensor(obs.binary_masks[obj_data.unique_id]).float()
-            masks.append(binary_mask)
-
-        if obs.segmentation is not None:
-            binary_mask = np.zeros_like(obs.segmentation)
-            binary_mask[obs.segmentation == obj_data.unique_id] = 1
-            binary_mask = torch.as_tensor(binary_mask).float()
-            masks.append(binary_mask)
-
-    TWO = torch.stack(TWO)
-    bboxes = torch.stack(bboxes)
-    infos = pd.DataFrame(infos)
-    if len(masks) > 0:
-        masks = torch.stack(masks)
-    B = len(infos)
-
-    TCW = torch.linalg.inv(TWC)  # [4,4]
-
-    # [B,4,4]
-    TCO = TCW.unsqueeze(0) @ TWO
-    K = torch.tensor(obs.camera_data.K).unsqueeze(0).expand([B, -1, -1])
-
-    data = tc.PandasTensorCollection(
-        infos=infos,
-        TCO=TCO,
-        bboxes=bboxes,
-        poses=TCO,
-        K=K,
-    )
-
-    if masks is not None:
-        data.register_tensor("masks", masks)
-
-    return data
+    return obs.as_pandas_tensor_collection(object_labels=object_labels)
@@ -73,6 +73,10 @@ class EvalConfig:
     skip_inference: bool = False
     skip_evaluation: bool = True
 
+    # Cache of the decoded frames, e.g. /dev/shm/happypose_frames (FrameCache)
+    frame_cache_dir: Optional[str] = None
+    frame_cache_max_gb: float = 16.0
+
     # Infos
     global_batch_size: Optional[int] = None
     hardware: HardwareConfig = field(default_factory=HardwareConfig)
@@ -43,8 +43,10 @@ from happypose.pose_estimators.megapose.inference.depth_refiner import DepthRefi
 from happypose.pose_estimators.megapose.inference.icp_refiner import ICPRefiner
 from happypose.pose_estimators.megapose.inference.pose_estimator import PoseEstimator
 from happypose.toolbox.datasets.datasets_cfg import make_object_dataset
+from happypose.toolbox.datasets.frame_cache import FrameCache
+from happypose.toolbox.inference.precision import InferencePrecision
 from happypose.toolbox.lib3d.rigid_mesh_database import MeshDataBase
-from happypose.toolbox.utils.distributed import get_rank, get_tmp_dir
+from happypose.toolbox.utils.distributed import get_rank
 from happypose.toolbox.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -120,6 +122,12 @@ def run_eval(
         scene_ds.frame_index = scene_ds.frame_index[: cfg.n_frames].reset_index(
             drop=True,
         )
+    if cfg.frame_cache_dir is not None:
+        scene_ds.frame_cache = FrameCache(
+            cfg.frame_cache_dir,
+            max_bytes=cfg.frame_cache_max_gb * 1e9,
+            namespace=cfg.ds_name,
+        )
 
     # Load detector model
     if cfg.inference.detection_type == "detector":
@@ -189,6 +197,11 @@ def run_eval(
         detector_model=detector_model,
         depth_refiner=depth_refiner,
         SO3_grid_size=cfg.inference.SO3_grid_size,
+        inference_precision=InferencePrecision(
+            dtype=cfg.inference.precision,
+            channels_last=cfg.inference.channels_last,
+            compile=cfg.inference.compile,
+        ),
     )
 
     # Create the prediction runner and run inference
@@ -244,7 +257,7 @@ def run_eval(
     torch.distributed.barrier()
     logger.info("Gathering predictions from all processes.")
     for k, v in all_preds.items():
-        all_preds[k] = v.gather_distributed(tmp_dir=get_tmp_dir()).cpu()
+        all_preds[k] = v.gather_distributed().cpu()
 
     torch.distributed.barrier()
     logger.info("Finished gathering predictions from all processes.")
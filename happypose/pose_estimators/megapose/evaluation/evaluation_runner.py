@@ -96,7 +96,7 @@ class EvaluationRunner:
         summary, dfs = {}, {}
         for meter_k, meter in self.meters.items():
             if len(meter.datas) > 0:
-                meter.gather_distributed(tmp_dir=self.tmp_dir)
+                meter.gather_distributed()
                 summary_, df_ = meter.summary()
                 dfs[meter_k] = df_
                 for k, v in summary_.items():
@@ -20,7 +20,7 @@ from collections import OrderedDict, defaultdict
 import pandas as pd
 
 # MegaPose
-from happypose.toolbox.utils.distributed import get_rank, get_tmp_dir
+from happypose.toolbox.utils.distributed import get_rank
 from happypose.toolbox.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -54,7 +54,7 @@ def run_pred_eval(pred_runner, pred_kwargs, eval_runner, eval_preds=None):
 
 def gather_predictions(all_predictions):
     for k, v in all_predictions.items():
-        all_predictions[k] = v.gather_distributed(tmp_dir=get_tmp_dir()).cpu()
+        all_predictions[k] = v.gather_distributed().cpu()
     return all_predictions
 
 
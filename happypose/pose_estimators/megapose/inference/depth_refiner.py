@@ -40,7 +40,7 @@ class DepthRefiner(ABC):
             predictions: len(predictions) = N, index into depth, masks, K using
                 the batch_im_id field.
             depth: [B, H, W]
-            masks: [B, H, W]
+            masks: [B, H, W] or RLEMasks
             K: [B,3,3]
 
         Returns: Tuple(refined_preds, extra_data)
@@ -19,12 +19,10 @@ from typing import Any, Optional
 # Third Party
 import numpy as np
 import numpy.typing as npt
-import pandas as pd
 import torch
 
 # MegaPose
 import happypose.pose_estimators.megapose
-import happypose.toolbox.utils.tensor_collection as tc
 from happypose.toolbox.inference.detector import DetectorModule
 from happypose.toolbox.inference.types import DetectionsType, ObservationTensor
 
@@ -72,6 +70,7 @@ class Detector(DetectorModule):
         output_masks: bool = False,
         mask_th: float = 0.8,
         one_instance_per_class: bool = False,
+        rle_masks: bool = False,
     ) -> DetectionsType:
         """Runs the detector on the given images.
 
@@ -82,6 +81,7 @@ class Detector(DetectorModule):
             mask_th: Threshold to use when computing masks
             one_instance_per_class: If True, keep only the highest scoring
                 detection within each class.
+            rle_masks: If True, the masks are stored as RLEMasks.
 
         Returns:
         ---
@@ -96,61 +96,16 @@ class Detector(DetectorModule):
         # TODO (lmanuelli): Why are we splitting this up into a list of tensors?
         outputs_ = self.model(list(images))
 
-        infos = []
-        bboxes = []
-        masks = []
-        for n, outputs_n in enumerate(outputs_):
-            outputs_n["labels"] = [
-                self.category_id_to_label[category_id.item()]
-                for category_id in outputs_n["labels"]
-            ]
-            for obj_id in range(len(outputs_n["boxes"])):
-                bbox = outputs_n["boxes"][obj_id]
-                info = {
-                    "batch_im_id": n,
-                    "label": outputs_n["labels"][obj_id],
-                    "score": outputs_n["scores"][obj_id].item(),
-                }
-                mask = outputs_n["masks"][obj_id, 0] > mask_th
-                bboxes.append(torch.as_tensor(bbox))
-                masks.append(torch.as_tensor(mask))
-                infos.append(info)
-
-        if len(bboxes) > 0:
-            bboxes = torch.stack(bboxes).to(device).float()
-            masks = torch.stack(masks).to(device)
-        else:
-            infos = {"score": [], "label": [], "batch_im_id": []}
-            bboxes = torch.empty(0, 4).to(device).float()
-            masks = torch.empty(
-                0,
-                images.shape[1],
-                images.shape[2],
-                dtype=torch.bool,
-            ).to(device)
-
-        detections = tc.PandasTensorCollection(
-            infos=pd.DataFrame(infos),
-            bboxes=bboxes,
+        return happypose.toolbox.inference.utils.make_detections_from_model_outputs(
+            outputs_,
+            self.category_id_to_label,
+            detection_th=detection_th,
+            output_masks=output_masks,
+            mask_th=mask_th,
+            one_instance_per_class=one_instance_per_class,
+            device=device,
+            rle_masks=rle_masks,
         )
-        if output_masks:
-            detections.register_tensor("masks", masks)
-        if detection_th is not None:
-            keep = np.where(detections.infos["score"] > detection_th)[0]
-            detections = detections[keep]
-
-        # Keep only the top-detection for each class label
-        if one_instance_per_class:
-            detections = happypose.toolbox.inference.utils.filter_detections(
-                detections,
-                one_instance_per_class=True,
-            )
-
-        # Add instance_id column to dataframe
-        # Each detection is now associated with an `instance_id` that
-        # identifies multiple instances of the same object
-        detections = happypose.toolbox.inference.utils.add_instance_id(detections)
-        return detections
 
     def __call__(self, *args: Any, **kwargs: Any) -> DetectionsType:
         return self.get_detections(*args, **kwargs)
@@ -24,11 +24,15 @@ from scipy import ndimage
 
 # MegaPose
 from happypose.pose_estimators.megapose.inference.depth_refiner import DepthRefiner
-from happypose.pose_estimators.megapose.inference.refiner_utils import compute_masks
+from happypose.pose_estimators.megapose.inference.refiner_utils import (
+    compute_masks,
+    get_mask,
+)
 from happypose.toolbox.inference.types import PoseEstimatesType
 from happypose.toolbox.lib3d.rigid_mesh_database import BatchedMeshes
 from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
 from happypose.toolbox.renderer.types import Panda3dLightData
+from happypose.toolbox.utils.profiler import profile, profile_function
 
 
 def get_normal(
@@ -229,6 +233,7 @@ class ICPRefiner(DepthRefiner):
         # default light_datas for rendering
         self.light_datas = [Panda3dLightData("ambient")]
 
+    @profile_function("icp")
     def refine_poses(
         self,
         predictions: PoseEstimatesType,
@@ -259,6 +264,7 @@ class ICPRefiner(DepthRefiner):
             light_datas=[self.light_datas] * N,
             resolution=resolution,
             render_depth=True,
+            render_rgb=False,
         )
 
         # [N,H,W]
@@ -283,16 +289,17 @@ class ICPRefiner(DepthRefiner):
 
                 mask = mask_measured
             else:
-                mask = masks[view_id].squeeze().cpu().numpy()
-
-            TCO_refined, retval = icp_refinement(
-                depth_measured,
-                depth_rendered,
-                mask,
-                cam_K,
-                TCO_pred,
-                n_min_points=1000,
-            )
+                mask = get_mask(masks, view_id)
+
+            with profile("icp_refinement"):
+                TCO_refined, retval = icp_refinement(
+                    depth_measured,
+                    depth_rendered,
+                    mask,
+                    cam_K,
+                    TCO_pred,
+                    n_min_points=1000,
+                )
 
             # Assign poses to predictions refined
             predictions_refined.poses_input[n] = predictions.poses[n].clone()
@@ -31,7 +31,13 @@ import happypose.toolbox.inference.utils
 import happypose.toolbox.utils.tensor_collection as tc
 from happypose.pose_estimators.megapose.inference.depth_refiner import DepthRefiner
 from happypose.pose_estimators.megapose.training.utils import CudaTimer, SimpleTimer
+from happypose.toolbox.inference.early_exit import (
+    RefinerConvergence,
+    forward_refiner_early_exit,
+)
 from happypose.toolbox.inference.pose_estimator import PoseEstimationModule
+from happypose.toolbox.inference.precision import InferencePrecision
+from happypose.toolbox.inference.pruning import prune_pose_hypotheses
 from happypose.toolbox.inference.types import (
     DetectionsType,
     ObservationTensor,
@@ -39,8 +45,14 @@ from happypose.toolbox.inference.types import (
 )
 from happypose.toolbox.inference.utils import add_instance_id, filter_detections
 from happypose.toolbox.lib3d.cosypose_ops import TCO_init_from_boxes_autodepth_with_R
+from happypose.toolbox.lib3d.nms3d import nms3d_pose_estimates
+from happypose.toolbox.renderer.render_service import (
+    RENDER_PRIORITY_SCORING,
+    render_priority,
+)
 from happypose.toolbox.utils import transform_utils
 from happypose.toolbox.utils.logging import get_logger
+from happypose.toolbox.utils.profiler import profile, profile_function
 from happypose.toolbox.utils.tensor_collection import (
     PandasTensorCollection,
     filter_top_pose_estimates,
@@ -64,6 +76,7 @@ class PoseEstimator(PoseEstimationModule):
         bsz_objects: int = 8,
         bsz_images: int = 256,
         SO3_grid_size: int = 576,
+        inference_precision: Optional[InferencePrecision] = None,
     ) -> None:
         super().__init__()
         self.coarse_model = coarse_model
@@ -73,6 +86,11 @@ class PoseEstimator(PoseEstimationModule):
         self.bsz_objects = bsz_objects
         self.bsz_images = bsz_images
 
+        if inference_precision is not None:
+            for model in (self.coarse_model, self.refiner_model):
+                if model is not None:
+                    model.set_inference_precision(inference_precision)
+
         # Load the SO3 grid if was passed in
         if SO3_grid_size is not None:
             self.load_SO3_grid(SO3_grid_size)
@@ -102,6 +120,7 @@ class PoseEstimator(PoseEstimationModule):
         self._SO3_grid = self._SO3_grid.to(device)
 
     @torch.no_grad()
+    @profile_function("refiner")
     def forward_refiner(
         self,
         observation: ObservationTensor,
@@ -109,6 +128,7 @@ class PoseEstimator(PoseEstimationModule):
         n_iterations: int = 5,
         keep_all_outputs: bool = False,
         cuda_timer: bool = False,
+        convergence: Optional[RefinerConvergence] = None,
         **refiner_kwargs,
     ) -> Tuple[dict, dict]:
         """Runs the refiner model for the specified number of iterations.
@@ -129,6 +149,8 @@ class PoseEstimator(PoseEstimationModule):
             extra_data:
                 A dict containing additional information such as timing
 
+        If convergence is set, the converged objects are not refined in the
+        next iterations, see `forward_refiner_early_exit`.
         """
         timer = Timer()
         timer.start()
@@ -137,6 +159,26 @@ class PoseEstimator(PoseEstimationModule):
 
         assert self.refiner_model is not None
 
+        if convergence is not None:
+            preds, all_outputs = forward_refiner_early_exit(
+                self.refiner_model,
+                observation,
+                data_TCO_input,
+                n_iterations=n_iterations,
+                convergence=convergence,
+                bsz_objects=self.bsz_objects,
+                keep_all_outputs=keep_all_outputs,
+                **refiner_kwargs,
+            )
+            elapsed = time.time() - start_time
+            extra_data = {
+                "n_iterations": n_iterations,
+                "outputs": all_outputs,
+                "model_time": elapsed,
+                "time": elapsed,
+            }
+            return preds, extra_data
+
         B = data_TCO_input.poses.shape[0]
         ids = torch.arange(B)
         ds = TensorDataset(ids)
@@ -160,15 +202,17 @@ class PoseEstimator(PoseEstimationModule):
             labels_ = df_["label"].tolist()
             batch_im_ids_ = torch.as_tensor(df_["batch_im_id"].values, device=device)
 
-            images_ = observation.images[batch_im_ids_]
             K_ = observation.K[batch_im_ids_]
             if torch.cuda.is_available():
                 timer_ = CudaTimer(enabled=cuda_timer)
             else:
                 timer_ = SimpleTimer()
             timer_.start()
+            # The crops are taken from the unique images, they are not
+            # replicated for each object.
             outputs_ = self.refiner_model(
-                images=images_,
+                images=observation.images,
+                image_ids=batch_im_ids_,
                 K=K_,
                 TCO=TCO_input_,
                 n_iterations=n_iterations,
@@ -220,6 +264,7 @@ class PoseEstimator(PoseEstimationModule):
         return preds, extra_data
 
     @torch.no_grad()
+    @profile_function("scoring")
     def forward_scoring_model(
         self,
         observation: ObservationTensor,
@@ -261,17 +306,23 @@ class PoseEstimator(PoseEstimationModule):
             labels_ = df_["label"].tolist()
             batch_im_ids_ = torch.as_tensor(df_["batch_im_id"].values, device=device)
 
-            images_ = observation.images[batch_im_ids_]
             K_ = observation.K[batch_im_ids_]
 
-            out_ = self.coarse_model.forward_coarse(
-                images=images_,
-                K=K_,
-                labels=labels_,
-                TCO_input=TCO_,
-                cuda_timer=cuda_timer,
-                return_debug_data=return_debug_data,
-            )
+            # The scoring renders are latency-critical when the render
+            # workers are shared with other consumers.
+            with render_priority(
+                self.coarse_model.renderer,
+                RENDER_PRIORITY_SCORING,
+            ):
+                out_ = self.coarse_model.forward_coarse(
+                    images=observation.images,
+                    image_ids=batch_im_ids_,
+                    K=K_,
+                    labels=labels_,
+                    TCO_input=TCO_,
+                    cuda_timer=cuda_timer,
+                    return_debug_data=return_debug_data,
+                )
 
             render_time += out_["render_time"]
             model_time += out_["model_time"]
@@ -325,6 +376,7 @@ class PoseEstimator(PoseEstimationModule):
         return data_TCO, extra_data
 
     @torch.no_grad()
+    @profile_function("coarse")
     def forward_coarse_model(
         self,
         observation: ObservationTensor,
@@ -387,7 +439,6 @@ class PoseEstimator(PoseEstimationModule):
             labels_ = df_["label"].tolist()
             bbox_ids_ = torch.as_tensor(df_["bbox_id"].values, device=device)
 
-            images_ = observation.images[batch_im_ids_]
             K_ = observation.K[batch_im_ids_]
 
             # We are indexing into the original detections TensorCollection.
@@ -412,7 +463,8 @@ class PoseEstimator(PoseEstimationModule):
             del points_
 
             out_ = coarse_model.forward_coarse(
-                images=images_,
+                images=observation.images,
+                image_ids=batch_im_ids_,
                 K=K_,
                 labels=labels_,
                 TCO_input=TCO_init_,
@@ -485,6 +537,7 @@ class PoseEstimator(PoseEstimationModule):
         return data_TCO, extra_data
 
     @torch.no_grad()
+    @profile_function("detection")
     def forward_detection_model(
         self,
         observation: ObservationTensor,
@@ -494,6 +547,7 @@ class PoseEstimator(PoseEstimationModule):
         """Runs the detector."""
         return self.detector_model.get_detections(observation, *args, **kwargs)
 
+    @profile_function("depth_refiner")
     def run_depth_refiner(
         self,
         observation: ObservationTensor,
@@ -513,6 +567,7 @@ class PoseEstimator(PoseEstimationModule):
         return refined_preds, extra_data
 
     @torch.no_grad()
+    @profile_function("run_inference_pipeline")
     def run_inference_pipeline(
         self,
         observation: ObservationTensor,
@@ -527,6 +582,10 @@ class PoseEstimator(PoseEstimationModule):
         cuda_timer: Optional[bool] = False,
         coarse_estimates: Optional[PoseEstimatesType] = None,
         labels_to_keep: Optional[List[str]] = None,
+        nms3d_threshold: Optional[float] = None,
+        nms3d_criterion: str = "translation",
+        refiner_convergence: Optional[RefinerConvergence] = None,
+        hypotheses_pruning_threshold: Optional[float] = None,
     ) -> Tuple[PoseEstimatesType, dict]:
         """Runs the entire pose estimation pipeline.
 
@@ -534,10 +593,16 @@ class PoseEstimator(PoseEstimationModule):
 
         1. Run detector (or use detections that were passed in)
         2. Run coarse model
-        3. Extract n_pose_hypotheses from coarse model
-        4. Run refiner for n_refiner_iterations
+        3. Extract n_pose_hypotheses from coarse model. If
+           hypotheses_pruning_threshold is set, remove the hypotheses whose
+           projection does not agree with the detection box (and mask), see
+           `inference.pruning`.
+        4. Run refiner for n_refiner_iterations, or until convergence of each
+           object if refiner_convergence is set.
         5. Score refined hypotheses
         6. Select highest scoring refined hypotheses.
+        7. Optionally, remove the duplicate estimates of the same object with
+           a 3D NMS if nms3d_threshold is set, see `lib3d.nms3d`.
 
         Returns
         -------
@@ -592,12 +657,22 @@ class PoseEstimator(PoseEstimationModule):
             timing_str += f"coarse={coarse_extra_data['time']:.2f}, "
 
             # Extract top-K coarse hypotheses
-            data_TCO_filtered = filter_top_pose_estimates(
-                data_TCO_coarse,
-                top_K=n_pose_hypotheses,
-                group_cols=["batch_im_id", "label", "instance_id"],
-                filter_field="coarse_logit",
-            )
+            with profile("filter_top_pose_estimates"):
+                data_TCO_filtered = filter_top_pose_estimates(
+                    data_TCO_coarse,
+                    top_K=n_pose_hypotheses,
+                    group_cols=["batch_im_id", "label", "instance_id"],
+                    filter_field="coarse_logit",
+                )
+            if hypotheses_pruning_threshold is not None:
+                with profile("prune_pose_hypotheses"):
+                    data_TCO_filtered = prune_pose_hypotheses(
+                        data_TCO_filtered,
+                        K=observation.K,
+                        mesh_db=self.coarse_model.mesh_db,
+                        threshold=hypotheses_pruning_threshold,
+                        masks=detections.tensors.get("masks"),
+                    )
 
         else:
             data_TCO_coarse = coarse_estimates
@@ -610,6 +685,7 @@ class PoseEstimator(PoseEstimationModule):
             n_iterations=n_refiner_iterations,
             keep_all_outputs=keep_all_refiner_outputs,
             cuda_timer=cuda_timer,
+            convergence=refiner_convergence,
         )
         data_TCO_refined = preds[f"iteration={n_refiner_iterations}"]
         timing_str += f"refiner={refiner_extra_data['time']:.2f}, "
@@ -623,12 +699,24 @@ class PoseEstimator(PoseEstimationModule):
         timing_str += f"scoring={scoring_extra_data['time']:.2f}, "
 
         # Extract the highest scoring pose estimate for each instance_id
-        data_TCO_final_scored = filter_top_pose_estimates(
-            data_TCO_scored,
-            top_K=1,
-            group_cols=["batch_im_id", "label", "instance_id"],
-            filter_field="pose_logit",
-        )
+        with profile("filter_top_pose_estimates"):
+            data_TCO_final_scored = filter_top_pose_estimates(
+                data_TCO_scored,
+                top_K=1,
+                group_cols=["batch_im_id", "label", "instance_id"],
+                filter_field="pose_logit",
+            )
+
+        if nms3d_threshold is not None:
+            with profile("nms3d"):
+                data_TCO_final_scored = nms3d_pose_estimates(
+                    data_TCO_final_scored,
+                    threshold=nms3d_threshold,
+                    group_cols=["batch_im_id", "label"],
+                    score_field="pose_logit",
+                    criterion=nms3d_criterion,
+                    mesh_db=self.mesh_db,
+                )
 
         # Optionally run ICP or TEASER++
         if run_depth_refiner:
@@ -13,8 +13,22 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+# Standard Library
+from typing import Union
+
 # Third Party
 import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.utils.rle_masks import RLEMasks
+
+
+def get_mask(masks: Union[torch.Tensor, RLEMasks], n: int) -> np.ndarray:
+    """Mask [H,W] n of the masks [B,H,W] or RLEMasks, as a numpy array."""
+    if isinstance(masks, RLEMasks):
+        return masks[n].decode()[0].numpy()
+    return masks[n].squeeze().cpu().numpy()
 
 
 def compute_masks(mask_type, depth_rendered, depth_measured, depth_delta_thresh=0.1):
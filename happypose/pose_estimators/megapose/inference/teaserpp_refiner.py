@@ -27,12 +27,14 @@ import torch
 from happypose.pose_estimators.megapose.inference.depth_refiner import DepthRefiner
 from happypose.pose_estimators.megapose.inference.refiner_utils import (
     compute_masks,
+    get_mask,
 )
 from happypose.pose_estimators.megapose.inference.types import PoseEstimatesType
 from happypose.toolbox.lib3d.rigid_mesh_database import BatchedMeshes
 from happypose.toolbox.lib3d.transform_ops import transform_pts_np
 from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
 from happypose.toolbox.renderer.types import Panda3dLightData
+from happypose.toolbox.utils.profiler import profile, profile_function
 from happypose.toolbox.visualization.meshcat_utils import get_pointcloud
 
 
@@ -187,6 +189,7 @@ class TeaserppRefiner(DepthRefiner):
 
         self.debug = {}
 
+    @profile_function("teaserpp")
     def refine_poses(
         self,
         predictions: PoseEstimatesType,
@@ -208,7 +211,8 @@ class TeaserppRefiner(DepthRefiner):
             predictions: PandasTensorCollection
                 Index into depth, K with batch_im_id
             depth: [B, H, W]
-            masks: not needed, for backward compatibility
+            masks: [B, H, W] or RLEMasks, optional, restrict the measured
+                points to the masks.
             K: [B,3,3]
 
         """
@@ -233,6 +237,7 @@ class TeaserppRefiner(DepthRefiner):
             light_datas=[self.light_datas] * N,
             resolution=resolution,
             render_depth=True,
+            render_rgb=False,
         )
 
         # [N,H,W]
@@ -253,6 +258,8 @@ class TeaserppRefiner(DepthRefiner):
                 depth_measured=depth_measured,
                 depth_delta_thresh=self.depth_delta_thresh,
             )
+            if masks is not None:
+                mask_measured = mask_measured & (get_mask(masks, view_id) > 0)
 
             # If insufficient number of points then just use the current prediction
             if (np.count_nonzero(mask_rendered) < self.n_min_points) or (
@@ -260,15 +267,16 @@ class TeaserppRefiner(DepthRefiner):
             ):
                 continue
             else:
-                out = compute_teaserpp_refinement(
-                    depth_src=depth_rendered,
-                    depth_tgt=depth_measured,
-                    mask=mask_measured,
-                    cam_K=cam_K,
-                    max_num_points=self.n_points,
-                    noise_bound=self.noise_bound,
-                    use_farthest_point_sampling=self.use_farthest_point_sampling,
-                )
+                with profile("teaserpp_refinement"):
+                    out = compute_teaserpp_refinement(
+                        depth_src=depth_rendered,
+                        depth_tgt=depth_measured,
+                        mask=mask_measured,
+                        cam_K=cam_K,
+                        max_num_points=self.n_points,
+                        noise_bound=self.noise_bound,
+                        use_farthest_point_sampling=self.use_farthest_point_sampling,
+                    )
 
                 # Only update the pose if we are "confident" about the solution,
                 # i.e. the num of inliers is above a threshold
@@ -46,6 +46,8 @@ infos: pd.DataFrame with (at least) fields
         correct batch for the refiner outputs
     - 'refiner_instance_idx', Optional[int], used to index into
         refiner outputs such as "image_crop", "render_crop", etc.
+    - 'n_refiner_iterations', Optional[int], number of refiner iterations
+        of this estimate when the refiner stops at convergence.
     - 'scene_id', Optional[str] used to identify predictions on a dataset.
     - 'view_id', Optional[str] used to identify predictions on a dataset.
 Tensors:
@@ -98,6 +100,9 @@ class InferenceConfig:
     bsz_objects: int = 16  # How many parallel refiners to run
     bsz_images: int = 288  # How many images to push through coarse model
     renderer: str = "panda3d"  # ['panda3d', 'pybullet']
+    precision: str = "fp32"  # ['fp32', 'bf16', 'fp16']
+    channels_last: bool = False
+    compile: bool = False
     n_workers: int = 1  # How many workers to use in the batch renderer
 
 
@@ -28,6 +28,11 @@ from happypose.pose_estimators.megapose.training.utils import CudaTimer, SimpleT
 
 # HappyPose
 from happypose.toolbox.datasets.scene_dataset import Resolution
+from happypose.toolbox.inference.precision import (
+    InferencePrecision,
+    configure_backbone,
+    run_backbone,
+)
 
 # MegaPose
 from happypose.toolbox.lib3d.camera_geometry import boxes_from_uv, get_K_crop_resize
@@ -41,9 +46,14 @@ from happypose.toolbox.lib3d.rigid_mesh_database import MeshDataBase
 from happypose.toolbox.lib3d.rotations import compute_rotation_matrix_from_ortho6d
 from happypose.toolbox.lib3d.transform_ops import normalize_T
 from happypose.toolbox.renderer import Panda3dLightData
-from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.panda3d_batch_renderer import (
+    Panda3dBatchRenderer,
+    PendingRenders,
+)
 from happypose.toolbox.renderer.panda3d_scene_renderer import make_scene_lights
+from happypose.toolbox.renderer.types import BatchRenderOutput
 from happypose.toolbox.utils.logging import get_logger
+from happypose.toolbox.utils.profiler import profile, profile_function
 
 logger = get_logger(__name__)
 
@@ -81,6 +91,25 @@ class PosePredictorOutput:
     timing_dict: Dict[str, float]
 
 
+@dataclass
+class PosePredictorIterationInputs:
+    """Inputs of a refiner iteration, whose renders may still be pending.
+
+    Returned by `PosePredictor.prefetch_renders`, so that the renders of the
+    first iteration are done in the background.
+    """
+
+    TCO_input: torch.Tensor
+    tCR: torch.Tensor
+    TCV_O_input: torch.Tensor
+    images_crop: torch.Tensor
+    K_crop: torch.Tensor
+    KV_crop: torch.Tensor
+    boxes_rend: torch.Tensor
+    boxes_crop: torch.Tensor
+    pending_renders: PendingRenders
+
+
 @dataclass
 class PosePredictorDebugData:
     """Filled when debug=True."""
@@ -176,10 +205,20 @@ class PosePredictor(nn.Module):
             + len(self._render_depth_dims)
         )
 
+        self.inference_precision = InferencePrecision()
+
         self.debug = False
         self.timing_dict: Dict[str, float] = defaultdict(float)
         self.debug_data = PosePredictorDebugData()
 
+    def set_inference_precision(self, precision: InferencePrecision) -> None:
+        """Sets the precision, memory format and compilation of the backbone.
+
+        Should be called once, after loading the weights.
+        """
+        configure_backbone(self.backbone, precision)
+        self.inference_precision = precision
+
     @property
     def input_rgb_dims(self) -> List[int]:
         return self._input_rgb_dims
@@ -196,6 +235,7 @@ class PosePredictor(nn.Module):
     def render_depth_dims(self) -> List[int]:
         return self._render_depth_dims
 
+    @profile_function("crop")
     def crop_inputs(
         self,
         images: torch.Tensor,
@@ -203,6 +243,7 @@ class PosePredictor(nn.Module):
         TCO: torch.Tensor,
         tCR: torch.Tensor,
         labels: List[str],
+        image_ids: Optional[torch.Tensor] = None,
     ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
         """Crop input images.
 
@@ -214,11 +255,14 @@ class PosePredictor(nn.Module):
 
         Args:
         ----
-            images (torch.Tensor): (bsz, ndims, h, w) where ndims is 3 or 4.
+            images (torch.Tensor): (bsz, ndims, h, w) where ndims is 3 or 4, or
+                (n_images, ndims, h, w) if image_ids is given.
             K (torch.Tensor): (bsz, 3, 3), intrinsics of input images
             TCO (torch.Tensor): (bsz, 4, 4)
             tCR (torch.Tensor): (bsz, 3) Position of the reference point wrt camera.
             labels (List[str]): Object labels
+            image_ids (torch.Tensor): (bsz,) index in images of the image of each
+                object. The images are not replicated for each object.
 
         Returns:
         -------
@@ -228,7 +272,9 @@ class PosePredictor(nn.Module):
                         points in pose TCO.
             boxes_crop: bounding box used to crop the input image.
         """
-        bsz = images.shape[0]
+        bsz = TCO.shape[0]
+        if image_ids is None:
+            assert images.shape[0] == bsz
         assert K.shape == (bsz, 3, 3)
         assert tCR.shape == (bsz, 3)
         assert TCO.shape == (bsz, 4, 4)
@@ -247,6 +293,7 @@ class PosePredictor(nn.Module):
             O_vertices=points,
             output_size=self.render_size,
             lamb=1.4,
+            image_ids=image_ids,
         )
 
         K_crop = get_K_crop_resize(
@@ -276,6 +323,7 @@ class PosePredictor(nn.Module):
             )
         return images_cropped, K_crop, boxes_rend, boxes_crop
 
+    @profile_function("crop_multiview")
     def compute_crops_multiview(
         self,
         images: torch.Tensor,
@@ -349,6 +397,7 @@ class PosePredictor(nn.Module):
         TCO_updated = pose_update_with_reference_point(TCO, K_crop, vxvyvz, dR, tCR)
         return TCO_updated
 
+    @profile_function("network")
     def net_forward(self, x: torch.Tensor) -> Dict[str, torch.Tensor]:
         """Forward pass of the neural network.
 
@@ -360,7 +409,7 @@ class PosePredictor(nn.Module):
         -------
             Dict[str, torch.Tensor]: Output of each network head.
         """
-        x = self.backbone(x)
+        x = run_backbone(self.backbone, x, self.inference_precision)
         if x.dim() == 2:
             pass
         elif x.dim() == 4:
@@ -373,6 +422,7 @@ class PosePredictor(nn.Module):
             outputs[k] = head(x)
         return outputs
 
+    @profile_function("render_multiview")
     def render_images_multiview(
         self,
         labels: List[str],
@@ -386,13 +436,32 @@ class PosePredictor(nn.Module):
         ----
             labels: List[str] with length bsz
             TCV_O: [bsz, n_views, 4, 4] pose of the cameras defining each view
-            KV: [bsz, n_views, 4, 4] intrinsics of the associated cameras
+            KV: [bsz, n_views, 3, 3] intrinsics of the associated cameras
             random_ambient_light: Whether to use randomize ambient light parameter.
 
         Returns:
         -------
             renders: [bsz, n_views*n_channels, H, W]
         """
+        pending_renders = self.submit_renders_multiview(
+            labels,
+            TCV_O,
+            KV,
+            random_ambient_light=random_ambient_light,
+        )
+        return self.stack_renders(pending_renders.wait(), len(labels))
+
+    def submit_renders_multiview(
+        self,
+        labels: List[str],
+        TCV_O: torch.Tensor,
+        KV: torch.Tensor,
+        random_ambient_light: bool = False,
+    ) -> PendingRenders:
+        """Sends the renders of `render_images_multiview` to the renderer.
+
+        The renders are done in the background, see `stack_renders`.
+        """
         labels_mv = []
         bsz = len(labels)
         n_views = TCV_O.shape[1]
@@ -400,6 +469,8 @@ class PosePredictor(nn.Module):
             for _ in range(n_views):
                 labels_mv.append(labels[n])
 
+        assert isinstance(self.renderer, Panda3dBatchRenderer)
+
         if random_ambient_light:
             light_datas = []
             for _ in range(len(labels_mv)):
@@ -421,9 +492,20 @@ class PosePredictor(nn.Module):
             else:
                 light_datas = [make_scene_lights() for _ in range(len(labels_mv))]
 
-        assert isinstance(self.renderer, Panda3dBatchRenderer)
-
-        render_data = self.renderer.render(
+        if n_views > 1 and not random_ambient_light:
+            # Lights are the same for all the views of an object,
+            # render them as cameras of a single scene.
+            return self.renderer.render_multiview_async(
+                labels=labels,
+                TCV_O=TCV_O,
+                KV=KV,
+                light_datas=light_datas[::n_views],
+                resolution=self.render_size,
+                render_depth=self.render_depth,
+                render_binary_mask=False,
+                render_normals=self.render_normals,
+            )
+        return self.renderer.render_async(
             labels=labels_mv,
             TCO=TCV_O.flatten(0, 1),
             K=KV.flatten(0, 1),
@@ -434,6 +516,8 @@ class PosePredictor(nn.Module):
             render_normals=self.render_normals,
         )
 
+    def stack_renders(self, render_data: BatchRenderOutput, bsz: int) -> torch.Tensor:
+        """Renders of bsz objects as a [bsz, n_views*n_channels, H, W] tensor."""
         cat_list = []
         cat_list.append(render_data.rgbs)
 
@@ -446,12 +530,13 @@ class PosePredictor(nn.Module):
         renders = torch.cat(cat_list, dim=1)
         n_channels = renders.shape[1]
 
-        renders = renders.view(bsz, n_views, n_channels, *renders.shape[-2:]).flatten(
+        renders = renders.view(bsz, -1, n_channels, *renders.shape[-2:]).flatten(
             1,
             2,
         )
         return renders  # [bsz, n_views*n_channels, H, W]
 
+    @profile_function("normalize")
     def normalize_images(
         self,
         images: torch.Tensor,
@@ -543,6 +628,109 @@ class PosePredictor(nn.Module):
 
         return depth_norm
 
+    def prepare_iteration(
+        self,
+        images: torch.Tensor,
+        K: torch.Tensor,
+        labels: List[str],
+        TCO_input: torch.Tensor,
+        random_ambient_light: bool = False,
+        image_ids: Optional[torch.Tensor] = None,
+    ) -> PosePredictorIterationInputs:
+        """Crops the images and submits the renders of a refiner iteration.
+
+        images must only contain the input dimensions of the model.
+        """
+        bsz = TCO_input.shape[0]
+        dtype = TCO_input.dtype
+        device = TCO_input.device
+        TCO_input = normalize_T(TCO_input).detach()
+
+        # Anchor / reference point
+        tOR = torch.zeros(bsz, 3, device=device, dtype=dtype)
+        tCR = TCO_input[..., :3, [-1]] + TCO_input[..., :3, :3] @ tOR.unsqueeze(-1)
+        tCR = tCR.squeeze(-1)
+
+        TCV_O_input = make_TCO_multiview(
+            TCO=TCO_input,
+            tCR=tCR,
+            multiview_type=self.multiview_type,
+            n_views=self.n_rendered_views,
+            remove_TCO_rendering=self.remove_TCO_rendering,
+        )
+        TCV_O_input_flatten = TCV_O_input.flatten(0, 1)
+
+        n_views = TCV_O_input.shape[1]
+        tCV_R = TCV_O_input_flatten[..., :3, [-1]] + TCV_O_input_flatten[
+            ...,
+            :3,
+            :3,
+        ] @ tOR.unsqueeze(1).repeat(1, n_views, 1).flatten(0, 1).unsqueeze(-1)
+        tCV_R = tCV_R.squeeze(-1).view(bsz, TCV_O_input.shape[1], 3)
+
+        images_crop, K_crop, boxes_rend, boxes_crop = self.crop_inputs(
+            images,
+            K,
+            TCO_input,
+            tCR,
+            labels,
+            image_ids=image_ids,
+        )
+
+        KV_crop = self.compute_crops_multiview(
+            images,
+            K,
+            TCV_O_input,
+            tCV_R,
+            labels,
+        )
+        if not self.remove_TCO_rendering:
+            KV_crop[:, 0] = K_crop
+
+        pending_renders = self.submit_renders_multiview(
+            labels,
+            TCV_O_input,
+            KV_crop,
+            random_ambient_light=random_ambient_light,
+        )
+        return PosePredictorIterationInputs(
+            TCO_input=TCO_input,
+            tCR=tCR,
+            TCV_O_input=TCV_O_input,
+            images_crop=images_crop,
+            K_crop=K_crop,
+            KV_crop=KV_crop,
+            boxes_rend=boxes_rend,
+            boxes_crop=boxes_crop,
+            pending_renders=pending_renders,
+        )
+
+    def prefetch_renders(
+        self,
+        images: torch.Tensor,
+        K: torch.Tensor,
+        labels: List[str],
+        TCO: torch.Tensor,
+        random_ambient_light: bool = False,
+        image_ids: Optional[torch.Tensor] = None,
+    ) -> PosePredictorIterationInputs:
+        """Submits the renders of the first iteration of `forward`.
+
+        The renders are done in the background by the renderer workers, the
+        result is passed to `forward` as prefetched_inputs, with the same
+        arguments.
+        """
+        if not self.input_depth:
+            images = images[:, self.input_rgb_dims]
+        return self.prepare_iteration(
+            images,
+            K,
+            labels,
+            TCO,
+            random_ambient_light=random_ambient_light,
+            image_ids=image_ids,
+        )
+
     def forward(
         self,
         images: torch.Tensor,
@@ -551,14 +739,22 @@ class PosePredictor(nn.Module):
         TCO: torch.Tensor,
         n_iterations: int = 1,
         random_ambient_light: bool = False,
+        image_ids: Optional[torch.Tensor] = None,
+        prefetched_inputs: Optional[PosePredictorIterationInputs] = None,
     ) -> Dict[str, PosePredictorOutput]:
-        timing_dict: Dict[str, float] = defaultdict(float)
+        """Runs n_iterations of the refiner.
 
+        If image_ids is given, images contains the unique images and the
+        object n is in the image images[image_ids[n]], see `crop_inputs`.
+        The first iteration uses the prefetched_inputs if given, see
+        `prefetch_renders`. timing_dict["render"] is the time spent waiting
+        for the renders.
+        """
         if not self.input_depth:
             # Remove the depth dimension if it is not used
             images = images[:, self.input_rgb_dims]
 
-        bsz = images.shape[0]
+        bsz = TCO.shape[0]
         assert TCO.shape == (bsz, 4, 4)
         assert K.shape == (bsz, 3, 3)
         assert len(labels) == bsz
@@ -568,55 +764,34 @@ class PosePredictor(nn.Module):
         outputs = {}
         TCO_input = TCO
         for n in range(n_iterations):
-            TCO_input = normalize_T(TCO_input).detach()
-
-            # Anchor / reference point
-            tOR = torch.zeros(bsz, 3, device=device, dtype=dtype)
-            tCR = TCO_input[..., :3, [-1]] + TCO_input[..., :3, :3] @ tOR.unsqueeze(-1)
-            tCR = tCR.squeeze(-1)
-
-            TCV_O_input = make_TCO_multiview(
-                TCO=TCO_input,
-                tCR=tCR,
-                multiview_type=self.multiview_type,
-                n_views=self.n_rendered_views,
-                remove_TCO_rendering=self.remove_TCO_rendering,
-            )
-            TCV_O_input_flatten = TCV_O_input.flatten(0, 1)
-
-            n_views = TCV_O_input.shape[1]
-            tCV_R = TCV_O_input_flatten[..., :3, [-1]] + TCV_O_input_flatten[
-                ...,
-                :3,
-                :3,
-            ] @ tOR.unsqueeze(1).repeat(1, n_views, 1).flatten(0, 1).unsqueeze(-1)
-            tCV_R = tCV_R.squeeze(-1).view(bsz, TCV_O_input.shape[1], 3)
-
-            images_crop, K_crop, boxes_rend, boxes_crop = self.crop_inputs(
-                images,
-                K,
-                TCO_input,
-                tCR,
-                labels,
-            )
-
-            KV_crop = self.compute_crops_multiview(
-                images,
-                K,
-                TCV_O_input,
-                tCV_R,
-                labels,
-            )
-            if not self.remove_TCO_rendering:
-                KV_crop[:, 0] = K_crop
+            timing_dict: Dict[str, float] = defaultdict(float)
+            if n == 0 and prefetched_inputs is not None:
+                assert prefetched_inputs.TCO_input.shape == TCO.shape
+                iteration_inputs = prefetched_inputs
+            else:
+                iteration_inputs = self.prepare_iteration(
+                    images,
+                    K,
+                    labels,
+                    TCO_input,
+                    random_ambient_light=random_ambient_light,
+                    image_ids=image_ids,
+                )
+            TCO_input = iteration_inputs.TCO_input
+            tCR = iteration_inputs.tCR
+            TCV_O_input = iteration_inputs.TCV_O_input
+            images_crop = iteration_inputs.images_crop
+            K_crop = iteration_inputs.K_crop
+            KV_crop = iteration_inputs.KV_crop
+            boxes_rend = iteration_inputs.boxes_rend
+            boxes_crop = iteration_inputs.boxes_crop
 
             t = time.time()
-            renders = self.render_images_multiview(
-                labels,
-                TCV_O_input,
-                KV_crop,
-                random_ambient_light=random_ambient_light,
-            )
+            with profile("render_multiview"):
+                renders = self.stack_renders(
+                    iteration_inputs.pending_renders.wait(),
+                    bsz,
+                )
             render_time = time.time() - t
             timing_dict["render"] = render_time
 
@@ -713,6 +888,7 @@ class PosePredictor(nn.Module):
         TCO_input: torch.Tensor,
         cuda_timer: bool = False,
         return_debug_data: bool = False,
+        image_ids: Optional[torch.Tensor] = None,
     ) -> Dict[str, Any]:
         # TODO: Is this still necessary ?
         """Run the coarse model given images + poses.
@@ -727,6 +903,8 @@ class PosePredictor(nn.Module):
             K: [B,3,3] camera intrinsics
             labels: list(str) of len(B)
             TCO: [B,4,4] object poses
+            image_ids: [B,] optional, index in images of the image of each
+                pose, see `crop_inputs`.
 
 
         Returns:
@@ -746,7 +924,7 @@ class PosePredictor(nn.Module):
             # Remove the depth dimension if it is not used
             images = images[:, self.input_rgb_dims]
 
-        bsz, nchannels, h, w = images.shape
+        bsz = TCO_input.shape[0]
         assert TCO_input.shape == (bsz, 4, 4)
         assert K.shape == (bsz, 3, 3)
         assert len(labels) == bsz
@@ -759,6 +937,7 @@ class PosePredictor(nn.Module):
             TCO_input,
             tCR,
             labels,
+            image_ids=image_ids,
         )
 
         # [B,1,4,4], hack to use the multi-view function
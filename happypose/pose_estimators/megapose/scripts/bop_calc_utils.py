@@ -0,0 +1,522 @@
+"""Shared implementation of `bop_calc_masks.py` and `bop_calc_gt_info.py`.
+
+Scenes are processed independently in a pool of worker processes, each worker
+keeping its own depth renderer alive across scenes. Two renderer backends are
+supported:
+- the `bop_toolkit` renderers (`cpp`, `python`, ...), which render one
+  ground-truth instance per call,
+- `panda3d`, which renders all the instances of a view in a single frame by
+  giving each instance its own camera (isolated with panda3d camera masks).
+
+A scene is skipped when its outputs are more recent than its inputs
+(`scene_gt.json`, `scene_camera.json` and the depth images), unless
+`--overwrite` is passed.
+"""
+
+# Standard Library
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Third Party
+import numpy as np
+from bop_toolkit_lib import inout, misc, visibility
+
+SCENE_DIR_TEMPLATE = "bop_data/train_pbr/{scene_id:06d}"
+MASKS_STAMP_NAME = ".bop_calc_masks.stamp"
+VISIB_DELTA = 15
+
+# Maximum number of instances rendered in a single panda3d frame,
+# limited by the number of bits of panda3d camera masks.
+PANDA3D_MAX_INSTANCES_PER_FRAME = 31
+
+
+def make_argument_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--chunk-dir", type=str, nargs="+")
+    parser.add_argument("--shapenet-dir", type=str)
+    parser.add_argument("--gso-dir", type=str)
+    parser.add_argument(
+        "--renderer-type",
+        type=str,
+        default="cpp",
+        help="bop_toolkit renderer type (cpp, python, ...) or panda3d.",
+    )
+    parser.add_argument("--scene-ids", type=int, nargs="+", default=None)
+    parser.add_argument("--n-workers", type=int, default=1)
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Recompute scenes even if their outputs are up to date.",
+    )
+    parser.add_argument("--overwrite-models", action="store_true")
+    return parser
+
+
+def load_chunk_objects(
+    chunk_dir: Path,
+    shapenet_dir: Optional[Path] = None,
+    gso_dir: Optional[Path] = None,
+) -> Dict[str, Path]:
+    """Returns the mapping from object names to ply paths of a chunk."""
+    chunk_infos = json.loads((chunk_dir / "chunk_infos.json").read_text())
+    obj_name_to_ply_path = {}
+    for obj in chunk_infos["scene_infos"]["objects"]:
+        obj_name = obj["category_id"]
+        if shapenet_dir is not None:
+            synset_id, source_id = obj["synset_id"], obj["source_id"]
+            ply_path = (
+                Path(shapenet_dir)
+                / f"{synset_id}/{source_id}"
+                / "models/model_normalized_scaled.ply"
+            )
+        else:
+            assert gso_dir is not None
+            gso_id = obj_name.split("gso_")[1]
+            ply_path = Path(gso_dir) / f"{gso_id}" / "meshes/model.ply"
+        obj_name_to_ply_path[obj_name] = ply_path
+    return obj_name_to_ply_path
+
+
+def list_scene_ids(chunk_dir: Path) -> List[int]:
+    split_dir = chunk_dir / "bop_data/train_pbr"
+    return sorted(int(p.name) for p in split_dir.iterdir() if p.name.isdigit())
+
+
+def scene_is_up_to_date(scene_dir: Path, output_path: Path) -> bool:
+    """Checks that `output_path` is more recent than all the inputs of a scene."""
+    if not output_path.exists():
+        return False
+    input_paths = [scene_dir / "scene_gt.json", scene_dir / "scene_camera.json"]
+    input_paths += list((scene_dir / "depth").iterdir())
+    inputs_mtime = max(p.stat().st_mtime for p in input_paths)
+    return output_path.stat().st_mtime >= inputs_mtime
+
+
+class BopToolkitDepthRenderer:
+    """Renders instances one by one with a `bop_toolkit_lib` renderer."""
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        renderer_type: str,
+        obj_name_to_ply_path: Dict[str, Path],
+    ):
+        from bop_toolkit_lib import renderer
+
+        self._renderer = renderer.create_renderer(
+            width,
+            height,
+            renderer_type,
+            mode="depth",
+        )
+        self._obj_name_to_id = {}
+        for obj_id, (obj_name, ply_path) in enumerate(obj_name_to_ply_path.items()):
+            self._obj_name_to_id[obj_name] = obj_id
+            self._renderer.add_object(obj_id, str(ply_path))
+
+    def render_instances(
+        self,
+        gts: List[Dict],
+        K: np.ndarray,
+    ) -> List[np.ndarray]:
+        """Renders the depth (in mm) of each ground-truth instance alone."""
+        fx, fy, cx, cy = K[0, 0], K[1, 1], K[0, 2], K[1, 2]
+        depths = []
+        for gt in gts:
+            depth = self._renderer.render_object(
+                self._obj_name_to_id[gt["obj_id"]],
+                gt["cam_R_m2c"],
+                gt["cam_t_m2c"],
+                fx,
+                fy,
+                cx,
+                cy,
+            )["depth"]
+            depths.append(depth)
+        return depths
+
+
+class Panda3dDepthRenderer:
+    """Renders all the instances of a view in one frame with panda3d.
+
+    Each instance is seen by a dedicated camera only, so that every camera
+    produces the unoccluded depth of its instance.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        obj_name_to_ply_path: Dict[str, Path],
+        z_near: float = 0.01,
+        z_far: float = 10.0,
+    ):
+        from happypose.toolbox.datasets.object_dataset import RigidObjectDataset
+        from happypose.toolbox.renderer.panda3d_scene_renderer import (
+            Panda3dSceneRenderer,
+        )
+
+        # The meshes are labeled by their path, so that objects of different
+        # chunks sharing a name do not conflict when the renderer is reused.
+        self._object_dataset = RigidObjectDataset([])
+        self._renderer = Panda3dSceneRenderer(self._object_dataset)
+        self._obj_name_to_label: Dict[str, str] = {}
+        self.z_near = z_near
+        self.z_far = z_far
+        self.set_objects(width, height, obj_name_to_ply_path)
+
+    def set_objects(
+        self,
+        width: int,
+        height: int,
+        obj_name_to_ply_path: Dict[str, Path],
+    ) -> None:
+        """Sets the resolution and the objects, loading the meshes not seen yet."""
+        from happypose.toolbox.datasets.object_dataset import RigidObject
+
+        self.resolution = (height, width)
+        self._obj_name_to_label = {}
+        for obj_name, ply_path in obj_name_to_ply_path.items():
+            label = str(ply_path)
+            if label not in self._object_dataset.label_to_objects:
+                # BOP meshes and poses are expressed in millimeters.
+                obj = RigidObject(
+                    label=label, mesh_path=Path(ply_path), mesh_units="mm"
+                )
+                self._object_dataset.list_objects.append(obj)
+                self._object_dataset.label_to_objects[label] = obj
+                self._renderer.get_object_node(label)
+            self._obj_name_to_label[obj_name] = label
+
+    def render_instances(
+        self,
+        gts: List[Dict],
+        K: np.ndarray,
+    ) -> List[np.ndarray]:
+        """Renders the depth (in mm) of each ground-truth instance alone."""
+        depths = []
+        for start in range(0, len(gts), PANDA3D_MAX_INSTANCES_PER_FRAME):
+            gts_ = gts[start : start + PANDA3D_MAX_INSTANCES_PER_FRAME]
+            depths.extend(self._render_frame(gts_, K))
+        return depths
+
+    def _render_frame(
+        self,
+        gts: List[Dict],
+        K: np.ndarray,
+    ) -> List[np.ndarray]:
+        from happypose.toolbox.lib3d.transform import Transform
+        from happypose.toolbox.renderer.types import (
+            Panda3dCameraData,
+            Panda3dObjectData,
+        )
+
+        object_datas, camera_datas = [], []
+        for gt in gts:
+            t_m = np.asarray(gt["cam_t_m2c"], dtype=float).flatten() / 1000
+            TCO = Transform(np.asarray(gt["cam_R_m2c"], dtype=float), t_m)
+            label = self._obj_name_to_label[gt["obj_id"]]
+            object_datas.append(Panda3dObjectData(label=label, TWO=TCO))
+            camera_datas.append(
+                Panda3dCameraData(
+                    K=K,
+                    resolution=self.resolution,
+                    z_near=self.z_near,
+                    z_far=self.z_far,
+                ),
+            )
+        renderings = self._renderer.render_scene(
+            object_datas,
+            camera_datas,
+            light_datas=[],
+            render_depth=True,
+            isolate_objects=True,
+            render_rgb=False,
+        )
+        return [rendering.depth[..., 0] * 1000 for rendering in renderings]
+
+
+DepthRenderer = Union[BopToolkitDepthRenderer, Panda3dDepthRenderer]
+_worker_renderers: Dict[Tuple, DepthRenderer] = {}
+_worker_panda3d_renderer: Optional[Panda3dDepthRenderer] = None
+
+
+def get_depth_renderer(
+    renderer_type: str,
+    width: int,
+    height: int,
+    obj_name_to_ply_path: Dict[str, Path],
+) -> DepthRenderer:
+    """Returns a depth renderer, cached for the lifetime of the worker process.
+
+    The panda3d renderer is created once per worker, the resolution and the
+    objects are updated at each call. Only the last bop_toolkit renderer is
+    kept.
+    """
+    global _worker_panda3d_renderer
+    if renderer_type == "panda3d":
+        if _worker_panda3d_renderer is None:
+            _worker_panda3d_renderer = Panda3dDepthRenderer(
+                width,
+                height,
+                obj_name_to_ply_path,
+            )
+        else:
+            _worker_panda3d_renderer.set_objects(width, height, obj_name_to_ply_path)
+        return _worker_panda3d_renderer
+
+    key = (renderer_type, width, height, tuple(sorted(obj_name_to_ply_path.items())))
+    if key not in _worker_renderers:
+        # bop_toolkit renderers keep GL resources alive, only keep the last one.
+        _worker_renderers.clear()
+        _worker_renderers[key] = BopToolkitDepthRenderer(
+            width,
+            height,
+            renderer_type,
+            obj_name_to_ply_path,
+        )
+    return _worker_renderers[key]
+
+
+def load_scene_view(
+    scene_dir: Path,
+    scene_camera: Dict,
+    im_id: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the camera intrinsics and the distance image (in mm) of a view."""
+    K = scene_camera[im_id]["cam_K"]
+    depth_im = inout.load_depth(str(scene_dir / f"depth/{im_id:06d}.png"))
+    depth_im *= scene_camera[im_id]["depth_scale"]  # to [mm]
+    dist_im = misc.depth_im_to_dist_im_fast(depth_im, K)
+    return K, dist_im
+
+
+def calc_scene_masks(
+    chunk_dir: Path,
+    scene_id: int,
+    renderer_type: str,
+    obj_name_to_ply_path: Dict[str, Path],
+    overwrite: bool = False,
+) -> bool:
+    """Computes the `mask` and `mask_visib` images of a scene.
+
+    Returns False if the scene was already up to date.
+    """
+    scene_dir = chunk_dir / SCENE_DIR_TEMPLATE.format(scene_id=scene_id)
+    stamp_path = scene_dir / MASKS_STAMP_NAME
+    if not overwrite and scene_is_up_to_date(scene_dir, stamp_path):
+        return False
+
+    cam_infos = json.loads((chunk_dir / "bop_data/camera.json").read_text())
+    im_width, im_height = cam_infos["width"], cam_infos["height"]
+    ren = get_depth_renderer(renderer_type, im_width, im_height, obj_name_to_ply_path)
+
+    scene_camera = inout.load_scene_camera(str(scene_dir / "scene_camera.json"))
+    scene_gt = inout.load_scene_gt(str(scene_dir / "scene_gt.json"))
+    mask_dir_path = scene_dir / "mask"
+    mask_visib_dir_path = scene_dir / "mask_visib"
+    misc.ensure_dir(str(mask_dir_path))
+    misc.ensure_dir(str(mask_visib_dir_path))
+
+    for im_id in sorted(scene_gt.keys()):
+        K, dist_im = load_scene_view(scene_dir, scene_camera, im_id)
+        gt_ids = [
+            gt_id
+            for gt_id, gt in enumerate(scene_gt[im_id])
+            if gt["obj_id"] in obj_name_to_ply_path
+        ]
+        depths_gt = ren.render_instances([scene_gt[im_id][i] for i in gt_ids], K)
+        for gt_id, depth_gt in zip(gt_ids, depths_gt):
+            # Convert depth image to distance image.
+            dist_gt = misc.depth_im_to_dist_im_fast(depth_gt, K)
+
+            # Mask of the full object silhouette.
+            mask = dist_gt > 0
+
+            # Mask of the visible part of the object silhouette.
+            mask_visib = visibility.estimate_visib_mask_gt(
+                dist_im,
+                dist_gt,
+                VISIB_DELTA,
+                visib_mode="bop19",
+            )
+
+            # Save the calculated masks.
+            mask_name = f"{im_id:06d}_{gt_id:06d}.png"
+            inout.save_im(
+                str(mask_dir_path / mask_name),
+                255 * mask.astype(np.uint8),
+            )
+            inout.save_im(
+                str(mask_visib_dir_path / mask_name),
+                255 * mask_visib.astype(np.uint8),
+            )
+    stamp_path.touch()
+    return True
+
+
+def calc_scene_gt_info(
+    chunk_dir: Path,
+    scene_id: int,
+    renderer_type: str,
+    obj_name_to_ply_path: Dict[str, Path],
+    overwrite: bool = False,
+) -> bool:
+    """Computes the `scene_gt_info.json` of a scene.
+
+    Objects are rendered in an image 3 times larger than the original one
+    to measure the silhouette of objects truncated by the image borders.
+    Returns False if the scene was already up to date.
+    """
+    scene_dir = chunk_dir / SCENE_DIR_TEMPLATE.format(scene_id=scene_id)
+    scene_gt_info_path = scene_dir / "scene_gt_info.json"
+    if not overwrite and scene_is_up_to_date(scene_dir, scene_gt_info_path):
+        return False
+
+    cam_infos = json.loads((chunk_dir / "bop_data/camera.json").read_text())
+    im_width, im_height = cam_infos["width"], cam_infos["height"]
+    ren_width, ren_height = 3 * im_width, 3 * im_height
+    ren_cx_offset, ren_cy_offset = im_width, im_height
+    large_ren = get_depth_renderer(
+        renderer_type,
+        ren_width,
+        ren_height,
+        obj_name_to_ply_path,
+    )
+
+    scene_camera = inout.load_scene_camera(str(scene_dir / "scene_camera.json"))
+    scene_gt = inout.load_scene_gt(str(scene_dir / "scene_gt.json"))
+
+    scene_gt_info = {}
+    for im_id in sorted(scene_gt.keys()):
+        K, dist_im = load_scene_view(scene_dir, scene_camera, im_id)
+        im_size = (dist_im.shape[1], dist_im.shape[0])
+        K_large = K.copy()
+        K_large[0, 2] += ren_cx_offset
+        K_large[1, 2] += ren_cy_offset
+
+        gts = [gt for gt in scene_gt[im_id] if gt["obj_id"] in obj_name_to_ply_path]
+        depths_gt_large = large_ren.render_instances(gts, K_large)
+
+        scene_gt_info[im_id] = []
+        for depth_gt_large in depths_gt_large:
+            depth_gt = depth_gt_large[
+                ren_cy_offset : (ren_cy_offset + im_height),
+                ren_cx_offset : (ren_cx_offset + im_width),
+            ]
+
+            # Convert depth images to distance images.
+            dist_gt = misc.depth_im_to_dist_im_fast(depth_gt, K)
+
+            # Estimation of the visibility mask.
+            visib_gt = visibility.estimate_visib_mask_gt(
+                dist_im,
+                dist_gt,
+                VISIB_DELTA,
+                visib_mode="bop19",
+            )
+
+            # Mask of the object in the GT pose.
+            obj_mask_gt_large = depth_gt_large > 0
+            obj_mask_gt = dist_gt > 0
+
+            # Number of pixels in the whole object silhouette
+            # (even in the truncated part).
+            px_count_all = np.sum(obj_mask_gt_large)
+
+            # Number of pixels in the object silhouette with a valid depth measurement
+            # (i.e. with a non-zero value in the depth image).
+            px_count_valid = np.sum(dist_im[obj_mask_gt] > 0)
+
+            # Number of pixels in the visible part of the object silhouette.
+            px_count_visib = visib_gt.sum()
+
+            # Visible surface fraction.
+            if px_count_all > 0:
+                visib_fract = px_count_visib / float(px_count_all)
+            else:
+                visib_fract = 0.0
+
+            # Bounding box of the whole object silhouette
+            # (including the truncated part).
+            bbox = [-1, -1, -1, -1]
+            if px_count_visib > 0:
+                ys, xs = obj_mask_gt_large.nonzero()
+                ys -= ren_cy_offset
+                xs -= ren_cx_offset
+                bbox = misc.calc_2d_bbox(xs, ys, im_size)
+
+            # Bounding box of the visible surface part.
+            bbox_visib = [-1, -1, -1, -1]
+            if px_count_visib > 0:
+                ys, xs = visib_gt.nonzero()
+                bbox_visib = misc.calc_2d_bbox(xs, ys, im_size)
+
+            # Store the calculated info.
+            scene_gt_info[im_id].append(
+                {
+                    "px_count_all": int(px_count_all),
+                    "px_count_valid": int(px_count_valid),
+                    "px_count_visib": int(px_count_visib),
+                    "visib_fract": float(visib_fract),
+                    "bbox_obj": [int(e) for e in bbox],
+                    "bbox_visib": [int(e) for e in bbox_visib],
+                },
+            )
+
+    # Save the info for the current scene.
+    misc.ensure_dir(os.path.dirname(scene_gt_info_path))
+    inout.save_json(str(scene_gt_info_path), scene_gt_info)
+    return True
+
+
+SceneFunction = Callable[[Path, int, str, Dict[str, Path], bool], bool]
+
+
+def run_scenes(
+    scene_fn: SceneFunction,
+    args: argparse.Namespace,
+) -> None:
+    """Runs `scene_fn` on every scene of every chunk, in parallel over scenes."""
+    shapenet_dir = Path(args.shapenet_dir) if args.shapenet_dir else None
+    gso_dir = Path(args.gso_dir) if args.gso_dir else None
+
+    tasks = []
+    for chunk_dir in map(Path, args.chunk_dir):
+        obj_name_to_ply_path = load_chunk_objects(chunk_dir, shapenet_dir, gso_dir)
+        scene_ids = args.scene_ids
+        if scene_ids is None:
+            scene_ids = list_scene_ids(chunk_dir)
+        for scene_id in scene_ids:
+            tasks.append(
+                (
+                    chunk_dir,
+                    scene_id,
+                    args.renderer_type,
+                    obj_name_to_ply_path,
+                    args.overwrite,
+                ),
+            )
+    misc.log(
+        f"{scene_fn.__name__}: {len(tasks)} scenes, {args.n_workers} workers, "
+        f"renderer={args.renderer_type}",
+    )
+
+    start = time.time()
+    if args.n_workers > 1:
+        with ProcessPoolExecutor(max_workers=args.n_workers) as executor:
+            futures = [executor.submit(scene_fn, *task) for task in tasks]
+            processed = [future.result() for future in futures]
+    else:
+        processed = [scene_fn(*task) for task in tasks]
+    misc.log(
+        f"{scene_fn.__name__}: processed {sum(processed)} scenes, "
+        f"skipped {len(processed) - sum(processed)} up-to-date scenes "
+        f"in {time.time() - start:.1f}s",
+    )
@@ -26,6 +26,7 @@ from omegaconf import OmegaConf
 
 # MegaPose
 import happypose.pose_estimators.megapose.utils.hostlist as hostlist
+from happypose.toolbox.utils.distributed import broadcast_object
 from happypose.toolbox.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -41,16 +42,11 @@ def get_tmp_dir():
 
 
 def sync_config(cfg, local_fields=[]):
-    cfg_path = get_tmp_dir() / "config.yaml"
-    if get_rank() == 0:
-        OmegaConf.save(cfg, cfg_path)
-    dist.barrier()
     my_cfg = cfg
-    cfg = OmegaConf.load(cfg_path)
+    cfg = OmegaConf.create(broadcast_object(OmegaConf.to_yaml(cfg)))
     for local_field in local_fields:
         if local_field in my_cfg:
             cfg[local_field] = my_cfg[local_field]
-    dist.barrier()
     return cfg
 
 
@@ -0,0 +1,51 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+from pathlib import Path
+
+# Third Party
+import trimesh
+from tqdm import tqdm
+
+# MegaPose
+from happypose.pose_estimators.megapose.config import LOCAL_DATA_DIR
+from happypose.toolbox.datasets.datasets_cfg import make_object_dataset
+from happypose.toolbox.datasets.object_dataset import RigidObjectDataset
+from happypose.toolbox.lib3d.mesh_lod import DEFAULT_LOD_N_FACES, MeshLODs
+
+MESH_LODS_DIR = LOCAL_DATA_DIR / "mesh_lods"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Decimates the meshes of an object dataset, for MeshLODs.",
+    )
+    parser.add_argument("--object-dataset", type=str, required=True)
+    parser.add_argument("--cache-dir", type=Path, default=MESH_LODS_DIR)
+    parser.add_argument(
+        "--n-faces",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_LOD_N_FACES),
+    )
+    args = parser.parse_args()
+
+    trimesh.util.log.setLevel("ERROR")
+    obj_dataset = make_object_dataset(args.object_dataset)
+    for obj in tqdm(obj_dataset.objects):
+        MeshLODs(RigidObjectDataset([obj]), args.cache_dir, n_faces=args.n_faces)
+    print(f"Mesh levels saved in {args.cache_dir}")
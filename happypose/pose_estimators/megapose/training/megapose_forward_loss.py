@@ -14,7 +14,8 @@ limitations under the License.
 """
 
 # Standard Library
-from typing import Any, Dict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
 
 # Third Party
 import numpy as np
@@ -24,7 +25,10 @@ from bokeh.io import curdoc
 from bokeh.layouts import gridplot
 from torch import nn
 
-from happypose.pose_estimators.megapose.models.pose_rigid import PosePredictor
+from happypose.pose_estimators.megapose.models.pose_rigid import (
+    PosePredictor,
+    PosePredictorIterationInputs,
+)
 from happypose.pose_estimators.megapose.training.training_config import TrainingConfig
 from happypose.pose_estimators.megapose.training.utils import cast, cast_images
 
@@ -43,18 +47,38 @@ from happypose.toolbox.lib3d.transform_ops import add_noise, invert_transform_ma
 from happypose.toolbox.visualization.bokeh_plotter import BokehPlotter
 
 
-def megapose_forward_loss(
+@dataclass
+class PreparedBatch:
+    """Inputs of the model for a training batch, see `prepare_batch`.
+
+    The hypotheses are [batch_size, n_hypotheses]. prefetched_inputs holds
+    the first refiner iteration, whose renders may still be pending.
+    """
+
+    images: torch.Tensor
+    K: torch.Tensor
+    TCO_gt: torch.Tensor
+    labels_gt: np.ndarray
+    hypotheses_TCO_init: torch.Tensor
+    hypotheses_labels: np.ndarray
+    hypotheses_image_ids: torch.Tensor
+    is_hypothesis_positive: Optional[np.ndarray]
+    prefetched_inputs: Optional[PosePredictorIterationInputs] = None
+
+
+def prepare_batch(
     model: PosePredictor,
     cfg: TrainingConfig,
     data: BatchPoseData,
-    meters: Dict[str, torchnet.meter.AverageValueMeter],
     mesh_db: BatchedMeshes,
-    n_iterations: int,
-    debug_dict: Dict[str, Any],
-    make_visualization: bool = False,
-    train: bool = True,
-    is_notebook: bool = False,
-) -> torch.Tensor:
+    prefetch_renders: bool = False,
+) -> PreparedBatch:
+    """Samples the initial hypotheses of a batch.
+
+    With prefetch_renders=True, the renders of the first refiner iteration
+    are submitted to the renderer, which renders them in the background
+    until the batch is passed to `megapose_forward_loss`.
+    """
     # Normalize RGB dims to be in [0,1] from [0,255]
     # Don't tamper with depth
     images = cast_images(rgb=data.rgbs, depth=data.depths)
@@ -67,8 +91,6 @@ def megapose_forward_loss(
     device, dtype = TCO_gt.device, TCO_gt.dtype
 
     n_hypotheses = cfg.n_hypotheses
-    bce_loss = nn.BCEWithLogitsLoss(reduction="none").cuda()
-
     hypotheses_image_ids = (
         torch.arange(batch_size, device=device).unsqueeze(1).repeat(1, cfg.n_hypotheses)
     )
@@ -147,14 +169,75 @@ def megapose_forward_loss(
     else:
         raise ValueError(cfg.hypotheses_init_method)
 
+    batch = PreparedBatch(
+        images=images,
+        K=K,
+        TCO_gt=TCO_gt,
+        labels_gt=labels_gt,
+        hypotheses_TCO_init=hypotheses_TCO_init,
+        hypotheses_labels=hypotheses_labels,
+        hypotheses_image_ids=hypotheses_image_ids,
+        is_hypothesis_positive=is_hypothesis_positive,
+    )
+    if prefetch_renders:
+        if isinstance(model, nn.parallel.DistributedDataParallel):
+            model = model.module
+        hypotheses_image_ids_flat = hypotheses_image_ids.flatten(0, 1)
+        batch.prefetched_inputs = model.prefetch_renders(
+            images=images,
+            image_ids=hypotheses_image_ids_flat,
+            K=K[hypotheses_image_ids_flat],
+            TCO=hypotheses_TCO_init.flatten(0, 1),
+            labels=np.ravel(hypotheses_labels),
+            random_ambient_light=cfg.random_ambient_light,
+        )
+    return batch
+
+
+def megapose_forward_loss(
+    model: PosePredictor,
+    cfg: TrainingConfig,
+    data: BatchPoseData,
+    meters: Dict[str, torchnet.meter.AverageValueMeter],
+    mesh_db: BatchedMeshes,
+    n_iterations: int,
+    debug_dict: Dict[str, Any],
+    make_visualization: bool = False,
+    train: bool = True,
+    is_notebook: bool = False,
+    batch: Optional[PreparedBatch] = None,
+) -> torch.Tensor:
+    """Loss of the model on a batch.
+
+    batch is the output of `prepare_batch` for this data, it is prepared
+    here if not given.
+    """
+    if batch is None:
+        batch = prepare_batch(model, cfg, data, mesh_db)
+    images = batch.images
+    K = batch.K
+    TCO_gt = batch.TCO_gt
+    labels_gt = batch.labels_gt
+    hypotheses_TCO_init = batch.hypotheses_TCO_init
+    hypotheses_labels = batch.hypotheses_labels
+    hypotheses_image_ids = batch.hypotheses_image_ids
+    is_hypothesis_positive = batch.is_hypothesis_positive
+
+    batch_size = images.shape[0]
+    device, dtype = TCO_gt.device, TCO_gt.dtype
+    n_hypotheses = cfg.n_hypotheses
+    bce_loss = nn.BCEWithLogitsLoss(reduction="none").cuda()
+
     hypotheses_image_ids_flat = hypotheses_image_ids.flatten(0, 1)
     outputs = model(
-        images=images[hypotheses_image_ids_flat],
+        images=images,
+        image_ids=hypotheses_image_ids_flat,
         K=K[hypotheses_image_ids_flat],
         TCO=hypotheses_TCO_init.flatten(0, 1),
         labels=np.ravel(hypotheses_labels),
         n_iterations=n_iterations,
         random_ambient_light=cfg.random_ambient_light,
+        prefetched_inputs=batch.prefetched_inputs,
     )
 
     meshes = mesh_db.select(labels_gt)
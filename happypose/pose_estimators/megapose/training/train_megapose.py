@@ -37,6 +37,7 @@ from happypose.pose_estimators.megapose.panda3d_renderer.panda3d_batch_renderer
 )
 from happypose.pose_estimators.megapose.training.megapose_forward_loss import (
     megapose_forward_loss,
+    prepare_batch,
 )
 from happypose.pose_estimators.megapose.training.pose_models_cfg import (
     check_update_config,
@@ -320,6 +321,12 @@ def train_megapose(cfg: TrainingConfig) -> None:
             n_iterations=n_iterations,
             mesh_db=mesh_db,
         )
+        prepare_batch_fn = functools.partial(
+            prepare_batch,
+            model=model,
+            cfg=cfg,
+            mesh_db=mesh_db,
+        )
 
         def train() -> None:
             meters = meters_train
@@ -330,10 +337,15 @@ def train_megapose(cfg: TrainingConfig) -> None:
                 ncols=120,
                 disable=cfg.logging_style != "tqdm",
             )
+            next_batch = None
             for n in pbar:
                 start_iter = time.time()
                 t = time.time()
-                data = next(iter_train)
+                if next_batch is None:
+                    data = next(iter_train)
+                    batch = prepare_batch_fn(data=data)
+                else:
+                    data, batch = next_batch
                 time_data = time.time() - t
 
                 optimizer.zero_grad()
@@ -347,12 +359,27 @@ def train_megapose(cfg: TrainingConfig) -> None:
                         meters=meters,
                         train=True,
                         debug_dict=debug_dict,
+                        batch=batch,
                     )
 
+                # Time spent waiting for the renders.
                 time_render = debug_dict["time_render"]
                 meters["loss_total"].add(loss.item())
                 timer_forward.end()
 
+                next_batch = None
+                if cfg.prefetch_renders and n + 1 < this_rank_n_batch_per_epoch:
+                    # The renders of the first iteration of the next batch are
+                    # done by the renderer workers during the backward pass.
+                    t = time.time()
+                    next_data = next(iter_train)
+                    with torch.cuda.amp.autocast():
+                        next_batch = (
+                            next_data,
+                            prepare_batch_fn(data=next_data, prefetch_renders=True),
+                        )
+                    time_data += time.time() - t
+
                 timer_backward = CudaTimer(enabled=cfg.cuda_timing)
                 timer_backward.start()
                 scaler.scale(loss).backward()
@@ -121,6 +121,8 @@ class TrainingConfig(omegaconf.dictconfig.DictConfig):
     n_iterations: int = 3
     add_iteration_epoch_interval: int = 100
     random_ambient_light: bool = True
+    # Render the first iteration of the next batch during the backward pass.
+    prefetch_renders: bool = True
 
     # Loss
     n_points_loss: int = 2000
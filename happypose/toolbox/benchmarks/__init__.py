@@ -0,0 +1,5 @@
+"""Benchmarks of performance-critical parts of the toolbox.
+
+Each module can be run as a script, e.g.
+`python -m happypose.toolbox.benchmarks.depth_rendering --help`.
+"""
@@ -0,0 +1,217 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+# Third Party
+import numpy as np
+import pandas as pd
+import torch
+
+# MegaPose
+import happypose.toolbox.utils.tensor_collection as tc
+from happypose.toolbox.utils.bop_results import (
+    load_bop_detections,
+    read_bop_results,
+    write_bop_results,
+)
+
+
+def make_predictions(n_rows: int) -> tc.PandasTensorCollection:
+    """Random predictions of n_rows objects, in the format of the evaluation."""
+    rng = np.random.RandomState(0)
+    poses = torch.as_tensor(rng.rand(n_rows, 4, 4), dtype=torch.float32)
+    infos = pd.DataFrame(
+        {
+            "scene_id": rng.randint(0, 100, n_rows),
+            "view_id": rng.randint(0, 1000, n_rows),
+            "label": [f"ycbv-obj_{i:06d}" for i in rng.randint(1, 22, n_rows)],
+            "score": rng.rand(n_rows),
+            "time": rng.rand(n_rows),
+        }
+    )
+    return tc.PandasTensorCollection(infos, poses=poses)
+
+
+def write_results_per_row(path: Path, predictions: tc.PandasTensorCollection):
+    """Previous writer, one dict per row for bop_toolkit_lib.inout."""
+    preds = []
+    for n in range(len(predictions)):
+        TCO_n = predictions.poses[n]
+        row = predictions.infos.iloc[n]
+        preds.append(
+            dict(
+                scene_id=row["scene_id"],
+                im_id=row["view_id"],
+                obj_id=int(row.label.split("_")[-1]),
+                score=row["score"],
+                t=TCO_n[:3, -1] * 1e3,
+                R=TCO_n[:3, :3],
+                time=row["time"],
+            )
+        )
+    # bop_toolkit_lib.inout.save_bop_results
+    lines = ["scene_id,im_id,obj_id,score,R,t,time"]
+    for res in preds:
+        R = " ".join(map(str, res["R"].flatten().tolist()))
+        t = " ".join(map(str, res["t"].flatten().tolist()))
+        lines.append(
+            f"{res['scene_id']},{res['im_id']},{res['obj_id']},{res['score']},"
+            f"{R},{t},{res['time']}"
+        )
+    path.write_text("\n".join(lines))
+
+
+def read_results_per_row(path: Path):
+    """bop_toolkit_lib.inout.load_bop_results."""
+    results = []
+    with path.open() as f:
+        next(f)
+        for line in f:
+            elems = line.split(",")
+            results.append(
+                {
+                    "scene_id": int(elems[0]),
+                    "im_id": int(elems[1]),
+                    "obj_id": int(elems[2]),
+                    "score": float(elems[3]),
+                    "R": np.array(list(map(float, elems[4].split()))).reshape(3, 3),
+                    "t": np.array(list(map(float, elems[5].split()))).reshape(3, 1),
+                    "time": float(elems[6]),
+                }
+            )
+    return results
+
+
+def load_detections_json(path: Path):
+    """Previous loader of the external detections."""
+    dets = []
+    for det in json.loads(path.read_text()):
+        del det["segmentation"]
+        x, y, w, h = det["bbox"]
+        det["bbox"] = [float(v) for v in [x, y, x + w, y + h]]
+        det["bbox_modal"] = det["bbox"]
+        det["label"] = "ycbv-obj_{}".format(str(det["category_id"]).zfill(6))
+        dets.append(det)
+    return pd.DataFrame.from_records(dets)
+
+
+def write_detections(path: Path, n_detections: int) -> None:
+    """Detections of the BOP format, with a segmentation of ~2kB."""
+    rng = np.random.RandomState(0)
+    counts = "".join(rng.choice(list("0123456789abcdefXYZ[]@"), 2000))
+    with path.open("w") as f:
+        f.write("[")
+        for n in range(n_detections):
+            det = {
+                "scene_id": int(n // 1000),
+                "image_id": int(n % 1000),
+                "category_id": int(1 + n % 21),
+                "score": float(rng.rand()),
+                "bbox": [1.0, 2.0, 30.0, 40.0],
+                "segmentation": {"counts": counts, "size": [480, 640]},
+                "time": 0.1,
+            }
+            f.write(("," if n > 0 else "") + json.dumps(det))
+        f.write("]")
+
+
+def measure(fn: Callable) -> Tuple[float, float]:
+    """Time (s) and peak memory (MB) of the python allocations of fn."""
+    tracemalloc.start()
+    start = time.time()
+    fn()
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def benchmark_bop_results(
+    n_rows: int = 1_000_000,
+    n_rows_per_row: int = 20_000,
+    n_detections: int = 100_000,
+    n_workers: int = 0,
+) -> Dict[str, Dict[str, float]]:
+    """Time (s) of the writing and reading of n_rows BOP results, and time (s)
+    and peak memory (MB) of the loading of n_detections external detections.
+
+    The previous per-row implementations run on n_rows_per_row rows, their
+    time is extrapolated to n_rows.
+    """
+    predictions = make_predictions(n_rows)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        path = tmp_dir / "results.csv"
+        path_per_row = tmp_dir / "results_per_row.csv"
+        scale = n_rows / n_rows_per_row
+
+        start = time.time()
+        write_results_per_row(path_per_row, predictions[:n_rows_per_row])
+        per_row = (time.time() - start) * scale
+        start = time.time()
+        write_bop_results(path, predictions, n_workers=n_workers)
+        results["write"] = {"per_row": per_row, "column_wise": time.time() - start}
+
+        start = time.time()
+        read_results_per_row(path_per_row)
+        per_row = (time.time() - start) * scale
+        start = time.time()
+        read_bop_results(path)
+        results["read"] = {"per_row": per_row, "column_wise": time.time() - start}
+        results["write"]["file_mb"] = path.stat().st_size / 1e6
+
+        path = tmp_dir / "detections.json"
+        write_detections(path, n_detections)
+        json_s, json_mb = measure(lambda: load_detections_json(path))
+        stream_s, stream_mb = measure(lambda: load_bop_detections(path, "ycbv"))
+        results["detections"] = {
+            "json_s": json_s,
+            "json_peak_mb": json_mb,
+            "streaming_s": stream_s,
+            "streaming_peak_mb": stream_mb,
+            "file_mb": path.stat().st_size / 1e6,
+        }
+
+    for name in ("write", "read"):
+        results[name]["speedup"] = (
+            results[name]["per_row"] / results[name]["column_wise"]
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("BOP results and detections I/O")
+    parser.add_argument("--n-rows", type=int, default=1_000_000)
+    parser.add_argument("--n-rows-per-row", type=int, default=20_000)
+    parser.add_argument("--n-detections", type=int, default=100_000)
+    parser.add_argument("--n-workers", type=int, default=0)
+    args = parser.parse_args()
+
+    results = benchmark_bop_results(
+        n_rows=args.n_rows,
+        n_rows_per_row=args.n_rows_per_row,
+        n_detections=args.n_detections,
+        n_workers=args.n_workers,
+    )
+    print(json.dumps(results, indent=2))
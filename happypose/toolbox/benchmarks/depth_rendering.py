@@ -0,0 +1,101 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.types import Panda3dLightData, Resolution
+
+
+def benchmark_depth_rendering(
+    mesh_path: Path,
+    mesh_units: str = "mm",
+    batch_size: int = 64,
+    n_iterations: int = 10,
+    n_workers: int = 4,
+    resolution: Resolution = (240, 320),
+) -> Dict[str, float]:
+    """Compares the throughput of rgb+depth and depth-only batch renders.
+
+    Returns the number of renders per second of each mode.
+    """
+    asset_dataset = RigidObjectDataset(
+        [RigidObject(label="object", mesh_path=mesh_path, mesh_units=mesh_units)],
+    )
+    renderer = Panda3dBatchRenderer(asset_dataset, n_workers=n_workers)
+
+    h, w = resolution
+    K = torch.tensor([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=torch.float)
+    TCO = torch.eye(4).repeat(batch_size, 1, 1)
+    TCO[:, 2, 3] = torch.linspace(0.3, 0.6, batch_size)
+    render_kwargs = dict(
+        labels=batch_size * ["object"],
+        TCO=TCO,
+        K=K.repeat(batch_size, 1, 1),
+        light_datas=batch_size
+        * [[Panda3dLightData(light_type="ambient", color=(1.0, 1.0, 1.0, 1.0))]],
+        resolution=resolution,
+        render_depth=True,
+        render_binary_mask=True,
+    )
+
+    results = {}
+    for mode, render_rgb in (("rgb_depth", True), ("depth_only", False)):
+        # Warmup, creates the cameras of the workers.
+        renderer.render(**render_kwargs, render_rgb=render_rgb)
+        times = []
+        for _ in range(n_iterations):
+            start = time.time()
+            renderer.render(**render_kwargs, render_rgb=render_rgb)
+            times.append(time.time() - start)
+        results[f"{mode}/renders_per_second"] = batch_size / float(np.mean(times))
+    results["speedup"] = (
+        results["depth_only/renders_per_second"]
+        / results["rgb_depth/renders_per_second"]
+    )
+    renderer.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Depth-only rendering throughput")
+    parser.add_argument("--mesh-path", type=Path, required=True)
+    parser.add_argument("--mesh-units", type=str, default="mm")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-iterations", type=int, default=10)
+    parser.add_argument("--n-workers", type=int, default=4)
+    parser.add_argument("--resolution", type=int, nargs=2, default=(240, 320))
+    args = parser.parse_args()
+
+    results = benchmark_depth_rendering(
+        mesh_path=args.mesh_path,
+        mesh_units=args.mesh_units,
+        batch_size=args.batch_size,
+        n_iterations=args.n_iterations,
+        n_workers=args.n_workers,
+        resolution=tuple(args.resolution),
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,161 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from typing import Dict, List, Optional
+
+# Third Party
+import numpy as np
+import pandas as pd
+import torch
+
+# MegaPose
+import happypose.toolbox.utils.tensor_collection as tc
+from happypose.toolbox.inference.types import DetectionsType
+from happypose.toolbox.inference.utils import (
+    add_instance_id,
+    filter_detections,
+    make_detections_from_model_outputs,
+)
+
+
+def make_detections_loop(
+    outputs: List[Dict[str, torch.Tensor]],
+    category_id_to_label: Dict[int, str],
+    detection_th: Optional[float] = None,
+    output_masks: bool = False,
+    mask_th: float = 0.8,
+    one_instance_per_class: bool = False,
+) -> DetectionsType:
+    """Previous implementation, with a loop over the detections."""
+    infos = []
+    bboxes = []
+    masks = []
+    for n, outputs_n in enumerate(outputs):
+        labels = [
+            category_id_to_label[category_id.item()]
+            for category_id in outputs_n["labels"]
+        ]
+        for obj_id in range(len(outputs_n["boxes"])):
+            infos.append(
+                {
+                    "batch_im_id": n,
+                    "label": labels[obj_id],
+                    "score": outputs_n["scores"][obj_id].item(),
+                },
+            )
+            bboxes.append(torch.as_tensor(outputs_n["boxes"][obj_id]))
+            masks.append(torch.as_tensor(outputs_n["masks"][obj_id, 0] > mask_th))
+    detections = tc.PandasTensorCollection(
+        infos=pd.DataFrame(infos),
+        bboxes=torch.stack(bboxes).float(),
+    )
+    if output_masks:
+        detections.register_tensor("masks", torch.stack(masks))
+    if detection_th is not None:
+        keep = np.where(detections.infos["score"] > detection_th)[0]
+        detections = detections[keep]
+    if one_instance_per_class:
+        detections = filter_detections(detections, one_instance_per_class=True)
+    return add_instance_id(detections)
+
+
+def make_model_outputs(
+    n_images: int,
+    n_detections: int,
+    n_categories: int,
+    resolution=(480, 640),
+) -> List[Dict[str, torch.Tensor]]:
+    """Random outputs of a Mask R-CNN, with scores sorted for each image."""
+    generator = torch.Generator().manual_seed(0)
+    outputs = []
+    for _ in range(n_images):
+        xy = torch.rand(n_detections, 2, generator=generator) * 300
+        outputs.append(
+            {
+                "boxes": torch.cat([xy, xy + 100], -1),
+                "labels": torch.randint(
+                    1,
+                    n_categories + 1,
+                    (n_detections,),
+                    generator=generator,
+                ),
+                "scores": torch.rand(n_detections, generator=generator)
+                .sort(descending=True)
+                .values,
+                "masks": torch.rand(
+                    n_detections,
+                    1,
+                    *resolution,
+                    generator=generator,
+                ),
+            },
+        )
+    return outputs
+
+
+def benchmark_detection_postprocessing(
+    n_images: int = 1,
+    n_detections: int = 100,
+    n_categories: int = 21,
+    n_iterations: int = 5,
+    detection_th: float = 0.5,
+) -> Dict[str, Dict[str, float]]:
+    """Measures the time of the postprocessing of the detections, in ms.
+
+    With and without the masks, and with `one_instance_per_class`.
+    """
+    outputs = make_model_outputs(n_images, n_detections, n_categories)
+    category_id_to_label = {n: f"obj_{n:06d}" for n in range(1, n_categories + 1)}
+    results = {}
+    for name, kwargs in (
+        ("boxes", {}),
+        ("boxes_threshold", {"detection_th": detection_th}),
+        ("masks", {"output_masks": True}),
+        ("one_instance_per_class", {"one_instance_per_class": True}),
+    ):
+        results[name] = {}
+        for impl, fn in (
+            ("loop", make_detections_loop),
+            ("tensor", make_detections_from_model_outputs),
+        ):
+            times = []
+            for _ in range(n_iterations):
+                start = time.time()
+                fn(outputs, category_id_to_label, **kwargs)
+                times.append((time.time() - start) * 1000)
+            results[name][impl] = float(np.median(times))
+        results[name]["speedup"] = results[name]["loop"] / results[name]["tensor"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Postprocessing of the detections")
+    parser.add_argument("--n-images", type=int, default=1)
+    parser.add_argument("--n-detections", type=int, default=100)
+    parser.add_argument("--n-categories", type=int, default=21)
+    parser.add_argument("--n-iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    results = benchmark_detection_postprocessing(
+        n_images=args.n_images,
+        n_detections=args.n_detections,
+        n_categories=args.n_categories,
+        n_iterations=args.n_iterations,
+    )
+    print(json.dumps(results, indent=2))
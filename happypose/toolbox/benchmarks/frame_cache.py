@@ -0,0 +1,123 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Third Party
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+# MegaPose
+from happypose.toolbox.datasets.frame_cache import DEFAULT_FRAME_CACHE_DIR, FrameCache
+from happypose.toolbox.datasets.scene_dataset import (
+    CameraData,
+    ObservationInfos,
+    SceneDataset,
+    SceneObservation,
+)
+from happypose.toolbox.lib3d.transform import Transform
+
+
+class PNGSceneDataset(SceneDataset):
+    """Frames stored as png files, decoded like the frames of BOP."""
+
+    def __init__(self, ds_dir: Path, n_frames: int):
+        frame_index = pd.DataFrame({"scene_id": 0, "view_id": np.arange(n_frames)})
+        super().__init__(frame_index, load_depth=True, load_segmentation=False)
+        self.ds_dir = ds_dir
+
+    def _load_scene_observation(self, image_infos: ObservationInfos):
+        view_id = int(image_infos.view_id)
+        rgb = np.array(Image.open(self.ds_dir / f"rgb_{view_id:06d}.png"))
+        depth = np.array(Image.open(self.ds_dir / f"depth_{view_id:06d}.png"))
+        return SceneObservation(
+            rgb=rgb,
+            depth=depth.astype(np.float32) / 1000,
+            infos=image_infos,
+            object_datas=[],
+            camera_data=CameraData(K=np.eye(3), TWC=Transform(np.eye(4))),
+        )
+
+
+def write_frames(ds_dir: Path, n_frames: int, resolution=(480, 640)) -> None:
+    """Noisy rgb and smooth depth images, compressed like the images of BOP."""
+    h, w = resolution
+    rng = np.random.RandomState(0)
+    v, u = np.meshgrid(np.arange(h), np.arange(w), indexing="ij")
+    for view_id in range(n_frames):
+        rgb = (u[..., None] + v[..., None] + rng.randint(0, 32, (h, w, 3))) % 256
+        depth = 500 + 2 * u + v + view_id
+        Image.fromarray(rgb.astype(np.uint8)).save(ds_dir / f"rgb_{view_id:06d}.png")
+        Image.fromarray(depth.astype(np.uint16)).save(
+            ds_dir / f"depth_{view_id:06d}.png",
+        )
+
+
+def time_pass(ds: SceneDataset) -> float:
+    """Time (ms) per frame of a pass over the dataset."""
+    start = time.time()
+    for n in range(len(ds)):
+        obs = ds[n]
+        # Read the arrays, as the collate function of the DataLoader does.
+        obs.rgb.sum()
+        obs.depth.sum()
+    return (time.time() - start) * 1000 / len(ds)
+
+
+def benchmark_frame_cache(
+    n_frames: int = 50,
+    cache_dir: Optional[str] = None,
+) -> Dict[str, float]:
+    """Time (ms) per frame of the passes over a dataset of png frames.
+
+    The first pass with the cache decodes and writes the frames, the
+    following passes (e.g. the next epochs or evaluation runs) read them.
+    """
+    if cache_dir is None:
+        cache_dir = DEFAULT_FRAME_CACHE_DIR
+    results = {}
+    with tempfile.TemporaryDirectory() as ds_dir:
+        ds = PNGSceneDataset(Path(ds_dir), n_frames)
+        write_frames(ds.ds_dir, n_frames)
+        results["decode"] = time_pass(ds)
+
+        ds.frame_cache = FrameCache(cache_dir, namespace="benchmark")
+        ds.frame_cache.clear()
+        results["cache_write"] = time_pass(ds)
+        results["cache_read"] = time_pass(ds)
+        results["cache_mb"] = ds.frame_cache.size_bytes() / 1e6
+        ds.frame_cache.clear()
+    results["speedup"] = results["decode"] / results["cache_read"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Cache of the decoded frames")
+    parser.add_argument("--n-frames", type=int, default=50)
+    parser.add_argument("--cache-dir", type=str, default=None)
+    args = parser.parse_args()
+
+    results = benchmark_frame_cache(
+        n_frames=args.n_frames,
+        cache_dir=args.cache_dir,
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,111 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from dataclasses import replace
+from typing import Dict, List
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.pose_estimators.megapose.models.pose_rigid import PosePredictor
+from happypose.pose_estimators.megapose.models.wide_resnet import WideResNet34
+from happypose.toolbox.inference.precision import InferencePrecision
+
+PRECISIONS = {
+    "fp32": InferencePrecision(),
+    "fp32_channels_last": InferencePrecision(channels_last=True),
+    "bf16": InferencePrecision(dtype="bf16"),
+    "bf16_channels_last": InferencePrecision(dtype="bf16", channels_last=True),
+    "fp16_channels_last": InferencePrecision(dtype="fp16", channels_last=True),
+}
+
+
+def benchmark_inference_precision(
+    modes: List[str],
+    batch_size: int = 32,
+    n_iterations: int = 10,
+    n_inputs: int = 9,
+    device: str = "cpu",
+    compile: bool = False,
+) -> Dict[str, Dict[str, float]]:
+    """Measures the throughput of the MegaPose network in each precision mode.
+
+    The network has random weights and the input is a random batch of
+    rgb + rendered images at the MegaPose crop size. The error of the pose
+    outputs is measured with respect to float32.
+    """
+    torch.manual_seed(0)
+    x = torch.rand(batch_size, n_inputs, 240, 320, device=device)
+
+    results = {}
+    outputs_fp32 = None
+    for mode in ["fp32", *[mode for mode in modes if mode != "fp32"]]:
+        torch.manual_seed(0)
+        model = PosePredictor(
+            backbone=WideResNet34(n_inputs=n_inputs),
+            renderer=None,
+            mesh_db=None,
+        )
+        model = model.to(device).eval()
+        model.set_inference_precision(replace(PRECISIONS[mode], compile=compile))
+
+        times = []
+        with torch.no_grad():
+            for n in range(n_iterations + 1):
+                start = time.time()
+                outputs = model.net_forward(x)["pose"]
+                if device == "cuda":
+                    torch.cuda.synchronize()
+                if n > 0:
+                    # First iteration is a warmup.
+                    times.append(time.time() - start)
+        if outputs_fp32 is None:
+            outputs_fp32 = outputs
+        results[mode] = {
+            "images_per_second": batch_size / float(np.mean(times)),
+            "max_abs_error": float((outputs - outputs_fp32).abs().max()),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Inference precision throughput")
+    parser.add_argument(
+        "--modes",
+        type=str,
+        nargs="+",
+        default=["fp32", "fp32_channels_last", "bf16", "bf16_channels_last"],
+        choices=list(PRECISIONS.keys()),
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--n-iterations", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--compile", action="store_true")
+    args = parser.parse_args()
+
+    results = benchmark_inference_precision(
+        modes=args.modes,
+        batch_size=args.batch_size,
+        n_iterations=args.n_iterations,
+        device=args.device,
+        compile=args.compile,
+    )
+    print(json.dumps(results, indent=2))
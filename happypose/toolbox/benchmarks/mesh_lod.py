@@ -0,0 +1,168 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.benchmarks.software_rendering import (
+    compare_renders,
+    time_renders,
+)
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.lib3d.mesh_lod import DEFAULT_LOD_N_FACES, MeshLODs
+from happypose.toolbox.lib3d.rotations import angle_axis_to_rotation_matrix
+from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.types import Panda3dLightData, Resolution
+
+
+def benchmark_mesh_lod(
+    mesh_path: Path,
+    mesh_units: str = "mm",
+    cache_dir: Optional[Path] = None,
+    n_faces: Sequence[int] = DEFAULT_LOD_N_FACES,
+    max_pixels_per_face: float = 4.0,
+    batch_size: int = 64,
+    n_iterations: int = 10,
+    n_workers: int = 4,
+    resolution: Resolution = (240, 320),
+    distances: Sequence[float] = (0.3, 0.6, 1.2),
+) -> Dict:
+    """Compares the renders of the full meshes and of the levels of detail.
+
+    The object is rendered at each of the `distances` (in m), with random
+    rotations. Returns the number of renders per second with and without
+    levels of detail, the agreement of the renders, and the selected levels.
+    """
+    asset_dataset = RigidObjectDataset(
+        [RigidObject(label="object", mesh_path=mesh_path, mesh_units=mesh_units)],
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.time()
+        mesh_lods = MeshLODs(
+            asset_dataset,
+            cache_dir if cache_dir is not None else tmp_dir,
+            n_faces=n_faces,
+            max_pixels_per_face=max_pixels_per_face,
+        )
+        results = {
+            "decimation_time": time.time() - start,
+            "n_faces": [level.n_faces for level in mesh_lods.get_levels("object")],
+        }
+
+        h, w = resolution
+        generator = torch.Generator().manual_seed(0)
+        K = torch.tensor([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=torch.float)
+        TCO = torch.eye(4).repeat(batch_size, 1, 1)
+        TCO[:, :3, :3] = angle_axis_to_rotation_matrix(
+            torch.randn(batch_size, 3, generator=generator),
+        )[:, :3, :3]
+        render_kwargs = dict(
+            labels=batch_size * ["object"],
+            K=K.repeat(batch_size, 1, 1),
+            light_datas=batch_size
+            * [[Panda3dLightData(light_type="ambient", color=(1.0, 1.0, 1.0, 1.0))]],
+            resolution=resolution,
+            render_depth=True,
+            render_binary_mask=True,
+        )
+
+        renderers = {
+            name: Panda3dBatchRenderer(
+                asset_dataset,
+                n_workers=n_workers,
+                preload_cache=True,
+                mesh_lods=lods,
+            )
+            for name, lods in (("full", None), ("lod", mesh_lods))
+        }
+        try:
+            for distance in distances:
+                TCO[:, 2, 3] = distance
+                render_kwargs["TCO"] = TCO
+                levels = mesh_lods.select_levels(
+                    render_kwargs["labels"],
+                    TCO,
+                    render_kwargs["K"],
+                )
+                time_full, renders_full = time_renders(
+                    renderers["full"],
+                    render_kwargs,
+                    n_iterations,
+                )
+                time_lod, renders_lod = time_renders(
+                    renderers["lod"],
+                    render_kwargs,
+                    n_iterations,
+                )
+                results[f"distance={distance}"] = {
+                    "levels": np.bincount(levels).tolist(),
+                    "full_renders_per_second": batch_size / time_full,
+                    "lod_renders_per_second": batch_size / time_lod,
+                    "speedup": time_full / time_lod,
+                    **compare_renders(renders_lod, renders_full),
+                }
+        finally:
+            for renderer in renderers.values():
+                renderer.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Rendering with mesh levels of detail")
+    parser.add_argument("--mesh-path", type=Path, required=True)
+    parser.add_argument("--mesh-units", type=str, default="mm")
+    parser.add_argument("--cache-dir", type=Path, default=None)
+    parser.add_argument(
+        "--n-faces",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_LOD_N_FACES),
+    )
+    parser.add_argument("--max-pixels-per-face", type=float, default=4.0)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-iterations", type=int, default=10)
+    parser.add_argument("--n-workers", type=int, default=4)
+    parser.add_argument("--resolution", type=int, nargs=2, default=(240, 320))
+    parser.add_argument(
+        "--distances",
+        type=float,
+        nargs="+",
+        default=[0.3, 0.6, 1.2],
+    )
+    args = parser.parse_args()
+
+    results = benchmark_mesh_lod(
+        mesh_path=args.mesh_path,
+        mesh_units=args.mesh_units,
+        cache_dir=args.cache_dir,
+        n_faces=args.n_faces,
+        max_pixels_per_face=args.max_pixels_per_face,
+        batch_size=args.batch_size,
+        n_iterations=args.n_iterations,
+        n_workers=args.n_workers,
+        resolution=tuple(args.resolution),
+        distances=args.distances,
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,118 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from typing import Dict, List
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.lib3d.multiview import (
+    MULTIVIEW_CAM_POSITIONS,
+    _get_views_TCO_pos_sphere,
+    make_TCO_multiview,
+)
+from happypose.toolbox.lib3d.transform_ops import invert_transform_matrices
+
+
+def make_TCO_multiview_reference(
+    TCO: torch.Tensor,
+    tCR: torch.Tensor,
+    multiview_type: str,
+) -> torch.Tensor:
+    """Per-sample implementation using the panda3d scene graph."""
+    TC0_CV = []
+    for TCO_n, tCR_n in zip(TCO.cpu().numpy(), tCR.cpu().numpy()):
+        TC0_CV_ = [np.eye(4)]
+        TC0_CV_ += _get_views_TCO_pos_sphere(
+            TCO_n,
+            tCR_n,
+            MULTIVIEW_CAM_POSITIONS[multiview_type],
+        )
+        TC0_CV.append(TC0_CV_)
+    TC0_CV = torch.as_tensor(np.stack(TC0_CV), device=TCO.device, dtype=TCO.dtype)
+    return invert_transform_matrices(TC0_CV) @ TCO.unsqueeze(1)
+
+
+def benchmark_multiview(
+    batch_sizes: List[int],
+    multiview_type: str = "TCO+front_3views",
+    n_iterations: int = 10,
+    device: str = "cpu",
+    reference: bool = True,
+) -> Dict[int, Dict[str, float]]:
+    """Measures the time of `make_TCO_multiview` for each batch size, in ms."""
+    results = {}
+    for batch_size in batch_sizes:
+        TCO = torch.eye(4, device=device).repeat(batch_size, 1, 1)
+        TCO[:, :3, 3] = torch.rand(batch_size, 3, device=device) * 0.2
+        TCO[:, 2, 3] += 0.5
+        tCR = TCO[:, :3, 3].clone()
+
+        times = []
+        for _ in range(n_iterations):
+            start = time.time()
+            TCV_O = make_TCO_multiview(
+                TCO,
+                tCR,
+                multiview_type=multiview_type,
+            )
+            if device == "cuda":
+                torch.cuda.synchronize()
+            times.append(time.time() - start)
+        results[batch_size] = {"batched_ms": float(np.median(times)) * 1000}
+
+        if reference:
+            start = time.time()
+            TCV_O_ref = make_TCO_multiview_reference(TCO, tCR, multiview_type)
+            results[batch_size]["reference_ms"] = (time.time() - start) * 1000
+            results[batch_size]["max_abs_error"] = float(
+                (TCV_O - TCV_O_ref).abs().max(),
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Multiview camera poses")
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[64, 256, 1024, 4096],
+    )
+    parser.add_argument(
+        "--multiview-type",
+        type=str,
+        default="TCO+front_3views",
+        choices=list(MULTIVIEW_CAM_POSITIONS.keys()),
+    )
+    parser.add_argument("--n-iterations", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--no-reference", action="store_true")
+    args = parser.parse_args()
+
+    results = benchmark_multiview(
+        batch_sizes=args.batch_sizes,
+        multiview_type=args.multiview_type,
+        n_iterations=args.n_iterations,
+        device=args.device,
+        reference=not args.no_reference,
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,107 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from typing import Dict, List
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.lib3d.nms3d import nms3d
+
+
+def nms3d_reference(TCO: np.ndarray, scores: np.ndarray, th: float) -> List[int]:
+    """Loop over the predictions sorted by score, previously used in cosypose."""
+    is_tested = set()
+    all_t = TCO[:, :3, -1]
+    keep = []
+    for idx in np.argsort(-scores, kind="stable"):
+        if idx in is_tested:
+            continue
+        dists = np.linalg.norm(TCO[idx, :3, -1] - all_t, axis=-1)
+        dists[idx] = np.inf
+        is_tested.update(np.where(dists <= th)[0].tolist())
+        keep.append(int(idx))
+    return keep
+
+
+def benchmark_nms3d(
+    n_predictions: List[int],
+    threshold: float = 0.04,
+    n_hypotheses_per_object: int = 5,
+    n_iterations: int = 5,
+    reference: bool = True,
+) -> Dict[int, Dict[str, float]]:
+    """Measures the time of the 3D NMS for each number of predictions, in ms.
+
+    The predictions are clustered around n / n_hypotheses_per_object objects
+    in a 1m cube. Dense clusters have a quadratic number of close pairs, which
+    all have to be found by the batched NMS.
+    """
+    results = {}
+    for n in n_predictions:
+        generator = torch.Generator().manual_seed(0)
+        n_objects = max(n // n_hypotheses_per_object, 1)
+        centers = torch.rand(n_objects, 3, generator=generator)
+        TCO = torch.eye(4).repeat(n, 1, 1)
+        TCO[:, :3, 3] = centers[torch.randint(0, n_objects, (n,), generator=generator)]
+        TCO[:, :3, 3] += torch.randn(n, 3, generator=generator) * 0.02
+        scores = torch.rand(n, generator=generator)
+
+        times = []
+        for _ in range(n_iterations):
+            start = time.time()
+            keep = nms3d(TCO, scores, threshold=threshold)
+            times.append(time.time() - start)
+        results[n] = {
+            "batched_ms": float(np.median(times)) * 1000,
+            "n_kept": len(keep),
+        }
+
+        if reference:
+            start = time.time()
+            keep_ref = nms3d_reference(TCO.numpy(), scores.numpy(), threshold)
+            results[n]["reference_ms"] = (time.time() - start) * 1000
+            results[n]["same_result"] = keep.tolist() == keep_ref
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("3D NMS")
+    parser.add_argument(
+        "--n-predictions",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+    )
+    parser.add_argument("--threshold", type=float, default=0.04)
+    parser.add_argument("--n-hypotheses-per-object", type=int, default=5)
+    parser.add_argument("--n-iterations", type=int, default=5)
+    parser.add_argument("--no-reference", action="store_true")
+    args = parser.parse_args()
+
+    results = benchmark_nms3d(
+        n_predictions=args.n_predictions,
+        threshold=args.threshold,
+        n_hypotheses_per_object=args.n_hypotheses_per_object,
+        n_iterations=args.n_iterations,
+        reference=not args.no_reference,
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,117 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Third Party
+import numpy as np
+
+# MegaPose
+from happypose.pose_estimators.cosypose.cosypose.recording.packed_chunk import (
+    PackedChunksReader,
+    convert_dumps_to_packed,
+)
+from happypose.pose_estimators.cosypose.cosypose.recording.record_chunk import (
+    write_chunk,
+)
+
+
+def make_random_state(rng: np.random.Generator, resolution=(480, 640)) -> Dict:
+    h, w = resolution
+    return {
+        "camera": {
+            "rgb": rng.integers(0, 255, (h, w, 3), dtype=np.uint8),
+            "mask": rng.integers(0, 10, (h, w), dtype=np.uint8),
+            "depth": np.zeros((h, w), dtype=np.float32),
+            "K": np.eye(3),
+        },
+        "objects": [{"name": "obj", "TWO": np.eye(4)}],
+    }
+
+
+def benchmark_packed_chunks(
+    n_chunks: int = 10,
+    n_frames_per_chunk: int = 100,
+    n_reads: int = 1000,
+    ds_dir: Optional[str] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Measures the random-access read throughput of dumps and packed chunks.
+
+    A dataset of random frames is recorded in the dumps format and converted
+    to packed chunks. Each frame read is unpickled, the images are not decoded.
+    """
+    rng = np.random.default_rng(0)
+    tmp_dir = tempfile.TemporaryDirectory(dir=ds_dir)
+    ds_dir = Path(tmp_dir.name)
+    for seed in range(n_chunks):
+        states = [make_random_state(rng) for _ in range(n_frames_per_chunk)]
+        write_chunk(states, seed, ds_dir)
+    convert_dumps_to_packed(ds_dir)
+    keys = [f"{s}-{n}" for s in range(n_chunks) for n in range(n_frames_per_chunk)]
+    read_keys = rng.choice(keys, size=n_reads)
+
+    def read_dump(key):
+        return (ds_dir / "dumps" / key).with_suffix(".pkl").read_bytes()
+
+    packed_reader = PackedChunksReader(ds_dir)
+    results = {}
+    for name, read in (("dumps", read_dump), ("packed", packed_reader.read)):
+        n_bytes = 0
+        start = time.time()
+        for key in read_keys:
+            buf = read(key)
+            n_bytes += len(buf)
+            pickle.loads(buf)
+        elapsed = time.time() - start
+        results[name] = {
+            "frames_per_s": n_reads / elapsed,
+            "MB_per_s": n_bytes / elapsed / 1e6,
+        }
+    results["n_files"] = {
+        "dumps": len(keys),
+        "packed": n_chunks,
+    }
+    packed_reader.close()
+    tmp_dir.cleanup()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Packed chunks read throughput")
+    parser.add_argument("--n-chunks", type=int, default=10)
+    parser.add_argument("--n-frames-per-chunk", type=int, default=100)
+    parser.add_argument("--n-reads", type=int, default=1000)
+    parser.add_argument(
+        "--ds-dir",
+        type=str,
+        default=None,
+        help="Directory in which the temporary dataset is written.",
+    )
+    args = parser.parse_args()
+
+    results = benchmark_packed_chunks(
+        n_chunks=args.n_chunks,
+        n_frames_per_chunk=args.n_frames_per_chunk,
+        n_reads=args.n_reads,
+        ds_dir=args.ds_dir,
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,426 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Third Party
+import numpy as np
+import pandas as pd
+import torch
+from omegaconf import OmegaConf
+
+# MegaPose
+from happypose.pose_estimators.cosypose.cosypose.integrated.pose_estimator import (
+    PoseEstimator as CosyPoseEstimator,
+)
+from happypose.pose_estimators.cosypose.cosypose.training.pose_models_cfg import (
+    create_pose_model_cosypose,
+)
+from happypose.pose_estimators.megapose.inference.icp_refiner import ICPRefiner
+from happypose.pose_estimators.megapose.inference.pose_estimator import (
+    PoseEstimator as MegaPoseEstimator,
+)
+from happypose.pose_estimators.megapose.training.pose_models_cfg import (
+    create_model_pose,
+)
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.inference.types import ObservationTensor
+from happypose.toolbox.lib3d.camera_geometry import boxes_from_uv, project_points
+from happypose.toolbox.lib3d.rigid_mesh_database import BatchedMeshes, MeshDataBase
+from happypose.toolbox.lib3d.rotations import angle_axis_to_rotation_matrix
+from happypose.toolbox.lib3d.transform import Transform
+from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.panda3d_scene_renderer import Panda3dSceneRenderer
+from happypose.toolbox.renderer.types import (
+    Panda3dCameraData,
+    Panda3dLightData,
+    Panda3dObjectData,
+    Resolution,
+)
+from happypose.toolbox.utils.profiler import Profiler, profiling
+from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
+
+PIPELINES = ("megapose", "cosypose", "icp", "teaserpp")
+
+MEGAPOSE_COARSE_CFG = dict(
+    n_rendered_views=1,
+    multiview_type="TCO",
+    views_inplane_rotations=False,
+    predict_rendered_views_logits=True,
+    remove_TCO_rendering=False,
+    predict_pose_update=False,
+    render_normals=True,
+    render_depth=False,
+    input_depth=False,
+    depth_normalization_type="tCR_scale",
+)
+
+MEGAPOSE_REFINER_CFG = dict(
+    MEGAPOSE_COARSE_CFG,
+    n_rendered_views=4,
+    multiview_type="TCO+front_3views",
+    predict_rendered_views_logits=False,
+    predict_pose_update=True,
+)
+
+
+def make_object_dataset(
+    mesh_paths: List[Path],
+    mesh_units: str = "mm",
+) -> RigidObjectDataset:
+    """Object dataset with one object per mesh, labelled obj_{n}."""
+    return RigidObjectDataset(
+        [
+            RigidObject(label=f"obj_{n}", mesh_path=Path(path), mesh_units=mesh_units)
+            for n, path in enumerate(mesh_paths)
+        ],
+    )
+
+
+def make_synthetic_frames(
+    object_dataset: RigidObjectDataset,
+    mesh_db: BatchedMeshes,
+    n_frames: int,
+    n_objects_per_frame: int = 4,
+    resolution: Resolution = (480, 640),
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Renders deterministic synthetic frames of the objects.
+
+    The objects are placed at random orientations 0.5 to 0.9m in front of
+    the camera. Each frame contains the observation (rgb + depth), the
+    ground truth poses and the detections, whose boxes are the projections
+    of the object points.
+    """
+    rng = np.random.RandomState(seed)
+    h, w = resolution
+    K = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=np.float32)
+    scene_renderer = Panda3dSceneRenderer(asset_dataset=object_dataset)
+    labels = [obj.label for obj in object_dataset.list_objects]
+
+    frames = []
+    for _ in range(n_frames):
+        frame_labels = rng.choice(labels, size=n_objects_per_frame).tolist()
+        TCO = np.tile(np.eye(4), (n_objects_per_frame, 1, 1))
+        for n in range(n_objects_per_frame):
+            q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+            R = q * np.sign(np.diag(r))
+            TCO[n, :3, :3] = R * np.linalg.det(R)
+            TCO[n, :3, 3] = [*rng.uniform(-0.12, 0.12, size=2), rng.uniform(0.5, 0.9)]
+        rendering = scene_renderer.render_scene(
+            object_datas=[
+                Panda3dObjectData(label=label, TWO=Transform(TCO_n))
+                for label, TCO_n in zip(frame_labels, TCO)
+            ],
+            camera_datas=[
+                Panda3dCameraData(K=K, resolution=resolution, TWC=Transform(np.eye(4))),
+            ],
+            light_datas=[
+                Panda3dLightData(light_type="ambient", color=(1.0, 1.0, 1.0, 1.0)),
+            ],
+            render_depth=True,
+        )[0]
+
+        infos = pd.DataFrame({"label": frame_labels, "batch_im_id": 0, "score": 1.0})
+        infos["instance_id"] = infos.groupby("label").cumcount()
+        TCO = torch.as_tensor(TCO, dtype=torch.float)
+        K_ = torch.as_tensor(K).unsqueeze(0).repeat(n_objects_per_frame, 1, 1)
+        points = mesh_db.select(frame_labels).sample_points(1000, deterministic=True)
+        points = points.cpu()
+        uv = project_points(points, K_, TCO)
+        uv[..., 0] = uv[..., 0].clamp(0, w - 1)
+        uv[..., 1] = uv[..., 1].clamp(0, h - 1)
+        frames.append(
+            dict(
+                observation=ObservationTensor.from_numpy(
+                    rendering.rgb,
+                    rendering.depth.squeeze(-1),
+                    K,
+                ),
+                detections=PandasTensorCollection(infos, bboxes=boxes_from_uv(uv)),
+                gt_poses=PandasTensorCollection(infos, poses=TCO),
+            ),
+        )
+    return frames
+
+
+def perturb_poses(
+    poses: PandasTensorCollection,
+    translation_noise: float = 0.01,
+    rotation_noise_deg: float = 0.0,
+    seed: int = 0,
+) -> PandasTensorCollection:
+    """Initial estimates of the refiners, ground truth poses with noise.
+
+    The translations get a gaussian noise of std translation_noise (m) and
+    the rotations a rotation of rotation_noise_deg around a random axis.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    TCO = poses.poses.clone()
+    TCO[:, :3, 3] += torch.randn(len(TCO), 3, generator=generator) * translation_noise
+    if rotation_noise_deg > 0:
+        axis = torch.randn(len(TCO), 3, generator=generator)
+        axis = axis / axis.norm(dim=-1, keepdim=True)
+        R_noise = angle_axis_to_rotation_matrix(axis * math.radians(rotation_noise_deg))
+        TCO[:, :3, :3] = TCO[:, :3, :3] @ R_noise[:, :3, :3]
+    return PandasTensorCollection(poses.infos, poses=TCO, poses_input=TCO.clone())
+
+
+def time_frames(
+    frames: List[Dict[str, Any]],
+    run_frame: Callable[[Dict[str, Any]], Any],
+    n_warmup_frames: int = 1,
+) -> Dict[str, Any]:
+    """Runs a pipeline on each frame under a profiler.
+
+    Returns the throughput, the percentiles of the frame latencies and the
+    summary of the profiled stages, all times in ms.
+    """
+    for frame in frames[:n_warmup_frames]:
+        run_frame(frame)
+
+    latencies = []
+    with profiling(Profiler()) as profiler:
+        for frame in frames:
+            start = time.time()
+            run_frame(frame)
+            latencies.append((time.time() - start) * 1000)
+    latencies = np.array(latencies)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        "frames_per_second": 1000 * len(latencies) / float(latencies.sum()),
+        "latency_ms": {
+            "mean": float(latencies.mean()),
+            "p50": float(p50),
+            "p90": float(p90),
+            "p99": float(p99),
+        },
+        "stages": profiler.summary(),
+    }
+
+
+def make_megapose_estimator(
+    renderer: Panda3dBatchRenderer,
+    mesh_db: BatchedMeshes,
+    backbone_str: str = "resnet34",
+    SO3_grid_size: int = 72,
+) -> MegaPoseEstimator:
+    """MegaPose coarse and refiner models with random weights."""
+    models = []
+    for cfg in (MEGAPOSE_COARSE_CFG, MEGAPOSE_REFINER_CFG):
+        cfg = OmegaConf.create(dict(cfg, backbone_str=backbone_str))
+        model = create_model_pose(cfg, renderer=renderer, mesh_db=mesh_db).eval()
+        model.cfg = cfg
+        models.append(model)
+    coarse_model, refiner_model = models
+    return MegaPoseEstimator(
+        refiner_model=refiner_model,
+        coarse_model=coarse_model,
+        SO3_grid_size=SO3_grid_size,
+    )
+
+
+def make_cosypose_estimator(
+    renderer: Panda3dBatchRenderer,
+    mesh_db: BatchedMeshes,
+    backbone_str: str = "efficientnet-b3",
+) -> CosyPoseEstimator:
+    """CosyPose coarse and refiner models with random weights."""
+    models = []
+    for _ in range(2):
+        cfg = OmegaConf.create(
+            dict(
+                backbone_str=backbone_str,
+                n_pose_dims=9,
+                init_method="z-up+auto-depth",
+            ),
+        )
+        model = create_pose_model_cosypose(cfg, renderer=renderer, mesh_db=mesh_db)
+        model.cfg = cfg
+        models.append(model.eval())
+    coarse_model, refiner_model = models
+    return CosyPoseEstimator(refiner_model=refiner_model, coarse_model=coarse_model)
+
+
+def benchmark_pipelines(
+    mesh_paths: List[Path],
+    mesh_units: str = "mm",
+    pipelines: Tuple[str, ...] = PIPELINES,
+    n_frames: int = 10,
+    n_objects_per_frame: int = 4,
+    resolution: Resolution = (480, 640),
+    n_workers: int = 4,
+    megapose_backbone: str = "resnet34",
+    megapose_SO3_grid_size: int = 72,
+    megapose_n_refiner_iterations: int = 5,
+    cosypose_backbone: str = "efficientnet-b3",
+    cosypose_n_refiner_iterations: int = 4,
+    n_threads: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Measures the per-frame latency of the pose estimation pipelines on CPU.
+
+    The frames are synthetic renders of the meshes, generated from the seed,
+    and the networks have random weights: the timings do not depend on the
+    accuracy of the estimates. The pipelines are run from the ground truth
+    detections (megapose: coarse + refiner + scoring, cosypose: coarse +
+    refiner) or from noisy ground truth poses (icp, teaserpp depth refiners).
+    n_threads sets the number of torch threads, importing cosypose sets
+    OMP_NUM_THREADS=1.
+    """
+    if n_threads is not None:
+        torch.set_num_threads(n_threads)
+    torch.manual_seed(seed)
+    object_dataset = make_object_dataset(mesh_paths, mesh_units)
+    mesh_db = MeshDataBase.from_object_ds(object_dataset).batched()
+    frames = make_synthetic_frames(
+        object_dataset,
+        mesh_db,
+        n_frames=n_frames,
+        n_objects_per_frame=n_objects_per_frame,
+        resolution=resolution,
+        seed=seed,
+    )
+    renderer = Panda3dBatchRenderer(
+        asset_dataset=object_dataset,
+        n_workers=n_workers,
+        split_objects=True,
+        preload_cache=False,
+    )
+
+    results: Dict[str, Any] = {
+        "config": dict(
+            n_frames=n_frames,
+            n_objects_per_frame=n_objects_per_frame,
+            resolution=list(resolution),
+            n_workers=n_workers,
+            n_threads=torch.get_num_threads(),
+        ),
+    }
+    if "megapose" in pipelines:
+        pose_estimator = make_megapose_estimator(
+            renderer,
+            mesh_db,
+            backbone_str=megapose_backbone,
+            SO3_grid_size=megapose_SO3_grid_size,
+        )
+        results["megapose"] = time_frames(
+            frames,
+            lambda frame: pose_estimator.run_inference_pipeline(
+                frame["observation"],
+                detections=frame["detections"],
+                n_refiner_iterations=megapose_n_refiner_iterations,
+            ),
+        )
+        results["megapose"]["config"] = dict(
+            backbone=megapose_backbone,
+            SO3_grid_size=megapose_SO3_grid_size,
+            n_refiner_iterations=megapose_n_refiner_iterations,
+        )
+
+    if "cosypose" in pipelines:
+        pose_estimator = make_cosypose_estimator(
+            renderer,
+            mesh_db,
+            backbone_str=cosypose_backbone,
+        )
+        results["cosypose"] = time_frames(
+            frames,
+            lambda frame: pose_estimator.run_inference_pipeline(
+                frame["observation"],
+                detections=frame["detections"],
+                n_coarse_iterations=1,
+                n_refiner_iterations=cosypose_n_refiner_iterations,
+            ),
+        )
+        results["cosypose"]["config"] = dict(
+            backbone=cosypose_backbone,
+            n_refiner_iterations=cosypose_n_refiner_iterations,
+        )
+
+    for pipeline in ("icp", "teaserpp"):
+        if pipeline not in pipelines:
+            continue
+        if pipeline == "icp":
+            depth_refiner = ICPRefiner(mesh_db, renderer)
+        else:
+            try:
+                from happypose.pose_estimators.megapose.inference.teaserpp_refiner import (
+                    TeaserppRefiner,
+                )
+            except ImportError as e:
+                results[pipeline] = {"skipped": str(e)}
+                continue
+            depth_refiner = TeaserppRefiner(mesh_db, renderer)
+        results[pipeline] = time_frames(
+            frames,
+            lambda frame: depth_refiner.refine_poses(
+                perturb_poses(frame["gt_poses"], seed=seed),
+                depth=frame["observation"].depth,
+                K=frame["observation"].K,
+            ),
+        )
+
+    renderer.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Per-frame latency of the pose pipelines")
+    parser.add_argument("--mesh-paths", type=Path, nargs="+", required=True)
+    parser.add_argument("--mesh-units", type=str, default="mm")
+    parser.add_argument(
+        "--pipelines",
+        type=str,
+        nargs="+",
+        default=list(PIPELINES),
+        choices=PIPELINES,
+    )
+    parser.add_argument("--n-frames", type=int, default=10)
+    parser.add_argument("--n-objects-per-frame", type=int, default=4)
+    parser.add_argument("--resolution", type=int, nargs=2, default=(480, 640))
+    parser.add_argument("--n-workers", type=int, default=4)
+    parser.add_argument("--megapose-backbone", type=str, default="resnet34")
+    parser.add_argument("--megapose-SO3-grid-size", type=int, default=72)
+    parser.add_argument("--megapose-n-refiner-iterations", type=int, default=5)
+    parser.add_argument("--cosypose-backbone", type=str, default="efficientnet-b3")
+    parser.add_argument("--cosypose-n-refiner-iterations", type=int, default=4)
+    parser.add_argument("--n-threads", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = benchmark_pipelines(
+        mesh_paths=args.mesh_paths,
+        mesh_units=args.mesh_units,
+        pipelines=tuple(args.pipelines),
+        n_frames=args.n_frames,
+        n_objects_per_frame=args.n_objects_per_frame,
+        resolution=tuple(args.resolution),
+        n_workers=args.n_workers,
+        megapose_backbone=args.megapose_backbone,
+        megapose_SO3_grid_size=args.megapose_SO3_grid_size,
+        megapose_n_refiner_iterations=args.megapose_n_refiner_iterations,
+        cosypose_backbone=args.cosypose_backbone,
+        cosypose_n_refiner_iterations=args.cosypose_n_refiner_iterations,
+        n_threads=args.n_threads,
+        seed=args.seed,
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,193 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.pose_estimators.megapose.inference.pose_estimator import PoseEstimator
+from happypose.toolbox.benchmarks.pipelines import (
+    make_object_dataset,
+    make_synthetic_frames,
+    perturb_poses,
+)
+from happypose.toolbox.inference.early_exit import RefinerConvergence
+from happypose.toolbox.lib3d.distances import dists_add
+from happypose.toolbox.utils.load_model import load_named_model
+
+
+def run_refiner(
+    pose_estimator: PoseEstimator,
+    frames: List[Dict[str, Any]],
+    n_iterations: int,
+    convergence: Optional[RefinerConvergence],
+    translation_noise: float,
+    rotation_noise_deg: float,
+) -> Dict[str, float]:
+    """Refines the noisy ground truth poses of the frames.
+
+    Returns the time, the number of refiner iterations and of renders summed
+    over the objects, and the ADD errors (m) of the refined poses.
+    """
+    mesh_db = pose_estimator.refiner_model.mesh_db
+    n_views = pose_estimator.refiner_model.n_rendered_views
+    errors = []
+    n_object_iterations = 0
+    start = time.time()
+    for frame_id, frame in enumerate(frames):
+        gt_poses = frame["gt_poses"]
+        observation = frame["observation"]
+        data_TCO_init = perturb_poses(
+            gt_poses,
+            translation_noise=translation_noise,
+            rotation_noise_deg=rotation_noise_deg,
+            seed=frame_id,
+        )
+        if torch.cuda.is_available():
+            observation = observation.cuda()
+            data_TCO_init = data_TCO_init.cuda()
+        preds, _ = pose_estimator.forward_refiner(
+            observation,
+            data_TCO_init,
+            n_iterations=n_iterations,
+            convergence=convergence,
+        )
+        preds = preds[f"iteration={n_iterations}"]
+        if convergence is None:
+            n_object_iterations += len(preds) * n_iterations
+        else:
+            n_object_iterations += int(preds.infos["n_refiner_iterations"].sum())
+        points = mesh_db.select(gt_poses.infos["label"]).sample_points(
+            1000,
+            deterministic=True,
+        )
+        dists = dists_add(preds.poses.cpu(), gt_poses.poses, points.cpu())
+        errors.append(dists.norm(dim=-1).mean(dim=-1))
+    elapsed = time.time() - start
+    errors = torch.cat(errors).numpy()
+    return {
+        "time": elapsed,
+        "object_iterations": n_object_iterations,
+        "renders": n_object_iterations * n_views,
+        "add_mean": float(errors.mean()),
+        "add_median": float(np.median(errors)),
+    }
+
+
+def benchmark_refiner_early_exit(
+    mesh_paths: List[Path],
+    mesh_units: str = "mm",
+    model_name: str = "megapose-1.0-RGB",
+    n_frames: int = 10,
+    n_objects_per_frame: int = 4,
+    n_iterations: int = 5,
+    rotation_thresholds_deg: Tuple[float, ...] = (0.5,),
+    translation_thresholds: Tuple[float, ...] = (0.002,),
+    translation_noise: float = 0.02,
+    rotation_noise_deg: float = 15.0,
+    n_workers: int = 4,
+    seed: int = 0,
+) -> Dict[str, Dict[str, float]]:
+    """Compares the refiner with a fixed number of iterations and with early exit.
+
+    The refiner of the pretrained model refines noisy ground truth poses of
+    synthetic frames (see `benchmarks.pipelines`). For each convergence
+    criterion, returns the renders saved and the ADD errors, to be compared
+    with the errors of the fixed number of iterations.
+    """
+    object_dataset = make_object_dataset(mesh_paths, mesh_units)
+    pose_estimator = load_named_model(model_name, object_dataset, n_workers=n_workers)
+    frames = make_synthetic_frames(
+        object_dataset,
+        pose_estimator.refiner_model.mesh_db,
+        n_frames=n_frames,
+        n_objects_per_frame=n_objects_per_frame,
+        seed=seed,
+    )
+    kwargs = dict(
+        n_iterations=n_iterations,
+        translation_noise=translation_noise,
+        rotation_noise_deg=rotation_noise_deg,
+    )
+
+    # Warmup.
+    run_refiner(pose_estimator, frames[:1], convergence=None, **kwargs)
+    results = {"fixed": run_refiner(pose_estimator, frames, convergence=None, **kwargs)}
+    for rotation_deg in rotation_thresholds_deg:
+        for translation in translation_thresholds:
+            convergence = RefinerConvergence(rotation_deg, translation)
+            result = run_refiner(
+                pose_estimator,
+                frames,
+                convergence=convergence,
+                **kwargs,
+            )
+            result["renders_saved"] = (
+                1 - result["renders"] / results["fixed"]["renders"]
+            )
+            result["speedup"] = results["fixed"]["time"] / result["time"]
+            results[f"early_exit/rot={rotation_deg}deg,t={translation}m"] = result
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Refiner early exit")
+    parser.add_argument("--mesh-paths", type=Path, nargs="+", required=True)
+    parser.add_argument("--mesh-units", type=str, default="mm")
+    parser.add_argument("--model-name", type=str, default="megapose-1.0-RGB")
+    parser.add_argument("--n-frames", type=int, default=10)
+    parser.add_argument("--n-objects-per-frame", type=int, default=4)
+    parser.add_argument("--n-iterations", type=int, default=5)
+    parser.add_argument(
+        "--rotation-thresholds-deg",
+        type=float,
+        nargs="+",
+        default=[0.25, 0.5, 1.0],
+    )
+    parser.add_argument(
+        "--translation-thresholds",
+        type=float,
+        nargs="+",
+        default=[0.001, 0.002],
+    )
+    parser.add_argument("--translation-noise", type=float, default=0.02)
+    parser.add_argument("--rotation-noise-deg", type=float, default=15.0)
+    parser.add_argument("--n-workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = benchmark_refiner_early_exit(
+        mesh_paths=args.mesh_paths,
+        mesh_units=args.mesh_units,
+        model_name=args.model_name,
+        n_frames=args.n_frames,
+        n_objects_per_frame=args.n_objects_per_frame,
+        n_iterations=args.n_iterations,
+        rotation_thresholds_deg=tuple(args.rotation_thresholds_deg),
+        translation_thresholds=tuple(args.translation_thresholds),
+        translation_noise=args.translation_noise,
+        rotation_noise_deg=args.rotation_noise_deg,
+        n_workers=args.n_workers,
+        seed=args.seed,
+    )
+    print(json.dumps(results, indent=2))
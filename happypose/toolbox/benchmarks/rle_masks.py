@@ -0,0 +1,121 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.utils.rle_masks import RLEMasks
+
+
+def make_object_masks(
+    n_masks: int,
+    resolution=(480, 640),
+    seed: int = 0,
+) -> torch.Tensor:
+    """Random ellipses (n_masks, H, W), of the size of the objects of BOP."""
+    generator = torch.Generator().manual_seed(seed)
+    h, w = resolution
+    centers = torch.rand(n_masks, 2, generator=generator) * torch.tensor([w, h])
+    radii = 20 + torch.rand(n_masks, 2, generator=generator) * 100
+    v, u = torch.meshgrid(torch.arange(h), torch.arange(w), indexing="ij")
+    uv = torch.stack([u, v], -1).float()
+    distances = ((uv[None] - centers[:, None, None]) / radii[:, None, None]) ** 2
+    return distances.sum(-1) < 1
+
+
+def dense_iou(masks_a: torch.Tensor, masks_b: torch.Tensor) -> torch.Tensor:
+    """IoU (N, M) of dense masks."""
+    masks_a, masks_b = masks_a.flatten(1).float(), masks_b.flatten(1).float()
+    inter = masks_a @ masks_b.T
+    union = masks_a.sum(-1)[:, None] + masks_b.sum(-1)[None] - inter
+    return inter / union.clamp(min=1)
+
+
+def dense_elementwise_iou(masks_a: torch.Tensor, masks_b: torch.Tensor):
+    inter = (masks_a & masks_b).flatten(1).sum(-1)
+    union = (masks_a | masks_b).flatten(1).sum(-1)
+    return inter / union.clamp(min=1)
+
+
+def median_time(fn: Callable, n_iterations: int) -> float:
+    times = []
+    for _ in range(n_iterations):
+        start = time.time()
+        fn()
+        times.append((time.time() - start) * 1000)
+    return float(np.median(times))
+
+
+def benchmark_rle_masks(
+    n_masks: int = 100,
+    n_iterations: int = 5,
+) -> Dict[str, Dict[str, float]]:
+    """Memory (MB) of the masks and time (ms) of the operations on the masks.
+
+    The IoU of all the pairs of masks and of the n_masks pairs (e.g. the
+    candidate matches of the DetectionMeter) on dense and RLE masks.
+    """
+    masks = make_object_masks(n_masks)
+    other_masks = make_object_masks(n_masks, seed=1)
+    rle, other_rle = RLEMasks.encode(masks), RLEMasks.encode(other_masks)
+    assert torch.allclose(rle.iou(other_rle), dense_iou(masks, other_masks))
+
+    results = {
+        "memory": {
+            "dense_float": masks.numel() * 4 / 1e6,
+            "dense_bool": masks.numel() / 1e6,
+            "rle": rle.nbytes / 1e6,
+        },
+    }
+    results["memory"]["reduction"] = (
+        results["memory"]["dense_bool"] / results["memory"]["rle"]
+    )
+    results["encoding"] = {
+        "encode": median_time(lambda: RLEMasks.encode(masks), n_iterations),
+        "decode": median_time(lambda: rle.decode(), n_iterations),
+        "area": median_time(lambda: rle.area(), n_iterations),
+        "bboxes": median_time(lambda: rle.bboxes(), n_iterations),
+    }
+    for name, dense_fn, rle_fn in (
+        ("iou", dense_iou, RLEMasks.iou),
+        ("elementwise_iou", dense_elementwise_iou, RLEMasks.elementwise_iou),
+    ):
+        results[name] = {
+            "dense": median_time(lambda: dense_fn(masks, other_masks), n_iterations),
+            "rle": median_time(lambda: rle_fn(rle, other_rle), n_iterations),
+        }
+        results[name]["speedup"] = results[name]["dense"] / results[name]["rle"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Run-length encoded masks")
+    parser.add_argument("--n-masks", type=int, default=100)
+    parser.add_argument("--n-iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    results = benchmark_rle_masks(
+        n_masks=args.n_masks,
+        n_iterations=args.n_iterations,
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,166 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+from typing import Dict, Tuple
+
+# Third Party
+import torch
+
+# MegaPose
+from happypose.toolbox.lib3d.cropping import deepim_crops_robust
+
+
+def make_crop_inputs(
+    n_images: int,
+    n_hypotheses: int,
+    resolution: Tuple[int, int],
+    device: str,
+) -> Dict[str, torch.Tensor]:
+    """RGBD images and n_hypotheses poses per image, in front of the camera."""
+    generator = torch.Generator().manual_seed(0)
+    h, w = resolution
+    n = n_images * n_hypotheses
+    K = torch.tensor([[600.0, 0, w / 2], [0, 600, h / 2], [0, 0, 1]]).repeat(n, 1, 1)
+    TCO = torch.eye(4).repeat(n, 1, 1)
+    TCO[:, :3, 3] = torch.rand(n, 3, generator=generator) * 0.2 - 0.1
+    TCO[:, 2, 3] += 0.8
+    inputs = dict(
+        images=torch.rand(n_images, 4, h, w, generator=generator),
+        image_ids=torch.arange(n_images).repeat_interleave(n_hypotheses),
+        K=K,
+        TCO_pred=TCO,
+        tCR_in=TCO[:, :3, 3],
+        O_vertices=torch.rand(n, 200, 3, generator=generator) * 0.1 - 0.05,
+        obs_boxes=torch.tensor([[0.0, 0.0, w / 4, h / 4]]).repeat(n, 1),
+    )
+    return {k: v.to(device) for k, v in inputs.items()}
+
+
+def run_crops(inputs: Dict[str, torch.Tensor], replicate_images: bool) -> None:
+    inputs = dict(inputs)
+    if replicate_images:
+        # Previous behavior, the image of each hypothesis is copied.
+        inputs["images"] = inputs["images"][inputs.pop("image_ids")]
+    deepim_crops_robust(**inputs, output_size=(240, 320), lamb=1.4)
+
+
+def _measure_cpu_peak_memory(
+    n_images: int,
+    n_hypotheses: int,
+    resolution: Tuple[int, int],
+    replicate_images: bool,
+) -> Tuple[float, float]:
+    """Peak memory increase (bytes) and time of the crops, run in a new process."""
+    inputs = make_crop_inputs(n_images, n_hypotheses, resolution, "cpu")
+    # Warmup.
+    run_crops({k: v[:1] for k, v in inputs.items()}, replicate_images=False)
+    # ru_maxrss is in KiB on Linux.
+    maxrss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    run_crops(inputs, replicate_images)
+    elapsed = time.time() - start
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (maxrss - maxrss_start) * 1024, elapsed
+
+
+def measure_peak_memory(
+    n_images: int,
+    n_hypotheses: int,
+    resolution: Tuple[int, int],
+    replicate_images: bool,
+    device: str,
+) -> Tuple[float, float]:
+    """Peak memory increase (bytes) and time of cropping the hypotheses.
+
+    On CPU, the peak resident memory of the process cannot be reset, so each
+    measurement runs in a new process.
+    """
+    if device == "cpu":
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(1) as pool:
+            return pool.apply(
+                _measure_cpu_peak_memory,
+                (n_images, n_hypotheses, resolution, replicate_images),
+            )
+
+    inputs = make_crop_inputs(n_images, n_hypotheses, resolution, device)
+    run_crops({k: v[:1] for k, v in inputs.items()}, replicate_images=False)
+    torch.cuda.synchronize()
+    torch.cuda.reset_peak_memory_stats()
+    memory_start = torch.cuda.memory_allocated()
+    start = time.time()
+    run_crops(inputs, replicate_images)
+    torch.cuda.synchronize()
+    elapsed = time.time() - start
+    return torch.cuda.max_memory_allocated() - memory_start, elapsed
+
+
+def benchmark_roi_cropping(
+    n_images: int = 2,
+    n_hypotheses: int = 128,
+    resolution: Tuple[int, int] = (480, 640),
+    device: str = "cuda" if torch.cuda.is_available() else "cpu",
+) -> Dict[str, Dict[str, float]]:
+    """Compares the crops of replicated images and of the unique images.
+
+    The crops of the n_images * n_hypotheses hypotheses are taken either
+    from the images replicated for each hypothesis (previous behavior of the
+    pose estimator), or from the unique images with the per-hypothesis image
+    indices. Returns the peak memory (MB) and time (ms) of each.
+    """
+    results = {}
+    for name, replicate_images in (("replicated", True), ("indexed", False)):
+        peak_memory, elapsed = measure_peak_memory(
+            n_images,
+            n_hypotheses,
+            resolution,
+            replicate_images,
+            device,
+        )
+        results[name] = {
+            "peak_memory_mb": peak_memory / 2**20,
+            "time_ms": elapsed * 1000,
+        }
+    results["memory_saved_mb"] = (
+        results["replicated"]["peak_memory_mb"] - results["indexed"]["peak_memory_mb"]
+    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Crops of replicated vs unique images")
+    parser.add_argument("--n-images", type=int, default=2)
+    parser.add_argument("--n-hypotheses", type=int, default=128)
+    parser.add_argument("--resolution", type=int, nargs=2, default=[480, 640])
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cuda" if torch.cuda.is_available() else "cpu",
+    )
+    args = parser.parse_args()
+
+    results = benchmark_roi_cropping(
+        n_images=args.n_images,
+        n_hypotheses=args.n_hypotheses,
+        resolution=tuple(args.resolution),
+        device=args.device,
+    )
+    print(json.dumps(results, indent=2))
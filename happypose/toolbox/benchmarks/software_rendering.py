@@ -0,0 +1,151 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.lib3d.rotations import angle_axis_to_rotation_matrix
+from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.software_batch_renderer import SoftwareBatchRenderer
+from happypose.toolbox.renderer.types import (
+    BatchRenderOutput,
+    Panda3dLightData,
+    Resolution,
+)
+
+
+def time_renders(renderer: Panda3dBatchRenderer, render_kwargs, n_iterations: int):
+    """Mean time of a batch render, and the last renders."""
+    # Warmup, creates the cameras of the workers.
+    renders = renderer.render(**render_kwargs)
+    times = []
+    for _ in range(n_iterations):
+        start = time.time()
+        renders = renderer.render(**render_kwargs)
+        times.append(time.time() - start)
+    return float(np.mean(times)), renders
+
+
+def compare_renders(
+    renders: BatchRenderOutput,
+    renders_ref: BatchRenderOutput,
+) -> Dict[str, float]:
+    """Agreement of the masks, depths and colors of two batches of renders."""
+    masks, masks_ref = renders.binary_masks, renders_ref.binary_masks
+    both = masks & masks_ref
+    depth_errors = (renders.depths - renders_ref.depths).abs()[both]
+    rgb_errors = (renders.rgbs - renders_ref.rgbs).abs()[both.expand(-1, 3, -1, -1)]
+    return {
+        "mask_iou": float(both.sum() / (masks | masks_ref).sum()),
+        "depth_error_median_mm": float(depth_errors.median()) * 1000,
+        "rgb_error_mean": float(rgb_errors.mean()),
+    }
+
+
+def benchmark_software_rendering(
+    mesh_path: Path,
+    mesh_units: str = "mm",
+    batch_size: int = 64,
+    n_iterations: int = 10,
+    n_workers: int = 4,
+    resolution: Resolution = (240, 320),
+) -> Dict[str, Dict[str, float]]:
+    """Compares the software renderer and the panda3d renderer on CPU.
+
+    Returns the number of renders per second of each renderer, and the
+    agreement of the software renders with the panda3d renders.
+    """
+    asset_dataset = RigidObjectDataset(
+        [RigidObject(label="object", mesh_path=mesh_path, mesh_units=mesh_units)],
+    )
+
+    h, w = resolution
+    generator = torch.Generator().manual_seed(0)
+    K = torch.tensor([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=torch.float)
+    TCO = torch.eye(4).repeat(batch_size, 1, 1)
+    TCO[:, :3, :3] = angle_axis_to_rotation_matrix(
+        torch.randn(batch_size, 3, generator=generator),
+    )[:, :3, :3]
+    TCO[:, 2, 3] = torch.linspace(0.3, 0.6, batch_size)
+    render_kwargs = dict(
+        labels=batch_size * ["object"],
+        TCO=TCO,
+        K=K.repeat(batch_size, 1, 1),
+        light_datas=batch_size
+        * [[Panda3dLightData(light_type="ambient", color=(1.0, 1.0, 1.0, 1.0))]],
+        resolution=resolution,
+        render_depth=True,
+        render_binary_mask=True,
+    )
+
+    results = {}
+    renderer = Panda3dBatchRenderer(
+        asset_dataset,
+        n_workers=n_workers,
+        preload_cache=True,
+    )
+    try:
+        time_panda3d, renders_panda3d = time_renders(
+            renderer,
+            render_kwargs,
+            n_iterations,
+        )
+    finally:
+        renderer.stop()
+    results["panda3d"] = {"renders_per_second": batch_size / time_panda3d}
+
+    renderer = SoftwareBatchRenderer(asset_dataset, preload_cache=True)
+    time_software, renders_software = time_renders(
+        renderer,
+        render_kwargs,
+        n_iterations,
+    )
+    results["software"] = {
+        "renders_per_second": batch_size / time_software,
+        **compare_renders(renders_software, renders_panda3d),
+    }
+    results["speedup"] = time_panda3d / time_software
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Software vs panda3d rendering on CPU")
+    parser.add_argument("--mesh-path", type=Path, required=True)
+    parser.add_argument("--mesh-units", type=str, default="mm")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-iterations", type=int, default=10)
+    parser.add_argument("--n-workers", type=int, default=4)
+    parser.add_argument("--resolution", type=int, nargs=2, default=(240, 320))
+    args = parser.parse_args()
+
+    results = benchmark_software_rendering(
+        mesh_path=args.mesh_path,
+        mesh_units=args.mesh_units,
+        batch_size=args.batch_size,
+        n_iterations=args.n_iterations,
+        n_workers=args.n_workers,
+        resolution=tuple(args.resolution),
+    )
+    print(json.dumps(results, indent=2))
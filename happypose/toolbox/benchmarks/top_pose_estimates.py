@@ -0,0 +1,119 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import argparse
+import json
+import time
+from typing import Dict, List
+
+# Third Party
+import numpy as np
+import pandas as pd
+import torch
+
+# MegaPose
+from happypose.toolbox.utils.tensor_collection import (
+    PandasTensorCollection,
+    filter_top_pose_estimates,
+)
+
+
+def filter_top_pose_estimates_pandas(
+    data_TCO: PandasTensorCollection,
+    top_K: int,
+    group_cols: List[str],
+    filter_field: str,
+) -> PandasTensorCollection:
+    """Previous implementation, with a pandas groupby."""
+    df = data_TCO.infos
+    df = df.sort_values(filter_field, ascending=False).groupby(group_cols).head(top_K)
+    return data_TCO[df.index.tolist()]
+
+
+def make_coarse_estimates(
+    n_images: int,
+    n_detections: int,
+    n_hypotheses: int,
+) -> PandasTensorCollection:
+    rng = np.random.default_rng(0)
+    n = n_images * n_detections * n_hypotheses
+    detection_ids = np.repeat(np.arange(n_images * n_detections), n_hypotheses)
+    infos = pd.DataFrame(
+        {
+            "batch_im_id": detection_ids // n_detections,
+            "label": [f"obj_{i % 21:06d}" for i in detection_ids],
+            "instance_id": detection_ids % n_detections,
+            "coarse_logit": rng.normal(size=n),
+        }
+    )
+    poses = torch.eye(4).repeat(n, 1, 1)
+    return PandasTensorCollection(infos=infos, poses=poses)
+
+
+def benchmark_top_pose_estimates(
+    n_hypotheses: List[int],
+    n_images: int = 1,
+    n_detections: int = 30,
+    top_K: int = 1,
+    n_iterations: int = 5,
+) -> Dict[int, Dict[str, float]]:
+    """Measures the time of filtering the top_K coarse estimates, in ms."""
+    group_cols = ["batch_im_id", "label", "instance_id"]
+    results = {}
+    for n_hyps in n_hypotheses:
+        data_TCO = make_coarse_estimates(n_images, n_detections, n_hyps)
+        results[n_hyps] = {}
+        for name, fn in (
+            ("tensor", filter_top_pose_estimates),
+            ("pandas", filter_top_pose_estimates_pandas),
+        ):
+            times = []
+            for _ in range(n_iterations):
+                start = time.time()
+                fn(
+                    data_TCO,
+                    top_K=top_K,
+                    group_cols=group_cols,
+                    filter_field="coarse_logit",
+                )
+                times.append(time.time() - start)
+            results[n_hyps][f"{name}_ms"] = float(np.median(times)) * 1000
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Top-K filtering of pose estimates")
+    parser.add_argument(
+        "--n-hypotheses",
+        type=int,
+        nargs="+",
+        default=[576, 4608],
+        help="Number of coarse hypotheses per detection.",
+    )
+    parser.add_argument("--n-images", type=int, default=1)
+    parser.add_argument("--n-detections", type=int, default=30)
+    parser.add_argument("--top-K", type=int, default=1)
+    parser.add_argument("--n-iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    results = benchmark_top_pose_estimates(
+        n_hypotheses=args.n_hypotheses,
+        n_images=args.n_images,
+        n_detections=args.n_detections,
+        top_K=args.top_K,
+        n_iterations=args.n_iterations,
+    )
+    print(json.dumps(results, indent=2))
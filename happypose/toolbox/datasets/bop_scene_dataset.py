@@ -17,6 +17,7 @@ limitations under the License.
 import json
 import pickle
 from pathlib import Path
+from typing import Any, Dict
 
 # Third Party
 import numpy as np
@@ -40,6 +41,7 @@ from happypose.toolbox.datasets.scene_dataset import (
 )
 from happypose.toolbox.lib3d.transform import Transform
 from happypose.toolbox.utils.logging import get_logger
+from happypose.toolbox.utils.rle_masks import RLEMasks
 
 logger = get_logger(__name__)
 
@@ -196,6 +198,8 @@ class BOPDataset(SceneDataset):
         allow_cache (bool): _description_,
         per_view_annotations (bool): _description_,
         models_dir (str): name of the object directory in bop dataset directory (e.g. "models", "models_eval", "models_cad"...)
+        rle_masks (bool): load the visible masks of the objects as RLEMasks in the
+            binary_masks of the observations, instead of the segmentation
     Returns:
     -------
         List[SceneData]: _description_
@@ -211,9 +215,11 @@ class BOPDataset(SceneDataset):
         allow_cache: bool = False,
         per_view_annotations: bool = False,
         models_dir: str = "models",
+        rle_masks: bool = False,
     ):
         assert ds_dir.exists(), "Dataset does not exists."
         self.ds_dir = ds_dir
+        self.rle_masks = rle_masks
 
         self.split = split
         self.base_dir = ds_dir / split
@@ -253,6 +259,17 @@ class BOPDataset(SceneDataset):
         models_infos = json.loads((models_path / "models_info.json").read_text())
         self.all_labels = [f"obj_{int(obj_id):06d}" for obj_id in models_infos.keys()]
 
+    def _frame_cache_options(self) -> Dict[str, Any]:
+        options = super()._frame_cache_options()
+        options.update(
+            ds_dir=str(self.ds_dir),
+            split=self.split,
+            label_format=self.label_format,
+            use_raw_object_id=self.use_raw_object_id,
+            rle_masks=self.rle_masks,
+        )
+        return options
+
     def _load_scene_observation(
         self,
         image_infos: ObservationInfos,
@@ -317,7 +334,10 @@ class BOPDataset(SceneDataset):
         TWC = TCW.inverse()
 
         object_datas = []
-        segmentation = np.zeros((h, w), dtype=np.uint32)
+        binary_masks = None
+        segmentation = None
+        if not self.rle_masks:
+            segmentation = np.zeros((h, w), dtype=np.uint32)
         if this_gt_info is not None:
             annotation = this_gt
             n_objects = len(annotation)
@@ -361,7 +381,9 @@ class BOPDataset(SceneDataset):
                 object_datas.append(object_data)
 
             mask_path = scene_dir / "mask_visib" / f"{view_id_str}_all.png"
-            if mask_path.exists():
+            if self.rle_masks:
+                binary_masks = self._load_rle_masks(scene_dir, view_id_str, n_objects)
+            elif mask_path.exists():
                 segmentation = np.array(Image.open(mask_path), dtype=np.uint32)
             else:
                 for n in range(n_objects):
@@ -386,5 +408,27 @@ class BOPDataset(SceneDataset):
             camera_data=camera_data,
             infos=image_infos,
             object_datas=object_datas,
+            binary_masks=binary_masks,
         )
         return observation
+
+    @staticmethod
+    def _load_rle_masks(
+        scene_dir: Path,
+        view_id_str: str,
+        n_objects: int,
+    ) -> Dict[int, RLEMasks]:
+        """RLEMasks of the visible masks of the objects, by unique id."""
+        unique_ids = list(range(1, n_objects + 1))
+        mask_path = scene_dir / "mask_visib" / f"{view_id_str}_all.png"
+        if mask_path.exists():
+            segmentation = np.array(Image.open(mask_path), dtype=np.uint32)
+            masks = RLEMasks.from_segmentation(segmentation, unique_ids)
+            return {unique_id: masks[n] for n, unique_id in enumerate(unique_ids)}
+        binary_masks = {}
+        for n, unique_id in enumerate(unique_ids):
+            binary_mask_n = np.array(
+                Image.open(scene_dir / "mask_visib" / f"{view_id_str}_{n:06d}.png"),
+            )
+            binary_masks[unique_id] = RLEMasks.encode(binary_mask_n[None] == 255)
+        return binary_masks
@@ -0,0 +1,190 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+# Standard Library
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
+
+# Third Party
+import numpy as np
+
+# HappyPose
+from happypose.toolbox.utils.logging import get_logger
+
+if TYPE_CHECKING:
+    from happypose.toolbox.datasets.scene_dataset import SceneObservation
+
+logger = get_logger(__name__)
+
+# Shared memory on linux, the frames are shared by all the processes.
+DEFAULT_FRAME_CACHE_DIR = Path("/dev/shm/happypose_frames")
+
+# Decoded images of the observations, stored as .npy files.
+ARRAY_FIELDS = ("rgb", "depth", "segmentation")
+
+# Number of writes of a process after which the size of the cache is scanned.
+SCAN_INTERVAL = 64
+
+
+class FrameCache:
+    """Cache of the decoded observations of a scene dataset, on disk.
+
+    The observations of the frames (scene_id, view_id) are stored in
+    cache_dir / namespace / <hash of the dataset options> / <scene_id>-<view_id>,
+    the decoded rgb, depth and segmentation as .npy files that are memory
+    mapped when loaded, and the rest of the observation pickled. The default
+    directory is in /dev/shm, so the frames are shared in memory between the
+    DataLoader workers, the passes over the dataset and the evaluation runs
+    (until the cache is cleared or the machine rebooted).
+
+    The frames are written by the processes that load them, with an atomic
+    rename. When the size of the cache exceeds max_bytes, the least recently
+    used frames are removed. Each process scans the size of the cache after
+    SCAN_INTERVAL writes or when its own writes could exceed max_bytes, so
+    the cap can be exceeded by the frames written by the other processes
+    in between.
+
+    Args:
+    ----
+        cache_dir: directory of the cache, shared by the datasets.
+        max_bytes: maximum size of the cache.
+        namespace: name of the dataset, e.g. 'ycbv.bop19'.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Union[str, Path]] = None,
+        max_bytes: float = 16e9,
+        namespace: str = "default",
+    ):
+        if cache_dir is None:
+            cache_dir = DEFAULT_FRAME_CACHE_DIR
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.namespace = namespace
+        self._known_bytes: Optional[int] = None
+        self._n_writes = 0
+
+    def _frame_dir(self, options: Dict[str, Any], scene_id: int, view_id: int) -> Path:
+        options_str = json.dumps(options, sort_keys=True, default=str)
+        options_hash = hashlib.sha1(options_str.encode()).hexdigest()[:16]
+        return self.cache_dir / self.namespace / options_hash / f"{scene_id}-{view_id}"
+
+    def get(
+        self,
+        options: Dict[str, Any],
+        scene_id: int,
+        view_id: int,
+    ) -> Optional[SceneObservation]:
+        """The cached observation of the frame, None if it is not cached."""
+        frame_dir = self._frame_dir(options, scene_id, view_id)
+        try:
+            observation_bytes = (frame_dir / "observation.pkl").read_bytes()
+            observation, array_fields = pickle.loads(observation_bytes)
+            # Copy-on-write, the arrays can be modified by the caller.
+            arrays = {
+                k: np.load(frame_dir / f"{k}.npy", mmap_mode="c") for k in array_fields
+            }
+            os.utime(frame_dir)
+        except (FileNotFoundError, EOFError, ValueError):
+            # Not cached, or removed by another process.
+            return None
+        return dataclasses.replace(observation, **arrays)
+
+    def put(self, options: Dict[str, Any], observation: SceneObservation) -> None:
+        """Stores the observation, if it is smaller than max_bytes."""
+        infos = observation.infos
+        frame_dir = self._frame_dir(options, infos.scene_id, infos.view_id)
+        if frame_dir.exists():
+            return
+        arrays = {
+            k: getattr(observation, k)
+            for k in ARRAY_FIELDS
+            if getattr(observation, k) is not None
+        }
+        observation = dataclasses.replace(observation, **dict.fromkeys(arrays))
+        observation_bytes = pickle.dumps((observation, list(arrays)))
+        n_bytes = len(observation_bytes) + sum(v.nbytes for v in arrays.values())
+        if n_bytes > self.max_bytes:
+            return
+
+        tmp_dir = frame_dir.with_name(f"{frame_dir.name}.tmp{os.getpid()}")
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            for k, v in arrays.items():
+                np.save(tmp_dir / f"{k}.npy", np.ascontiguousarray(v))
+            (tmp_dir / "observation.pkl").write_bytes(observation_bytes)
+            os.rename(tmp_dir, frame_dir)
+        except OSError as e:
+            # Written by another process, or the cache is full.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not frame_dir.exists():
+                logger.warning(f"Could not cache the frame {frame_dir}: {e}")
+            return
+
+        self._n_writes += 1
+        if self._known_bytes is not None:
+            self._known_bytes += n_bytes
+        if (
+            self._known_bytes is None
+            or self._known_bytes > self.max_bytes
+            or self._n_writes % SCAN_INTERVAL == 0
+        ):
+            self.evict()
+
+    def _frame_dirs(self):
+        return [
+            path
+            for path in self.cache_dir.glob("*/*/*")
+            if path.is_dir() and ".tmp" not in path.name
+        ]
+
+    def evict(self) -> None:
+        """Removes the least recently used frames until the cache fits in max_bytes."""
+        frames = []
+        for frame_dir in self._frame_dirs():
+            try:
+                n_bytes = sum(path.stat().st_size for path in frame_dir.iterdir())
+                frames.append((frame_dir.stat().st_mtime, n_bytes, frame_dir))
+            except FileNotFoundError:
+                continue
+        total_bytes = sum(n_bytes for _, n_bytes, _ in frames)
+        for _, n_bytes, frame_dir in sorted(frames):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(frame_dir, ignore_errors=True)
+            total_bytes -= n_bytes
+        self._known_bytes = total_bytes
+
+    def size_bytes(self) -> int:
+        """Size of the frames in the cache."""
+        return sum(
+            path.stat().st_size
+            for frame_dir in self._frame_dirs()
+            for path in frame_dir.iterdir()
+        )
+
+    def clear(self) -> None:
+        """Removes the frames of the namespace."""
+        shutil.rmtree(self.cache_dir / self.namespace, ignore_errors=True)
+        self._known_bytes = None
@@ -33,8 +33,10 @@ import webdataset as wds
 
 # MegaPose
 import happypose.toolbox.utils.tensor_collection as tc
+from happypose.toolbox.datasets.frame_cache import FrameCache
 from happypose.toolbox.lib3d.transform import Transform
 from happypose.toolbox.utils.random import make_seed
+from happypose.toolbox.utils.rle_masks import RLEMasks
 from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
 from happypose.toolbox.utils.types import Resolution
 
@@ -64,6 +66,13 @@ SingleDataJsonType = Union[str, float, ListPose, int, ListBbox, Any]
 DataJsonType = Union[Dict[str, SingleDataJsonType], List[SingleDataJsonType]]
 
 
+def _binary_mask(mask: Union[np.ndarray, RLEMasks]) -> torch.Tensor:
+    """(h, w) float mask of a binary mask of SceneObservation.binary_masks."""
+    if isinstance(mask, RLEMasks):
+        return mask.decode()[0].float()
+    return torch.tensor(mask).float()
+
+
 def transform_to_list(T: Transform) -> ListPose:
     return [T.quaternion.coeffs().tolist(), T.translation.tolist()]
 
@@ -199,8 +208,8 @@ class SceneObservation:
     infos: Optional[ObservationInfos] = None
     object_datas: Optional[List[ObjectData]] = None
     camera_data: Optional[CameraData] = None
-    # dict mapping unique id to (h, w) np.bool_
-    binary_masks: Optional[Dict[int, np.ndarray]] = None
+    # dict mapping unique id to (h, w) np.bool_, or to the RLEMasks of one mask
+    binary_masks: Optional[Dict[int, Union[np.ndarray, RLEMasks]]] = None
 
     def __iter__(self):
         masks = []
@@ -209,7 +218,7 @@ class SceneObservation:
         rgb = obs.rgb
         for _n, obj_data in enumerate(obs.object_datas):
             if obs.binary_masks is not None:
-                binary_mask = torch.tensor(obs.binary_masks[obj_data.unique_id]).float()
+                binary_mask = _binary_mask(obs.binary_masks[obj_data.unique_id])
                 masks.append(binary_mask)
 
             if obs.segmentation is not None:
@@ -229,12 +238,14 @@ class SceneObservation:
     def collate_fn(
         batch: List[SceneObservation],
         object_labels: Optional[List[str]] = None,
+        rle_masks: bool = False,
     ) -> Dict[Any, Any]:
         """Collate a batch of SceneObservation objects.
 
         Args:
         ----
             object_labels: If passed in parse only those object labels.
+            rle_masks: If True, the masks of the objects are RLEMasks.
 
         Returns:
         -------
@@ -287,7 +298,10 @@ class SceneObservation:
 
             depth_images.append(depth)
 
-            gt_data_ = data.as_pandas_tensor_collection(object_labels=object_labels)
+            gt_data_ = data.as_pandas_tensor_collection(
+                object_labels=object_labels,
+                rle_masks=rle_masks,
+            )
             gt_data_.infos["batch_im_id"] = batch_im_id  # Add batch_im_id
             gt_data.append(gt_data_)
 
@@ -326,8 +340,14 @@ class SceneObservation:
     def as_pandas_tensor_collection(
         self,
         object_labels: Optional[List[str]] = None,
+        rle_masks: bool = False,
     ) -> SceneObservationTensorCollection:
-        """Convert SceneData to a PandasTensorCollection representation."""
+        """Convert SceneData to a PandasTensorCollection representation.
+
+        With rle_masks, the masks of the objects are RLEMasks encoded from
+        the binary masks or the segmentation, the (h, w) float masks of the
+        objects are not created.
+        """
         obs = self
 
         assert obs.camera_data is not None
@@ -337,6 +357,7 @@ class SceneObservation:
         TWO = []
         bboxes = []
         masks = []
+        unique_ids = []
         TWC = torch.as_tensor(obs.camera_data.TWC.matrix).float()
 
         TWO_init = []
@@ -356,12 +377,13 @@ class SceneObservation:
             infos.append(info)
             TWO.append(torch.tensor(obj_data.TWO.matrix).float())
             bboxes.append(torch.tensor(obj_data.bbox_modal).float())
+            unique_ids.append(obj_data.unique_id)
 
-            if obs.binary_masks is not None:
-                binary_mask = torch.tensor(obs.binary_masks[obj_data.unique_id]).float()
+            if obs.binary_masks is not None and not rle_masks:
+                binary_mask = _binary_mask(obs.binary_masks[obj_data.unique_id])
                 masks.append(binary_mask)
 
-            if obs.segmentation is not None:
+            if obs.segmentation is not None and not rle_masks:
                 binary_mask = np.zeros_like(obs.segmentation, dtype=np.bool_)
                 binary_mask[obs.segmentation == obj_data.unique_id] = 1
                 binary_mask = torch.as_tensor(binary_mask).float()
@@ -371,7 +393,9 @@ class SceneObservation:
                 TWO_init.append(torch.tensor(obj_data.TWO_init.matrix).float())
 
         infos = pd.DataFrame(infos)
-        if len(masks) > 0:
+        if rle_masks:
+            masks = obs.get_rle_masks(unique_ids)
+        elif len(masks) > 0:
             masks = torch.stack(masks)
         else:
             masks = None
@@ -412,6 +436,23 @@ class SceneObservation:
             data.register_tensor("poses_init", TCO_init)
         return data
 
+    def get_rle_masks(self, unique_ids: List[int]) -> Optional[RLEMasks]:
+        """RLEMasks of the objects unique_ids.
+
+        From the binary masks if there are, else from the segmentation.
+        """
+        if self.binary_masks is not None and len(unique_ids) > 0:
+            masks = [self.binary_masks[unique_id] for unique_id in unique_ids]
+            return RLEMasks.concatenate(
+                [
+                    mask if isinstance(mask, RLEMasks) else RLEMasks.encode(mask[None])
+                    for mask in masks
+                ],
+            )
+        if self.segmentation is not None:
+            return RLEMasks.from_segmentation(self.segmentation, unique_ids)
+        return None
+
 
 class SceneDataset(torch.utils.data.Dataset):
     def __init__(
@@ -432,10 +473,14 @@ class SceneDataset(torch.utils.data.Dataset):
             load_segmentation (bool, optional): Whether to load image segmentation.
             Defaults to True.
             Defaults to f'{label}'.
+
+        The decoded observations can be cached by setting `frame_cache`
+        to a FrameCache.
         """
         self.frame_index = frame_index
         self.load_depth = load_depth
         self.load_segmentation = load_segmentation
+        self.frame_cache: Optional[FrameCache] = None
 
     def _load_scene_observation(
         self,
@@ -443,11 +488,26 @@ class SceneDataset(torch.utils.data.Dataset):
     ) -> SceneObservation:
         raise NotImplementedError
 
+    def _frame_cache_options(self) -> Dict[str, Any]:
+        """Options of the dataset that change the observations, see FrameCache."""
+        return {
+            "class": type(self).__name__,
+            "load_depth": self.load_depth,
+            "load_segmentation": self.load_segmentation,
+        }
+
     def __getitem__(self, idx: int) -> SceneObservation:
         assert self.frame_index is not None
         row = self.frame_index.iloc[idx]
         infos = ObservationInfos(scene_id=row.scene_id, view_id=row.view_id)
-        return self._load_scene_observation(infos)
+        if self.frame_cache is None:
+            return self._load_scene_observation(infos)
+        options = self._frame_cache_options()
+        observation = self.frame_cache.get(options, infos.scene_id, infos.view_id)
+        if observation is None:
+            observation = self._load_scene_observation(infos)
+            self.frame_cache.put(options, observation)
+        return observation
 
     def __len__(self) -> int:
         assert self.frame_index is not None
@@ -0,0 +1,169 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import inspect
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.inference.types import ObservationTensor, PoseEstimatesType
+from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
+
+# Fields of the refiner outputs collected in the predictions.
+REFINER_OUTPUT_FIELDS = {
+    "poses": "TCO_output",
+    "poses_input": "TCO_input",
+    "K_crop": "K_crop",
+    "K": "K",
+    "boxes_rend": "boxes_rend",
+    "boxes_crop": "boxes_crop",
+}
+
+
+def pose_update_magnitude(
+    TCO_input: torch.Tensor,
+    TCO_output: torch.Tensor,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Angle (rad) and translation norm (m) of the updates TCO_input -> TCO_output."""
+    R_update = TCO_input[:, :3, :3].transpose(1, 2) @ TCO_output[:, :3, :3]
+    cos_angle = (R_update.diagonal(dim1=1, dim2=2).sum(-1) - 1) / 2
+    angle = torch.acos(cos_angle.clamp(-1.0, 1.0))
+    translation = (TCO_output[:, :3, 3] - TCO_input[:, :3, 3]).norm(dim=-1)
+    return angle, translation
+
+
+@dataclass
+class RefinerConvergence:
+    """Convergence criterion of the refiner, used to stop refining objects early.
+
+    An object is converged when the pose update of its last refiner
+    iteration is below both thresholds.
+
+    rotation_deg: threshold on the angle of the rotation update, in degrees.
+    translation: threshold on the norm of the translation update, in meters.
+    """
+
+    rotation_deg: float = 0.5
+    translation: float = 0.002
+
+    def is_converged(
+        self,
+        TCO_input: torch.Tensor,
+        TCO_output: torch.Tensor,
+    ) -> torch.Tensor:
+        angle, translation = pose_update_magnitude(TCO_input, TCO_output)
+        return (angle < math.radians(self.rotation_deg)) & (
+            translation < self.translation
+        )
+
+
+def forward_refiner_early_exit(
+    refiner_model: torch.nn.Module,
+    observation: ObservationTensor,
+    data_TCO_input: PoseEstimatesType,
+    n_iterations: int,
+    convergence: RefinerConvergence,
+    bsz_objects: int = 8,
+    keep_all_outputs: bool = False,
+    **refiner_kwargs: Any,
+) -> Tuple[Dict[str, PoseEstimatesType], List[Dict[str, Any]]]:
+    """Runs the refiner, removing the converged objects from the next iterations.
+
+    The refiner runs one iteration at a time on the objects that are not
+    converged yet, in batches of bsz_objects. The predictions of each
+    iteration contain all the objects, converged objects keep the outputs of
+    their last iteration. The number of iterations of each object is stored
+    in the 'n_refiner_iterations' column of the infos.
+
+    If the forward of the refiner_model takes image_ids (megapose), the crops
+    are taken from the unique images of the observation, otherwise (cosypose)
+    the images are replicated for each object of the batch.
+
+    Returns
+    -------
+        (preds, all_outputs)
+
+        preds: A dict with keys 'iteration={n}' for n=1,...,n_iterations.
+        all_outputs: the outputs of the refiner of each batch, only if
+            keep_all_outputs is True.
+    """
+    B = len(data_TCO_input)
+    if B == 0:
+        return {}, []
+    device = observation.images.device
+    infos = data_TCO_input.infos.copy()
+    infos["refiner_batch_idx"] = np.arange(B) // bsz_objects
+    infos["refiner_instance_idx"] = np.arange(B) % bsz_objects
+    labels = infos["label"].to_numpy()
+    batch_im_ids = torch.as_tensor(
+        infos["batch_im_id"].to_numpy(copy=True),
+        device=device,
+    )
+
+    use_image_ids = "image_ids" in inspect.signature(refiner_model.forward).parameters
+
+    outputs: Dict[str, torch.Tensor] = {}
+    iter_outputs: List[Dict[str, torch.Tensor]] = []
+    all_outputs = []
+    n_object_iterations = np.zeros(B, dtype=int)
+    active_ids = torch.arange(B, device=device)
+    TCO = data_TCO_input.poses
+    for n in range(1, n_iterations + 1):
+        for batch_ids in active_ids.split(bsz_objects):
+            if use_image_ids:
+                images_kwargs = {
+                    "images": observation.images,
+                    "image_ids": batch_im_ids[batch_ids],
+                }
+            else:
+                images_kwargs = {"images": observation.images[batch_im_ids[batch_ids]]}
+            outputs_ = refiner_model(
+                **images_kwargs,
+                K=observation.K[batch_im_ids[batch_ids]],
+                TCO=TCO[batch_ids],
+                n_iterations=1,
+                labels=labels[batch_ids.cpu().numpy()].tolist(),
+                **refiner_kwargs,
+            )
+            if keep_all_outputs:
+                all_outputs.append({f"iteration={n}": outputs_["iteration=1"]})
+            for k, field in REFINER_OUTPUT_FIELDS.items():
+                v = getattr(outputs_["iteration=1"], field)
+                if k not in outputs:
+                    outputs[k] = v.new_empty((B, *v.shape[1:]))
+                outputs[k][batch_ids] = v
+
+        if len(active_ids) > 0:
+            n_object_iterations[active_ids.cpu().numpy()] += 1
+            converged = convergence.is_converged(
+                outputs["poses_input"][active_ids],
+                outputs["poses"][active_ids],
+            )
+            active_ids = active_ids[~converged]
+        TCO = outputs["poses"]
+        iter_outputs.append({k: v.clone() for k, v in outputs.items()})
+
+    infos["n_refiner_iterations"] = n_object_iterations
+    preds = {
+        f"iteration={n}": PandasTensorCollection(infos, **iter_outputs_)
+        for n, iter_outputs_ in enumerate(iter_outputs, start=1)
+    }
+    return preds, all_outputs
@@ -0,0 +1,84 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+from dataclasses import dataclass
+from typing import Optional
+
+# Third Party
+import torch
+
+PRECISION_DTYPES = {
+    "fp32": None,
+    "bf16": torch.bfloat16,
+    "fp16": torch.float16,
+}
+
+
+@dataclass
+class InferencePrecision:
+    """Numerical precision and memory format of the backbones at inference.
+
+    dtype: 'fp32', 'bf16' or 'fp16'. With 'bf16' or 'fp16', the backbone runs
+        under autocast and its features are cast back to float32 before the
+        network heads. 'fp16' should only be used on GPU.
+    channels_last: use the channels_last memory format in the backbone.
+    compile: compile the backbone with torch.compile.
+    """
+
+    dtype: str = "fp32"
+    channels_last: bool = False
+    compile: bool = False
+
+    def __post_init__(self) -> None:
+        if self.dtype not in PRECISION_DTYPES:
+            msg = f"Unknown precision {self.dtype}, use one of {list(PRECISION_DTYPES)}"
+            raise ValueError(msg)
+
+    @property
+    def autocast_dtype(self) -> Optional[torch.dtype]:
+        return PRECISION_DTYPES[self.dtype]
+
+
+def configure_backbone(
+    backbone: torch.nn.Module,
+    precision: InferencePrecision,
+) -> None:
+    """Converts the backbone weights in-place for the given precision.
+
+    Only the memory format and compilation are changed, the weights are kept
+    in float32 as autocast handles the casts.
+    """
+    if precision.channels_last:
+        backbone.to(memory_format=torch.channels_last)
+    if precision.compile:
+        # Compiles in-place, the state_dict keys are unchanged.
+        backbone.compile()
+
+
+def run_backbone(
+    backbone: torch.nn.Module,
+    x: torch.Tensor,
+    precision: InferencePrecision,
+) -> torch.Tensor:
+    """Runs the backbone on x with the given precision, returns float32 features."""
+    if precision.channels_last and x.dim() == 4:
+        x = x.contiguous(memory_format=torch.channels_last)
+    dtype = precision.autocast_dtype
+    if dtype is None:
+        return backbone(x)
+    with torch.autocast(device_type=x.device.type, dtype=dtype):
+        x = backbone(x)
+    return x.float()
@@ -0,0 +1,118 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+from typing import Optional, Sequence, Union
+
+# Third Party
+import numpy as np
+import torch
+
+# MegaPose
+from happypose.toolbox.inference.types import PoseEstimatesType
+from happypose.toolbox.lib3d.camera_geometry import (
+    boxes_from_uv,
+    project_points_robust,
+)
+from happypose.toolbox.lib3d.rigid_mesh_database import BatchedMeshes
+from happypose.toolbox.utils.rle_masks import RLEMasks
+from happypose.toolbox.utils.tensor_collection import get_group_ids, segmented_top_k
+
+
+def elementwise_box_iou(boxes_a: torch.Tensor, boxes_b: torch.Tensor) -> torch.Tensor:
+    """IoU of the pairs of boxes (x1, y1, x2, y2) boxes_a[n], boxes_b[n]."""
+    x1y1 = torch.max(boxes_a[:, :2], boxes_b[:, :2])
+    x2y2 = torch.min(boxes_a[:, 2:], boxes_b[:, 2:])
+    inter = (x2y2 - x1y1).clamp(min=0).prod(dim=-1)
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).clamp(min=0).prod(dim=-1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).clamp(min=0).prod(dim=-1)
+    return inter / (area_a + area_b - inter).clamp(min=1e-6)
+
+
+def compute_hypotheses_agreement(
+    data_TCO: PoseEstimatesType,
+    K: torch.Tensor,
+    mesh_db: BatchedMeshes,
+    masks: Optional[Union[torch.Tensor, RLEMasks]] = None,
+    n_points: int = 200,
+) -> torch.Tensor:
+    """Agreement of the pose hypotheses with their detection, in [0, 1].
+
+    The mesh points are projected with the pose of each hypothesis. The
+    agreement is the IoU of the box of the projected points with the
+    detection box data_TCO.bboxes. If the detection masks are given, it is
+    multiplied by the fraction of the projected points that fall inside the
+    mask of the detection data_TCO.infos['bbox_id'].
+
+    Args:
+    ----
+        K: [n_images,3,3] intrinsics of the images of data_TCO.infos['batch_im_id'].
+        masks: [n_detections,H,W] boolean masks of the detections, or RLEMasks.
+    """
+    df = data_TCO.infos
+    points = mesh_db.select(df["label"].tolist()).sample_points(
+        n_points,
+        deterministic=True,
+    )
+    batch_im_ids = torch.as_tensor(df["batch_im_id"].to_numpy(copy=True))
+    uv = project_points_robust(points, K[batch_im_ids.to(K.device)], data_TCO.poses)
+    agreement = elementwise_box_iou(boxes_from_uv(uv), data_TCO.bboxes.float())
+    if masks is not None:
+        H, W = masks.shape[-2:]
+        uv = uv.round().long()
+        inside = (uv[..., 0] >= 0) & (uv[..., 0] < W) & (uv[..., 1] >= 0)
+        inside &= uv[..., 1] < H
+        u = uv[..., 0].clamp(0, W - 1)
+        v = uv[..., 1].clamp(0, H - 1)
+        bbox_ids = torch.as_tensor(df["bbox_id"].to_numpy(copy=True))
+        mask_ids = bbox_ids.to(masks.device).unsqueeze(-1).expand_as(u)
+        if isinstance(masks, RLEMasks):
+            in_mask = masks.contains(mask_ids, v, u) & inside
+        else:
+            in_mask = masks[mask_ids, v, u].bool() & inside
+        agreement = agreement * in_mask.float().mean(dim=-1)
+    return agreement
+
+
+def prune_pose_hypotheses(
+    data_TCO: PoseEstimatesType,
+    K: torch.Tensor,
+    mesh_db: BatchedMeshes,
+    threshold: float,
+    group_cols: Sequence[str] = ("batch_im_id", "label", "instance_id"),
+    masks: Optional[Union[torch.Tensor, RLEMasks]] = None,
+    n_points: int = 200,
+) -> PoseEstimatesType:
+    """Removes the hypotheses that do not agree with their detection.
+
+    The hypotheses with an agreement (see `compute_hypotheses_agreement`)
+    below the threshold are removed, but the best hypothesis of each
+    instance (group of group_cols) is always kept. The agreement is stored
+    in the column 'hypothesis_agreement'.
+    """
+    agreement = compute_hypotheses_agreement(
+        data_TCO,
+        K,
+        mesh_db,
+        masks=masks,
+        n_points=n_points,
+    ).cpu()
+    group_ids = torch.from_numpy(get_group_ids(data_TCO.infos, list(group_cols)))
+    keep = agreement >= threshold
+    keep[segmented_top_k(agreement.double(), group_ids, top_K=1)] = True
+    ids = np.flatnonzero(keep.numpy())
+    data_TCO_pruned = data_TCO[ids.tolist()]
+    data_TCO_pruned.infos["hypothesis_agreement"] = agreement.numpy()[ids]
+    return data_TCO_pruned
@@ -45,6 +45,8 @@ infos: pd.DataFrame with (at least) fields
         correct batch for the refiner outputs
     - 'refiner_instance_idx', Optional[int], used to index into
         refiner outputs such as "image_crop", "render_crop", etc.
+    - 'n_refiner_iterations', Optional[int], number of refiner iterations
+        of this estimate when the refiner stops at convergence.
     - 'scene_id', Optional[str] used to identify predictions on a dataset.
     - 'view_id', Optional[str] used to identify predictions on a dataset.
 Tensors:
@@ -49,8 +49,16 @@ from happypose.toolbox.datasets.scene_dataset import CameraData, ObjectData
 from happypose.toolbox.inference.types import DetectionsType, PoseEstimatesType
 from happypose.toolbox.lib3d.rigid_mesh_database import BatchedMeshes, MeshDataBase
 from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.render_service import (
+    RENDER_PRIORITY_COARSE,
+    RENDER_PRIORITY_REFINER,
+    RenderHandle,
+    get_render_service,
+)
+from happypose.toolbox.renderer.software_batch_renderer import SoftwareBatchRenderer
 from happypose.toolbox.utils.logging import get_logger
 from happypose.toolbox.utils.models_compat import change_keys_of_older_models
+from happypose.toolbox.utils.rle_masks import RLEMasks
 from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
 
 logger = get_logger(__name__)
@@ -88,11 +96,24 @@ def load_pose_models(
     force_panda3d_renderer: bool = False,
     renderer_kwargs: Optional[Dict] = None,
     models_root: Path = EXP_DIR,
+    use_render_service: bool = False,
+    renderer_type: Optional[str] = None,
 ) -> Tuple[
     torch.nn.Module,
     torch.nn.Module,
     BatchedMeshes,
 ]:
+    """Loads the coarse and refiner models.
+
+    With `use_render_service`, the models render with handles of the
+    render service of the process (see `get_render_service`), whose
+    workers are shared with the other models using the same objects.
+    The service is replaced by loading models with other objects only
+    once the models using it are released.
+    `renderer_type` overrides the renderer of the models' configs, use
+    "software" to render without OpenGL (see `SoftwareBatchRenderer`),
+    `renderer_kwargs` are then passed to the `SoftwareBatchRenderer`.
+    """
     coarse_run_dir = models_root / coarse_run_id
     coarse_cfg: TrainingConfig = load_cfg(coarse_run_dir / "config.yaml")
     coarse_cfg = check_update_config_pose(coarse_cfg)
@@ -102,7 +123,7 @@ def load_pose_models(
     refiner_cfg = check_update_config_pose(refiner_cfg)
 
     # TODO: Handle loading older cosypose models with bullet renderer.
-    assert force_panda3d_renderer
+    assert force_panda3d_renderer or renderer_type is not None
 
     logger.debug("Creating MeshDatabase")
     mesh_db = MeshDataBase.from_object_ds(object_dataset)
@@ -128,11 +149,40 @@ def load_pose_models(
             raise ValueError(renderer_type)
         return renderer
 
-    coarse_renderer = make_renderer(coarse_cfg.renderer)
-    if refiner_cfg.renderer == coarse_cfg.renderer:
+    def make_render_handle(renderer_type: str, priority: int) -> RenderHandle:
+        if renderer_type != "panda3d" and not force_panda3d_renderer:
+            raise ValueError(renderer_type)
+        renderer_kwargs_ = dict(renderer_kwargs) if renderer_kwargs else {}
+        renderer_kwargs_.setdefault("n_workers", 4)
+        renderer_kwargs_.setdefault("preload_cache", False)
+        service = get_render_service(object_dataset, **renderer_kwargs_)
+        return service.get_handle(priority)
+
+    coarse_renderer_type = renderer_type or coarse_cfg.renderer
+    refiner_renderer_type = renderer_type or refiner_cfg.renderer
+    if renderer_type == "software":
+        # The images are rasterized in the calling process,
+        # there are no render workers to share.
+        coarse_renderer = SoftwareBatchRenderer(
+            asset_dataset=object_dataset,
+            **(renderer_kwargs or {}),
+        )
         refiner_renderer = coarse_renderer
+    elif use_render_service:
+        coarse_renderer = make_render_handle(
+            coarse_renderer_type,
+            RENDER_PRIORITY_COARSE,
+        )
+        refiner_renderer = make_render_handle(
+            refiner_renderer_type,
+            RENDER_PRIORITY_REFINER,
+        )
     else:
-        refiner_renderer = make_renderer(refiner_cfg.renderer)
+        coarse_renderer = make_renderer(coarse_renderer_type)
+        if refiner_renderer_type == coarse_renderer_type:
+            refiner_renderer = coarse_renderer
+        else:
+            refiner_renderer = make_renderer(refiner_renderer_type)
 
     mesh_db_batched = mesh_db.batched().to(device)
 
@@ -172,14 +222,8 @@ def add_instance_id(
     if "instance_id" in inputs.infos:
         return inputs
 
-    def create_instance_id(df: pd.DataFrame) -> pd.DataFrame:
-        df["instance_id"] = np.arange(len(df))
-        return df
-
     df = inputs.infos
-    df = df.groupby(["batch_im_id", "label"], group_keys=False).apply(
-        lambda df: create_instance_id(df), include_groups=True
-    )
+    df["instance_id"] = df.groupby(["batch_im_id", "label"]).cumcount()
     inputs.infos = df
     return inputs
 
@@ -206,6 +250,122 @@ def filter_detections(
     return detections
 
 
+def _select_masks(masks: torch.Tensor, ids: torch.Tensor) -> torch.Tensor:
+    """`masks[ids, 0]` of (n, 1, H, W) masks, a view when the ids are a range."""
+    if len(ids) > 0 and torch.equal(ids, torch.arange(ids[0], ids[0] + len(ids))):
+        return masks[ids[0] : ids[0] + len(ids), 0]
+    return masks[ids, 0]
+
+
+def make_detections_from_model_outputs(
+    outputs: List[Dict[str, torch.Tensor]],
+    category_id_to_label: Dict[int, str],
+    detection_th: Optional[float] = None,
+    output_masks: bool = False,
+    mask_th: float = 0.8,
+    one_instance_per_class: bool = False,
+    device: torch.device = device,
+    rle_masks: bool = False,
+) -> DetectionsType:
+    """Detections of the outputs of a Mask R-CNN on a batch of images.
+
+    The outputs of all the images are processed together: the thresholding,
+    the lookup of the labels in a table indexed by category id and the
+    selection of the best detection of each label and image (a segmented
+    max of the scores) are done on the tensors, and the masks of the kept
+    detections are thresholded image per image.
+
+    Args:
+    ----
+        outputs: outputs of the model for each image, with `boxes` (n, 4),
+            `labels` (n,) category ids, `scores` (n,) and `masks` (n, 1, H, W).
+        category_id_to_label: label of each category id.
+        rle_masks: store the masks as `RLEMasks`, encoded image per image
+            without allocating the (N, H, W) masks.
+
+    Returns
+    -------
+        detections with the columns `batch_im_id`, `label`, `score` and
+        `instance_id`, the `bboxes` (xmin, ymin, xmax, ymax) and the (N, H, W)
+        bool `masks` with `output_masks=True`, on `device` (or `RLEMasks`).
+    """
+    n_detections = torch.tensor([len(outputs_n["boxes"]) for outputs_n in outputs])
+    batch_im_ids = torch.repeat_interleave(torch.arange(len(outputs)), n_detections)
+    scores = torch.cat([outputs_n["scores"].cpu() for outputs_n in outputs])
+    category_ids = torch.cat([outputs_n["labels"].cpu() for outputs_n in outputs])
+
+    keep = torch.ones(len(scores), dtype=torch.bool)
+    if detection_th is not None:
+        keep = scores > detection_th
+    if one_instance_per_class:
+        # Best detection of each category in each image.
+        _, group_ids = torch.unique(
+            torch.stack([batch_im_ids, category_ids], -1),
+            dim=0,
+            return_inverse=True,
+        )
+        group_ids = torch.where(keep, group_ids, -1)
+        ids = tc.segmented_top_k(scores, group_ids, 1)
+    else:
+        ids = torch.nonzero(keep)[:, 0]
+
+    label_table = np.full(max(category_id_to_label, default=0) + 1, None, dtype=object)
+    label_table[list(category_id_to_label.keys())] = list(category_id_to_label.values())
+    category_ids = category_ids[ids].numpy()
+    is_known = category_ids < len(label_table)
+    labels = label_table[np.where(is_known, category_ids, 0)]
+    if not is_known.all() or pd.isna(labels).any():
+        unknown = set(category_ids.tolist()) - set(category_id_to_label)
+        raise KeyError(f"Unknown category ids {sorted(unknown)}")
+    infos = pd.DataFrame(
+        {
+            "batch_im_id": batch_im_ids[ids].numpy(),
+            "label": labels,
+            "score": scores[ids].numpy().astype(np.float64),
+        },
+    )
+    boxes = torch.cat([outputs_n["boxes"].cpu() for outputs_n in outputs])
+    detections = tc.PandasTensorCollection(
+        infos=infos,
+        bboxes=boxes[ids].to(device).float(),
+    )
+    if output_masks:
+        # Positions of the kept detections in the outputs of each image.
+        order = torch.sort(batch_im_ids[ids], stable=True).indices
+        first_ids = torch.cumsum(n_detections, 0) - n_detections
+        image_ids = ids[order].split(
+            torch.bincount(batch_im_ids[ids], minlength=len(outputs)).tolist(),
+        )
+        if rle_masks:
+            masks = RLEMasks.concatenate(
+                [
+                    RLEMasks.encode(
+                        _select_masks(outputs[n]["masks"], ids_n - first_ids[n])
+                        > mask_th,
+                    )
+                    for n, ids_n in enumerate(image_ids)
+                ],
+            )
+        else:
+            # The masks are thresholded in place, to avoid copies of the masks.
+            masks = torch.empty(
+                (len(ids), *outputs[0]["masks"].shape[-2:]),
+                dtype=torch.bool,
+                device=outputs[0]["masks"].device,
+            )
+            start = 0
+            for n, ids_n in enumerate(image_ids):
+                end = start + len(ids_n)
+                masks_n = _select_masks(outputs[n]["masks"], ids_n - first_ids[n])
+                torch.gt(masks_n, mask_th, out=masks[start:end])
+                start = end
+        if not torch.equal(order, torch.arange(len(order))):
+            masks = masks[torch.argsort(order)]
+        masks = masks.to(device)
+        detections.register_tensor("masks", masks)
+    return add_instance_id(detections)
+
+
 def make_cameras(camera_data: List[CameraData]) -> PandasTensorCollection:
     """Creates a PandasTensorCollection from list of camera data.
 
@@ -75,6 +75,14 @@ def deepim_boxes(
     return boxes
 
 
+def get_roi_image_ids(batch_size, image_ids=None, device=None):
+    """First column of the roi_align boxes, the index of the image of each box."""
+    if image_ids is None:
+        image_ids = torch.arange(batch_size)
+    assert image_ids.shape == (batch_size,)
+    return image_ids.to(device).float().unsqueeze(1)
+
+
 def deepim_crops(
     images,
     obs_boxes,
@@ -83,8 +91,15 @@ def deepim_crops(
     O_vertices,
     output_size=None,
     lamb=1.4,
+    image_ids=None,
 ):
-    batch_size, _, h, w = images.shape
+    """Crops of the images around the objects in poses TCO_pred.
+
+    If image_ids is given, images contains the unique images and the crop n
+    is taken from images[image_ids[n]], otherwise from images[n].
+    """
+    _, _, h, w = images.shape
+    batch_size = TCO_pred.shape[0]
     device = images.device
     if output_size is None:
         output_size = (h, w)
@@ -103,7 +118,7 @@ def deepim_crops(
         lamb=lamb,
     )
     boxes = torch.cat(
-        (torch.arange(batch_size).unsqueeze(1).to(device).float(), boxes),
+        (get_roi_image_ids(batch_size, image_ids, device), boxes),
         dim=1,
     )
     crops = crop_images(images, boxes, output_size=output_size, sampling_ratio=4)
@@ -120,8 +135,10 @@ def deepim_crops_robust(
     output_size=None,
     lamb=1.4,
     return_crops=True,
+    image_ids=None,
 ):
-    batch_size, _, h, w = images.shape
+    """Same as deepim_crops, using the reference point tCR_in as crop center."""
+    _, _, h, w = images.shape
     batch_size = TCO_pred.shape[0]
     device = images.device
     if output_size is None:
@@ -143,7 +160,7 @@ def deepim_crops_robust(
         lamb=lamb,
     )
     boxes = torch.cat(
-        (torch.arange(batch_size).unsqueeze(1).to(device).float(), boxes),
+        (get_roi_image_ids(batch_size, image_ids, device), boxes),
         dim=1,
     )
     crops = None
@@ -156,8 +173,9 @@ def crop_images(images, boxes, output_size, sampling_ratio):
     """Crop RGB/RGBD images.
 
     Properly handles using roi_align with a depth image (which contains invalid pixels)
+    boxes: [N,5], the first column is the index of the image in images.
     """
-    batch_size, nchannels, h, w = images.shape
+    _, nchannels, h, w = images.shape
     assert nchannels in [3, 4]  # doesn't handle grayscale currently
     has_depth = nchannels == 4
 
@@ -0,0 +1,408 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+# Third Party
+import numpy as np
+import torch
+import trimesh
+from PIL import Image
+
+# MegaPose
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Number of faces of the decimated levels, the level 0 is the original mesh.
+DEFAULT_LOD_N_FACES = (32000, 8000, 2000)
+# Changing the decimation invalidates the cached levels.
+_LOD_VERSION = 1
+
+
+@dataclass
+class MeshLevel:
+    """A level of detail of a mesh.
+
+    mesh_path: path of the mesh, in the units of the original mesh.
+    n_faces: number of faces of the mesh.
+    """
+
+    mesh_path: Path
+    n_faces: int
+
+
+def get_mesh_texture(visual: trimesh.visual.ColorVisuals) -> Optional[Image.Image]:
+    """Texture image of a mesh, None if the mesh is not textured.
+
+    trimesh replaces the textures it cannot load by a 2x2 placeholder,
+    which is also considered as no texture (panda3d renders these meshes in
+    white).
+    """
+    if visual.kind != "texture" or visual.uv is None:
+        return None
+    image = getattr(visual.material, "image", None)
+    placeholder = trimesh.visual.material.empty_material().image
+    if image is None or image.tobytes() == placeholder.tobytes():
+        return None
+    return image
+
+
+def _grid_cells(vertices: np.ndarray, cell_size: float) -> np.ndarray:
+    """Index of the cell of a regular grid of each vertex, from 0 to n_cells."""
+    cells = np.floor((vertices - vertices.min(0)) / cell_size).astype(np.int64)
+    dims = cells.max(0) + 1
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    return np.unique(keys, return_inverse=True)[1].reshape(-1)
+
+
+def _unique_rows(rows: np.ndarray) -> np.ndarray:
+    """Indices of the first occurrence of each of the unique (n, 3) int rows."""
+    n = int(rows.max()) + 1 if len(rows) > 0 else 1
+    if n < 2**21:
+        keys = (rows[:, 0] * n + rows[:, 1]) * n + rows[:, 2]
+        return np.unique(keys, return_index=True)[1]
+    return np.unique(rows, axis=0, return_index=True)[1]
+
+
+def _cluster_faces(faces: np.ndarray, cell_ids: np.ndarray) -> np.ndarray:
+    """Indices of the faces that remain when the vertices of each cell are merged.
+
+    The faces whose vertices are not in three different cells are removed,
+    as well as the duplicates of a face.
+    """
+    faces = cell_ids[faces]
+    keep = np.flatnonzero(
+        (faces[:, 0] != faces[:, 1])
+        & (faces[:, 1] != faces[:, 2])
+        & (faces[:, 0] != faces[:, 2]),
+    )
+    unique = _unique_rows(np.sort(faces[keep], axis=1))
+    return keep[np.sort(unique)]
+
+
+def _bincount_mean(ids: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Mean of the (N, D) values of each of the n groups of ids."""
+    counts = np.maximum(np.bincount(ids, minlength=n), 1)
+    sums = [np.bincount(ids, values[:, d], minlength=n) for d in range(values.shape[1])]
+    return np.stack(sums, axis=-1) / counts[:, None]
+
+
+def decimate_mesh(
+    mesh: trimesh.Trimesh,
+    n_faces: int,
+    uv_cell_size: float = 1 / 64,
+    n_iterations: int = 20,
+) -> trimesh.Trimesh:
+    """Simplifies a mesh to at most `n_faces` faces, by vertex clustering.
+
+    The vertices are merged in the cells of a regular grid, whose size is
+    found by bisection. Each cell is represented by its vertex closest to the
+    mean of the cell, so that the simplified surface stays on the original
+    one, with the mean of the vertex normals (and vertex colors) of the cell.
+    For textured meshes, the merged vertices are split along the texture
+    seams (vertices of a cell whose texture coordinates are further than
+    `uv_cell_size`) and keep the same texture.
+    """
+    vertices = np.asarray(mesh.vertices, dtype=np.float64)
+    faces = np.asarray(mesh.faces, dtype=np.int64)
+    if len(faces) <= n_faces:
+        return mesh.copy()
+
+    # The number of faces decreases with the size of the cells.
+    diagonal = float(np.linalg.norm(vertices.max(0) - vertices.min(0)))
+    log_low, log_high = np.log(diagonal * 2**-16), np.log(diagonal)
+    cell_ids = _grid_cells(vertices, diagonal)
+    face_ids = _cluster_faces(faces, cell_ids)
+    for _ in range(n_iterations):
+        log_size = (log_low + log_high) / 2
+        cell_ids_ = _grid_cells(vertices, float(np.exp(log_size)))
+        face_ids_ = _cluster_faces(faces, cell_ids_)
+        if len(face_ids_) <= n_faces:
+            log_high = log_size
+            cell_ids, face_ids = cell_ids_, face_ids_
+        else:
+            log_low = log_size
+
+    n_cells = int(cell_ids.max()) + 1
+    means = _bincount_mean(cell_ids, vertices, n_cells)
+    distances = np.linalg.norm(vertices - means[cell_ids], axis=-1)
+    order = np.lexsort((distances, cell_ids))
+    representatives = order[np.searchsorted(cell_ids[order], np.arange(n_cells))]
+    normals = _bincount_mean(cell_ids, np.asarray(mesh.vertex_normals), n_cells)
+    normals /= np.maximum(np.linalg.norm(normals, axis=-1, keepdims=True), 1e-12)
+
+    texture = get_mesh_texture(mesh.visual)
+    if texture is not None:
+        uvs = np.asarray(mesh.visual.uv, dtype=np.float64)
+        uv_cells = np.floor(uvs / uv_cell_size).astype(np.int64)
+        keys = np.stack([cell_ids, uv_cells[:, 0], uv_cells[:, 1]], axis=-1)
+        _, vertex_ids = np.unique(keys, axis=0, return_inverse=True)
+        vertex_ids = vertex_ids.reshape(-1)
+    else:
+        vertex_ids = cell_ids
+    n_vertices = int(vertex_ids.max()) + 1
+    vertex_cells = np.zeros(n_vertices, dtype=np.int64)
+    vertex_cells[vertex_ids] = cell_ids
+
+    if texture is not None:
+        visual = trimesh.visual.TextureVisuals(
+            uv=_bincount_mean(vertex_ids, uvs, n_vertices),
+            image=texture,
+        )
+    elif mesh.visual.kind == "vertex":
+        colors = np.asarray(mesh.visual.vertex_colors, dtype=np.float64)
+        colors = _bincount_mean(vertex_ids, colors, n_vertices)
+        visual = trimesh.visual.ColorVisuals(vertex_colors=colors.round())
+    else:
+        visual = None
+    return trimesh.Trimesh(
+        vertices=vertices[representatives][vertex_cells],
+        faces=vertex_ids[faces[face_ids]],
+        vertex_normals=normals[vertex_cells],
+        visual=visual,
+        process=False,
+    )
+
+
+def export_mesh_ply(
+    mesh: trimesh.Trimesh,
+    path: Path,
+    texture_file: Optional[str] = None,
+) -> None:
+    """Saves a mesh as a binary ply with vertex normals.
+
+    The texture coordinates (and texture file, relative to the ply file) are
+    written as in the BOP models, which panda3d loads with their textures.
+    """
+    properties = [(name, "<f4") for name in ("x", "y", "z", "nx", "ny", "nz")]
+    columns = [np.asarray(mesh.vertices), np.asarray(mesh.vertex_normals)]
+    header = ["ply", "format binary_little_endian 1.0"]
+    if texture_file is not None:
+        header.append(f"comment TextureFile {texture_file}")
+        properties += [("texture_u", "<f4"), ("texture_v", "<f4")]
+        columns.append(np.asarray(mesh.visual.uv))
+    vertex_data = np.concatenate(columns, axis=-1)
+    if mesh.visual.kind == "vertex":
+        properties += [(name, "u1") for name in ("red", "green", "blue", "alpha")]
+        colors = np.asarray(mesh.visual.vertex_colors)
+        vertex_data = np.concatenate([vertex_data, colors], axis=-1)
+    vertices = np.empty(len(mesh.vertices), dtype=properties)
+    for n, (name, _) in enumerate(properties):
+        vertices[name] = vertex_data[:, n]
+
+    faces = np.empty(len(mesh.faces), dtype=[("n", "u1"), ("ids", "<i4", (3,))])
+    faces["n"] = 3
+    faces["ids"] = np.asarray(mesh.faces)
+
+    ply_types = {"<f4": "float", "u1": "uchar"}
+    header.append(f"element vertex {len(vertices)}")
+    header += [f"property {ply_types[dtype]} {name}" for name, dtype in properties]
+    header.append(f"element face {len(faces)}")
+    header += ["property list uchar int vertex_indices", "end_header"]
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        f.write(vertices.tobytes())
+        f.write(faces.tobytes())
+
+
+def _cache_key(mesh_path: Path, n_faces: Sequence[int]) -> str:
+    stat = mesh_path.stat()
+    key = [str(mesh_path.resolve()), stat.st_size, stat.st_mtime_ns]
+    key += [list(n_faces), _LOD_VERSION]
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()[:16]
+
+
+def make_mesh_levels(
+    obj: RigidObject,
+    cache_dir: Path,
+    n_faces: Sequence[int] = DEFAULT_LOD_N_FACES,
+) -> Dict:
+    """Decimates the mesh of an object, the levels are cached in `cache_dir`.
+
+    Returns
+    -------
+        The infos of the levels: `levels` (List[MeshLevel], the first one is
+        the original mesh, then decreasing numbers of faces), `radius` and
+        `diameter` of the object in meters.
+    """
+    mesh_path = Path(obj.mesh_path)
+    label = "".join(c if c.isalnum() or c in "-_." else "_" for c in obj.label)
+    level_dir = Path(cache_dir) / f"{label}-{_cache_key(mesh_path, n_faces)}"
+    infos_path = level_dir / "levels.json"
+    if not infos_path.exists():
+        mesh = trimesh.load(str(mesh_path), process=False, force="mesh")
+        level_dir.mkdir(parents=True, exist_ok=True)
+        texture = get_mesh_texture(mesh.visual)
+        texture_file = None
+        if texture is not None:
+            texture_file = "texture.png"
+            texture.save(level_dir / texture_file)
+        levels = [{"mesh_path": str(mesh_path), "n_faces": len(mesh.faces)}]
+        for n_faces_ in sorted(n_faces, reverse=True):
+            if n_faces_ >= levels[-1]["n_faces"]:
+                continue
+            mesh_ = decimate_mesh(mesh, n_faces_)
+            mesh_path_ = level_dir / f"faces={n_faces_}.ply"
+            export_mesh_ply(mesh_, mesh_path_, texture_file=texture_file)
+            levels.append({"mesh_path": str(mesh_path_), "n_faces": len(mesh_.faces)})
+        # In the units of the mesh, the scale of the object is not in the key.
+        vertices = np.asarray(mesh.vertices)
+        infos = {
+            "levels": levels,
+            "radius": float(np.linalg.norm(vertices, axis=-1).max()),
+            "diameter": float(np.linalg.norm(vertices.max(0) - vertices.min(0))),
+        }
+        infos_path.write_text(json.dumps(infos))
+        logger.debug(f"Mesh levels of {obj.label}: {levels}")
+    infos = json.loads(infos_path.read_text())
+    infos["radius"] *= obj.scale
+    infos["diameter"] *= obj.scale
+    infos["levels"] = [
+        MeshLevel(mesh_path=Path(level["mesh_path"]), n_faces=level["n_faces"])
+        for level in infos["levels"]
+    ]
+    return infos
+
+
+class MeshLODs:
+    def __init__(
+        self,
+        object_dataset: RigidObjectDataset,
+        cache_dir: Union[str, Path],
+        n_faces: Sequence[int] = DEFAULT_LOD_N_FACES,
+        max_pixels_per_face: float = 4.0,
+    ):
+        """Levels of detail of the meshes of an object dataset.
+
+        The meshes are decimated to `n_faces` faces (see `decimate_mesh`) the
+        first time, and cached in `cache_dir`. The level of an object seen by
+        a camera is the coarsest one with at most `max_pixels_per_face`
+        pixels per face, for the area of the projection of the bounding
+        sphere of the object.
+
+        The levels are additional objects of `object_dataset`, labeled with
+        `lod_label`, which is used by the renderers to render the selected
+        levels (see `Panda3dBatchRenderer`). `decimated_object_dataset`
+        can also be used to load coarser meshes, e.g. in the `MeshDataBase`.
+        """
+        self.object_dataset = object_dataset
+        self.max_pixels_per_face = max_pixels_per_face
+        self.label_to_infos = {
+            obj.label: make_mesh_levels(obj, Path(cache_dir), n_faces)
+            for obj in object_dataset.list_objects
+        }
+
+    @staticmethod
+    def lod_label(label: str, level: int) -> str:
+        return label if level == 0 else f"{label}_lod={level}"
+
+    def get_levels(self, label: str) -> List[MeshLevel]:
+        return self.label_to_infos[label]["levels"]
+
+    def _make_object(self, obj: RigidObject, label: str, level: int) -> RigidObject:
+        infos = self.label_to_infos[obj.label]
+        lod_obj = RigidObject(
+            label=label,
+            mesh_path=infos["levels"][level].mesh_path,
+            category=obj.category,
+            symmetries_discrete=obj.symmetries_discrete,
+            symmetries_continuous=obj.symmetries_continuous,
+            ypr_offset_deg=obj.ypr_offset_deg,
+            scaling_factor=obj.scaling_factor,
+            scaling_factor_mesh_units_to_meters=obj.scaling_factor_mesh_units_to_meters,
+        )
+        lod_obj.mesh_units = obj.mesh_units
+        # The diameter of the decimated meshes is slightly smaller.
+        lod_obj.diameter_meters = infos["diameter"]
+        return lod_obj
+
+    def make_object_dataset(self) -> RigidObjectDataset:
+        """Objects of the dataset, and their levels labeled with `lod_label`."""
+        objects = list(self.object_dataset.list_objects)
+        for obj in self.object_dataset.list_objects:
+            for level in range(1, len(self.get_levels(obj.label))):
+                label = self.lod_label(obj.label, level)
+                objects.append(self._make_object(obj, label, level))
+        return RigidObjectDataset(objects)
+
+    def decimated_object_dataset(self, min_n_faces: int) -> RigidObjectDataset:
+        """Objects with their coarsest mesh of at least `min_n_faces` faces."""
+        objects = []
+        for obj in self.object_dataset.list_objects:
+            levels = self.get_levels(obj.label)
+            level = 0
+            for n, mesh_level in enumerate(levels):
+                if mesh_level.n_faces >= min_n_faces:
+                    level = n
+            objects.append(self._make_object(obj, obj.label, level))
+        return RigidObjectDataset(objects)
+
+    def select_levels(
+        self,
+        labels: List[str],
+        TCO: torch.Tensor,
+        K: torch.Tensor,
+    ) -> np.ndarray:
+        """Levels of the objects seen by the cameras.
+
+        Args:
+        ----
+            labels (List[str]): labels of the objects, length bsz.
+            TCO (torch.Tensor): (bsz, ..., 4, 4) poses of the objects in the
+                cameras, e.g. (bsz, n_views, 4, 4).
+            K (torch.Tensor): (bsz, ..., 3, 3) intrinsics of the cameras.
+
+        Returns
+        -------
+            (bsz,) levels, the finest one of the views of each object.
+        """
+        bsz = len(labels)
+        TCO = TCO.detach().reshape(bsz, -1, 4, 4).cpu().numpy()
+        K = K.detach().reshape(bsz, -1, 3, 3).cpu().numpy()
+        focal = np.sqrt(np.abs(K[..., 0, 0] * K[..., 1, 1]))
+        z = TCO[..., 2, 3]
+        radius = np.array([self.label_to_infos[label]["radius"] for label in labels])
+        with np.errstate(divide="ignore"):
+            projected_radius = np.where(
+                z > 0,
+                focal * radius[:, None] / np.abs(z),
+                np.inf,
+            ).max(-1)
+        area = np.pi * projected_radius**2
+
+        levels = np.zeros(bsz, dtype=np.int64)
+        for n, (label, area_n) in enumerate(zip(labels, area)):
+            for level, mesh_level in enumerate(self.get_levels(label)):
+                if area_n > mesh_level.n_faces * self.max_pixels_per_face:
+                    break
+                levels[n] = level
+        return levels
+
+    def select_labels(
+        self,
+        labels: List[str],
+        TCO: torch.Tensor,
+        K: torch.Tensor,
+    ) -> List[str]:
+        """Labels of the selected levels of the objects, see `select_levels`."""
+        levels = self.select_levels(labels, TCO, K)
+        return [self.lod_label(label, level) for label, level in zip(labels, levels)]
@@ -13,6 +13,9 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+# Standard Library
+import functools
+
 # Third Party
 import numpy as np
 import torch
@@ -71,14 +74,24 @@ def get_meshes_aabbs_bounds(pts):
     return lower, upper
 
 
+@functools.lru_cache(maxsize=64)
+def get_deterministic_point_ids(n_points_total: int, n_points: int) -> torch.Tensor:
+    """Indices of the points selected by sample_points(deterministic=True)."""
+    point_ids = np.random.RandomState(0).choice(
+        n_points_total,
+        size=n_points,
+        replace=False,
+    )
+    return torch.as_tensor(point_ids)
+
+
 def sample_points(points, n_points, deterministic=False):
     assert points.dim() == 3
     assert n_points <= points.shape[1]
     if deterministic:
-        np_random = np.random.RandomState(0)
+        point_ids = get_deterministic_point_ids(points.shape[1], n_points)
     else:
-        np_random = np.random
-    point_ids = np_random.choice(points.shape[1], size=n_points, replace=False)
+        point_ids = np.random.choice(points.shape[1], size=n_points, replace=False)
     point_ids = torch.as_tensor(point_ids).to(points.device)
     points = torch.index_select(points, 1, point_ids)
     return points
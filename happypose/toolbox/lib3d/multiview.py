@@ -92,28 +92,34 @@ def _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0):
     return TC0_CV
 
 
-def get_1_view_TCO_pos_front(TCO, tCR):
-    cam_positions_wrt_cam0 = np.array(
+def _make_26_views_cam_positions() -> np.ndarray:
+    cam_positions_wrt_cam0 = []
+    for y in [0, 1, 2]:
+        for x in [0, -1, 1]:
+            for z in [0, 1, -1]:
+                if x == 0 and y == 1 and z == 0:
+                    pass
+                else:
+                    cam_positions_wrt_cam0.append([x, y, z])
+    return np.array(cam_positions_wrt_cam0, dtype=float)
+
+
+# Positions of the cameras of each multiview type, in the frame of a camera
+# looking at the reference point, in units of the distance to the reference point.
+MULTIVIEW_CAM_POSITIONS = {
+    "TCO+front_1view": np.array(
         [
             [0, 0, 0],
         ],
-    )
-    return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
-
-
-def get_3_views_TCO_pos_front(TCO, tCR):
-    cam_positions_wrt_cam0 = np.array(
+    ),
+    "TCO+front_3views": np.array(
         [
             [0, 0, 0],
             [1, 0, 0],
             [-1, 0, 0],
         ],
-    )
-    return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
-
-
-def get_5_views_TCO_pos_front(TCO, tCR):
-    cam_positions_wrt_cam0 = np.array(
+    ),
+    "TCO+front_5views": np.array(
         [
             [0, 0, 0],
             [1, 0, 0],
@@ -121,23 +127,15 @@ def get_5_views_TCO_pos_front(TCO, tCR):
             [0, 0, 1],
             [0, 0, -1],
         ],
-    )
-    return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
-
-
-def get_3_views_TCO_pos_sphere(TCO, tCR):
-    cam_positions_wrt_cam0 = np.array(
+    ),
+    "sphere_3views": np.array(
         [
             [0, 0, 0],
             [1, 0, 0],
             [-1, 0, 0],
         ],
-    )
-    return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
-
-
-def get_6_views_TCO_pos_sphere(TCO, tCR):
-    cam_positions_wrt_cam0 = np.array(
+    ),
+    "sphere_6views": np.array(
         [
             [0, 0, 0],
             [1, 1, 0],
@@ -146,23 +144,105 @@ def get_6_views_TCO_pos_sphere(TCO, tCR):
             [-1, 1, 0],
             [0, 1, -1],
         ],
-    )
+    ),
+    "sphere_26views": _make_26_views_cam_positions(),
+}
+
+
+def get_1_view_TCO_pos_front(TCO, tCR):
+    cam_positions_wrt_cam0 = MULTIVIEW_CAM_POSITIONS["TCO+front_1view"]
+    return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
+
+
+def get_3_views_TCO_pos_front(TCO, tCR):
+    cam_positions_wrt_cam0 = MULTIVIEW_CAM_POSITIONS["TCO+front_3views"]
+    return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
+
+
+def get_5_views_TCO_pos_front(TCO, tCR):
+    cam_positions_wrt_cam0 = MULTIVIEW_CAM_POSITIONS["TCO+front_5views"]
+    return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
+
+
+def get_3_views_TCO_pos_sphere(TCO, tCR):
+    cam_positions_wrt_cam0 = MULTIVIEW_CAM_POSITIONS["sphere_3views"]
+    return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
+
+
+def get_6_views_TCO_pos_sphere(TCO, tCR):
+    cam_positions_wrt_cam0 = MULTIVIEW_CAM_POSITIONS["sphere_6views"]
     return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
 
 
 def get_26_views_TCO_pos_sphere(TCO, tCR):
-    cam_positions_wrt_cam0 = []
-    for y in [0, 1, 2]:
-        for x in [0, -1, 1]:
-            for z in [0, 1, -1]:
-                if x == 0 and y == 1 and z == 0:
-                    pass
-                else:
-                    cam_positions_wrt_cam0.append([x, y, z])
-    cam_positions_wrt_cam0 = np.array(cam_positions_wrt_cam0, dtype=float)
+    cam_positions_wrt_cam0 = MULTIVIEW_CAM_POSITIONS["sphere_26views"]
     return _get_views_TCO_pos_sphere(TCO, tCR, cam_positions_wrt_cam0)
 
 
+def _look_at(forward: torch.Tensor, up: torch.Tensor) -> torch.Tensor:
+    """Rotations whose y axis points along forward and z axis is closest to up.
+
+    Same convention as panda3d's `NodePath.lookAt` (z-up, right handed).
+
+    Args:
+    ----
+        forward: (..., 3)
+        up: (..., 3)
+
+    Returns:
+    -------
+        R: (..., 3, 3) rotation matrices, columns are the (right, forward, up) axes.
+    """
+    forward = torch.nn.functional.normalize(forward, dim=-1)
+    right = torch.nn.functional.normalize(torch.cross(forward, up, dim=-1), dim=-1)
+    up = torch.cross(right, forward, dim=-1)
+    return torch.stack((right, forward, up), dim=-1)
+
+
+def make_TC0_CV(tCR: torch.Tensor, cam_positions_wrt_cam0: np.ndarray) -> torch.Tensor:
+    """Batched equivalent of `_get_views_TCO_pos_sphere`.
+
+    The cameras are placed on a sphere centered on the reference point, at
+    `cam_positions_wrt_cam0` (in units of the distance between the camera and the
+    reference point) in the frame of a camera looking at the reference point,
+    and all point to the reference point.
+
+    Args:
+    ----
+        tCR (torch.Tensor): (bsz, 3) reference point in camera frame.
+        cam_positions_wrt_cam0 (np.ndarray): (n_views, 3)
+
+    Returns:
+    -------
+        TC0_CV (torch.Tensor): (bsz, n_views, 4, 4) poses of the views in the
+            frame of the input camera.
+    """
+    bsz = tCR.shape[0]
+    device, dtype = tCR.device, tCR.dtype
+    n_views = len(cam_positions_wrt_cam0)
+    cam_positions = torch.as_tensor(cam_positions_wrt_cam0, device=device, dtype=dtype)
+
+    # Up vector of the panda3d camera (-y of the camera frame).
+    up = torch.tensor([0.0, -1.0, 0.0], device=device, dtype=dtype).expand(bsz, 3)
+    R_C0_L = _look_at(tCR, up)
+    radius = torch.linalg.norm(tCR, dim=-1)
+    tC0_CV = (
+        R_C0_L.unsqueeze(1) @ (cam_positions * radius[:, None, None]).unsqueeze(-1)
+    ).squeeze(-1)
+    R_C0_CV = _look_at(
+        tCR.unsqueeze(1) - tC0_CV, up.unsqueeze(1).expand(bsz, n_views, 3)
+    )
+
+    # From panda3d (x right, y forward, z up) to camera (x right, y down, z forward)
+    TC0_CV = torch.zeros(bsz, n_views, 4, 4, device=device, dtype=dtype)
+    TC0_CV[..., :3, 0] = R_C0_CV[..., 0]
+    TC0_CV[..., :3, 1] = -R_C0_CV[..., 2]
+    TC0_CV[..., :3, 2] = R_C0_CV[..., 1]
+    TC0_CV[..., :3, 3] = tC0_CV
+    TC0_CV[..., 3, 3] = 1
+    return TC0_CV
+
+
 def make_TCO_multiview(
     TCO: torch.Tensor,
     tCR: torch.Tensor,
@@ -171,70 +251,41 @@ def make_TCO_multiview(
     remove_TCO_rendering: bool = False,
     views_inplane_rotations: bool = False,
 ):
-    """_summary_.
+    """Makes the poses of the object seen from multiple views around it.
+
+    Unless `remove_TCO_rendering` is True, the first view is the input pose.
+    With `views_inplane_rotations`, each view is additionally rotated by
+    90, 180 and 270 degrees around its optical axis.
+    All computations are batched and stay on the device of TCO.
 
     Args:
     ----
         TCO (torch.Tensor): (bsz, 4, 4)
         tCR (torch.Tensor): (bsz, 3)
+        multiview_type (str): one of `MULTIVIEW_CAM_POSITIONS`.
+        n_views (int): if 1, only the input pose is used.
 
 
     Returns:
     -------
-        _type_: _description_
+        TCV_O (torch.Tensor): (bsz, n_views, 4, 4)
     """
     bsz = TCO.shape[0]
     device, dtype = TCO.device, TCO.dtype
 
-    TCO_np = TCO.cpu().numpy()
-    tCR_np = tCR.cpu().numpy()
-
     if n_views == 1:
-        TC0_CV = []
-        for _b in range(bsz):
-            TC0_CV_ = [np.eye(4)]
-            TC0_CV.append(TC0_CV_)
-        TC0_CV = torch.as_tensor(np.stack(TC0_CV), device=device, dtype=dtype)
-        TCV_O = invert_transform_matrices(TC0_CV) @ TCO.unsqueeze(1)
-
-    elif multiview_type == "TCO+front_1view":
-        TC0_CV = []
-        for b in range(bsz):
-            if remove_TCO_rendering:
-                TC0_CV_ = []
-            else:
-                TC0_CV_ = [np.eye(4)]
-            TC0_CV_ += get_1_view_TCO_pos_front(TCO_np[b], tCR_np[b])
-            TC0_CV.append(TC0_CV_)
-        TC0_CV = torch.as_tensor(np.stack(TC0_CV), device=device, dtype=dtype)
-        TCV_O = invert_transform_matrices(TC0_CV) @ TCO.unsqueeze(1)
-
-    elif multiview_type == "TCO+front_3views":
-        TC0_CV = []
-        for b in range(bsz):
-            if remove_TCO_rendering:
-                TC0_CV_ = []
-            else:
-                TC0_CV_ = [np.eye(4)]
-            TC0_CV_ += get_3_views_TCO_pos_front(TCO_np[b], tCR_np[b])
-            TC0_CV.append(TC0_CV_)
-        TC0_CV = torch.as_tensor(np.stack(TC0_CV), device=device, dtype=dtype)
-        TCV_O = invert_transform_matrices(TC0_CV) @ TCO.unsqueeze(1)
-
-    elif multiview_type == "sphere_26views":
-        TC0_CV = []
-        for b in range(bsz):
-            if remove_TCO_rendering:
-                TC0_CV_ = []
-            else:
-                TC0_CV_ = [np.eye(4)]
-            TC0_CV_ += get_26_views_TCO_pos_sphere(TCO_np[b], tCR_np[b])
-            TC0_CV.append(TC0_CV_)
-        TC0_CV = torch.as_tensor(np.stack(TC0_CV), device=device, dtype=dtype)
-        TCV_O = invert_transform_matrices(TC0_CV) @ TCO.unsqueeze(1)
-
+        TC0_CV = torch.eye(4, device=device, dtype=dtype).repeat(bsz, 1, 1, 1)
+    elif multiview_type in MULTIVIEW_CAM_POSITIONS:
+        TC0_CV = make_TC0_CV(
+            tCR.to(dtype),
+            MULTIVIEW_CAM_POSITIONS[multiview_type],
+        )
+        if not remove_TCO_rendering:
+            eye = torch.eye(4, device=device, dtype=dtype).repeat(bsz, 1, 1, 1)
+            TC0_CV = torch.cat((eye, TC0_CV), dim=1)
     else:
         raise ValueError(multiview_type)
+    TCV_O = invert_transform_matrices(TC0_CV) @ TCO.unsqueeze(1)
 
     if views_inplane_rotations:
         assert remove_TCO_rendering
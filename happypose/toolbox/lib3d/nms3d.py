@@ -0,0 +1,263 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+from typing import Optional, Sequence, Tuple
+
+# Third Party
+import torch
+
+# MegaPose
+from happypose.toolbox.lib3d.rigid_mesh_database import BatchedMeshes
+from happypose.toolbox.lib3d.transform_ops import transform_pts
+from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
+
+NMS3D_CRITERIA = ("translation", "add_s")
+
+# Maximum number of grid cells along each axis of the spatial hash.
+MAX_CELLS_PER_AXIS = 2**12
+
+UNDECIDED, KEPT, SUPPRESSED = 0, 1, 2
+
+
+def grid_neighbor_pairs(
+    t: torch.Tensor,
+    group_ids: torch.Tensor,
+    radius: float,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Finds the pairs of points of the same group that may be closer than radius.
+
+    The points are hashed in a grid of cells of size >= radius, candidate pairs
+    are the points of the same group in neighboring cells. All the pairs with
+    ||t_i - t_j|| <= radius are returned once, in any order, and others may be.
+
+    Args:
+        t: (N, 3) positions.
+        group_ids: (N,) integer group of each point.
+        radius: search radius.
+
+    Returns:
+        ids_i, ids_j: (E,) indices of the candidate pairs.
+    """
+    n = t.shape[0]
+    device = t.device
+    if n < 2:
+        empty = torch.zeros(0, dtype=torch.long, device=device)
+        return empty, empty
+
+    extent = float((t.max(dim=0).values - t.min(dim=0).values).max())
+    cell_size = max(radius, extent / (MAX_CELLS_PER_AXIS - 4), 1e-9)
+    cells = torch.floor(t / cell_size).long()
+    # Padding of one cell on each side, neighbor cells have valid coordinates.
+    cells = cells - cells.min(dim=0).values + 1
+    dims = cells.max(dim=0).values + 2
+    _, group_ids = torch.unique(group_ids, return_inverse=True)
+    keys = group_ids * dims[0] + cells[:, 0]
+    keys = (keys * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+    order = torch.argsort(keys)
+    sorted_keys = keys[order]
+    cell_keys, point_cells, cell_counts = torch.unique_consecutive(
+        sorted_keys,
+        return_inverse=True,
+        return_counts=True,
+    )
+    cell_ends = torch.cumsum(cell_counts, dim=0)
+    cell_starts = cell_ends - cell_counts
+
+    # Each pair is found once: in the same cell, the point j comes after the
+    # point i in sorted order, otherwise the cell of j is in the half of the
+    # neighboring cells that come after the cell of i.
+    offsets = torch.arange(-1, 2, device=device)
+    offsets = torch.cartesian_prod(offsets, offsets, offsets)
+    key_offsets = (offsets[:, 0] * dims[1] + offsets[:, 1]) * dims[2] + offsets[:, 2]
+    key_offsets = key_offsets[key_offsets > 0]
+    neighbor_keys = sorted_keys.unsqueeze(1) + key_offsets.unsqueeze(0)
+    cell_ids = torch.searchsorted(cell_keys, neighbor_keys)
+    cell_ids = cell_ids.clamp(max=len(cell_keys) - 1)
+    found = cell_keys[cell_ids] == neighbor_keys
+    positions = torch.arange(n, device=device)
+    starts = torch.cat(
+        [(positions + 1).unsqueeze(1), cell_starts[cell_ids]],
+        dim=1,
+    ).flatten()
+    counts = torch.cat(
+        [
+            (cell_ends[point_cells] - positions - 1).unsqueeze(1),
+            torch.where(found, cell_counts[cell_ids], 0),
+        ],
+        dim=1,
+    ).flatten()
+
+    positions_i = positions.repeat_interleave(len(key_offsets) + 1)
+    positions_i = positions_i.repeat_interleave(counts)
+    segment_starts = torch.cumsum(counts, dim=0) - counts
+    positions_j = torch.arange(len(positions_i), device=device)
+    positions_j += (starts - segment_starts).repeat_interleave(counts)
+    return order[positions_i], order[positions_j]
+
+
+def add_s_distances(
+    TCO_i: torch.Tensor,
+    TCO_j: torch.Tensor,
+    points: torch.Tensor,
+    batch_size: int = 256,
+) -> torch.Tensor:
+    """ADD-S distance between the poses TCO_i and TCO_j of the same objects.
+
+    The distance is averaged over both directions so it is symmetric.
+
+    Args:
+        TCO_i, TCO_j: (E, 4, 4) poses.
+        points: (E, P, 3) points of the objects.
+    """
+    dists = []
+    for start in range(0, len(points), batch_size):
+        end = start + batch_size
+        pts_i = transform_pts(TCO_i[start:end], points[start:end])
+        pts_j = transform_pts(TCO_j[start:end], points[start:end])
+        d = torch.cdist(pts_i, pts_j)
+        dists.append(
+            0.5 * (d.min(dim=2).values.mean(dim=1) + d.min(dim=1).values.mean(dim=1))
+        )
+    if len(dists) == 0:
+        return torch.zeros(0, dtype=TCO_i.dtype, device=TCO_i.device)
+    return torch.cat(dists)
+
+
+def greedy_suppression(
+    scores: torch.Tensor,
+    ids_i: torch.Tensor,
+    ids_j: torch.Tensor,
+) -> torch.Tensor:
+    """Greedy non-maximum suppression given the pairs of overlapping elements.
+
+    Gives the same result as visiting the elements by decreasing score and
+    keeping those that do not overlap an already kept element. The elements
+    whose higher-scoring neighbors are all decided are decided in parallel.
+
+    Returns:
+        keep: indices of the kept elements, sorted by decreasing score.
+    """
+    n = scores.shape[0]
+    sorted_ids = torch.sort(scores, descending=True, stable=True).indices
+    rank = torch.empty_like(sorted_ids)
+    rank[sorted_ids] = torch.arange(n, device=scores.device)
+    i_first = rank[ids_i] < rank[ids_j]
+    parents = torch.where(i_first, ids_i, ids_j)
+    children = torch.where(i_first, ids_j, ids_i)
+
+    state = torch.full((n,), UNDECIDED, dtype=torch.uint8, device=scores.device)
+    while True:
+        undecided = state == UNDECIDED
+        if not undecided.any():
+            break
+        parent_states = state[parents]
+        has_kept_parent = torch.zeros_like(undecided)
+        has_kept_parent[children[parent_states == KEPT]] = True
+        has_undecided_parent = torch.zeros_like(undecided)
+        has_undecided_parent[children[parent_states == UNDECIDED]] = True
+        state[undecided & has_kept_parent] = SUPPRESSED
+        state[undecided & ~has_kept_parent & ~has_undecided_parent] = KEPT
+    return sorted_ids[state[sorted_ids] == KEPT]
+
+
+def nms3d(
+    TCO: torch.Tensor,
+    scores: torch.Tensor,
+    group_ids: Optional[torch.Tensor] = None,
+    threshold: float = 0.04,
+    criterion: str = "translation",
+    points: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    """Greedy 3D non-maximum suppression of pose predictions.
+
+    A prediction is suppressed if it is closer than threshold to a prediction
+    of the same group with a higher score.
+
+    Args:
+        TCO: (N, 4, 4) poses.
+        scores: (N,) scores.
+        group_ids: (N,) integer ids, e.g. of (batch_im_id, label). Predictions
+            of different groups never suppress each other. Defaults to a
+            single group.
+        threshold: distance threshold, in the units of TCO.
+        criterion: 'translation' (distance between the translations) or
+            'add_s' (ADD-S distance between the points, which handles object
+            symmetries). With 'add_s', the groups must only contain
+            predictions of the same object.
+        points: (N, P, 3) object points, required with 'add_s'.
+
+    Returns:
+        keep: indices of the kept predictions, sorted by decreasing score.
+    """
+    if criterion not in NMS3D_CRITERIA:
+        msg = f"Unknown criterion {criterion}, use one of {NMS3D_CRITERIA}"
+        raise ValueError(msg)
+    if group_ids is None:
+        group_ids = torch.zeros(len(TCO), dtype=torch.long, device=TCO.device)
+
+    t = TCO[:, :3, 3]
+    if criterion == "translation":
+        ids_i, ids_j = grid_neighbor_pairs(t, group_ids, threshold)
+        dists = torch.linalg.norm(t[ids_i] - t[ids_j], dim=-1)
+    else:
+        assert points is not None, "points are required by the add_s criterion"
+        # ADD-S >= ||t_i - t_j|| - 2 * radius of the object.
+        radius = float(torch.linalg.norm(points, dim=-1).max()) if len(points) else 0.0
+        ids_i, ids_j = grid_neighbor_pairs(t, group_ids, threshold + 2 * radius)
+        dists = add_s_distances(TCO[ids_i], TCO[ids_j], points[ids_i])
+    is_close = dists <= threshold
+    return greedy_suppression(scores, ids_i[is_close], ids_j[is_close])
+
+
+def nms3d_pose_estimates(
+    data_TCO: PandasTensorCollection,
+    threshold: float = 0.04,
+    group_cols: Sequence[str] = ("batch_im_id", "label"),
+    score_field: str = "score",
+    criterion: str = "translation",
+    mesh_db: Optional[BatchedMeshes] = None,
+    n_points: int = 200,
+) -> PandasTensorCollection:
+    """Applies `nms3d` to the pose estimates, grouped by group_cols.
+
+    Args:
+        data_TCO: pose estimates with the poses in data_TCO.poses.
+        score_field: column of data_TCO.infos with the scores.
+        mesh_db: used to sample the object points with the 'add_s' criterion.
+
+    Returns:
+        The kept estimates, sorted by decreasing score.
+    """
+    df = data_TCO.infos
+    TCO = data_TCO.poses
+    group_ids = df.groupby(list(group_cols), sort=False).ngroup().values
+    group_ids = torch.as_tensor(group_ids, device=TCO.device)
+    scores = torch.as_tensor(df[score_field].values, device=TCO.device)
+    points = None
+    if criterion == "add_s":
+        assert mesh_db is not None, "mesh_db is required by the add_s criterion"
+        meshes = mesh_db.select(df["label"].tolist())
+        points = meshes.sample_points(n_points, deterministic=True).to(TCO.device)
+    keep = nms3d(
+        TCO,
+        scores,
+        group_ids=group_ids,
+        threshold=threshold,
+        criterion=criterion,
+        points=points,
+    )
+    return data_TCO[keep.tolist()]
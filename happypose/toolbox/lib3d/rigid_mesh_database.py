@@ -139,11 +139,27 @@ class BatchedMeshes(TensorCollection):
         self.labels = np.asarray(labels)
         self.register_tensor("points", points)
         self.register_tensor("symmetries", symmetries)
+        self._sampled_points = {}
 
     @property
     def n_sym_mapping(self):
         return {label: obj["n_sym"] for label, obj in self.infos.items()}
 
+    def get_sampled_points(self, n_points):
+        """Points of sample_points(n_points, deterministic=True) of all the meshes.
+
+        The points are cached for each n_points.
+        """
+        points = self._sampled_points.get(n_points)
+        if (
+            points is None
+            or points.device != self.points.device
+            or points.dtype != self.points.dtype
+        ):
+            points = sample_points(self.points, n_points, deterministic=True)
+            self._sampled_points[n_points] = points
+        return points
+
     def select(self, labels):
         ids = [self.label_to_id[label] for label in labels]
         return Meshes(
@@ -151,21 +167,41 @@ class BatchedMeshes(TensorCollection):
             labels=self.labels[ids],
             points=self.points[ids],
             symmetries=self.symmetries[ids],
+            batched_meshes=self,
+            ids=ids,
         )
 
 
 class Meshes(TensorCollection):
-    def __init__(self, infos, labels, points, symmetries):
+    def __init__(
+        self,
+        infos,
+        labels,
+        points,
+        symmetries,
+        batched_meshes=None,
+        ids=None,
+    ):
+        """Meshes selected from batched_meshes at ids, if given.
+
+        The deterministic point samples are then gathered from the cache of
+        batched_meshes.
+        """
         super().__init__()
         self.infos = infos
         self.labels = np.asarray(labels)
         self.register_tensor("points", points)
         self.register_tensor("symmetries", symmetries)
+        self._batched_meshes = batched_meshes
+        self._ids = ids
 
     def select_labels(self, labels):
         raise NotImplementedError
 
     def sample_points(self, n_points, deterministic=False):
+        if deterministic and self._batched_meshes is not None:
+            points = self._batched_meshes.get_sampled_points(n_points)[self._ids]
+            return points.to(self.points.device, self.points.dtype)
         return sample_points(self.points, n_points, deterministic=deterministic)
 
 
@@ -14,8 +14,12 @@ limitations under the License.
 """
 
 # Standard Library
+import heapq
+import threading
+import time
+import weakref
 from dataclasses import dataclass
-from typing import List, Set, Union
+from typing import Dict, List, Optional, Set, Union
 
 # Third Party
 import numpy as np
@@ -24,13 +28,15 @@ import torch.multiprocessing
 
 # HappyPose
 from happypose.toolbox.datasets.object_dataset import RigidObjectDataset
+from happypose.toolbox.lib3d.mesh_lod import MeshLODs
 from happypose.toolbox.lib3d.transform import Transform
 from happypose.toolbox.lib3d.transform_ops import invert_transform_matrices
 from happypose.toolbox.renderer.types import BatchRenderOutput
 from happypose.toolbox.utils.logging import get_logger
+from happypose.toolbox.utils.profiler import get_profiler, profile_function
 
 # Local Folder
-from .panda3d_scene_renderer import Panda3dSceneRenderer
+from .panda3d_scene_renderer import Panda3dSceneRenderer, stack_renderings
 from .types import (
     CameraRenderingData,
     Panda3dCameraData,
@@ -45,11 +51,124 @@ logger = get_logger(__name__)
 
 @dataclass
 class SceneData:
-    camera_data: Panda3dCameraData
+    camera_datas: List[Panda3dCameraData]
     light_datas: List[Panda3dLightData]
     object_datas: List[Panda3dObjectData]
 
 
+@dataclass
+class WorkerStats:
+    """Utilization counters of a render worker.
+
+    n_renders: number of renders done by the worker.
+    n_lazy_loads: number of meshes loaded on demand by the scheduler.
+    render_time: total time spent rendering, in seconds.
+    max_queue_depth: maximum number of renders waiting in the worker queue.
+    """
+
+    n_renders: int = 0
+    n_lazy_loads: int = 0
+    render_time: float = 0.0
+    max_queue_depth: int = 0
+
+
+class RenderScheduler:
+    """Assigns renders to workers based on the meshes they hold.
+
+    A render is sent to the least-loaded worker that already holds the mesh
+    of the object. If this worker has `imbalance_threshold` more pending
+    renders than the least-loaded worker overall, the render is sent to the
+    latter instead, which loads the mesh lazily and holds it from now on.
+    """
+
+    def __init__(
+        self,
+        worker_labels: List[Set[str]],
+        imbalance_threshold: int = 32,
+    ):
+        self.n_workers = len(worker_labels)
+        self.imbalance_threshold = imbalance_threshold
+        self.worker_labels = [set(labels) for labels in worker_labels]
+        self.queue_depths = np.zeros(self.n_workers, dtype=int)
+        self.stats = [WorkerStats() for _ in range(self.n_workers)]
+
+    def assign(self, label: str) -> int:
+        least_loaded_id = int(np.argmin(self.queue_depths))
+        holder_ids = [
+            n for n in range(self.n_workers) if label in self.worker_labels[n]
+        ]
+        worker_id = least_loaded_id
+        if len(holder_ids) > 0:
+            holder_id = min(holder_ids, key=lambda n: self.queue_depths[n])
+            imbalance = (
+                self.queue_depths[holder_id] - self.queue_depths[least_loaded_id]
+            )
+            if imbalance <= self.imbalance_threshold:
+                worker_id = holder_id
+        if label not in self.worker_labels[worker_id]:
+            self.worker_labels[worker_id].add(label)
+            self.stats[worker_id].n_lazy_loads += 1
+        self.queue_depths[worker_id] += 1
+        stats = self.stats[worker_id]
+        stats.max_queue_depth = max(
+            stats.max_queue_depth, int(self.queue_depths[worker_id])
+        )
+        return worker_id
+
+    def complete(self, worker_id: int, render_time: float = 0.0) -> None:
+        self.queue_depths[worker_id] -= 1
+        self.stats[worker_id].n_renders += 1
+        self.stats[worker_id].render_time += render_time
+
+    def utilization(self) -> Dict[int, float]:
+        """Fraction of the total rendering time spent by each worker."""
+        total_time = sum(stats.render_time for stats in self.stats)
+        return {
+            n: stats.render_time / total_time if total_time > 0 else 0.0
+            for n, stats in enumerate(self.stats)
+        }
+
+
+class PendingRenders:
+    """Handle of a batch of renders submitted to the workers.
+
+    The renders are done in the background, `wait` blocks until they
+    are all done and returns them. It raises an error if the renderer was
+    stopped before the renders were done.
+    """
+
+    def __init__(
+        self,
+        renderer: "Panda3dBatchRenderer",
+        data_ids: List[int],
+        render_normals: bool,
+        render_depth: bool,
+        render_binary_mask: bool,
+        render_rgb: bool,
+    ):
+        self.renderer = renderer
+        self.data_ids = data_ids
+        self.render_normals = render_normals
+        self.render_depth = render_depth
+        self.render_binary_mask = render_binary_mask
+        self.render_rgb = render_rgb
+        self._output: Optional[BatchRenderOutput] = None
+        # Filled by the thread receiving the outputs of the workers.
+        self._worker_outputs: List[Optional[WorkerRenderOutput]] = [None] * len(
+            data_ids
+        )
+        self._n_received = 0
+        self._error: Optional[Exception] = None
+
+    def is_done(self) -> bool:
+        return self._error is not None or self._n_received == len(self.data_ids)
+
+    def wait(self) -> BatchRenderOutput:
+        if self._output is None:
+            self._output = self.renderer._collect(self)
+        return self._output
+
+
 @dataclass
 class RenderArguments:
     data_id: int
@@ -57,6 +176,7 @@ class RenderArguments:
     render_depth: bool
     render_binary_mask: bool
     scene_data: SceneData
+    render_rgb: bool = True
 
 
 def worker_loop(
@@ -77,11 +197,14 @@ def worker_loop(
         if render_args is None:
             break
 
+        start = time.time()
         scene_data = render_args.scene_data
-        is_valid = (
-            np.isfinite(scene_data.object_datas[0].TWO.toHomogeneousMatrix()).all()
-            and np.isfinite(scene_data.camera_data.TWC.toHomogeneousMatrix()).all()
-            and np.isfinite(scene_data.camera_data.K).all()
+        is_valid = np.isfinite(
+            scene_data.object_datas[0].TWO.toHomogeneousMatrix(),
+        ).all() and all(
+            np.isfinite(camera_data.TWC.toHomogeneousMatrix()).all()
+            and np.isfinite(camera_data.K).all()
+            for camera_data in scene_data.camera_datas
         )
 
         if is_valid:
@@ -89,25 +212,30 @@ def worker_loop(
             # arrays are contiguous. This ensures that they
             # have non-negative strides and can be converted into
             # torch.tensors.
+            # All the cameras of a scene are rendered in a single frame
+            # and read back as (n_cameras, h, w, c) arrays.
             renderings = renderer.render_scene(
                 object_datas=scene_data.object_datas,
-                camera_datas=[scene_data.camera_data],
+                camera_datas=scene_data.camera_datas,
                 light_datas=scene_data.light_datas,
                 render_normals=render_args.render_normals,
                 render_depth=render_args.render_depth,
                 render_binary_mask=render_args.render_binary_mask,
                 copy_arrays=True,  # ensures non-negative strid
+                single_frame=True,
+                render_rgb=render_args.render_rgb,
             )
-            # by definition, each "scene" in batch rendering corresponds to 1 camera, 1 object
-            # -> retrieves the first and only rendering
-            renderings_ = renderings[0]
+            renderings_ = stack_renderings(renderings)
         else:
-            h, w = scene_data.camera_data.resolution
+            n = len(scene_data.camera_datas)
+            h, w = scene_data.camera_datas[0].resolution
             renderings_ = CameraRenderingData(
-                rgb=np.zeros((h, w, 3), dtype=np.uint8),
-                normals=np.zeros((h, w, 1), dtype=np.uint8),
-                depth=np.zeros((h, w, 1), dtype=np.float32),
-                binary_mask=np.zeros((h, w, 1), dtype=bool),
+                rgb=np.zeros((n, h, w, 3), dtype=np.uint8)
+                if render_args.render_rgb
+                else None,
+                normals=np.zeros((n, h, w, 3), dtype=np.uint8),
+                depth=np.zeros((n, h, w, 1), dtype=np.float32),
+                binary_mask=np.zeros((n, h, w, 1), dtype=bool),
             )
 
         output = WorkerRenderOutput(
@@ -118,6 +246,9 @@ def worker_loop(
             binary_mask=renderings_.binary_mask
             if render_args.render_binary_mask
             else None,
+            render_time=time.time() - start,
+            start_time=start,
+            worker_id=worker_id,
         )
         del render_args
         out_queue.put(output)
@@ -125,6 +256,22 @@ def worker_loop(
     logger.debug(f"Close worker: {worker_id}")
 
 
+def receiver_loop(
+    renderer_ref: "weakref.ref[Panda3dBatchRenderer]",
+    out_queue: torch.multiprocessing.Queue,
+) -> None:
+    """Loop of the thread receiving the outputs of the render workers."""
+    while True:
+        output: Optional[WorkerRenderOutput] = out_queue.get()
+        if output is None:
+            break
+        renderer = renderer_ref()
+        if renderer is None:
+            break
+        renderer._receive_output(output)
+        del renderer
+
+
 class Panda3dBatchRenderer:
     def __init__(
         self,
@@ -132,17 +279,62 @@ class Panda3dBatchRenderer:
         n_workers: int = 8,
         preload_cache: bool = True,
         split_objects: bool = False,
+        imbalance_threshold: int = 32,
+        max_in_flight_per_worker: Optional[int] = None,
+        lazy_start: bool = False,
+        mesh_lods: Optional[MeshLODs] = None,
     ):
+        """Renders batches of single-object images in parallel worker processes.
+
+        With `split_objects=True`, each worker has its own queue and only
+        preloads a subset of the meshes. Renders are then dispatched by a
+        `RenderScheduler`, which balances the load across workers and
+        loads meshes on additional workers when one worker is
+        `imbalance_threshold` renders behind the least-loaded one.
+
+        Renders are sent to the workers by order of priority (see
+        `render_scene_datas_async`). With `max_in_flight_per_worker`, at most
+        this number of renders per worker are sent to the workers at a time,
+        the others wait in a priority queue, so that renders submitted later
+        with a higher priority are not stuck behind a large batch.
+        With `lazy_start=True`, the workers are spawned on the first render.
+
+        With `mesh_lods` (levels of detail of the meshes of `asset_dataset`),
+        each object is rendered with the level selected for its projected
+        size in the image, see `MeshLODs.select_levels`.
+        """
         self._is_closed = False
+        self._is_stopping = False
+        self._mesh_lods = mesh_lods
+        if mesh_lods is not None:
+            asset_dataset = mesh_lods.make_object_dataset()
         self._object_dataset = asset_dataset
         self._n_workers = n_workers
+        self._preload_cache = preload_cache
         self._split_objects = split_objects
+        self._imbalance_threshold = imbalance_threshold
+        self._scheduler = None
         self._renderers = []
         self._in_queues = []
         self._out_queue = None
+        self._is_started = False
+        self._max_in_flight = None
+        if max_in_flight_per_worker is not None:
+            self._max_in_flight = max_in_flight_per_worker * n_workers
+        # Renders are identified by a data_id unique over all the batches.
+        # The renders waiting to be sent are in a heap of
+        # (-priority, data_id, render_args).
+        self._next_data_id = 0
+        self._render_heap: List = []
+        self._n_in_flight = 0
+        self._data_id_to_worker_id: Dict[int, int] = {}
+        self._data_id_to_pending: Dict[int, PendingRenders] = {}
+        self._condition = threading.Condition()
+        self._receiver_thread: Optional[threading.Thread] = None
         assert n_workers >= 1
 
-        self._init_renderers(preload_cache)
+        if not lazy_start:
+            self.start()
 
     def make_scene_data(
         self,
@@ -170,6 +362,8 @@ class Panda3dBatchRenderer:
         assert TCO.shape == (bsz, 4, 4)
         assert K.shape == (bsz, 3, 3)
         assert bsz == len(labels), "Need same number of labels as TCO/K batch size"
+        if self._mesh_lods is not None:
+            labels = self._mesh_lods.select_labels(labels, TCO, K)
 
         TCO = TCO.detach()
         TOC = invert_transform_matrices(TCO).cpu().numpy().astype(np.float32)
@@ -178,11 +372,69 @@ class Panda3dBatchRenderer:
         scene_datas = []
         for label_n, TOC_n, K_n, lights_n in zip(labels, TOC, K, light_datas):
             scene_data = SceneData(
-                camera_data=Panda3dCameraData(
-                    TWC=Transform(TOC_n),
-                    K=K_n,
-                    resolution=resolution,
-                ),
+                camera_datas=[
+                    Panda3dCameraData(
+                        TWC=Transform(TOC_n),
+                        K=K_n,
+                        resolution=resolution,
+                    ),
+                ],
+                object_datas=[
+                    Panda3dObjectData(
+                        label=label_n,
+                        TWO=TWO,
+                    ),
+                ],
+                light_datas=lights_n,
+            )
+            scene_datas.append(scene_data)
+        return scene_datas
+
+    def make_multiview_scene_data(
+        self,
+        labels: List[str],
+        TCV_O: torch.Tensor,
+        KV: torch.Tensor,
+        light_datas: List[List[Panda3dLightData]],
+        resolution: Resolution,
+    ) -> List[SceneData]:
+        """Makes one scene per object, seen by multiple cameras.
+
+        Args:
+        ----
+            labels (List[str]): object labels, length bsz
+            TCV_O (torch.Tensor): (bsz, n_views, 4, 4) float
+            KV (torch.Tensor): (bsz, n_views, 3, 3) float
+            light_datas (List[List[Panda3dLightData]]): lights of each scene
+            resolution (Resolution): resolution of all the cameras
+
+        Returns:
+        -------
+            List[SceneData]: bsz scenes with n_views cameras each.
+        """
+        bsz, n_views = TCV_O.shape[:2]
+        assert TCV_O.shape == (bsz, n_views, 4, 4)
+        assert KV.shape == (bsz, n_views, 3, 3)
+        assert bsz == len(labels), "Need same number of labels as TCV_O batch size"
+        if self._mesh_lods is not None:
+            labels = self._mesh_lods.select_labels(labels, TCV_O, KV)
+
+        TCV_O = TCV_O.detach()
+        TV_OC = invert_transform_matrices(TCV_O.flatten(0, 1))
+        TV_OC = TV_OC.view(bsz, n_views, 4, 4).cpu().numpy().astype(np.float32)
+        KV = KV.cpu().numpy()
+        TWO = Transform((0.0, 0.0, 0.0, 1.0), (0.0, 0.0, 0.0))
+        scene_datas = []
+        for label_n, TV_OC_n, KV_n, lights_n in zip(labels, TV_OC, KV, light_datas):
+            scene_data = SceneData(
+                camera_datas=[
+                    Panda3dCameraData(
+                        TWC=Transform(TOC_v),
+                        K=K_v,
+                        resolution=resolution,
+                    )
+                    for TOC_v, K_v in zip(TV_OC_n, KV_n)
+                ],
                 object_datas=[
                     Panda3dObjectData(
                         label=label_n,
@@ -204,81 +456,280 @@ class Panda3dBatchRenderer:
         render_normals: bool = False,
         render_depth: bool = False,
         render_binary_mask: bool = False,
+        render_rgb: bool = True,
     ) -> BatchRenderOutput:
+        """Renders a batch of single-object images.
+
+        With `render_rgb=False`, only the depths (and binary masks) are
+        rendered, in a faster depth-only mode ignoring the lights,
+        and the output `rgbs` is None.
+        """
+        return self.render_async(
+            labels,
+            TCO,
+            K,
+            light_datas,
+            resolution,
+            render_normals=render_normals,
+            render_depth=render_depth,
+            render_binary_mask=render_binary_mask,
+            render_rgb=render_rgb,
+        ).wait()
+
+    def render_async(
+        self,
+        labels: List[str],
+        TCO: torch.Tensor,
+        K: torch.Tensor,
+        light_datas: List[List[Panda3dLightData]],
+        resolution: Resolution,
+        render_normals: bool = False,
+        render_depth: bool = False,
+        render_binary_mask: bool = False,
+        render_rgb: bool = True,
+    ) -> PendingRenders:
+        """Same as `render`, without waiting for the renders."""
         scene_datas = self.make_scene_data(labels, TCO, K, light_datas, resolution)
-        bsz = len(scene_datas)
-
-        # ==================================
-        # Send batches of renders to workers
-        # ==================================
-        for n, scene_data_n in enumerate(scene_datas):
-            render_args = RenderArguments(
-                data_id=n,
-                scene_data=scene_data_n,
+        return self.render_scene_datas_async(
+            scene_datas,
+            render_normals=render_normals,
+            render_depth=render_depth,
+            render_binary_mask=render_binary_mask,
+            render_rgb=render_rgb,
+        )
+
+    def render_multiview(
+        self,
+        labels: List[str],
+        TCV_O: torch.Tensor,
+        KV: torch.Tensor,
+        light_datas: List[List[Panda3dLightData]],
+        resolution: Resolution,
+        render_normals: bool = False,
+        render_depth: bool = False,
+        render_binary_mask: bool = False,
+        render_rgb: bool = True,
+    ) -> BatchRenderOutput:
+        """Renders multiple views of each object.
+
+        All the views of one object are rendered in a single frame, as cameras of
+        the same scene, and therefore share the same lights.
+        The outputs have a batch size of bsz * n_views, ordered as
+        `TCV_O.flatten(0, 1)`.
+        """
+        return self.render_multiview_async(
+            labels,
+            TCV_O,
+            KV,
+            light_datas,
+            resolution,
+            render_normals=render_normals,
+            render_depth=render_depth,
+            render_binary_mask=render_binary_mask,
+            render_rgb=render_rgb,
+        ).wait()
+
+    def render_multiview_async(
+        self,
+        labels: List[str],
+        TCV_O: torch.Tensor,
+        KV: torch.Tensor,
+        light_datas: List[List[Panda3dLightData]],
+        resolution: Resolution,
+        render_normals: bool = False,
+        render_depth: bool = False,
+        render_binary_mask: bool = False,
+        render_rgb: bool = True,
+    ) -> PendingRenders:
+        """Same as `render_multiview`, without waiting for the renders."""
+        scene_datas = self.make_multiview_scene_data(
+            labels,
+            TCV_O,
+            KV,
+            light_datas,
+            resolution,
+        )
+        return self.render_scene_datas_async(
+            scene_datas,
+            render_normals=render_normals,
+            render_depth=render_depth,
+            render_binary_mask=render_binary_mask,
+            render_rgb=render_rgb,
+        )
+
+    def render_scene_datas(
+        self,
+        scene_datas: List[SceneData],
+        render_normals: bool = False,
+        render_depth: bool = False,
+        render_binary_mask: bool = False,
+        render_rgb: bool = True,
+    ) -> BatchRenderOutput:
+        return self.render_scene_datas_async(
+            scene_datas,
+            render_normals=render_normals,
+            render_depth=render_depth,
+            render_binary_mask=render_binary_mask,
+            render_rgb=render_rgb,
+        ).wait()
+
+    def render_scene_datas_async(
+        self,
+        scene_datas: List[SceneData],
+        render_normals: bool = False,
+        render_depth: bool = False,
+        render_binary_mask: bool = False,
+        render_rgb: bool = True,
+        priority: int = 0,
+    ) -> PendingRenders:
+        """Sends the renders to the workers and returns without waiting.
+
+        Several batches can be pending at the same time. The renders of the
+        batches with a higher priority are sent to the workers first, the
+        batches of equal priority in the order they were submitted.
+        """
+        if not render_rgb:
+            assert render_depth, "Depth must be rendered if rgb is not rendered"
+            assert not render_normals, "Normals can only be rendered with rgb"
+
+        with self._condition:
+            self.start()
+            data_ids = list(
+                range(self._next_data_id, self._next_data_id + len(scene_datas)),
+            )
+            self._next_data_id += len(scene_datas)
+            pending = PendingRenders(
+                self,
+                data_ids,
                 render_normals=render_normals,
                 render_depth=render_depth,
                 render_binary_mask=render_binary_mask,
+                render_rgb=render_rgb,
             )
+            for data_id, scene_data_n in zip(data_ids, scene_datas):
+                render_args = RenderArguments(
+                    data_id=data_id,
+                    scene_data=scene_data_n,
+                    render_normals=render_normals,
+                    render_depth=render_depth,
+                    render_binary_mask=render_binary_mask,
+                    render_rgb=render_rgb,
+                )
+                self._data_id_to_pending[data_id] = pending
+                heapq.heappush(self._render_heap, (-priority, data_id, render_args))
+            self._dispatch()
+        return pending
 
-            in_queue = self._object_label_to_queue[scene_data_n.object_datas[0].label]
-            in_queue.put(render_args)
+    def _dispatch(self) -> None:
+        """Sends the renders of highest priority to the workers.
 
-        # ===============================
-        # Retrieve the workers renderings
-        # ===============================
-        list_rgbs = [None for _ in np.arange(bsz)]
-        list_normals = [None for _ in np.arange(bsz)]
-        list_depths = [None for _ in np.arange(bsz)]
-        list_binary_masks = [None for _ in np.arange(bsz)]
-
-        for n in np.arange(bsz):
-            renders: WorkerRenderOutput = self._out_queue.get()
-            data_id = renders.data_id
-            list_rgbs[data_id] = torch.tensor(renders.rgb)
+        Must be called with the condition acquired.
+        """
+        if self._is_stopping:
+            return
+        while len(self._render_heap) > 0 and (
+            self._max_in_flight is None or self._n_in_flight < self._max_in_flight
+        ):
+            _, data_id, render_args = heapq.heappop(self._render_heap)
+            if self._scheduler is not None:
+                label = render_args.scene_data.object_datas[0].label
+                worker_id = self._scheduler.assign(label)
+                self._data_id_to_worker_id[data_id] = worker_id
+                in_queue = self._worker_id_to_queue[worker_id]
+            else:
+                in_queue = self._in_queues[0]
+            in_queue.put(render_args)
+            self._n_in_flight += 1
+
+    def _receive_output(self, output: WorkerRenderOutput) -> None:
+        """Stores the output of a worker and sends the next renders."""
+        with self._condition:
+            self._n_in_flight -= 1
+            if self._scheduler is not None:
+                self._scheduler.complete(
+                    self._data_id_to_worker_id.pop(output.data_id),
+                    output.render_time,
+                )
+            pending = self._data_id_to_pending.pop(output.data_id)
+            pending._worker_outputs[output.data_id - pending.data_ids[0]] = output
+            pending._n_received += 1
+            self._dispatch()
+            if pending.is_done():
+                self._condition.notify_all()
+
+    @profile_function("render")
+    def _collect(self, pending: PendingRenders) -> BatchRenderOutput:
+        """Waits for the renders of a pending batch."""
+        render_rgb = pending.render_rgb
+        render_normals = pending.render_normals
+        render_depth = pending.render_depth
+        render_binary_mask = pending.render_binary_mask
+        with self._condition:
+            self._condition.wait_for(pending.is_done)
+        if pending._error is not None:
+            raise pending._error
+
+        list_rgbs = []
+        list_normals = []
+        list_depths = []
+        list_binary_masks = []
+
+        profiler = get_profiler()
+        for renders in pending._worker_outputs:
+            if profiler is not None:
+                profiler.add_event(
+                    "render_worker",
+                    renders.start_time,
+                    renders.render_time,
+                    thread=f"render_worker_{renders.worker_id}",
+                )
+            if render_rgb:
+                list_rgbs.append(torch.as_tensor(renders.rgb))
             if render_normals:
-                list_normals[data_id] = torch.tensor(renders.normals)
+                list_normals.append(torch.as_tensor(renders.normals))
             if render_depth:
-                list_depths[data_id] = torch.tensor(renders.depth)
+                list_depths.append(torch.as_tensor(renders.depth))
             if render_binary_mask:
-                list_binary_masks[data_id] = torch.tensor(renders.binary_mask)
-            del renders
-
-        assert list_rgbs[0] is not None
-
-        if torch.cuda.is_available():
-            rgbs = torch.stack(list_rgbs).pin_memory().cuda(non_blocking=True)
-        else:
-            rgbs = torch.stack(list_rgbs)
-        rgbs = rgbs.float().permute(0, 3, 1, 2) / 255
+                list_binary_masks.append(torch.as_tensor(renders.binary_mask))
+        pending._worker_outputs = []
 
+        rgbs = None
         normals = None
         depths = None
         binary_masks = None
 
+        if render_rgb:
+            assert len(list_rgbs) > 0
+            if torch.cuda.is_available():
+                rgbs = torch.cat(list_rgbs).pin_memory().cuda(non_blocking=True)
+            else:
+                rgbs = torch.cat(list_rgbs)
+            rgbs = rgbs.float().permute(0, 3, 1, 2) / 255
+
         if render_normals:
-            assert list_normals[0] is not None
+            assert len(list_normals) > 0
             if torch.cuda.is_available():
-                normals = torch.stack(list_normals).pin_memory().cuda(non_blocking=True)
+                normals = torch.cat(list_normals).pin_memory().cuda(non_blocking=True)
             else:
-                normals = torch.stack(list_normals)
+                normals = torch.cat(list_normals)
             normals = normals.float().permute(0, 3, 1, 2) / 255
 
         if render_depth:
-            assert list_depths[0] is not None
+            assert len(list_depths) > 0
             if torch.cuda.is_available():
-                depths = torch.stack(list_depths).pin_memory().cuda(non_blocking=True)
+                depths = torch.cat(list_depths).pin_memory().cuda(non_blocking=True)
             else:
-                depths = torch.stack(list_depths)
+                depths = torch.cat(list_depths)
             depths = depths.float().permute(0, 3, 1, 2)
 
         if render_binary_mask:
-            assert list_binary_masks[0] is not None
+            assert len(list_binary_masks) > 0
             if torch.cuda.is_available():
                 binary_masks = (
-                    torch.stack(list_binary_masks).pin_memory().cuda(non_blocking=True)
+                    torch.cat(list_binary_masks).pin_memory().cuda(non_blocking=True)
                 )
             else:
-                binary_masks = torch.stack(list_binary_masks)
+                binary_masks = torch.cat(list_binary_masks)
             binary_masks = binary_masks.permute(0, 3, 1, 2)
 
         return BatchRenderOutput(
@@ -288,6 +739,23 @@ class Panda3dBatchRenderer:
             binary_masks=binary_masks,
         )
 
+    def start(self) -> None:
+        """Spawns the workers, if they are not running yet."""
+        assert not self._is_closed, "The renderer is stopped"
+        if self._is_started:
+            return
+        self._init_renderers(self._preload_cache)
+        # The thread only keeps a weak reference to the renderer, which
+        # is stopped when it is garbage collected.
+        self._receiver_thread = threading.Thread(
+            target=receiver_loop,
+            args=(weakref.ref(self), self._out_queue),
+            name="render_receiver",
+            daemon=True,
+        )
+        self._receiver_thread.start()
+        self._is_started = True
+
     def _init_renderers(self, preload_cache: bool) -> None:
         object_labels = [obj.label for obj in self._object_dataset.list_objects]
 
@@ -300,14 +768,17 @@ class Panda3dBatchRenderer:
                 n: self._in_queues[n] for n in range(self._n_workers)
             }
             object_labels_split = np.array_split(object_labels, self._n_workers)
-            self._object_label_to_queue = {}
-            for n, split in enumerate(object_labels_split):
-                for label in split:
-                    self._object_label_to_queue[label] = self._in_queues[n]
+            if preload_cache:
+                worker_labels = [set(split.tolist()) for split in object_labels_split]
+            else:
+                worker_labels = [set() for _ in range(self._n_workers)]
+            self._scheduler = RenderScheduler(
+                worker_labels,
+                imbalance_threshold=self._imbalance_threshold,
+            )
         else:
             object_labels_split = [object_labels for _ in range(self._n_workers)]
             self._in_queues = [torch.multiprocessing.Queue()]
-            self._object_label_to_queue = {k: self._in_queues[0] for k in object_labels}
             self._worker_id_to_queue = {
                 n: self._in_queues[0] for n in range(self._n_workers)
             }
@@ -332,21 +803,50 @@ class Panda3dBatchRenderer:
             renderer_process.start()
             self._renderers.append(renderer_process)
 
+    def get_worker_stats(self) -> List[WorkerStats]:
+        """Returns the utilization counters of each worker.
+
+        Only available with `split_objects=True`, where renders are
+        dispatched by the scheduler.
+        """
+        assert self._scheduler is not None, "Requires split_objects=True"
+        return self._scheduler.stats
+
     def stop(self) -> None:
         logger.debug("Stopping batch renderer...")
         if self._is_closed:
             return
-        for n in range(self._n_workers):
-            self._worker_id_to_queue[n].put(None)
-        for renderer_process in self._renderers:
-            renderer_process.join()
-            renderer_process.terminate()
-        for queue in self._in_queues:
-            queue.close()
-        if self._out_queue is not None:
+        with self._condition:
+            # The renders waiting in the heap are not sent to the workers.
+            self._is_stopping = True
+        if self._is_started:
+            for n in range(self._n_workers):
+                self._worker_id_to_queue[n].put(None)
+            for renderer_process in self._renderers:
+                renderer_process.join()
+                renderer_process.terminate()
+            self._out_queue.put(None)
+            if threading.current_thread() is not self._receiver_thread:
+                self._receiver_thread.join()
+            for queue in self._in_queues:
+                queue.close()
             self._out_queue.close()
+        self._fail_pending_renders()
         self._is_closed = True
         logger.debug("Batch renderer is closed.")
 
+    def _fail_pending_renders(self) -> None:
+        """Wakes the waiters of the renders that will never be done."""
+        with self._condition:
+            for pending in set(self._data_id_to_pending.values()):
+                pending._error = RuntimeError(
+                    "The batch renderer was stopped before the renders were done."
+                )
+            self._data_id_to_pending = {}
+            self._data_id_to_worker_id = {}
+            self._render_heap = []
+            self._n_in_flight = 0
+            self._condition.notify_all()
+
     def __del__(self) -> None:
         self.stop()
@@ -22,7 +22,7 @@ import xml.etree.ElementTree as ET
 from collections import defaultdict
 from dataclasses import dataclass
 from functools import partial
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set, Tuple
 
 import numpy as np
 import panda3d as p3d
@@ -46,6 +46,11 @@ from .types import (
 )
 from .utils import make_rgb_texture_normal_map, np_to_lmatrix4
 
+# Camera masks used to render rgb and normals in a single frame.
+# Bit 31 is reserved by panda3d.
+NORMALS_CAMERA_MASK = p3d.core.BitMask32.bit(30)
+RGB_CAMERA_MASK = p3d.core.PandaNode.getAllCameraMask() & ~NORMALS_CAMERA_MASK
+
 
 @dataclass
 class Panda3dDebugData:
@@ -160,7 +165,10 @@ class Panda3dSceneRenderer:
         self.debug = debug
         self.debug_data = Panda3dDebugData(timings={})
 
-        self._cameras_pool: Dict[Resolution, List[Panda3dCamera]] = defaultdict(list)
+        self._cameras_pool: Dict[
+            Tuple[Resolution, bool],
+            List[Panda3dCamera],
+        ] = defaultdict(list)
         if hasattr(builtins, "base"):
             self._app = builtins.base  # type: ignore
         else:
@@ -173,17 +181,26 @@ class Panda3dSceneRenderer:
         for label in tqdm(preload_labels, disable=not verbose):
             self.get_object_node(label)
 
-    def create_new_camera(self, resolution: Resolution) -> Panda3dCamera:
+    def create_new_camera(
+        self,
+        resolution: Resolution,
+        depth_only: bool = False,
+    ) -> Panda3dCamera:
         idx = sum([len(x) for x in self._cameras_pool.values()])
         cam = Panda3dCamera.create(
             f"camera={idx}",
             resolution=resolution,
             app=self._app,
+            depth_only=depth_only,
         )
-        self._cameras_pool[resolution].append(cam)
+        self._cameras_pool[(resolution, depth_only)].append(cam)
         return cam
 
-    def get_cameras(self, data_cameras: List[Panda3dCameraData]) -> List[Panda3dCamera]:
+    def get_cameras(
+        self,
+        data_cameras: List[Panda3dCameraData],
+        depth_only: bool = False,
+    ) -> List[Panda3dCamera]:
         resolution_to_data_cameras: Dict[
             Resolution,
             List[Panda3dCameraData],
@@ -193,13 +210,13 @@ class Panda3dSceneRenderer:
 
         for resolution_, data_cameras_ in resolution_to_data_cameras.items():
             for idx in range(len(data_cameras_)):
-                if idx >= len(self._cameras_pool[resolution_]):
-                    self.create_new_camera(resolution_)
+                if idx >= len(self._cameras_pool[(resolution_, depth_only)]):
+                    self.create_new_camera(resolution_, depth_only=depth_only)
 
         cameras = []
         available_cameras = {k: v.copy() for k, v in self._cameras_pool.items()}
         for data_camera in data_cameras:
-            camera = available_cameras[data_camera.resolution].pop()
+            camera = available_cameras[(data_camera.resolution, depth_only)].pop()
             cameras.append(camera)
         return cameras
 
@@ -255,12 +272,14 @@ class Panda3dSceneRenderer:
         self,
         root_node: p3d.core.NodePath,
         data_cameras: List[Panda3dCameraData],
+        depth_only: bool = False,
     ) -> List[Panda3dCamera]:
-        cameras = self.get_cameras(data_cameras)
+        cameras = self.get_cameras(data_cameras, depth_only=depth_only)
 
         for data_camera, camera in zip(data_cameras, cameras):
             camera_node_path = camera.node_path
             camera_node_path.node().setActive(1)
+            camera.graphics_buffer.setActive(True)
             camera_node_path.reparentTo(root_node)
 
             data_camera.set_lens_parameters(camera_node_path.node().getLens())
@@ -275,19 +294,48 @@ class Panda3dSceneRenderer:
         cameras: List[Panda3dCamera],
         copy_arrays: bool = True,
         render_depth: bool = False,
+        render_frame: bool = True,
+        render_rgb: bool = True,
     ) -> List[CameraRenderingData]:
-        self._app.graphicsEngine.renderFrame()
-        self._app.graphicsEngine.syncFrame()
+        """Renders a frame and reads back the images of each camera.
+
+        If `copy_arrays` is True and all the cameras have the same resolution,
+        the images are read into a single contiguous (n_cameras, h, w, c) array
+        per modality, each `CameraRenderingData` holding a view of it
+        (see `stack_renderings`).
+        If `render_frame` is False, the images of the last frame are read.
+        If `render_rgb` is False, only the depth is read back.
+        """
+        if render_frame:
+            self._app.graphicsEngine.renderFrame()
+            self._app.graphicsEngine.syncFrame()
+
+        rgbs, depths = None, None
+        if copy_arrays and len({camera.resolution for camera in cameras}) == 1:
+            h, w = cameras[0].resolution
+            if render_rgb:
+                rgbs = np.empty((len(cameras), h, w, 3), dtype=np.uint8)
+            if render_depth:
+                depths = np.empty((len(cameras), h, w, 1), dtype=np.float32)
 
         renderings = []
-        for camera in cameras:
-            rgb = camera.get_rgb_image()
-            if copy_arrays:
-                rgb = rgb.copy()
+        for n, camera in enumerate(cameras):
+            rgb = None
+            if render_rgb:
+                rgb = camera.get_rgb_image()
+                if rgbs is not None:
+                    rgbs[n] = rgb
+                    rgb = rgbs[n]
+                elif copy_arrays:
+                    rgb = rgb.copy()
             rendering = CameraRenderingData(rgb)
 
             if render_depth:
-                rendering.depth = camera.get_depth_image()
+                depth = camera.get_depth_image()
+                if depths is not None:
+                    depths[n] = depth
+                    depth = depths[n]
+                rendering.depth = depth
             renderings.append(rendering)
         return renderings
 
@@ -317,6 +365,57 @@ class Panda3dSceneRenderer:
             light_node_paths.append(light_node_path)
         return light_node_paths
 
+    def isolate_objects(
+        self,
+        object_nodes: List[p3d.core.NodePath],
+        cameras: List[Panda3dCamera],
+    ) -> None:
+        """Makes each object visible only from the camera with the same index."""
+        assert len(object_nodes) == len(cameras) <= 31
+        for n, (object_node, camera) in enumerate(zip(object_nodes, cameras)):
+            camera_mask = p3d.core.BitMask32.bit(n)
+            camera.node_path.node().setCameraMask(camera_mask)
+            object_node.hide(p3d.core.BitMask32.allOn())
+            object_node.show(camera_mask)
+
+    def use_depth_only_state(self, root_node: p3d.core.NodePath) -> None:
+        """Disables all the render states that do not affect depth."""
+        root_node.set_light_off(1)
+        root_node.set_shader_off(1)
+        root_node.set_texture_off(1)
+        root_node.set_material_off(1)
+        root_node.set_antialias(p3d.core.AntialiasAttrib.MNone, 1)
+        root_node.set_attrib(
+            p3d.core.ColorWriteAttrib.make(p3d.core.ColorWriteAttrib.COff),
+            1,
+        )
+
+    def clear_scene(
+        self,
+        root_node: p3d.core.NodePath,
+        cameras: List[Panda3dCamera],
+        object_nodes: List[p3d.core.NodePath],
+        light_nodes: List[p3d.core.NodePath],
+    ) -> None:
+        """Detaches a scene created by `setup_scene` and releases its cameras."""
+        for camera in cameras:
+            camera.node_path.node().setActive(0)
+            camera.graphics_buffer.setActive(False)
+            camera.node_path.node().setCameraMask(p3d.core.PandaNode.getAllCameraMask())
+        for object_node in object_nodes:
+            object_node.clear_texture()  # TODO: Is this necessary ?
+            object_node.clear_light()  # TODO: Is this necessary ?
+            object_node.detach_node()
+        for light_node in light_nodes:
+            light_node.detach_node()
+        root_node.clear_light()
+        root_node.detach_node()
+
+        for _ in range(3):
+            # TODO: Is this necessary ?
+            p3d.core.RenderState.garbageCollect()
+            p3d.core.TransformState.garbageCollect()
+
     def render_scene(
         self,
         object_datas: List[Panda3dObjectData],
@@ -327,15 +426,68 @@ class Panda3dSceneRenderer:
         render_binary_mask: bool = False,
         copy_arrays: bool = True,
         clear: bool = True,
+        isolate_objects: bool = False,
+        single_frame: bool = False,
+        render_rgb: bool = True,
     ) -> List[CameraRenderingData]:
+        """Renders a scene seen from one or multiple cameras in a single frame.
+
+        If `isolate_objects` is True, there must be as many objects as cameras
+        (at most 31) and camera n only sees object n. This renders several
+        single-object images in one frame.
+
+        By default, normals are rendered in a second frame after re-texturing the
+        objects. If `single_frame` is True, normals are instead rendered in the
+        same frame as rgb and depth, by dedicated cameras that only see
+        normals-textured copies of the objects.
+
+        If `render_rgb` is False, only depth (and binary masks) are rendered,
+        without lights, textures, shaders nor multisampling, using cameras
+        with depth-only buffers. The lights are ignored.
+        """
         if render_binary_mask:
             assert render_depth, "Binary mask can only be rendered if depth is rendered"
+        if not render_rgb:
+            assert render_depth, "Depth must be rendered if rgb is not rendered"
+            assert not render_normals, "Normals can only be rendered with rgb"
+        single_frame = single_frame and render_normals
+        assert not (single_frame and isolate_objects)
 
         start = time.time()
         root_node = self._app.render.attachNewNode("world")
+        if not render_rgb:
+            self.use_depth_only_state(root_node)
         object_nodes = self.setup_scene(root_node, object_datas)
-        cameras = self.setup_cameras(root_node, camera_datas)
-        light_nodes = self.setup_lights(root_node, light_datas)
+        normals_root_node, normals_cameras = None, []
+        if single_frame:
+            cameras = self.setup_cameras(root_node, camera_datas + camera_datas)
+            normals_cameras = cameras[len(camera_datas) :]
+            cameras = cameras[: len(camera_datas)]
+            normals_root_node = root_node.attach_new_node("normals")
+            object_nodes += self.setup_normals_scene(
+                normals_root_node,
+                object_datas,
+                object_nodes,
+            )
+            for camera in cameras:
+                camera.node_path.node().setCameraMask(RGB_CAMERA_MASK)
+            for camera in normals_cameras:
+                camera.node_path.node().setCameraMask(NORMALS_CAMERA_MASK)
+        else:
+            cameras = self.setup_cameras(
+                root_node,
+                camera_datas,
+                depth_only=not render_rgb,
+            )
+        if isolate_objects:
+            self.isolate_objects(object_nodes, cameras)
+        light_nodes = []
+        if render_rgb:
+            light_nodes = self.setup_lights(root_node, light_datas)
+        if normals_root_node is not None:
+            normals_root_node.set_light_off()
+            light_data = Panda3dLightData(light_type="ambient", color=(1, 1, 1, 1))
+            light_nodes += self.setup_lights(normals_root_node, [light_data])
         setup_time = time.time() - start
 
         start = time.time()
@@ -343,8 +495,17 @@ class Panda3dSceneRenderer:
             cameras,
             copy_arrays=copy_arrays,
             render_depth=render_depth,
+            render_rgb=render_rgb,
         )
-        if render_normals:
+        if single_frame:
+            normals_renderings = self.render_images(
+                normals_cameras,
+                copy_arrays=copy_arrays,
+                render_frame=False,
+            )
+            for n, rendering_n in enumerate(renderings):
+                rendering_n.normals = normals_renderings[n].rgb
+        elif render_normals:
             for object_node in object_nodes:
                 self.use_normals_texture(object_node)
                 root_node.clear_light()
@@ -358,33 +519,71 @@ class Panda3dSceneRenderer:
                 rendering_n.normals = normals_renderings[n].rgb
 
         if render_binary_mask:
-            for rendering_n in renderings:
-                assert rendering_n.depth is not None
-                h, w = rendering_n.depth.shape[:2]
-                binary_mask = np.zeros((h, w), dtype=bool)
-                binary_mask[rendering_n.depth[..., 0] > 0] = 1  # (h,w)
-                binary_mask = binary_mask[..., np.newaxis]  # (h,w,1)
-                rendering_n.binary_mask = binary_mask
+            depths = stack_renderings(renderings).depth
+            assert depths is not None
+            binary_masks = depths > 0  # (n,h,w,1)
+            for n, rendering_n in enumerate(renderings):
+                rendering_n.binary_mask = binary_masks[n]
 
         render_time = time.time() - start
 
         if clear:
-            for camera in cameras:
-                camera.node_path.node().setActive(0)
-            for object_node in object_nodes:
-                object_node.clear_texture()  # TODO: Is this necessary ?
-                object_node.clear_light()  # TODO: Is this necessary ?
-                object_node.detach_node()
-            for light_node in light_nodes:
-                light_node.detach_node()
-            root_node.clear_light()
-            root_node.detach_node()
-
-            for _ in range(3):
-                # TODO: Is this necessary ?
-                p3d.core.RenderState.garbageCollect()
-                p3d.core.TransformState.garbageCollect()
+            self.clear_scene(
+                root_node,
+                cameras + normals_cameras,
+                object_nodes,
+                light_nodes,
+            )
 
         self.debug_data.timings["setup_time"] = setup_time
         self.debug_data.timings["render_time"] = render_time
         return renderings
+
+    def setup_normals_scene(
+        self,
+        normals_root_node: p3d.core.NodePath,
+        object_datas: List[Panda3dObjectData],
+        object_nodes: List[p3d.core.NodePath],
+    ) -> List[p3d.core.NodePath]:
+        """Adds normals-textured copies of the objects, only seen by normals cameras."""
+        for object_node in object_nodes:
+            object_node.hide(NORMALS_CAMERA_MASK)
+        normals_object_nodes = self.setup_scene(normals_root_node, object_datas)
+        for object_node, normals_object_node in zip(object_nodes, normals_object_nodes):
+            # Use the final transform, including positioning functions.
+            normals_object_node.setMat(object_node.getMat())
+            self.use_normals_texture(normals_object_node)
+            normals_object_node.hide(p3d.core.BitMask32.allOn())
+            normals_object_node.show(NORMALS_CAMERA_MASK)
+        return normals_object_nodes
+
+
+def stack_renderings(renderings: List[CameraRenderingData]) -> CameraRenderingData:
+    """Stacks the renderings of multiple cameras along a new first axis.
+
+    No copy is made when the renderings are views of the contiguous arrays
+    read back by `Panda3dSceneRenderer.render_images`.
+    """
+
+    def stack(arrays: List[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+        if arrays[0] is None:
+            return None
+        base = arrays[0].base
+        if (
+            isinstance(base, np.ndarray)
+            and base.shape == (len(arrays), *arrays[0].shape)
+            and all(
+                array.base is base
+                and array.ctypes.data == base.ctypes.data + n * base.strides[0]
+                for n, array in enumerate(arrays)
+            )
+        ):
+            return base
+        return np.stack(arrays)
+
+    return CameraRenderingData(
+        rgb=stack([r.rgb for r in renderings]),
+        normals=stack([r.normals for r in renderings]),
+        depth=stack([r.depth for r in renderings]),
+        binary_mask=stack([r.binary_mask for r in renderings]),
+    )
@@ -0,0 +1,265 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import atexit
+import contextlib
+import itertools
+import threading
+import weakref
+from typing import Dict, Iterator, List, Optional
+
+# HappyPose
+from happypose.toolbox.datasets.object_dataset import RigidObjectDataset
+from happypose.toolbox.lib3d.mesh_lod import MeshLODs
+from happypose.toolbox.utils.logging import get_logger
+
+# Local Folder
+from .panda3d_batch_renderer import (
+    Panda3dBatchRenderer,
+    PendingRenders,
+    SceneData,
+    WorkerStats,
+)
+
+logger = get_logger(__name__)
+
+# Renders of higher priority are sent to the workers first.
+RENDER_PRIORITY_COARSE = 0
+RENDER_PRIORITY_REFINER = 1
+RENDER_PRIORITY_SCORING = 2
+
+_RENDER_SERVICE: Optional["RenderService"] = None
+_RENDER_SERVICE_LOCK = threading.Lock()
+
+
+class RenderHandle(Panda3dBatchRenderer):
+    """Renderer of a consumer of a `RenderService`.
+
+    Has the interface of `Panda3dBatchRenderer`, the renders are done by
+    the workers of the service with the priority of the handle.
+    `stop` releases the handle, as well as its garbage collection. The
+    workers are stopped when all the handles of the service are released.
+    """
+
+    def __init__(self, service: "RenderService", priority: int) -> None:
+        self._service = service
+        self.priority = priority
+        self._local = threading.local()
+        self._mesh_lods = service.mesh_lods
+        self._finalizer = service._register(self)
+
+    @property
+    def _is_closed(self) -> bool:
+        return not self._finalizer.alive
+
+    def get_priority(self) -> int:
+        """Priority of the renders submitted by the calling thread."""
+        return getattr(self._local, "priority", self.priority)
+
+    def render_scene_datas_async(
+        self,
+        scene_datas: List[SceneData],
+        render_normals: bool = False,
+        render_depth: bool = False,
+        render_binary_mask: bool = False,
+        render_rgb: bool = True,
+        priority: Optional[int] = None,
+    ) -> PendingRenders:
+        assert not self._is_closed, "The render handle is released"
+        return self._service.get_renderer().render_scene_datas_async(
+            scene_datas,
+            render_normals=render_normals,
+            render_depth=render_depth,
+            render_binary_mask=render_binary_mask,
+            render_rgb=render_rgb,
+            priority=priority if priority is not None else self.get_priority(),
+        )
+
+    def get_worker_stats(self) -> List[WorkerStats]:
+        return self._service.get_renderer().get_worker_stats()
+
+    def stop(self) -> None:
+        # Does nothing if the handle is already released.
+        self._finalizer()
+
+
+class RenderService:
+    """Pool of render workers shared by several consumers.
+
+    The consumers (coarse model, refiner, scoring, ICP...) each get a
+    `RenderHandle` with `get_handle(priority)`. The renders of all the
+    handles are done by the same workers, the renders of higher priority
+    first: with `max_in_flight_per_worker`, the latency-critical renders
+    only wait for a few renders already sent to the workers, not for
+    a whole batch submitted before them.
+
+    The workers are spawned on the first render. They are stopped when
+    all the handles are released (stopped or garbage collected), or with
+    `stop`, and spawned again if a new handle is used.
+    """
+
+    def __init__(
+        self,
+        asset_dataset: RigidObjectDataset,
+        n_workers: int = 4,
+        preload_cache: bool = False,
+        split_objects: bool = True,
+        max_in_flight_per_worker: Optional[int] = 2,
+        mesh_lods: Optional[MeshLODs] = None,
+    ) -> None:
+        self.asset_dataset = asset_dataset
+        self.mesh_lods = mesh_lods
+        self.n_workers = n_workers
+        self.preload_cache = preload_cache
+        self.split_objects = split_objects
+        self.max_in_flight_per_worker = max_in_flight_per_worker
+        self._renderer: Optional[Panda3dBatchRenderer] = None
+        # Finalizers of the handles, they do not keep the handles alive.
+        self._handle_finalizers: Dict[int, weakref.finalize] = {}
+        self._handle_ids = itertools.count()
+        # Reentrant, the finalizers can run during a garbage collection
+        # triggered while the lock is held.
+        self._lock = threading.RLock()
+
+    def get_handle(self, priority: int = RENDER_PRIORITY_COARSE) -> RenderHandle:
+        return RenderHandle(self, priority)
+
+    def _register(self, handle: RenderHandle) -> weakref.finalize:
+        with self._lock:
+            handle_id = next(self._handle_ids)
+            finalizer = weakref.finalize(handle, self._release, handle_id)
+            # The service is stopped at exit by stop_render_service.
+            finalizer.atexit = False
+            self._handle_finalizers[handle_id] = finalizer
+        return finalizer
+
+    def get_renderer(self) -> Panda3dBatchRenderer:
+        """Renderer of the pool, its workers are spawned on the first render."""
+        with self._lock:
+            if self._renderer is None:
+                self._renderer = Panda3dBatchRenderer(
+                    asset_dataset=self.asset_dataset,
+                    n_workers=self.n_workers,
+                    preload_cache=self.preload_cache,
+                    split_objects=self.split_objects,
+                    max_in_flight_per_worker=self.max_in_flight_per_worker,
+                    lazy_start=True,
+                    mesh_lods=self.mesh_lods,
+                )
+            return self._renderer
+
+    @property
+    def n_handles(self) -> int:
+        return len(self._handle_finalizers)
+
+    @property
+    def is_running(self) -> bool:
+        return self._renderer is not None and self._renderer._is_started
+
+    def _release(self, handle_id: int) -> None:
+        with self._lock:
+            del self._handle_finalizers[handle_id]
+            is_unused = len(self._handle_finalizers) == 0
+        if is_unused:
+            self._stop_renderer()
+
+    def stop(self) -> None:
+        """Releases all the handles and stops the workers."""
+        with self._lock:
+            finalizers = list(self._handle_finalizers.values())
+        for finalizer in finalizers:
+            finalizer()
+        self._stop_renderer()
+
+    def _stop_renderer(self) -> None:
+        with self._lock:
+            renderer, self._renderer = self._renderer, None
+        if renderer is not None:
+            logger.debug("Stopping the render service workers.")
+            renderer.stop()
+
+
+def _same_objects(dataset: RigidObjectDataset, other: RigidObjectDataset) -> bool:
+    if dataset is other:
+        return True
+    labels = [obj.label for obj in dataset.list_objects]
+    return labels == [obj.label for obj in other.list_objects]
+
+
+def get_render_service(
+    asset_dataset: Optional[RigidObjectDataset] = None,
+    **kwargs,
+) -> RenderService:
+    """Returns the render service of the process.
+
+    The service is created on the first call, with `asset_dataset` and
+    the `RenderService` kwargs. The following calls return the same
+    service. A call with different objects replaces the service if it
+    has no handle left, and raises a ValueError otherwise.
+    """
+    global _RENDER_SERVICE
+    with _RENDER_SERVICE_LOCK:
+        if _RENDER_SERVICE is not None and _RENDER_SERVICE.n_handles == 0:
+            if asset_dataset is not None and not _same_objects(
+                asset_dataset, _RENDER_SERVICE.asset_dataset
+            ):
+                _RENDER_SERVICE.stop()
+                _RENDER_SERVICE = None
+        if _RENDER_SERVICE is None:
+            if asset_dataset is None:
+                msg = "asset_dataset is required to create the render service"
+                raise ValueError(msg)
+            _RENDER_SERVICE = RenderService(asset_dataset, **kwargs)
+        elif asset_dataset is not None:
+            if not _same_objects(asset_dataset, _RENDER_SERVICE.asset_dataset):
+                msg = (
+                    "The render service is already running with other objects, "
+                    "call stop_render_service first."
+                )
+                raise ValueError(msg)
+        return _RENDER_SERVICE
+
+
+def stop_render_service() -> None:
+    """Stops the render service of the process, if any."""
+    global _RENDER_SERVICE
+    with _RENDER_SERVICE_LOCK:
+        service, _RENDER_SERVICE = _RENDER_SERVICE, None
+    if service is not None:
+        service.stop()
+
+
+atexit.register(stop_render_service)
+
+
+@contextlib.contextmanager
+def render_priority(renderer: Panda3dBatchRenderer, priority: int) -> Iterator[None]:
+    """Renders of the calling thread with `renderer` use `priority`.
+
+    Does nothing if the renderer is not a `RenderHandle`.
+    """
+    if not isinstance(renderer, RenderHandle):
+        yield
+        return
+    previous_priority = getattr(renderer._local, "priority", None)
+    renderer._local.priority = priority
+    try:
+        yield
+    finally:
+        if previous_priority is None:
+            del renderer._local.priority
+        else:
+            renderer._local.priority = previous_priority
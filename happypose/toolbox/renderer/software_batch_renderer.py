@@ -0,0 +1,664 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+from collections import defaultdict
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+# Third Party
+import numpy as np
+import torch
+import trimesh
+
+# HappyPose
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.lib3d.mesh_lod import MeshLODs, get_mesh_texture
+from happypose.toolbox.renderer.types import BatchRenderOutput, Resolution
+from happypose.toolbox.utils.logging import get_logger
+from happypose.toolbox.utils.profiler import profile_function
+
+# Local Folder
+from .panda3d_batch_renderer import Panda3dBatchRenderer, PendingRenders, SceneData
+from .types import Panda3dLightData
+
+logger = get_logger(__name__)
+
+# Largest depth + face index key, for the pixels without any face.
+_EMPTY_KEY = torch.iinfo(torch.int64).max
+
+
+@dataclass
+class SoftwareMesh:
+    """Triangle mesh of an object, in meters.
+
+    vertices: (V, 3) float32
+    faces: (F, 3) int64
+    normals: (V, 3) float32, vertex normals.
+    colors: (V, 3) float32 in [0, 1], vertex colors, white if the mesh has none.
+    uvs: (V, 2) float32, texture coordinates, None if the mesh is not textured.
+    texture: (H, W, 3) float32 in [0, 1], None if the mesh is not textured.
+    radius: radius of the bounding sphere.
+    center: (3,) center of the bounding sphere.
+    """
+
+    vertices: torch.Tensor
+    faces: torch.Tensor
+    normals: torch.Tensor
+    colors: torch.Tensor
+    uvs: Optional[torch.Tensor]
+    texture: Optional[torch.Tensor]
+    radius: float
+    center: torch.Tensor
+
+
+def hpr_to_rotation_matrix(hpr_deg: Tuple[float, float, float]) -> np.ndarray:
+    """Rotation of panda3d's `setHpr` (heading, pitch, roll in degrees)."""
+    h, p, r = np.deg2rad(hpr_deg)
+    Rz = np.array(
+        [[np.cos(h), -np.sin(h), 0], [np.sin(h), np.cos(h), 0], [0, 0, 1]],
+    )
+    Rx = np.array(
+        [[1, 0, 0], [0, np.cos(p), -np.sin(p)], [0, np.sin(p), np.cos(p)]],
+    )
+    Ry = np.array(
+        [[np.cos(r), 0, np.sin(r)], [0, 1, 0], [-np.sin(r), 0, np.cos(r)]],
+    )
+    return Rz @ Rx @ Ry
+
+
+def load_software_mesh(asset: RigidObject) -> SoftwareMesh:
+    """Loads the mesh of an object with the scale and rotation offset of panda3d."""
+    mesh = trimesh.load(str(asset.mesh_path), process=False, force="mesh")
+    scale = asset.scaling_factor_mesh_units_to_meters * asset.scaling_factor
+    R = hpr_to_rotation_matrix(asset.ypr_offset_deg)
+    vertices = (np.asarray(mesh.vertices) * scale) @ R.T
+    normals = np.asarray(mesh.vertex_normals) @ R.T
+
+    colors = np.ones_like(vertices)
+    uvs, texture = None, None
+    visual = mesh.visual
+    if visual.kind == "vertex":
+        colors = np.asarray(visual.vertex_colors)[:, :3] / 255
+    elif get_mesh_texture(visual) is not None:
+        uvs = np.asarray(visual.uv)
+        image = get_mesh_texture(visual).convert("RGB")
+        texture = np.asarray(image, dtype=np.float32) / 255
+
+    center = (vertices.max(0) + vertices.min(0)) / 2
+    radius = float(np.linalg.norm(vertices - center, axis=-1).max())
+    return SoftwareMesh(
+        vertices=torch.as_tensor(vertices, dtype=torch.float32),
+        faces=torch.as_tensor(np.asarray(mesh.faces), dtype=torch.int64),
+        normals=torch.as_tensor(normals, dtype=torch.float32),
+        colors=torch.as_tensor(colors, dtype=torch.float32),
+        uvs=None if uvs is None else torch.as_tensor(uvs, dtype=torch.float32),
+        texture=None if texture is None else torch.as_tensor(texture),
+        radius=radius,
+        center=torch.as_tensor(center, dtype=torch.float32),
+    )
+
+
+@dataclass
+class _InstanceGroup:
+    """Instances of a mesh, whose triangles are contiguous in the rasterized ones.
+
+    start: index of the first triangle of the first instance.
+    R: (n_instances, 3, 3) rotations of the instances in the camera frames.
+    colors: color of each instance, None to use the colors of the mesh.
+    """
+
+    mesh: SoftwareMesh
+    start: int
+    R: torch.Tensor
+    colors: List[Optional[Tuple[float, float, float]]]
+
+
+class _NodeStub:
+    """Stand-in of a panda3d NodePath for the positioning functions of lights."""
+
+    def __init__(self, radius: float = 0.0) -> None:
+        self.radius = radius
+        self.pos = np.zeros(3)
+        self.look_at_point: Optional[np.ndarray] = None
+
+    def getBounds(self) -> SimpleNamespace:
+        return SimpleNamespace(radius=self.radius, getRadius=lambda: self.radius)
+
+    def setPos(self, *pos: float) -> None:
+        self.pos = np.asarray(pos, dtype=float).reshape(3)
+
+    def lookAt(self, *point: float) -> None:
+        self.look_at_point = np.asarray(point, dtype=float).reshape(3)
+
+    get_bounds = getBounds
+    set_pos = setPos
+    look_at = lookAt
+
+
+def rasterize(
+    triangles: torch.Tensor,
+    image_ids: torch.Tensor,
+    K: torch.Tensor,
+    resolution: Resolution,
+    z_near: float = 0.1,
+    z_far: float = 10.0,
+    max_candidates: int = 2**22,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Z-buffer rasterization of triangles into a batch of images.
+
+    The pixels of the bounding box of each triangle are tested, the nearest
+    triangle of each pixel is found with a single `scatter_reduce` of the
+    (depth, triangle index) keys packed in int64. The candidate pixels are
+    processed in chunks of at most `max_candidates`.
+    Triangles with a vertex outside of [z_near, z_far] are not rendered.
+
+    Args:
+    ----
+        triangles: (T, 3, 3) vertices of the triangles, in the camera frame.
+        image_ids: (T,) index of the image of each triangle.
+        K: (N, 3, 3) intrinsics of the N images.
+        resolution: (h, w) of the images.
+
+    Returns:
+    -------
+        triangle_ids: (N, h, w) int64, index of the triangle seen in each pixel,
+            -1 for the background.
+        barycentrics: (N, h, w, 3) perspective-correct barycentric coordinates.
+        depth: (N, h, w) float32, 0 for the background.
+    """
+    h, w = resolution
+    n_images = K.shape[0]
+    device = triangles.device
+    z = triangles[..., 2]
+    keep = ((z >= z_near) & (z <= z_far)).all(dim=-1)
+    triangle_ids = torch.nonzero(keep).flatten()
+    triangles, image_ids = triangles[keep], image_ids[keep]
+
+    K_ = K[image_ids]
+    uv = triangles[..., :2] / triangles[..., 2:]
+    uv = uv * K_[:, None, [0, 1], [0, 1]] + K_[:, None, [0, 1], [2, 2]]
+    coefficients = _plane_coefficients(uv, triangles[..., 2])
+
+    # Pixel (i, j) is sampled at (j + 0.5, i + 0.5).
+    uv_min = torch.ceil(uv.min(dim=1).values - 0.5).long()
+    uv_max = torch.floor(uv.max(dim=1).values - 0.5).long()
+    uv_min = torch.maximum(uv_min, torch.zeros_like(uv_min))
+    uv_max = torch.minimum(uv_max, torch.tensor([w - 1, h - 1], device=device))
+    sizes = (uv_max - uv_min + 1).clamp(min=0)
+    n_candidates = sizes[:, 0] * sizes[:, 1]
+    n_candidates[~torch.isfinite(coefficients).all(dim=-1)] = 0
+    # Offset of the first pixel and width of the box of each triangle.
+    boxes = torch.stack(
+        [(image_ids * h + uv_min[:, 1]) * w + uv_min[:, 0], sizes[:, 0]],
+        dim=-1,
+    )
+
+    keys = torch.full((n_images * h * w,), _EMPTY_KEY, dtype=torch.int64, device=device)
+    ends = torch.cumsum(n_candidates, 0)
+    starts = ends - n_candidates
+    total = int(ends[-1]) if len(ends) > 0 else 0
+    boundaries = torch.arange(
+        max_candidates,
+        total + max_candidates,
+        max_candidates,
+        device=device,
+    )
+    chunk_ends = torch.searchsorted(ends, boundaries, right=True).tolist()
+    chunk_start = 0
+    for chunk_end in chunk_ends:
+        chunk = slice(chunk_start, min(max(chunk_end, chunk_start + 1), len(ends)))
+        chunk_start = chunk.stop
+        n_chunk = n_candidates[chunk]
+        if chunk.start >= chunk.stop or n_chunk.sum() == 0:
+            continue
+        tri = torch.repeat_interleave(
+            torch.arange(chunk.start, chunk.stop, device=device),
+            n_chunk,
+        )
+        local = torch.arange(len(tri), device=device) - torch.repeat_interleave(
+            starts[chunk] - starts[chunk.start],
+            n_chunk,
+        )
+        box = boxes[tri]
+        dy = torch.div(local, box[:, 1], rounding_mode="floor")
+        dx = local - dy * box[:, 1]
+        pixels = box[:, 0] + dy * w + dx
+        values = _evaluate_planes(coefficients[tri], pixels, resolution)
+        inside = (values[:, :3] >= 0).all(dim=-1)
+        depth = 1 / values[:, 3]
+        key = (depth.float().view(torch.int32).long() << 32) | tri
+        key[~inside] = _EMPTY_KEY
+        keys.scatter_reduce_(0, pixels, key, reduce="amin")
+
+    fg_pixels = torch.nonzero(keys != _EMPTY_KEY).flatten()
+    fg_keys = keys[fg_pixels]
+    fg_tri = fg_keys & 0xFFFFFFFF
+    values = _evaluate_planes(coefficients[fg_tri], fg_pixels, resolution)
+    bary = values[:, :3].clamp(min=0) / triangles[fg_tri, :, 2]
+    bary = bary / bary.sum(dim=-1, keepdim=True)
+
+    out_triangle_ids = torch.full((n_images * h * w,), -1, device=device)
+    out_triangle_ids[fg_pixels] = triangle_ids[fg_tri]
+    out_barycentrics = torch.zeros(n_images * h * w, 3, device=device)
+    out_barycentrics[fg_pixels] = bary
+    out_depth = torch.zeros(n_images * h * w, device=device)
+    out_depth[fg_pixels] = (fg_keys >> 32).int().view(torch.float32)
+    return (
+        out_triangle_ids.view(n_images, h, w),
+        out_barycentrics.view(n_images, h, w, 3),
+        out_depth.view(n_images, h, w),
+    )
+
+
+def _plane_coefficients(uv: torch.Tensor, z: torch.Tensor) -> torch.Tensor:
+    """Screen-space planes of the barycentric coordinates and inverse depth.
+
+    Returns (T, 12) coefficients (a, b, c) of the 3 barycentric coordinates
+    and of 1/z, whose value at (x, y) is a * x + b * y + c. They are not finite
+    for the degenerate triangles.
+    """
+    u, v = uv[..., 0], uv[..., 1]
+    u1, u2 = u.roll(-1, dims=1), u.roll(-2, dims=1)
+    v1, v2 = v.roll(-1, dims=1), v.roll(-2, dims=1)
+    # Edge functions of the edges opposite to each vertex.
+    a, b, c = v1 - v2, u2 - u1, u1 * v2 - u2 * v1
+    area = c.sum(dim=-1, keepdim=True)
+    planes = torch.stack([a, b, c], dim=-1) / area.unsqueeze(-1)
+    inv_depth = (planes / z.unsqueeze(-1)).sum(dim=1, keepdim=True)
+    return torch.cat([planes, inv_depth], dim=1).flatten(1)
+
+
+def _evaluate_planes(
+    coefficients: torch.Tensor,
+    pixels: torch.Tensor,
+    resolution: Resolution,
+) -> torch.Tensor:
+    """Values of the planes at the centers of the pixels, (P, 4).
+
+    pixels: (P,) indices of the pixels in the flattened (N, h, w) images.
+    """
+    h, w = resolution
+    x = (pixels % w).to(coefficients.dtype) + 0.5
+    y = (torch.div(pixels, w, rounding_mode="floor") % h).to(coefficients.dtype)
+    y = y + 0.5
+    coefficients = coefficients.view(-1, 4, 3)
+    return (
+        coefficients[..., 0] * x.unsqueeze(-1)
+        + coefficients[..., 1] * y.unsqueeze(-1)
+        + coefficients[..., 2]
+    )
+
+
+class SoftwareBatchRenderer(Panda3dBatchRenderer):
+    """Renders batches of images with a z-buffer rasterizer in torch.
+
+    Drop-in replacement of `Panda3dBatchRenderer` that does not need
+    OpenGL, for the machines without GPU. All the images of a batch are
+    rasterized together, in the calling process, on `device`.
+
+    The objects are shaded with the ambient, point and directional lights of
+    the scenes, with the texture or vertex colors of the meshes, or with the
+    color of the `Panda3dObjectData`. Unlike panda3d, the images are not
+    antialiased and the materials of the meshes are ignored.
+    The positioning functions of the lights are called with a stand-in of
+    panda3d's nodes, which supports `getBounds().radius`, `setPos` and
+    `lookAt`, as used by `make_scene_lights`.
+    """
+
+    def __init__(
+        self,
+        asset_dataset: RigidObjectDataset,
+        preload_cache: bool = False,
+        device: str = "cpu",
+        max_candidates: int = 2**22,
+        mesh_lods: Optional[MeshLODs] = None,
+    ):
+        self._is_closed = False
+        self._mesh_lods = mesh_lods
+        if mesh_lods is not None:
+            asset_dataset = mesh_lods.make_object_dataset()
+        self._object_dataset = asset_dataset
+        self._scheduler = None
+        self.device = torch.device(device)
+        self.max_candidates = max_candidates
+        self._label_to_mesh: Dict[str, SoftwareMesh] = {}
+        if preload_cache:
+            for obj in asset_dataset.list_objects:
+                self.get_mesh(obj.label)
+
+    def get_mesh(self, label: str) -> SoftwareMesh:
+        if label not in self._label_to_mesh:
+            asset = self._object_dataset.get_object_by_label(label)
+            mesh = load_software_mesh(asset)
+            self._label_to_mesh[label] = SoftwareMesh(
+                **{
+                    k: v.to(self.device) if isinstance(v, torch.Tensor) else v
+                    for k, v in mesh.__dict__.items()
+                },
+            )
+        return self._label_to_mesh[label]
+
+    def start(self) -> None:
+        assert not self._is_closed, "The renderer is stopped"
+
+    def render_scene_datas_async(
+        self,
+        scene_datas: List[SceneData],
+        render_normals: bool = False,
+        render_depth: bool = False,
+        render_binary_mask: bool = False,
+        render_rgb: bool = True,
+        priority: int = 0,
+    ) -> PendingRenders:
+        """Renders the scenes, the returned renders are already done."""
+        if not render_rgb:
+            assert render_depth, "Depth must be rendered if rgb is not rendered"
+            assert not render_normals, "Normals can only be rendered with rgb"
+        self.start()
+        pending = PendingRenders(
+            self,
+            list(range(len(scene_datas))),
+            render_normals=render_normals,
+            render_depth=render_depth,
+            render_binary_mask=render_binary_mask,
+            render_rgb=render_rgb,
+        )
+        pending._output = self.render_scene_datas_now(
+            scene_datas,
+            render_normals=render_normals,
+            render_depth=render_depth,
+            render_binary_mask=render_binary_mask,
+            render_rgb=render_rgb,
+        )
+        pending._n_received = len(scene_datas)
+        return pending
+
+    @profile_function("render")
+    def render_scene_datas_now(
+        self,
+        scene_datas: List[SceneData],
+        render_normals: bool = False,
+        render_depth: bool = False,
+        render_binary_mask: bool = False,
+        render_rgb: bool = True,
+    ) -> BatchRenderOutput:
+        """Rasterizes the images of all the cameras of the scenes.
+
+        The images are in the order of the scenes, then of their cameras.
+        """
+        device = self.device
+        cameras = [camera for scene in scene_datas for camera in scene.camera_datas]
+        resolutions = {tuple(camera.resolution) for camera in cameras}
+        assert len(resolutions) == 1, "All the cameras must have the same resolution"
+        h, w = resolutions.pop()
+        z_near = {camera.z_near for camera in cameras}
+        z_far = {camera.z_far for camera in cameras}
+        assert len(z_near) == 1 and len(z_far) == 1
+
+        # Objects seen by each camera, grouped by label.
+        label_to_instances: Dict[str, List[Tuple]] = defaultdict(list)
+        image_id = 0
+        for scene in scene_datas:
+            for camera in scene.camera_datas:
+                assert camera.positioning_function is None
+                TCW = np.linalg.inv(camera.TWC.toHomogeneousMatrix())
+                for object_data in scene.object_datas:
+                    assert object_data.positioning_function is None
+                    TCO = TCW @ object_data.TWO.toHomogeneousMatrix()
+                    label_to_instances[object_data.label].append(
+                        (image_id, TCO, object_data.scale, object_data.color),
+                    )
+                image_id += 1
+
+        groups, triangles, image_ids = [], [], []
+        n_triangles = 0
+        for label, instances in label_to_instances.items():
+            mesh = self.get_mesh(label)
+            image_ids_, TCO, scales, colors = zip(*instances)
+            TCO = torch.as_tensor(np.stack(TCO), dtype=torch.float32).to(device)
+            scales = torch.as_tensor(scales, dtype=torch.float32).to(device)
+            vertices = (mesh.vertices * scales[:, None, None]) @ TCO[:, :3, :3].mT
+            vertices = vertices + TCO[:, None, :3, 3]
+            triangles.append(vertices[:, mesh.faces].flatten(0, 1))
+            image_ids.append(
+                torch.as_tensor(image_ids_, device=device).repeat_interleave(
+                    len(mesh.faces),
+                ),
+            )
+            groups.append(
+                _InstanceGroup(
+                    mesh=mesh,
+                    start=n_triangles,
+                    R=TCO[:, :3, :3],
+                    colors=[None if c is None else tuple(c[:3]) for c in colors],
+                ),
+            )
+            n_triangles += len(instances) * len(mesh.faces)
+
+        K = torch.stack(
+            [torch.as_tensor(camera.K, dtype=torch.float32) for camera in cameras],
+        ).to(device)
+        triangle_ids, barycentrics, depth = rasterize(
+            torch.cat(triangles),
+            torch.cat(image_ids),
+            K,
+            (h, w),
+            z_near=z_near.pop(),
+            z_far=z_far.pop(),
+            max_candidates=self.max_candidates,
+        )
+        mask = triangle_ids >= 0
+
+        rgbs, normals = None, None
+        if render_rgb or render_normals:
+            fg_normals, fg_colors = self._interpolate(
+                groups,
+                triangle_ids[mask],
+                barycentrics[mask],
+            )
+        if render_rgb:
+            fg_pixels = torch.nonzero(mask)
+            fg_uv = fg_pixels[:, [2, 1]].float() + 0.5
+            K_fg = K[fg_pixels[:, 0]]
+            fg_points = torch.cat(
+                [
+                    (fg_uv - K_fg[:, :2, 2]) / K_fg[:, [0, 1], [0, 1]],
+                    torch.ones_like(fg_uv[:, :1]),
+                ],
+                dim=-1,
+            ) * depth[mask].unsqueeze(-1)
+            rgbs = torch.zeros(len(cameras), h, w, 3, device=device)
+            rgbs[mask] = self._shade(
+                scene_datas,
+                fg_normals,
+                fg_points,
+                fg_pixels[:, 0],
+                fg_colors,
+            )
+            # Same quantization as the panda3d renders.
+            rgbs = (rgbs * 255).to(torch.uint8).float().permute(0, 3, 1, 2) / 255
+        if render_normals:
+            normals = torch.zeros(len(cameras), h, w, 3, device=device)
+            normals[mask] = encode_normals(fg_normals)
+            normals = normals.permute(0, 3, 1, 2)
+        return BatchRenderOutput(
+            rgbs=rgbs,
+            normals=normals,
+            depths=depth.unsqueeze(1) if render_depth else None,
+            binary_masks=mask.unsqueeze(1) if render_binary_mask else None,
+        )
+
+    def _interpolate(
+        self,
+        groups: List["_InstanceGroup"],
+        triangle_ids: torch.Tensor,
+        barycentrics: torch.Tensor,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Normals (camera frame) and colors before shading of the pixels."""
+        device = self.device
+        normals = torch.zeros(len(triangle_ids), 3, device=device)
+        colors = torch.ones(len(triangle_ids), 3, device=device)
+        barycentrics = barycentrics.unsqueeze(-1)
+        for group in groups:
+            mesh = group.mesh
+            n_faces = len(mesh.faces)
+            end = group.start + len(group.R) * n_faces
+            in_group = torch.nonzero(
+                (triangle_ids >= group.start) & (triangle_ids < end),
+            ).flatten()
+            if len(in_group) == 0:
+                continue
+            local_ids = triangle_ids[in_group] - group.start
+            instance_ids = torch.div(local_ids, n_faces, rounding_mode="floor")
+            faces = mesh.faces[local_ids - instance_ids * n_faces]
+            bary = barycentrics[in_group]
+            normals_ = (mesh.normals[faces] * bary).sum(1)
+            normals[in_group] = (group.R[instance_ids] * normals_.unsqueeze(1)).sum(-1)
+            if mesh.texture is not None:
+                uv = (mesh.uvs[faces] * bary).sum(1)
+                th, tw = mesh.texture.shape[:2]
+                tx = (uv[:, 0] % 1 * tw).long().clamp(max=tw - 1)
+                ty = ((1 - uv[:, 1] % 1) * th).long().clamp(max=th - 1)
+                colors_ = mesh.texture[ty, tx]
+            else:
+                colors_ = (mesh.colors[faces] * bary).sum(1)
+            if any(color is not None for color in group.colors):
+                has_color = torch.as_tensor(
+                    [color is not None for color in group.colors],
+                    device=device,
+                )
+                instance_colors = torch.as_tensor(
+                    [(1.0, 1.0, 1.0) if c is None else c for c in group.colors],
+                    dtype=torch.float32,
+                    device=device,
+                )
+                colors_ = torch.where(
+                    has_color[instance_ids].unsqueeze(-1),
+                    instance_colors[instance_ids],
+                    colors_,
+                )
+            colors[in_group] = colors_
+        return torch.nn.functional.normalize(normals, dim=-1), colors
+
+    def _shade(
+        self,
+        scene_datas: List[SceneData],
+        normals: torch.Tensor,
+        points: torch.Tensor,
+        pixel_image_ids: torch.Tensor,
+        base_colors: torch.Tensor,
+    ) -> torch.Tensor:
+        """Colors of the pixels lit by the lights of their scene (camera frame)."""
+        device = self.device
+        ambient, lights = [], []
+        for scene in scene_datas:
+            radius = self._scene_radius(scene)
+            for camera in scene.camera_datas:
+                TCW = np.linalg.inv(camera.TWC.toHomogeneousMatrix())
+                ambient_, lights_ = light_colors_and_positions(
+                    scene.light_datas,
+                    TCW,
+                    radius,
+                )
+                ambient.append(ambient_)
+                lights.append(lights_)
+        n_lights = max([len(lights_) for lights_ in lights] + [1])
+        light_params = torch.zeros(len(lights), n_lights, 7)
+        for n, lights_ in enumerate(lights):
+            if len(lights_) > 0:
+                light_params[n, : len(lights_)] = torch.as_tensor(
+                    np.stack(lights_),
+                    dtype=torch.float32,
+                )
+        light_params = light_params.to(device)[pixel_image_ids]
+        ambient = torch.as_tensor(np.stack(ambient), dtype=torch.float32)
+        ambient = ambient.to(device)[pixel_image_ids]
+        # light_params: (is_point, xyz, rgb), xyz is the position of point
+        # lights and the direction towards directional lights.
+        is_point = light_params[..., :1]
+        to_light = light_params[..., 1:4] - is_point * points.unsqueeze(1)
+        to_light = torch.nn.functional.normalize(to_light, dim=-1)
+        diffuse = (to_light * normals.unsqueeze(1)).sum(-1, keepdim=True).clamp(min=0)
+        colors = ambient + (diffuse * light_params[..., 4:]).sum(1)
+        return (base_colors * colors).clamp(0, 1)
+
+    def _scene_radius(self, scene: SceneData) -> float:
+        """Radius of the bounding sphere of the objects of a scene."""
+        centers, radii = [], []
+        for object_data in scene.object_datas:
+            mesh = self.get_mesh(object_data.label)
+            TWO = object_data.TWO.toHomogeneousMatrix()
+            center = mesh.center.cpu().numpy() * object_data.scale
+            centers.append(TWO[:3, :3] @ center + TWO[:3, 3])
+            radii.append(mesh.radius * object_data.scale)
+        centers = np.stack(centers)
+        scene_center = centers.mean(0)
+        return float(
+            max(np.linalg.norm(centers - scene_center, axis=-1) + np.array(radii)),
+        )
+
+    def get_worker_stats(self) -> List:
+        return []
+
+    def stop(self) -> None:
+        self._is_closed = True
+        self._label_to_mesh = {}
+
+
+def light_colors_and_positions(
+    light_datas: List[Panda3dLightData],
+    TCW: np.ndarray,
+    scene_radius: float,
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Ambient color and (is_point, xyz, rgb) of the other lights, camera frame."""
+    ambient = np.zeros(3)
+    lights = []
+    for light_data in light_datas:
+        color = np.asarray(light_data.color[:3], dtype=float)
+        if light_data.light_type == "ambient":
+            ambient += color
+            continue
+        node = _NodeStub()
+        if light_data.positioning_function is not None:
+            light_data.positioning_function(_NodeStub(scene_radius), node)
+        if light_data.light_type == "point":
+            xyz = TCW[:3, :3] @ node.pos + TCW[:3, 3]
+            lights.append(np.concatenate([[1.0], xyz, color]))
+        elif light_data.light_type == "directional":
+            # Directional lights shine along +y of their node, or to the
+            # point they look at.
+            direction = np.array([0.0, 1.0, 0.0])
+            if node.look_at_point is not None:
+                direction = node.look_at_point - node.pos
+            direction = direction / max(np.linalg.norm(direction), 1e-12)
+            lights.append(np.concatenate([[0.0], -TCW[:3, :3] @ direction, color]))
+        else:
+            raise NotImplementedError(light_data.light_type)
+    return ambient, lights
+
+
+def encode_normals(normals: torch.Tensor, size: int = 32) -> torch.Tensor:
+    """Colors of the camera-frame normals, as rendered by panda3d.
+
+    Panda3d renders the eye-space normals with the linearly filtered 3d
+    texture of `make_rgb_texture_normal_map`, whose coordinates wrap in [0, 1].
+    """
+    # Panda3d's eye space: x right, y forward, z up.
+    normals_eye = torch.stack([normals[:, 0], normals[:, 2], -normals[:, 1]], dim=-1)
+    texels = torch.remainder(normals_eye, 1.0) * size - 0.5
+    colors = texels.clamp(0, size - 1) * 255 / size
+    return colors.to(torch.uint8).float() / 255
@@ -54,7 +54,7 @@ class BatchRenderOutput:
     binary_masks: (bsz, 1, h, w) bool.
     """
 
-    rgbs: torch.Tensor
+    rgbs: Optional[torch.Tensor]
     normals: Optional[torch.Tensor]
     depths: Optional[torch.Tensor]
     binary_masks: Optional[torch.Tensor]
@@ -64,17 +64,23 @@ class BatchRenderOutput:
 class WorkerRenderOutput:
     """
     data_id: int
-    rgb: (h, w, 3) uint8
-    normals: (h, w, 3) uint8
-    depth: (h, w, 1) float32
-    binary_mask: (h, w, 1) bool
+    rgb: (n_cameras, h, w, 3) uint8
+    normals: (n_cameras, h, w, 3) uint8
+    depth: (n_cameras, h, w, 1) float32
+    binary_mask: (n_cameras, h, w, 1) bool
+    render_time: time spent by the worker on this render, in seconds.
+    start_time: time.time() at the start of the render.
+    worker_id: id of the worker that rendered the scene.
     """
 
     data_id: int
-    rgb: torch.Tensor
+    rgb: Optional[torch.Tensor]
     normals: Optional[torch.Tensor]
     depth: Optional[torch.Tensor]
     binary_mask: Optional[torch.Tensor]
+    render_time: float = 0.0
+    start_time: float = 0.0
+    worker_id: int = 0
 
 
 @dataclass
@@ -86,7 +92,7 @@ class CameraRenderingData:
     binary_mask: (h, w, 1) np.bool_.
     """
 
-    rgb: np.ndarray
+    rgb: Optional[np.ndarray]
     normals: Optional[np.ndarray] = None
     depth: Optional[np.ndarray] = None
     binary_mask: Optional[np.ndarray] = None
@@ -193,15 +199,22 @@ class Panda3dCamera:
     window_properties: p3d.core.WindowProperties
     graphics_buffer: p3d.core.GraphicsOutput
     resolution: Resolution
-    texture: p3d.core.Texture
+    texture: Optional[p3d.core.Texture]
     depth_texture: p3d.core.Texture
+    depth_only: bool = False
 
     @staticmethod
     def create(
         name: str,
         resolution: Resolution,
         app: Optional[ShowBase] = None,
+        depth_only: bool = False,
     ) -> "Panda3dCamera":
+        """Creates a camera rendering into its own offscreen buffer.
+
+        If `depth_only` is True, the buffer is not multisampled and only
+        the depth texture is copied to RAM, `get_rgb_image` cannot be used.
+        """
         if app is None:
             app = base  # type: ignore # noqa: F821
         window_props = p3d.core.WindowProperties.getDefault()
@@ -209,6 +222,9 @@ class Panda3dCamera:
         window_props.setSize(*resolution_)
 
         frame_buffer_props = p3d.core.FrameBufferProperties.getDefault()
+        if depth_only:
+            frame_buffer_props = p3d.core.FrameBufferProperties(frame_buffer_props)
+            frame_buffer_props.set_multisamples(0)
         graphics_buffer = app.graphicsEngine.make_output(
             app.pipe,
             f"Graphics Buffer [{name}]",
@@ -220,11 +236,13 @@ class Panda3dCamera:
             app.win,
         )
 
-        texture = p3d.core.Texture()
-        graphics_buffer.addRenderTexture(
-            texture,
-            p3d.core.GraphicsOutput.RTMCopyRam,
-        )
+        texture = None
+        if not depth_only:
+            texture = p3d.core.Texture()
+            graphics_buffer.addRenderTexture(
+                texture,
+                p3d.core.GraphicsOutput.RTMCopyRam,
+            )
 
         depth_texture = p3d.core.Texture()
         depth_texture.setFormat(p3d.core.Texture.FDepthComponent)
@@ -253,6 +271,7 @@ class Panda3dCamera:
             resolution=resolution,
             texture=texture,
             depth_texture=depth_texture,
+            depth_only=depth_only,
         )
 
     def get_rgb_image(self) -> np.ndarray:
@@ -262,6 +281,7 @@ class Panda3dCamera:
         -------
             np.ndarray: (h, w, 3) uint8 array
         """
+        assert not self.depth_only, "Depth-only cameras do not render rgb"
         # TODO : Extract data from the rgb texture ?
         # Is screenshot creating a
         texture = self.display_region.get_screenshot()
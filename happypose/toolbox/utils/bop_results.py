@@ -0,0 +1,238 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+# Standard Library
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence, Union
+
+# Third Party
+import numpy as np
+import pandas as pd
+import torch
+
+# HappyPose
+import happypose.toolbox.utils.tensor_collection as tc
+
+BOP_RESULTS_HEADER = "scene_id,im_id,obj_id,score,R,t,time"
+
+# Values of a line: scene_id, im_id, obj_id, score, R (row-major), t and time.
+N_VALUES = 17
+
+# Number of rows formatted or parsed at once, and approximate size of a row.
+CHUNK_SIZE = 100_000
+LINE_BYTES = 200
+
+
+def _line_format(float_digits: int) -> str:
+    """Format of a line of the results, for the values of `_result_values`."""
+    float_fmt = f"%.{float_digits}g"
+    R_fmt = " ".join(9 * [float_fmt])
+    t_fmt = " ".join(3 * [float_fmt])
+    return f"%d,%d,%d,%r,{R_fmt},{t_fmt},%r\n"
+
+
+def _format_chunk(values: np.ndarray, line_format: str) -> str:
+    return (line_format * len(values)) % tuple(values.ravel().tolist())
+
+
+def _result_values(
+    predictions: tc.PandasTensorCollection,
+    score_column: str,
+) -> np.ndarray:
+    """Values (N, N_VALUES) of the lines, with t in mm."""
+    infos = predictions.infos
+    poses = predictions.poses.detach().cpu().to(torch.float64).numpy()
+    # 'ycbv-obj_000001' -> 1, parsed once per label.
+    codes, labels = pd.factorize(infos["label"])
+    obj_ids = np.array([int(label.rsplit("_", 1)[-1]) for label in labels])[codes]
+    if "time" in infos:
+        times = infos["time"].to_numpy(np.float64)
+    else:
+        times = np.full(len(infos), -1.0)
+    return np.concatenate(
+        [
+            infos["scene_id"].to_numpy(np.float64)[:, None],
+            infos["view_id"].to_numpy(np.float64)[:, None],
+            obj_ids.astype(np.float64)[:, None],
+            infos[score_column].to_numpy(np.float64)[:, None],
+            poses[:, :3, :3].reshape(-1, 9),
+            poses[:, :3, 3] * 1e3,  # m -> mm conversion
+            times[:, None],
+        ],
+        axis=1,
+    )
+
+
+def write_bop_results(
+    path: Union[str, Path],
+    predictions: tc.PandasTensorCollection,
+    score_column: str = "score",
+    chunk_size: int = CHUNK_SIZE,
+    n_workers: int = 0,
+) -> Path:
+    """Writes the predictions in the csv format of the BOP challenge.
+
+    The lines are formatted column-wise by chunks of chunk_size rows, in
+    n_workers processes if n_workers > 0, instead of building one dict per
+    prediction for bop_toolkit_lib.inout.save_bop_results.
+
+    Args:
+    ----
+        path: csv file, e.g. <method>_ycbv-test.csv.
+        predictions: infos with the columns scene_id, view_id, label
+            (e.g. 'ycbv-obj_000001'), score_column and optionally time,
+            and the poses TCO (N, 4, 4) in meters.
+        score_column: column of the infos used as score, e.g. 'pose_score'.
+        chunk_size: number of lines formatted at once.
+        n_workers: number of processes formatting the chunks.
+    """
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    values = _result_values(predictions, score_column)
+    # Shortest representation of the float32 poses that reads back exactly.
+    float_digits = 9 if predictions.poses.dtype == torch.float32 else 17
+    line_format = _line_format(float_digits)
+    chunks = [values[i : i + chunk_size] for i in range(0, len(values), chunk_size)]
+    with path.open("w") as f:
+        f.write(BOP_RESULTS_HEADER + "\n")
+        if n_workers > 0 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                lines = executor.map(_format_chunk, chunks, len(chunks) * [line_format])
+                f.writelines(lines)
+        else:
+            f.writelines(_format_chunk(chunk, line_format) for chunk in chunks)
+    return path
+
+
+def read_bop_results(path: Union[str, Path]) -> tc.PandasTensorCollection:
+    """Reads the results in the csv format of the BOP challenge.
+
+    The lines are parsed by chunks of about chunk_size rows, all the values
+    of a chunk at once.
+
+    Returns
+    -------
+        The infos with the columns scene_id, view_id, obj_id, score and time,
+        and the poses TCO (N, 4, 4) in meters, as written by write_bop_results.
+    """
+    chunks = [np.zeros(0)]
+    with Path(path).open() as f:
+        header = f.readline().strip()
+        if header != BOP_RESULTS_HEADER:
+            raise ValueError(f"{path} does not start with {BOP_RESULTS_HEADER}.")
+        while True:
+            lines = f.readlines(CHUNK_SIZE * LINE_BYTES)
+            if not lines:
+                break
+            text = "".join(lines).replace(",", " ")
+            chunks.append(np.fromstring(text, sep=" "))
+    values = np.concatenate(chunks).reshape(-1, N_VALUES)
+
+    n = len(values)
+    poses = np.tile(np.eye(4), (n, 1, 1))
+    poses[:, :3, :3] = values[:, 4:13].reshape(n, 3, 3)
+    poses[:, :3, 3] = values[:, 13:16] / 1e3  # mm -> m conversion
+    infos = pd.DataFrame(
+        {
+            "scene_id": values[:, 0].astype(np.int64),
+            "view_id": values[:, 1].astype(np.int64),
+            "obj_id": values[:, 2].astype(np.int64),
+            "score": values[:, 3],
+            "time": values[:, 16],
+        }
+    )
+    return tc.PandasTensorCollection(infos, poses=torch.as_tensor(poses))
+
+
+def iter_json_list(
+    path: Union[str, Path],
+    drop_keys: Sequence[str] = (),
+    read_size: int = 1 << 20,
+) -> Iterator[Any]:
+    """Iterates over the items of a json file containing a list.
+
+    The file is decoded by blocks of read_size characters, so the text of
+    the file is never entirely in memory, and the drop_keys of the items
+    (e.g. the 'segmentation' of the detections) are removed as soon as the
+    item is decoded.
+    """
+    decoder = json.JSONDecoder()
+    with Path(path).open() as f:
+        buffer = ""
+        while not buffer:
+            block = f.read(read_size)
+            buffer = block.lstrip()
+            if not block:
+                break
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a json list.")
+        buffer = buffer[1:]
+        pos = 0
+        eof = False
+        while True:
+            # Skip the separators between the items.
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The item is cut by the end of the buffer.
+                if eof:
+                    raise
+                end = None
+            if end is None or (end == len(buffer) and not eof):
+                block = f.read(read_size)
+                eof = len(block) == 0
+                buffer = buffer[pos:] + block
+                pos = 0
+                continue
+            if isinstance(item, dict):
+                for key in drop_keys:
+                    item.pop(key, None)
+            yield item
+            pos = end
+
+
+def load_bop_detections(
+    path: Union[str, Path],
+    label_prefix: Optional[str] = None,
+) -> pd.DataFrame:
+    """Loads detections in the json format of the BOP challenge.
+
+    Returns
+    -------
+        One row per detection with the columns of the file, except the
+        segmentation, and bbox / bbox_modal converted to [x1, y1, x2, y2].
+        If label_prefix is given, e.g. 'ycbv', the labels of the objects
+        ('ycbv-obj_000001') are added in the column label.
+    """
+    df = pd.DataFrame.from_records(iter_json_list(path, drop_keys=("segmentation",)))
+    if len(df) == 0:
+        return df
+    # BOP format: [xmin, ymin, width, height]
+    bboxes = np.array(df["bbox"].tolist(), dtype=np.float64).reshape(-1, 4)
+    bboxes[:, 2:] += bboxes[:, :2]
+    df["bbox"] = bboxes.tolist()
+    df["bbox_modal"] = df["bbox"]
+    if label_prefix is not None:
+        obj_ids = df["category_id"].astype(str).str.zfill(6)
+        df["label"] = f"{label_prefix}-obj_" + obj_ids
+    return df
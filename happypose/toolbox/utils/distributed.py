@@ -16,9 +16,10 @@ limitations under the License.
 # Standard Library
 import datetime
 import os
+import pickle
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
 import omegaconf
 
@@ -32,6 +33,9 @@ from happypose.toolbox.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Size of the byte tensors used to send the pickled objects, 64MB.
+DEFAULT_CHUNK_SIZE = 2**26
+
 
 def get_tmp_dir() -> Path:
     if "JOB_DIR" in os.environ:
@@ -47,18 +51,14 @@ def sync_config(
     cfg: omegaconf.dictconfig.DictConfig,
     local_fields: List[str] = [],
 ) -> omegaconf.dictconfig.DictConfig:
-    cfg_path = get_tmp_dir() / "config.yaml"
-    if get_rank() == 0:
-        OmegaConf.save(cfg, cfg_path)
-    dist.barrier()
+    """Config of rank 0, except for the local_fields of this rank."""
     my_cfg = cfg
-    loaded_cfg = OmegaConf.load(cfg_path)
+    loaded_cfg = OmegaConf.create(broadcast_object(OmegaConf.to_yaml(cfg)))
     assert isinstance(loaded_cfg, omegaconf.dictconfig.DictConfig)
     cfg = loaded_cfg
     for local_field in local_fields:
         if local_field in my_cfg:
             cfg[local_field] = my_cfg[local_field]
-    dist.barrier()
     return cfg
 
 
@@ -102,6 +102,82 @@ def get_world_size() -> int:
     return world_size
 
 
+def _get_collective_device() -> torch.device:
+    if dist.get_backend() == "nccl":
+        return torch.device("cuda", torch.cuda.current_device())
+    return torch.device("cpu")
+
+
+def _send_object(obj: Any, dst: int, chunk_size: int) -> None:
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    device = _get_collective_device()
+    dist.send(torch.tensor([len(data)], dtype=torch.int64, device=device), dst)
+    for start in range(0, len(data), chunk_size):
+        # Only one chunk of the data is copied into a tensor at a time.
+        chunk = bytearray(data[start : start + chunk_size])
+        dist.send(torch.frombuffer(chunk, dtype=torch.uint8).to(device), dst)
+
+
+def _recv_object(src: int, chunk_size: int) -> Any:
+    device = _get_collective_device()
+    size = torch.zeros(1, dtype=torch.int64, device=device)
+    dist.recv(size, src)
+    data = bytearray(int(size.item()))
+    data_view = memoryview(data)
+    for start in range(0, len(data), chunk_size):
+        chunk = torch.empty(
+            min(chunk_size, len(data) - start),
+            dtype=torch.uint8,
+            device=device,
+        )
+        dist.recv(chunk, src)
+        data_view[start : start + len(chunk)] = chunk.cpu().numpy()
+    data_view.release()
+    return pickle.loads(data)
+
+
+def iter_gathered_objects(
+    obj: Any,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Any]:
+    """Streams the objects of all the ranks to rank 0.
+
+    On rank 0, yields the objects of ranks 0, 1, ..., world_size - 1. The
+    objects are pickled and sent as byte tensors of at most chunk_size bytes,
+    one rank after the other, so rank 0 only holds the serialized object of
+    one rank at a time. This works with the gloo (CPU) and nccl backends and
+    does not need a filesystem shared by the ranks.
+
+    On the other ranks, sends the object and yields nothing. The iterator
+    must be consumed on every rank.
+    """
+    rank, world_size = get_rank(), get_world_size()
+    if rank == 0:
+        yield obj
+        for src in range(1, world_size):
+            yield _recv_object(src, chunk_size)
+    else:
+        _send_object(obj, 0, chunk_size)
+
+
+def gather_objects(
+    obj: Any,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Optional[List[Any]]:
+    """Objects of all the ranks on rank 0, None on the other ranks."""
+    objects = list(iter_gathered_objects(obj, chunk_size=chunk_size))
+    return objects if get_rank() == 0 else None
+
+
+def broadcast_object(obj: Any, src: int = 0) -> Any:
+    """Object of rank src, on every rank."""
+    if get_world_size() == 1:
+        return obj
+    objects = [obj if get_rank() == src else None]
+    dist.broadcast_object_list(objects, src=src, device=_get_collective_device())
+    return objects[0]
+
+
 def reduce_dict(
     input_dict: Dict[str, Any],
     average: bool = True,
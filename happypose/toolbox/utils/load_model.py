@@ -1,8 +1,12 @@
+# Standard Library
+from typing import Optional
+
 # MegaPose
 from happypose.pose_estimators.megapose.config import LOCAL_DATA_DIR
 from happypose.pose_estimators.megapose.inference.icp_refiner import ICPRefiner
 from happypose.pose_estimators.megapose.inference.pose_estimator import PoseEstimator
 from happypose.toolbox.datasets.object_dataset import RigidObjectDataset
+from happypose.toolbox.inference.precision import InferencePrecision
 from happypose.toolbox.inference.utils import load_pose_models
 
 NAMED_MODELS = {
@@ -52,14 +56,19 @@ def load_named_model(
     object_dataset: RigidObjectDataset,
     n_workers: int = 4,
     bsz_images: int = 128,
+    inference_precision: Optional[InferencePrecision] = None,
+    renderer_type: Optional[str] = None,
 ) -> PoseEstimator:
     model = NAMED_MODELS[model_name]
 
-    renderer_kwargs = {
-        "preload_cache": False,
-        "split_objects": False,
-        "n_workers": n_workers,
-    }
+    if renderer_type == "software":
+        renderer_kwargs = {}
+    else:
+        renderer_kwargs = {
+            "preload_cache": False,
+            "split_objects": False,
+            "n_workers": n_workers,
+        }
 
     coarse_model, refiner_model, mesh_db = load_pose_models(
         coarse_run_id=model["coarse_run_id"],
@@ -68,6 +77,7 @@ def load_named_model(
         force_panda3d_renderer=True,
         renderer_kwargs=renderer_kwargs,
         models_root=LOCAL_DATA_DIR / "megapose-models",
+        renderer_type=renderer_type,
     )
 
     depth_refiner = None
@@ -84,5 +94,6 @@ def load_named_model(
         depth_refiner=depth_refiner,
         bsz_objects=8,
         bsz_images=bsz_images,
+        inference_precision=inference_precision,
     )
     return pose_estimator
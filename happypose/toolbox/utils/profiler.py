@@ -0,0 +1,252 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Standard Library
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Union
+
+# Third Party
+import numpy as np
+import torch
+
+_ACTIVE_PROFILER: Optional["Profiler"] = None
+_NULL_SPAN = contextlib.nullcontext()
+
+
+@dataclass
+class ProfilerEvent:
+    """A timed span.
+
+    path: names of the enclosing spans and of this span, joined with '/'.
+    start: start time, as returned by time.time().
+    duration: duration in seconds.
+    thread: name of the thread (or worker) that ran the span.
+    pid: process id.
+    args: additional information shown in the trace.
+    """
+
+    path: str
+    start: float
+    duration: float
+    thread: str
+    pid: int
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+
+class Profiler:
+    """Hierarchical profiler of the inference pipeline.
+
+    Spans are opened with `profiler.span(name)`, or with `profile(name)` in
+    the code instrumented with this module, which does nothing unless a
+    profiler is activated with `profiling`. Nested spans are recorded with
+    the path of their parents, e.g. 'run_inference_pipeline/refiner/render'.
+
+    Example:
+    -------
+        with profiling() as profiler:
+            pose_estimator.run_inference_pipeline(...)
+        print(profiler.summary_str())
+        profiler.save_chrome_trace("trace.json")
+
+    The trace can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+    Args:
+    ----
+        cuda_synchronize: synchronize CUDA at the start and end of each span,
+            so that the spans include the GPU time of their kernels.
+    """
+
+    def __init__(self, cuda_synchronize: bool = False) -> None:
+        self.cuda_synchronize = cuda_synchronize and torch.cuda.is_available()
+        self.events: List[ProfilerEvent] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _get_stack(self) -> List[str]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[None]:
+        stack = self._get_stack()
+        stack.append(name)
+        path = "/".join(stack)
+        if self.cuda_synchronize:
+            torch.cuda.synchronize()
+        start = time.time()
+        try:
+            yield
+        finally:
+            if self.cuda_synchronize:
+                torch.cuda.synchronize()
+            duration = time.time() - start
+            stack.pop()
+            self._append(path, start, duration, threading.current_thread().name, args)
+
+    def add_event(
+        self,
+        name: str,
+        start: float,
+        duration: float,
+        thread: Optional[str] = None,
+        **args: Any,
+    ) -> None:
+        """Records a span measured elsewhere, e.g. in a worker process.
+
+        The span is nested in the current span of the calling thread.
+        """
+        path = "/".join([*self._get_stack(), name])
+        thread = thread if thread is not None else threading.current_thread().name
+        self._append(path, start, duration, thread, args)
+
+    def _append(
+        self,
+        path: str,
+        start: float,
+        duration: float,
+        thread: str,
+        args: Dict[str, Any],
+    ) -> None:
+        event = ProfilerEvent(path, start, duration, thread, os.getpid(), args)
+        with self._lock:
+            self.events.append(event)
+
+    def reset(self) -> None:
+        self.events = []
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Statistics of the spans of each path, times in ms."""
+        path_to_durations = defaultdict(list)
+        for event in self.events:
+            path_to_durations[event.path].append(event.duration * 1000)
+        summary = {}
+        for path, durations in path_to_durations.items():
+            durations = np.array(durations)
+            p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+            summary[path] = {
+                "count": len(durations),
+                "total_ms": float(durations.sum()),
+                "mean_ms": float(durations.mean()),
+                "p50_ms": float(p50),
+                "p90_ms": float(p90),
+                "p99_ms": float(p99),
+                "max_ms": float(durations.max()),
+            }
+        return summary
+
+    def summary_str(self) -> str:
+        """Summary as a text table, children indented below their parents."""
+        summary = self.summary()
+        # Parents first, children in order of appearance.
+        paths = sorted(summary.keys(), key=lambda path: path.split("/"))
+        width = max([len(path.split("/")) * 2 + len(path) for path in paths] + [4])
+        columns = ["count", "total_ms", "mean_ms", "p50_ms", "p90_ms", "p99_ms"]
+        lines = ["span".ljust(width) + "".join(f"{c:>11}" for c in columns)]
+        for path in paths:
+            names = path.split("/")
+            line = ("  " * (len(names) - 1) + names[-1]).ljust(width)
+            line += f"{summary[path]['count']:>11d}"
+            line += "".join(f"{summary[path][c]:>11.2f}" for c in columns[1:])
+            lines.append(line)
+        return "\n".join(lines)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Events in the Chrome trace event format."""
+        thread_ids: Dict[str, int] = {}
+        trace_events = []
+        for event in self.events:
+            tid = thread_ids.setdefault(event.thread, len(thread_ids))
+            trace_events.append(
+                {
+                    "name": event.name,
+                    "cat": "happypose",
+                    "ph": "X",
+                    "ts": event.start * 1e6,
+                    "dur": event.duration * 1e6,
+                    "pid": event.pid,
+                    "tid": tid,
+                    "args": dict(event.args, path=event.path),
+                },
+            )
+        pids = {event.pid for event in self.events}
+        for thread, tid in thread_ids.items():
+            for pid in pids:
+                trace_events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": pid,
+                        "tid": tid,
+                        "args": {"name": thread},
+                    },
+                )
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, path: Union[str, Path]) -> None:
+        Path(path).write_text(json.dumps(self.to_chrome_trace()))
+
+
+def get_profiler() -> Optional[Profiler]:
+    """Returns the active profiler, None if profiling is disabled."""
+    return _ACTIVE_PROFILER
+
+
+@contextlib.contextmanager
+def profiling(profiler: Optional[Profiler] = None) -> Iterator[Profiler]:
+    """Activates a profiler (a new one by default) within the context."""
+    global _ACTIVE_PROFILER
+    profiler = profiler if profiler is not None else Profiler()
+    previous_profiler = _ACTIVE_PROFILER
+    _ACTIVE_PROFILER = profiler
+    try:
+        yield profiler
+    finally:
+        _ACTIVE_PROFILER = previous_profiler
+
+
+def profile(name: str, **args: Any) -> ContextManager:
+    """Span of the active profiler, does nothing if profiling is disabled."""
+    if _ACTIVE_PROFILER is None:
+        return _NULL_SPAN
+    return _ACTIVE_PROFILER.span(name, **args)
+
+
+def profile_function(name: str) -> Callable:
+    """Decorator recording each call of the function as a span."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _ACTIVE_PROFILER is None:
+                return fn(*args, **kwargs)
+            with _ACTIVE_PROFILER.span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,304 @@
+"""Copyright (c) 2022 Inria & NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+# Standard Library
+from typing import Dict, List, Sequence, Tuple, Union
+
+# Third Party
+import numpy as np
+import torch
+
+MasksType = Union[torch.Tensor, np.ndarray]
+IdsType = Union[int, slice, Sequence[int], np.ndarray, torch.Tensor]
+
+
+class RLEMasks:
+    """A batch of binary masks (N, H, W) stored as run-length encodings.
+
+    The runs follow the COCO convention: the pixels of a mask are read in
+    column-major order and the run lengths alternate between background and
+    foreground, starting with a (possibly empty) background run. The run
+    lengths of all the masks are concatenated in `counts`, the runs of the
+    mask n are counts[offsets[n]:offsets[n + 1]].
+
+    The area, the boxes and the IoU are computed on the runs, without
+    decoding the masks. The runs are always stored on the CPU: `to` is a
+    no-op so that the masks can be registered in a PandasTensorCollection,
+    the device of the decoded masks is chosen with `decode`.
+    """
+
+    def __init__(self, counts: np.ndarray, offsets: np.ndarray, size: Tuple[int, int]):
+        self.counts = np.asarray(counts, dtype=np.uint32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.size = (int(size[0]), int(size[1]))
+
+    @classmethod
+    def encode(cls, masks: MasksType) -> RLEMasks:
+        """Encodes the masks (N, H, W), on the device of the masks."""
+        masks = torch.as_tensor(masks)
+        n, h, w = masks.shape
+        padded = torch.zeros((n, h * w + 2), dtype=torch.int8, device=masks.device)
+        padded[:, 1:-1] = masks.bool().transpose(1, 2).reshape(n, h * w)
+        changes = padded[:, 1:] - padded[:, :-1]
+        mask_ids, starts = torch.nonzero(changes == 1, as_tuple=True)
+        ends = torch.nonzero(changes == -1, as_tuple=True)[1]
+        return cls._from_runs(
+            n,
+            (h, w),
+            mask_ids.cpu().numpy(),
+            starts.cpu().numpy(),
+            ends.cpu().numpy(),
+        )
+
+    @classmethod
+    def from_segmentation(
+        cls,
+        segmentation: np.ndarray,
+        ids: Sequence[int],
+    ) -> RLEMasks:
+        """Masks of the (unique) ids of a segmentation (H, W), e.g. SceneObservation."""
+        segmentation = np.asarray(segmentation)
+        ids = np.asarray(ids, dtype=np.int64)
+        values = segmentation.T.ravel()
+        changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+        starts = np.concatenate([[0], changes])
+        ends = np.concatenate([changes, [len(values)]])
+
+        # Mask of each run of the segmentation, if its value is one of the ids.
+        order = np.argsort(ids)
+        pos = np.searchsorted(ids[order], values[starts])
+        is_mask = pos < len(ids)
+        is_mask[is_mask] = ids[order[pos[is_mask]]] == values[starts[is_mask]]
+        mask_ids = order[pos[is_mask]]
+        run_order = np.argsort(mask_ids, kind="stable")
+        return cls._from_runs(
+            len(ids),
+            segmentation.shape,
+            mask_ids[run_order],
+            starts[is_mask][run_order],
+            ends[is_mask][run_order],
+        )
+
+    @classmethod
+    def _from_runs(
+        cls,
+        n: int,
+        size: Tuple[int, int],
+        mask_ids: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+    ) -> RLEMasks:
+        """Masks of the foreground runs [starts, ends), sorted by mask and start."""
+        n_pixels = size[0] * size[1]
+        n_runs = np.bincount(mask_ids, minlength=n)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(2 * n_runs + 1, out=offsets[1:])
+
+        # Boundaries of the runs of each mask: 0, start, end, ..., n_pixels.
+        bound_offsets = offsets + np.arange(n + 1)
+        bounds = np.empty(bound_offsets[-1], dtype=np.int64)
+        bounds[bound_offsets[:-1]] = 0
+        bounds[bound_offsets[1:] - 1] = n_pixels
+        run_offsets = np.cumsum(n_runs) - n_runs
+        run_ids = np.arange(len(mask_ids)) - run_offsets[mask_ids]
+        pos = bound_offsets[mask_ids] + 1 + 2 * run_ids
+        bounds[pos] = starts
+        bounds[pos + 1] = ends
+
+        keep = np.ones(max(len(bounds) - 1, 0), dtype=bool)
+        keep[bound_offsets[1:-1] - 1] = False
+        return cls(np.diff(bounds)[keep], offsets, size)
+
+    @classmethod
+    def from_coco(cls, rles: List[Dict]) -> RLEMasks:
+        """Masks of uncompressed COCO RLEs {'size': [H, W], 'counts': [...]}."""
+        size = tuple(rles[0]["size"]) if rles else (0, 0)
+        assert all(tuple(rle["size"]) == size for rle in rles)
+        counts = [np.asarray(rle["counts"], dtype=np.uint32) for rle in rles]
+        assert all(counts_n.sum() == size[0] * size[1] for counts_n in counts)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum([len(counts_n) for counts_n in counts], out=offsets[1:])
+        counts = np.concatenate(counts) if counts else np.empty(0, dtype=np.uint32)
+        return cls(counts, offsets, size)
+
+    def to_coco(self) -> List[Dict]:
+        """Uncompressed COCO RLEs of the masks."""
+        size = list(self.size)
+        return [
+            {"size": size, "counts": self.counts[start:end].tolist()}
+            for start, end in zip(self.offsets[:-1], self.offsets[1:])
+        ]
+
+    @staticmethod
+    def concatenate(masks: Sequence[RLEMasks]) -> RLEMasks:
+        size = masks[0].size
+        assert all(masks_n.size == size for masks_n in masks)
+        counts = np.concatenate([masks_n.counts for masks_n in masks])
+        starts = np.cumsum([0] + [len(masks_n.counts) for masks_n in masks])
+        offsets = [np.zeros(1, dtype=np.int64)]
+        for start, masks_n in zip(starts, masks):
+            offsets.append(masks_n.offsets[1:] + start)
+        return RLEMasks(counts, np.concatenate(offsets), size)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, ids: IdsType) -> RLEMasks:
+        """Masks of the ids, an int also gives a batch of one mask."""
+        if isinstance(ids, torch.Tensor):
+            ids = ids.cpu().numpy()
+        ids = np.atleast_1d(np.arange(len(self))[ids])
+        lengths = self.offsets[ids + 1] - self.offsets[ids]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        counts_ids = np.repeat(self.offsets[ids] - offsets[:-1], lengths)
+        counts_ids += np.arange(offsets[-1])
+        return RLEMasks(self.counts[counts_ids], offsets, self.size)
+
+    @property
+    def shape(self) -> torch.Size:
+        return torch.Size((len(self), *self.size))
+
+    @property
+    def dtype(self) -> torch.dtype:
+        return torch.bool
+
+    @property
+    def device(self) -> torch.device:
+        return torch.device("cpu")
+
+    @property
+    def nbytes(self) -> int:
+        return self.counts.nbytes + self.offsets.nbytes
+
+    def __repr__(self) -> str:
+        return f"RLEMasks(n={len(self)}, size={self.size}, nbytes={self.nbytes})"
+
+    def to(self, *args, **kwargs) -> RLEMasks:
+        return self
+
+    def clone(self) -> RLEMasks:
+        return RLEMasks(self.counts.copy(), self.offsets.copy(), self.size)
+
+    def _is_foreground(self) -> np.ndarray:
+        """Whether each run is a foreground run, the odd runs of each mask."""
+        is_odd = np.repeat((self.offsets[:-1] % 2).astype(bool), np.diff(self.offsets))
+        return is_odd != (np.arange(len(self.counts)) % 2).astype(bool)
+
+    def _foreground_runs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Mask, start and end pixels of the non-empty foreground runs."""
+        mask_ids = np.repeat(np.arange(len(self)), np.diff(self.offsets))
+        is_foreground = self._is_foreground() & (self.counts > 0)
+        # All the masks have n_pixels pixels, the runs are offset by n_pixels.
+        ends = np.cumsum(self.counts, dtype=np.int64)
+        mask_ids = mask_ids[is_foreground]
+        ends = ends[is_foreground] - mask_ids * (self.size[0] * self.size[1])
+        return mask_ids, ends - self.counts[is_foreground], ends
+
+    def decode(self, device: Union[str, torch.device] = "cpu") -> torch.Tensor:
+        """Boolean masks (N, H, W) on the device."""
+        h, w = self.size
+        masks = torch.repeat_interleave(
+            torch.from_numpy(self._is_foreground()).to(device),
+            torch.from_numpy(self.counts.astype(np.int64)).to(device),
+            output_size=len(self) * h * w,
+        )
+        return masks.view(len(self), w, h).transpose(1, 2).contiguous()
+
+    def area(self) -> torch.Tensor:
+        """Number of pixels (N,) of the masks."""
+        mask_ids, starts, ends = self._foreground_runs()
+        area = np.bincount(mask_ids, ends - starts, minlength=len(self))
+        return torch.from_numpy(area.astype(np.int64))
+
+    def bboxes(self) -> torch.Tensor:
+        """Boxes (N, 4) x1, y1, x2, y2 of the masks, zeros for an empty mask.
+
+        x2 and y2 are exclusive, as the boxes of the BOP annotations.
+        """
+        h = self.size[0]
+        mask_ids, starts, ends = self._foreground_runs()
+        x1, x2 = starts // h, (ends - 1) // h
+        # A run over several columns spans all the rows.
+        is_column = x1 == x2
+        y1 = np.where(is_column, starts % h, 0)
+        y2 = np.where(is_column, (ends - 1) % h, h - 1)
+
+        bboxes = np.zeros((len(self), 4), dtype=np.float32)
+        if len(mask_ids) > 0:
+            first = np.flatnonzero(np.diff(mask_ids, prepend=-1))
+            ids = mask_ids[first]
+            bboxes[ids, 0] = x1[first]
+            bboxes[ids, 1] = np.minimum.reduceat(y1, first)
+            bboxes[ids, 2] = np.maximum.reduceat(x2, first) + 1
+            bboxes[ids, 3] = np.maximum.reduceat(y2, first) + 1
+        return torch.from_numpy(bboxes)
+
+    def elementwise_iou(self, other: RLEMasks) -> torch.Tensor:
+        """IoU (N,) of the pairs of masks self[n], other[n]."""
+        assert len(self) == len(other) and self.size == other.size
+        n_pixels = self.size[0] * self.size[1]
+        positions, steps = [], []
+        union = np.zeros(len(self))
+        for masks in (self, other):
+            mask_ids, starts, ends = masks._foreground_runs()
+            positions += [mask_ids * n_pixels + starts, mask_ids * n_pixels + ends]
+            steps += [np.ones(len(starts), np.int8), -np.ones(len(ends), np.int8)]
+            union += np.bincount(mask_ids, ends - starts, minlength=len(self))
+        positions = np.concatenate(positions)
+        order = np.argsort(positions, kind="stable")
+        positions = positions[order]
+        # Number of masks covering each interval between two run boundaries.
+        coverage = np.cumsum(np.concatenate(steps)[order])[:-1]
+        lengths = np.diff(positions) * (coverage == 2)
+        inter = np.bincount(
+            positions[:-1] // max(n_pixels, 1),
+            lengths,
+            minlength=len(self),
+        )
+        inter = inter[: len(self)]
+        union -= inter
+        return torch.from_numpy(inter / np.maximum(union, 1)).float()
+
+    def iou(self, other: RLEMasks) -> torch.Tensor:
+        """IoU (N, M) of all the pairs of masks of self and other.
+
+        Only the pairs whose boxes overlap are compared on the runs.
+        """
+        bboxes, other_bboxes = self.bboxes(), other.bboxes()
+        x1y1 = torch.max(bboxes[:, None, :2], other_bboxes[None, :, :2])
+        x2y2 = torch.min(bboxes[:, None, 2:], other_bboxes[None, :, 2:])
+        ids, other_ids = torch.nonzero((x2y2 > x1y1).all(-1), as_tuple=True)
+        iou = torch.zeros((len(self), len(other)))
+        iou[ids, other_ids] = self[ids].elementwise_iou(other[other_ids])
+        return iou
+
+    def contains(
+        self,
+        ids: torch.Tensor,
+        y: torch.Tensor,
+        x: torch.Tensor,
+    ) -> torch.Tensor:
+        """Whether the pixels (y, x) are in the masks ids, any shape."""
+        h, w = self.size
+        device = y.device
+        ids, y, x = (torch.as_tensor(t).cpu().numpy() for t in (ids, y, x))
+        positions = ids.astype(np.int64) * (h * w) + x.astype(np.int64) * h + y
+        ends = np.cumsum(self.counts, dtype=np.int64)
+        runs = np.searchsorted(ends, positions, side="right")
+        is_foreground = (runs - self.offsets[ids]) % 2 == 1
+        return torch.from_numpy(is_foreground).to(device)
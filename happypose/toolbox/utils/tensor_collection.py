@@ -14,15 +14,20 @@ limitations under the License.
 """
 
 # Standard Library
-from pathlib import Path
 from typing import List
 
 # Third Party
+import numpy as np
 import pandas as pd
 import torch
 
 # MegaPose
-from happypose.toolbox.utils.distributed import get_rank, get_world_size
+from happypose.toolbox.utils.distributed import (
+    DEFAULT_CHUNK_SIZE,
+    get_rank,
+    iter_gathered_objects,
+)
+from happypose.toolbox.utils.rle_masks import RLEMasks
 
 
 def concatenate(datas):
@@ -38,7 +43,11 @@ def concatenate(datas):
     tensor_keys = datas[0].tensors.keys()
     tensors = {}
     for k in tensor_keys:
-        tensors[k] = torch.cat([getattr(data, k) for data in datas], dim=0)
+        values = [getattr(data, k) for data in datas]
+        if isinstance(values[0], RLEMasks):
+            tensors[k] = RLEMasks.concatenate(values)
+        else:
+            tensors[k] = torch.cat(values, dim=0)
     return PandasTensorCollection(infos=infos, **tensors)
 
 
@@ -163,27 +172,15 @@ class PandasTensorCollection(TensorCollection):
     def __len__(self):
         return len(self.infos)
 
-    def gather_distributed(self, tmp_dir=None):
-        rank, world_size = get_rank(), get_world_size()
-        tmp_file_template = (tmp_dir / "rank={rank}.pth.tar").as_posix()
-
-        if rank > 0:
-            tmp_file = tmp_file_template.format(rank=rank)
-            torch.save(self, tmp_file)
-
-        if world_size > 1:
-            torch.distributed.barrier()
+    def gather_distributed(self, tmp_dir=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Concatenation of the collections of all the ranks, on rank 0.
 
-        datas = [self]
-        if rank == 0 and world_size > 1:
-            for n in range(1, world_size):
-                tmp_file = tmp_file_template.format(rank=n)
-                data = torch.load(tmp_file)
-                datas.append(data)
-                Path(tmp_file).unlink()
-
-        if world_size > 1:
-            torch.distributed.barrier()
+        The collections are streamed to rank 0 with `iter_gathered_objects`,
+        the other ranks return their own collection. tmp_dir is not used.
+        """
+        datas = list(iter_gathered_objects(self, chunk_size=chunk_size))
+        if get_rank() > 0:
+            datas = [self]
         return concatenate(datas)
 
     def __getstate__(self):
@@ -198,6 +195,106 @@ class PandasTensorCollection(TensorCollection):
         return
 
 
+# Above this top_K, segmented_top_k sorts the scores.
+SEGMENTED_MAX_ROUNDS = 8
+
+
+def get_group_ids(df: pd.DataFrame, group_cols: List[str]) -> np.ndarray:
+    """Integer id of the group of each row, -1 if a group column is NaN."""
+    group_ids = np.zeros(len(df), dtype=np.int64)
+    is_nan = np.zeros(len(df), dtype=bool)
+    for col in group_cols:
+        codes, uniques = pd.factorize(df[col])
+        is_nan |= codes < 0
+        # Refactorizing keeps the ids smaller than len(df), they cannot overflow.
+        group_ids, _ = pd.factorize(group_ids * max(len(uniques), 1) + codes)
+    group_ids[is_nan] = -1
+    return group_ids
+
+
+def segmented_top_k(
+    scores: torch.Tensor,
+    group_ids: torch.Tensor,
+    top_K: int,
+    ascending: bool = False,
+) -> torch.Tensor:
+    """Indices of the top_K scores of each group.
+
+    The scores are sorted with a stable sort, NaN last, and the indices of the
+    top_K elements of each group are returned in this order. Elements with a
+    negative group id are discarded. This gives the same indices as
+    `df.sort_values(kind="stable").groupby(group_cols).head(top_K)`.
+
+    Args:
+        scores: (N,) scores.
+        group_ids: (N,) integer group of each score.
+        top_K: number of elements to retain per group.
+        ascending: retain the lowest scores instead of the highest.
+    """
+    if top_K <= SEGMENTED_MAX_ROUNDS and not scores.isnan().any():
+        keep = _segmented_top_k_rounds(
+            -scores if ascending else scores, group_ids, top_K
+        )
+        # Sorted by index and then by score, ties are kept in index order.
+        keep = torch.sort(keep).values
+        order = torch.sort(scores[keep], descending=not ascending, stable=True)
+        return keep[order.indices]
+
+    order = torch.sort(scores, descending=not ascending, stable=True).indices
+    order = order[torch.sort(scores[order].isnan().byte(), stable=True).indices]
+    sorted_group_ids = group_ids[order]
+    # Positions in `order`, sorted by group and then by score.
+    positions = torch.sort(sorted_group_ids, stable=True).indices
+    group_sizes = torch.unique_consecutive(
+        sorted_group_ids[positions],
+        return_counts=True,
+    )[1]
+    group_starts = torch.cumsum(group_sizes, dim=0) - group_sizes
+    offsets = torch.repeat_interleave(group_starts, group_sizes)
+    ranks = torch.empty_like(positions)
+    ranks[positions] = torch.arange(len(positions), device=scores.device) - offsets
+    keep = (ranks < top_K) & (sorted_group_ids >= 0)
+    return order[keep]
+
+
+def _segmented_top_k_rounds(
+    scores: torch.Tensor,
+    group_ids: torch.Tensor,
+    top_K: int,
+) -> torch.Tensor:
+    """Retains the highest score of each group top_K times, in O(top_K * N).
+
+    Among equal scores, the lowest index is retained first. Scores are not NaN.
+    """
+    n = len(scores)
+    if n == 0 or group_ids.max() < 0:
+        return torch.zeros(0, dtype=torch.long, device=scores.device)
+    remaining = group_ids >= 0
+    group_ids = group_ids.clamp(min=0)
+    n_groups = int(group_ids.max()) + 1
+    positions = torch.arange(n, device=scores.device)
+    keep = []
+    for _ in range(top_K):
+        masked_scores = torch.where(remaining, scores, -torch.inf)
+        group_max = torch.full(
+            (n_groups,), -torch.inf, dtype=scores.dtype, device=scores.device
+        )
+        group_max = group_max.scatter_reduce(0, group_ids, masked_scores, "amax")
+        is_max = remaining & (masked_scores == group_max[group_ids])
+        group_first = torch.full((n_groups,), n, device=scores.device).scatter_reduce(
+            0,
+            group_ids,
+            torch.where(is_max, positions, n),
+            "amin",
+        )
+        group_first = group_first[group_first < n]
+        if len(group_first) == 0:
+            break
+        keep.append(group_first)
+        remaining[group_first] = False
+    return torch.cat(keep)
+
+
 def filter_top_pose_estimates(
     data_TCO: PandasTensorCollection,
     top_K: int,
@@ -207,7 +304,8 @@ def filter_top_pose_estimates(
 ) -> PandasTensorCollection:
     """Filter the pose estimates by retaining only the top-K coarse model scores.
 
-    Retain only the top_K estimates corresponding to each hypothesis_id
+    Retain only the top_K estimates corresponding to each hypothesis_id.
+    Equal scores are kept in the order of the rows, see `segmented_top_k`.
 
     Args:
         top_K: how many estimates to retain
@@ -217,14 +315,10 @@ def filter_top_pose_estimates(
     """
 
     df = data_TCO.infos
+    group_ids = torch.from_numpy(get_group_ids(df, group_cols))
+    scores = torch.from_numpy(df[filter_field].to_numpy(dtype=np.float64, copy=True))
+    ids = segmented_top_k(scores, group_ids, top_K, ascending=ascending)
 
-    # Logic from https://stackoverflow.com/a/40629420
-    df = (
-        df.sort_values(filter_field, ascending=ascending)
-        .groupby(group_cols)
-        .head(top_K)
-    )
-
-    data_TCO_filtered = data_TCO[df.index.tolist()]
+    data_TCO_filtered = data_TCO[ids.tolist()]
 
     return data_TCO_filtered
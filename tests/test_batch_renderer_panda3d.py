@@ -1,5 +1,6 @@
 """Set of unit tests for Panda3D renderer."""
 
+import gc
 import os
 from pathlib import Path
 
@@ -12,12 +13,24 @@ from torch.testing import assert_close as tr_assert_close
 
 from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
 from happypose.toolbox.lib3d.transform import Transform
-from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.panda3d_batch_renderer import (
+    Panda3dBatchRenderer,
+    RenderScheduler,
+)
+from happypose.toolbox.renderer.render_service import (
+    RENDER_PRIORITY_COARSE,
+    RENDER_PRIORITY_SCORING,
+    RenderService,
+    get_render_service,
+    render_priority,
+    stop_render_service,
+)
 from happypose.toolbox.renderer.types import (
     Panda3dCameraData,
     Panda3dLightData,
     Panda3dObjectData,
 )
+from happypose.toolbox.utils.profiler import profiling
 
 from .config.test_config import DEVICE
 
@@ -259,3 +272,299 @@ class TestPanda3DBatchRenderer:
         #     render_normals=False,
         #     render_binary_mask=True
         # )
+
+    def test_render_scheduler(self):
+        """
+        Renders of a single object are spread across workers once imbalanced.
+        """
+        scheduler = RenderScheduler(
+            worker_labels=[{"a"}, {"b"}, set()],
+            imbalance_threshold=2,
+        )
+        worker_ids = [scheduler.assign("a") for _ in range(12)]
+        # The holder is used until it is 2 renders ahead of the others.
+        assert worker_ids[:3] == [0, 0, 0]
+        assert set(worker_ids) == {0, 1, 2}
+        assert scheduler.queue_depths.max() - scheduler.queue_depths.min() <= 3
+        assert all("a" in labels for labels in scheduler.worker_labels)
+        assert scheduler.stats[0].n_lazy_loads == 0
+        assert scheduler.stats[1].n_lazy_loads == 1
+        assert scheduler.stats[2].n_lazy_loads == 1
+
+        # Labels held by a worker go to this worker when balanced.
+        for worker_id in worker_ids:
+            scheduler.complete(worker_id, render_time=1.0)
+        assert scheduler.queue_depths.sum() == 0
+        assert scheduler.assign("b") == 1
+        assert sum(stats.n_renders for stats in scheduler.stats) == 12
+        assert sum(scheduler.utilization().values()) == pytest.approx(1.0)
+
+    @pytest.mark.order(2)
+    def test_batch_renderer_split_objects(self):
+        """
+        Batch render with objects split across workers and check worker stats.
+        """
+        renderer = Panda3dBatchRenderer(
+            asset_dataset=self.asset_dataset,
+            n_workers=2,
+            preload_cache=True,
+            split_objects=True,
+            imbalance_threshold=1,
+        )
+        TCO = torch.from_numpy((self.TWC.inverse() * self.TWO).matrix)
+        TCO = TCO.unsqueeze(0).repeat(self.Nc, 1, 1)
+        K = torch.from_numpy(self.K).unsqueeze(0).repeat(self.Nc, 1, 1)
+        renderings = renderer.render(
+            labels=self.Nc * [self.obj_label],
+            TCO=TCO,
+            K=K,
+            light_datas=self.Nc * [self.light_datas],
+            resolution=(self.height, self.width),
+            render_depth=True,
+        )
+        assert renderings.depths.shape == (self.Nc, 1, self.height, self.width)
+        assert renderings.depths[0, 0, self.height // 2, self.width // 2] > 0
+
+        stats = renderer.get_worker_stats()
+        assert len(stats) == 2
+        assert sum(s.n_renders for s in stats) == self.Nc
+        # The object is only preloaded by the first worker, the second one
+        # loads it lazily to share the work.
+        assert stats[0].n_lazy_loads == 0
+        assert stats[1].n_lazy_loads == 1
+        assert all(s.n_renders > 0 for s in stats)
+        renderer.stop()
+
+    @pytest.mark.order(2)
+    def test_batch_renderer_multiview(self):
+        """
+        Multiview renders match independent renders of each view.
+        """
+        renderer = Panda3dBatchRenderer(
+            asset_dataset=self.asset_dataset,
+            n_workers=2,
+            preload_cache=True,
+            split_objects=False,
+        )
+        bsz, n_views = 2, 3
+        TCO = torch.from_numpy((self.TWC.inverse() * self.TWO).matrix).float()
+        TCV_O = TCO.repeat(bsz, n_views, 1, 1)
+        TCV_O[:, :, 2, 3] += torch.linspace(0, 0.1, n_views)
+        KV = torch.from_numpy(self.K).float().repeat(bsz, n_views, 1, 1)
+        light_datas = bsz * [self.light_datas]
+        kwargs = dict(
+            resolution=(self.height, self.width),
+            render_normals=True,
+            render_depth=True,
+            render_binary_mask=True,
+        )
+        renderings_mv = renderer.render_multiview(
+            labels=bsz * [self.obj_label],
+            TCV_O=TCV_O,
+            KV=KV,
+            light_datas=light_datas,
+            **kwargs,
+        )
+        renderings = renderer.render(
+            labels=bsz * n_views * [self.obj_label],
+            TCO=TCV_O.flatten(0, 1),
+            K=KV.flatten(0, 1),
+            light_datas=bsz * n_views * [self.light_datas],
+            **kwargs,
+        )
+        assert renderings_mv.rgbs.shape == (bsz * n_views, 3, self.height, self.width)
+        assert tr_assert_close(renderings_mv.rgbs, renderings.rgbs) is None
+        assert tr_assert_close(renderings_mv.normals, renderings.normals) is None
+        assert tr_assert_close(renderings_mv.depths, renderings.depths) is None
+        assert (
+            tr_assert_close(renderings_mv.binary_masks, renderings.binary_masks) is None
+        )
+        # Views are rendered at different distances.
+        assert not torch.equal(renderings_mv.depths[0], renderings_mv.depths[1])
+        renderer.stop()
+
+    @pytest.mark.order(2)
+    def test_batch_renderer_depth_only(self):
+        """
+        Batch render depth and masks without rgb.
+        """
+        renderer = Panda3dBatchRenderer(
+            asset_dataset=self.asset_dataset,
+            n_workers=2,
+            preload_cache=True,
+            split_objects=False,
+        )
+        TCO = torch.from_numpy((self.TWC.inverse() * self.TWO).matrix)
+        TCO = TCO.unsqueeze(0).repeat(self.Nc, 1, 1)
+        K = torch.from_numpy(self.K).unsqueeze(0).repeat(self.Nc, 1, 1)
+        renderings = renderer.render(
+            labels=self.Nc * [self.obj_label],
+            TCO=TCO,
+            K=K,
+            light_datas=self.Nc * [self.light_datas],
+            resolution=(self.height, self.width),
+            render_depth=True,
+            render_binary_mask=True,
+            render_rgb=False,
+        )
+        assert renderings.rgbs is None
+        assert renderings.normals is None
+        assert renderings.depths.shape == (self.Nc, 1, self.height, self.width)
+        assert renderings.depths.dtype == torch.float32
+        assert renderings.binary_masks.dtype == torch.bool
+        assert renderings.depths[0, 0, 0, 0] == 0
+        assert renderings.depths[0, 0, self.height // 2, self.width // 2] < self.z_obj
+        assert renderings.binary_masks[0, 0, self.height // 2, self.width // 2]
+        renderer.stop()
+
+    @pytest.mark.order(2)
+    def test_batch_renderer_async(self):
+        """
+        Pending batches are collected in any order and match synchronous renders.
+        """
+        renderer = Panda3dBatchRenderer(
+            asset_dataset=self.asset_dataset,
+            n_workers=2,
+            preload_cache=True,
+            split_objects=True,
+        )
+        TCO = torch.from_numpy((self.TWC.inverse() * self.TWO).matrix).float()
+        TCO = TCO.unsqueeze(0).repeat(self.Nc, 1, 1)
+        TCO[:, 2, 3] += torch.linspace(0, 0.1, self.Nc)
+        K = torch.from_numpy(self.K).float().unsqueeze(0).repeat(self.Nc, 1, 1)
+        kwargs = dict(
+            labels=self.Nc * [self.obj_label],
+            K=K,
+            light_datas=self.Nc * [self.light_datas],
+            resolution=(self.height, self.width),
+            render_depth=True,
+        )
+        TCO_far = TCO.clone()
+        TCO_far[:, 2, 3] += 0.05
+        pending_near = renderer.render_async(TCO=TCO, **kwargs)
+        pending_far = renderer.render_async(TCO=TCO_far, **kwargs)
+        renderings_far = pending_far.wait()
+        renderings_near = pending_near.wait()
+        assert pending_near.wait() is renderings_near
+        renderings = renderer.render(TCO=TCO, **kwargs)
+        assert tr_assert_close(renderings_near.depths, renderings.depths) is None
+        assert not torch.equal(renderings_near.depths, renderings_far.depths)
+        # All the outputs were collected.
+        assert len(renderer._data_id_to_pending) == 0
+        assert sum(s.n_renders for s in renderer.get_worker_stats()) == 3 * self.Nc
+        renderer.stop()
+
+    def make_render_kwargs(self, n: int):
+        TCO = torch.from_numpy((self.TWC.inverse() * self.TWO).matrix).float()
+        K = torch.from_numpy(self.K).float()
+        return dict(
+            labels=n * [self.obj_label],
+            TCO=TCO.unsqueeze(0).repeat(n, 1, 1),
+            K=K.unsqueeze(0).repeat(n, 1, 1),
+            light_datas=n * [self.light_datas],
+            resolution=(self.height, self.width),
+        )
+
+    @pytest.mark.order(2)
+    def test_batch_renderer_priority(self):
+        """
+        Renders of higher priority overtake the renders waiting to be sent.
+        """
+        renderer = Panda3dBatchRenderer(
+            asset_dataset=self.asset_dataset,
+            n_workers=1,
+            preload_cache=True,
+            split_objects=True,
+            max_in_flight_per_worker=1,
+        )
+        kwargs = self.make_render_kwargs(self.Nc)
+        with profiling() as profiler:
+            pending_first = renderer.render_async(**kwargs)
+            pending_second = renderer.render_async(**kwargs)
+            pending_high = renderer.render_scene_datas_async(
+                renderer.make_scene_data(**kwargs),
+                priority=1,
+            )
+            pending_first.wait()
+            pending_second.wait()
+            pending_high.wait()
+        renderer.stop()
+        starts = [e.start for e in profiler.events if e.name == "render_worker"]
+        first, second, high = np.split(np.array(starts), 3)
+        # Only the first render of the first batch was sent before.
+        assert first[0] < high.min()
+        assert high.max() < first[1:].min()
+        assert first.max() < second.min()
+
+    @pytest.mark.order(2)
+    def test_batch_renderer_stop_pending(self):
+        """
+        Renders still pending when the renderer stops fail instead of blocking.
+        """
+        renderer = Panda3dBatchRenderer(
+            asset_dataset=self.asset_dataset,
+            n_workers=1,
+            preload_cache=True,
+            split_objects=True,
+            max_in_flight_per_worker=1,
+        )
+        pending = renderer.render_async(**self.make_render_kwargs(4 * self.Nc))
+        renderer.stop()
+        with pytest.raises(RuntimeError, match="stopped"):
+            pending.wait()
+        assert len(renderer._render_heap) == 0
+
+    @pytest.mark.order(2)
+    def test_render_service(self):
+        """
+        The handles of a render service share lazily spawned workers.
+        """
+        service = RenderService(self.asset_dataset, n_workers=2)
+        coarse_renderer = service.get_handle(RENDER_PRIORITY_COARSE)
+        scoring_renderer = service.get_handle(RENDER_PRIORITY_SCORING)
+        assert not service.is_running
+        assert isinstance(coarse_renderer, Panda3dBatchRenderer)
+
+        kwargs = self.make_render_kwargs(self.Nc)
+        renderings = coarse_renderer.render(**kwargs)
+        assert service.is_running
+        with render_priority(coarse_renderer, RENDER_PRIORITY_SCORING):
+            assert coarse_renderer.get_priority() == RENDER_PRIORITY_SCORING
+            renderings_scoring = scoring_renderer.render(**kwargs)
+        assert coarse_renderer.get_priority() == RENDER_PRIORITY_COARSE
+        assert tr_assert_close(renderings.rgbs, renderings_scoring.rgbs) is None
+        stats = scoring_renderer.get_worker_stats()
+        assert sum(s.n_renders for s in stats) == 2 * self.Nc
+
+        # The workers are stopped with the last handle, and spawned again.
+        coarse_renderer.stop()
+        assert service.is_running
+        scoring_renderer.stop()
+        assert not service.is_running and service.n_handles == 0
+        renderer = service.get_handle()
+        assert renderer.render(**kwargs).rgbs.shape == renderings.rgbs.shape
+        service.stop()
+        assert not service.is_running
+
+    @pytest.mark.order(2)
+    def test_render_service_dropped_handles(self):
+        """
+        The handles that are garbage collected are released.
+        """
+        service = get_render_service(self.asset_dataset, n_workers=1)
+        handles = [service.get_handle(), service.get_handle()]
+        assert service.n_handles == 2
+        handles[0].stop()
+        handles[0].stop()
+        assert service.n_handles == 1
+        other_dataset = RigidObjectDataset(self.asset_dataset.list_objects[:1])
+        with pytest.raises(ValueError, match="other objects"):
+            get_render_service(other_dataset)
+
+        del handles
+        gc.collect()
+        assert service.n_handles == 0
+        other_service = get_render_service(other_dataset)
+        assert other_service is not service
+        assert get_render_service() is other_service
+        stop_render_service()
@@ -0,0 +1,151 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+
+import happypose.toolbox.utils.tensor_collection as tc
+from happypose.toolbox.lib3d.transform import Transform
+from happypose.toolbox.utils.bop_results import (
+    BOP_RESULTS_HEADER,
+    iter_json_list,
+    load_bop_detections,
+    read_bop_results,
+    write_bop_results,
+)
+
+
+def parse_bop_line(line):
+    """Parsing of bop_toolkit_lib.inout.load_bop_results."""
+    elems = line.split(",")
+    return {
+        "scene_id": int(elems[0]),
+        "im_id": int(elems[1]),
+        "obj_id": int(elems[2]),
+        "score": float(elems[3]),
+        "R": np.array(list(map(float, elems[4].split()))).reshape(3, 3),
+        "t": np.array(list(map(float, elems[5].split()))).reshape(3, 1),
+        "time": float(elems[6]),
+    }
+
+
+class TestBOPResults(unittest.TestCase):
+    """
+    Test the reading and writing of the results in the BOP formats.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        n = 7
+        quats = np.random.RandomState(0).randn(n, 4)
+        quats /= np.linalg.norm(quats, axis=-1, keepdims=True)
+        translations = np.random.RandomState(1).rand(n, 3)
+        poses = torch.stack(
+            [
+                torch.as_tensor(Transform(quat, t).matrix)
+                for quat, t in zip(quats, translations)
+            ]
+        ).float()
+        infos = pd.DataFrame(
+            {
+                "scene_id": np.arange(n) // 3,
+                "view_id": np.arange(n) % 3,
+                "label": [f"ycbv-obj_{i:06d}" for i in range(1, n + 1)],
+                "score": np.linspace(0, 1, n),
+                "pose_score": np.linspace(1, 0, n),
+                "time": 0.25,
+            }
+        )
+        self.predictions = tc.PandasTensorCollection(infos, poses=poses)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_results(self):
+        path = write_bop_results(self.tmp_path / "results.csv", self.predictions)
+        lines = path.read_text().splitlines()
+        self.assertEqual(lines[0], BOP_RESULTS_HEADER)
+        self.assertEqual(len(lines), len(self.predictions) + 1)
+        for n, line in enumerate(lines[1:]):
+            row = self.predictions.infos.iloc[n]
+            TCO = self.predictions.poses[n].numpy()
+            result = parse_bop_line(line)
+            self.assertEqual(result["scene_id"], row.scene_id)
+            self.assertEqual(result["im_id"], row.view_id)
+            self.assertEqual(result["obj_id"], n + 1)
+            self.assertEqual(result["score"], row.score)
+            self.assertEqual(result["time"], 0.25)
+            self.assertTrue(np.array_equal(result["R"].astype(np.float32), TCO[:3, :3]))
+            self.assertTrue(np.allclose(result["t"][:, 0], TCO[:3, 3] * 1e3))
+
+        results = read_bop_results(path)
+        self.assertEqual(results.infos["obj_id"].tolist(), list(range(1, 8)))
+        self.assertTrue(
+            np.array_equal(results.infos["score"], self.predictions.infos["score"])
+        )
+        self.assertTrue(
+            torch.allclose(results.poses.float(), self.predictions.poses, atol=1e-6)
+        )
+
+        # Scores of the poses, no time, chunks formatted by worker processes.
+        self.predictions.infos = self.predictions.infos.drop(columns="time")
+        path = write_bop_results(
+            self.tmp_path / "results_pose_score.csv",
+            self.predictions,
+            score_column="pose_score",
+            chunk_size=3,
+            n_workers=2,
+        )
+        results = read_bop_results(path)
+        self.assertEqual(len(results), len(self.predictions))
+        self.assertTrue(
+            np.array_equal(results.infos["score"], self.predictions.infos["pose_score"])
+        )
+        self.assertTrue((results.infos["time"] == -1).all())
+
+    def test_iter_json_list(self):
+        items = [
+            {"a": i, "segmentation": {"counts": '[]{}, \\"' * i}, "b": [1.5, i]}
+            for i in range(20)
+        ]
+        path = self.tmp_path / "items.json"
+        path.write_text(" \n" + json.dumps(items, indent=1) + "\n")
+        for read_size in (1, 7, 1 << 20):
+            self.assertEqual(list(iter_json_list(path, read_size=read_size)), items)
+        items_iter = iter_json_list(path, drop_keys=("segmentation",), read_size=5)
+        self.assertEqual(list(items_iter), [{"a": i, "b": [1.5, i]} for i in range(20)])
+        path.write_text("[]")
+        self.assertEqual(list(iter_json_list(path)), [])
+        path.write_text('[{"a": 1}, {"a": ')
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_list(path, read_size=4))
+
+    def test_load_detections(self):
+        detections = [
+            {
+                "scene_id": 48,
+                "image_id": i,
+                "category_id": 2 + i,
+                "score": 0.5,
+                "bbox": [10, 20, 30, 40 + i],
+                "time": 0.1,
+                "segmentation": {"counts": "abc", "size": [480, 640]},
+            }
+            for i in range(3)
+        ]
+        path = self.tmp_path / "detections.json"
+        path.write_text(json.dumps(detections))
+        df = load_bop_detections(path, label_prefix="lm")
+        self.assertNotIn("segmentation", df)
+        self.assertEqual(df["bbox"][2], [10.0, 20.0, 40.0, 62.0])
+        self.assertEqual(df["bbox_modal"][2], [10.0, 20.0, 40.0, 62.0])
+        self.assertEqual(df["label"].tolist(), [f"lm-obj_00000{i}" for i in (2, 3, 4)])
+        self.assertEqual(df["image_id"].tolist(), [0, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
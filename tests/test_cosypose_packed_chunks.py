@@ -0,0 +1,127 @@
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from happypose.pose_estimators.cosypose.cosypose.recording.packed_chunk import (
+    PackedChunkReader,
+    PackedChunksReader,
+    convert_dumps_to_packed,
+    get_chunk_path,
+)
+from happypose.pose_estimators.cosypose.cosypose.recording.record_chunk import (
+    write_chunk,
+)
+
+
+def make_state(n):
+    rng = np.random.default_rng(n)
+    return {
+        "camera": {
+            "rgb": rng.integers(0, 255, (48, 64, 3), dtype=np.uint8),
+            "mask": rng.integers(0, 5, (48, 64), dtype=np.uint8),
+            "depth": rng.random((48, 64)),
+            "K": np.eye(3),
+        },
+        "objects": [{"name": f"obj_{n}", "TWO": np.eye(4)}],
+    }
+
+
+class TestPackedChunks(unittest.TestCase):
+    """
+    Test the packed chunk storage of synthetic datasets.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ds_dir = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_and_read(self):
+        seed, n_frames = 3, 5
+        keys = write_chunk(
+            [make_state(n) for n in range(n_frames)],
+            seed,
+            self.ds_dir,
+            packed=True,
+        )
+        self.assertEqual(keys, [f"{seed}-{n}" for n in range(n_frames)])
+        self.assertFalse((self.ds_dir / "dumps").exists())
+
+        reader = PackedChunkReader(get_chunk_path(self.ds_dir, seed))
+        self.assertEqual(len(reader), n_frames)
+        for idx in (-1, n_frames):
+            with self.assertRaises(IndexError):
+                reader.read(idx)
+        reader.close()
+
+        reader = PackedChunksReader(self.ds_dir)
+        # Readers sent to spawned workers reopen the chunks.
+        reader = pickle.loads(pickle.dumps(reader))
+        for n in reversed(range(n_frames)):
+            state = pickle.loads(reader.read(f"{seed}-{n}"))
+            self.assertEqual(state["objects"][0]["name"], f"obj_{n}")
+            self.assertNotIn("depth", state["camera"])
+        reader.close()
+
+    def test_convert_dumps(self):
+        for seed in range(2):
+            write_chunk([make_state(n) for n in range(3)], seed, self.ds_dir)
+        converted_seeds = convert_dumps_to_packed(self.ds_dir, remove_dumps=False)
+        self.assertEqual(converted_seeds, [0, 1])
+        self.assertEqual(convert_dumps_to_packed(self.ds_dir), [])
+
+        reader = PackedChunksReader(self.ds_dir)
+        for path in (self.ds_dir / "dumps").glob("*.pkl"):
+            self.assertEqual(reader.read(path.stem), path.read_bytes())
+        reader.close()
+
+        convert_dumps_to_packed(self.ds_dir, remove_dumps=True)
+        self.assertEqual(len(list((self.ds_dir / "dumps").glob("*.pkl"))), 0)
+
+    def test_mixed_dumps_and_chunks(self):
+        # Recording resumed with packed=True, or interrupted conversion.
+        write_chunk([make_state(n) for n in range(2)], 0, self.ds_dir)
+        write_chunk([make_state(n) for n in range(2)], 1, self.ds_dir, packed=True)
+        reader = PackedChunksReader(self.ds_dir)
+        for key in ("0-0", "0-1", "1-0", "1-1"):
+            state = pickle.loads(reader.read(key))
+            self.assertEqual(state["objects"][0]["name"], f"obj_{key[-1]}")
+        with self.assertRaises(FileNotFoundError):
+            reader.read("2-0")
+        reader.close()
+
+    def test_max_open_chunks(self):
+        n_seeds = 5
+        for seed in range(n_seeds):
+            write_chunk(
+                [make_state(n) for n in range(2)], seed, self.ds_dir, packed=True
+            )
+        reader = PackedChunksReader(self.ds_dir, max_open_chunks=2)
+        reader = pickle.loads(pickle.dumps(reader))
+        self.assertEqual(reader.max_open_chunks, 2)
+        for _ in range(2):
+            for seed in range(n_seeds):
+                for n in range(2):
+                    state = pickle.loads(reader.read(f"{seed}-{n}"))
+                    self.assertEqual(state["objects"][0]["name"], f"obj_{n}")
+                self.assertLessEqual(reader.n_open_chunks, 2)
+        # The most recently read chunks stay open.
+        reader.read("3-0")
+        self.assertEqual(list(reader._readers.keys()), [4, 3])
+        reader.close()
+        self.assertEqual(reader.n_open_chunks, 0)
+
+    def test_invalid_chunk(self):
+        path = self.ds_dir / "invalid.chunk"
+        path.write_bytes(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            PackedChunkReader(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from happypose.pose_estimators.cosypose.cosypose.recording.journal import (
+    RecordingJournal,
+)
+from happypose.pose_estimators.cosypose.cosypose.recording.packed_chunk import (
+    PackedChunksReader,
+)
+from happypose.pose_estimators.cosypose.cosypose.recording.record_local import (
+    record_dataset_local,
+)
+
+
+class FakeRecordingScene:
+    """Scene with the interface of BopRecordingScene, without pybullet."""
+
+    def __init__(self, resolution=(32, 24), seed=0):
+        self.resolution = resolution
+        self.n_connections = 0
+        self.set_seed(seed)
+
+    def set_seed(self, seed):
+        self.np_random = np.random.RandomState(seed)
+        self.seed = seed
+
+    def connect(self, load=True):
+        self.n_connections += 1
+
+    def disconnect(self):
+        pass
+
+    def make_new_scene(self):
+        w, h = self.resolution
+        return {
+            "camera": {
+                "rgb": self.np_random.randint(0, 255, (h, w, 3), dtype=np.uint8),
+                "mask": np.zeros((h, w), dtype=np.uint8),
+                "depth": np.zeros((h, w)),
+            },
+            "objects": [
+                {"seed": self.seed, "n_connections": self.n_connections},
+            ],
+        }
+
+
+class FailingRecordingScene(FakeRecordingScene):
+    """Scene failing on the chunk of seed 1."""
+
+    n_disconnections = 0
+
+    def disconnect(self):
+        FailingRecordingScene.n_disconnections += 1
+
+    def make_new_scene(self):
+        if self.seed == 1:
+            raise RuntimeError("Scene sampling failed")
+        return super().make_new_scene()
+
+
+SCENE_CLS = f"{__name__}.FakeRecordingScene"
+
+
+class TestRecordDatasetLocal(unittest.TestCase):
+    """
+    Test the local recording of synthetic datasets.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ds_dir = Path(self.tmp_dir.name) / "ds"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def record(self, n_chunks, n_workers):
+        return record_dataset_local(
+            ds_dir=self.ds_dir,
+            scene_cls=SCENE_CLS,
+            scene_kwargs={},
+            n_chunks=n_chunks,
+            n_frames_per_chunk=2,
+            n_workers=n_workers,
+            packed=True,
+        )
+
+    def test_record_and_resume(self):
+        keys = self.record(n_chunks=3, n_workers=0)
+        self.assertEqual(sorted(keys), [f"{s}-{n}" for s in range(3) for n in range(2)])
+
+        # Simulates a crash while writing the journal.
+        with (self.ds_dir / "journal.jsonl").open("a") as f:
+            f.write('{"seed": 3, "ke')
+        self.assertEqual(RecordingJournal(self.ds_dir).done_seeds, [0, 1, 2])
+
+        keys = self.record(n_chunks=5, n_workers=2)
+        self.assertEqual(len(keys), 10)
+        journal = RecordingJournal(self.ds_dir)
+        self.assertEqual(sorted(journal.done_seeds), list(range(5)))
+
+        reader = PackedChunksReader(self.ds_dir)
+        for seed in range(5):
+            state = pickle.loads(reader.read(f"{seed}-1"))
+            self.assertEqual(state["objects"][0]["seed"], seed)
+            # The scene of each worker is connected once.
+            self.assertEqual(state["objects"][0]["n_connections"], 1)
+        reader.close()
+
+    def test_scene_disconnected_on_error(self):
+        with self.assertRaises(RuntimeError):
+            record_dataset_local(
+                ds_dir=self.ds_dir,
+                scene_cls=f"{__name__}.FailingRecordingScene",
+                scene_kwargs={},
+                n_chunks=3,
+                n_frames_per_chunk=2,
+                n_workers=0,
+            )
+        self.assertEqual(FailingRecordingScene.n_disconnections, 1)
+        self.assertEqual(RecordingJournal(self.ds_dir).done_seeds, [0])
+
+    def test_legacy_journal(self):
+        self.ds_dir.mkdir()
+        (self.ds_dir / "seeds_recorded.txt").write_text("1\n0\n")
+        (self.ds_dir / "keys_recorded.txt").write_text("1-0\n1-1\n0-0\n0-1\n")
+        journal = RecordingJournal(self.ds_dir)
+        journal.close()
+        self.assertEqual(journal.done_seeds, [1, 0])
+        self.assertEqual(
+            RecordingJournal(self.ds_dir).keys, ["1-0", "1-1", "0-0", "0-1"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+import torch
+
+from happypose.toolbox.inference.utils import make_detections_from_model_outputs
+
+
+def make_outputs(category_ids, scores, size=(4, 6)):
+    """Outputs of a Mask R-CNN for one image, the mask n is filled with n / 10."""
+    n = len(category_ids)
+    return {
+        "boxes": torch.arange(n * 4, dtype=torch.float).view(n, 4),
+        "labels": torch.tensor(category_ids, dtype=torch.int64),
+        "scores": torch.tensor(scores),
+        "masks": torch.arange(n).float().view(n, 1, 1, 1).expand(n, 1, *size) / 10,
+    }
+
+
+class TestDetectionPostprocessing(unittest.TestCase):
+    """
+    Test the conversion of the outputs of the detector to detections.
+    """
+
+    def setUp(self):
+        self.category_id_to_label = {1: "a", 2: "b", 5: "c"}
+        self.outputs = [
+            make_outputs([1, 2, 1, 5], [0.9, 0.8, 0.7, 0.2]),
+            make_outputs([], []),
+            make_outputs([2, 2], [0.95, 0.6]),
+        ]
+
+    def test_detections(self):
+        detections = make_detections_from_model_outputs(
+            self.outputs,
+            self.category_id_to_label,
+            output_masks=True,
+            mask_th=0.15,
+            device="cpu",
+        )
+        df = detections.infos
+        self.assertEqual(df["batch_im_id"].tolist(), [0, 0, 0, 0, 2, 2])
+        self.assertEqual(df["label"].tolist(), ["a", "b", "a", "c", "b", "b"])
+        self.assertEqual(df["instance_id"].tolist(), [0, 0, 1, 0, 0, 1])
+        self.assertAlmostEqual(df["score"][4], 0.95, places=6)
+        self.assertTrue(torch.equal(detections.bboxes[4], torch.arange(4.0)))
+        self.assertEqual(detections.masks.shape, (6, 4, 6))
+        self.assertEqual(detections.masks.dtype, torch.bool)
+        is_full = detections.masks.flatten(1).all(-1).tolist()
+        self.assertEqual(is_full, [False, False, True, True, False, False])
+
+        detections = make_detections_from_model_outputs(
+            self.outputs,
+            self.category_id_to_label,
+            detection_th=0.75,
+        )
+        self.assertEqual(detections.infos["score"].round(2).tolist(), [0.9, 0.8, 0.95])
+        self.assertNotIn("masks", detections.tensors)
+
+    def test_one_instance_per_class(self):
+        detections = make_detections_from_model_outputs(
+            self.outputs,
+            self.category_id_to_label,
+            detection_th=0.5,
+            output_masks=True,
+            mask_th=0.05,
+            one_instance_per_class=True,
+        )
+        # Sorted by score, the masks follow the detections.
+        df = detections.infos
+        self.assertEqual(df["batch_im_id"].tolist(), [2, 0, 0])
+        self.assertEqual(df["label"].tolist(), ["b", "a", "b"])
+        self.assertEqual(df["instance_id"].tolist(), [0, 0, 0])
+        is_full = detections.masks.flatten(1).all(-1).tolist()
+        self.assertEqual(is_full, [False, False, True])
+        self.assertTrue(torch.equal(detections.bboxes[2], torch.arange(4.0, 8.0)))
+
+    def test_no_detection(self):
+        detections = make_detections_from_model_outputs(
+            self.outputs,
+            self.category_id_to_label,
+            detection_th=0.99,
+            output_masks=True,
+            one_instance_per_class=True,
+        )
+        self.assertEqual(len(detections), 0)
+        self.assertEqual(detections.bboxes.shape, (0, 4))
+        self.assertEqual(detections.masks.shape, (0, 4, 6))
+        self.assertIn("instance_id", detections.infos)
+
+    def test_unknown_category(self):
+        outputs = [make_outputs([1, 3], [0.9, 0.8])]
+        with self.assertRaises(KeyError):
+            make_detections_from_model_outputs(outputs, self.category_id_to_label)
+        detections = make_detections_from_model_outputs(
+            outputs,
+            self.category_id_to_label,
+            detection_th=0.85,
+        )
+        self.assertEqual(detections.infos["label"].tolist(), ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
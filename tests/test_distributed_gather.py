@@ -0,0 +1,98 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from omegaconf import OmegaConf
+
+import happypose.pose_estimators.cosypose.cosypose.utils.tensor_collection as cosypose_tc
+from happypose.pose_estimators.megapose.evaluation.meters.base import Meter
+from happypose.toolbox.utils.distributed import (
+    broadcast_object,
+    gather_objects,
+    sync_config,
+)
+from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
+
+WORLD_SIZE = 3
+
+
+def make_collection(rank, collection_cls=PandasTensorCollection):
+    n = rank + 2
+    infos = pd.DataFrame({"rank": rank, "label": [f"obj_{i}" for i in range(n)]})
+    return collection_cls(infos, poses=torch.full((n, 4, 4), float(rank)))
+
+
+def run_gather(rank, init_file):
+    dist.init_process_group(
+        backend="gloo",
+        init_method=f"file://{init_file}",
+        rank=rank,
+        world_size=WORLD_SIZE,
+    )
+    try:
+        # Small chunks, the objects are sent in several messages.
+        objects = gather_objects({"rank": rank, "x": np.arange(100 * rank)}, 64)
+        if rank == 0:
+            assert [obj["rank"] for obj in objects] == [0, 1, 2]
+            assert all(len(obj["x"]) == 100 * obj["rank"] for obj in objects)
+        else:
+            assert objects is None
+
+        for collection_cls in (
+            PandasTensorCollection,
+            cosypose_tc.PandasTensorCollection,
+        ):
+            data = make_collection(rank, collection_cls)
+            data = data.gather_distributed(chunk_size=128)
+            assert isinstance(data, collection_cls)
+            if rank == 0:
+                assert len(data) == 2 + 3 + 4
+                assert data.infos["rank"].tolist() == [0] * 2 + [1] * 3 + [2] * 4
+                ranks = torch.tensor(data.infos["rank"])
+                assert torch.equal(data.poses[:, 0, 0], ranks)
+            else:
+                assert len(data) == rank + 2
+
+        meter = Meter()
+        meter.datas["rank"].append(rank)
+        if rank == 2:
+            meter.datas["errors"].extend([0.1, 0.2])
+        meter.gather_distributed()
+        if rank == 0:
+            assert meter.datas["rank"] == [0, 1, 2]
+            assert meter.datas["errors"] == [0.1, 0.2]
+
+        cfg = OmegaConf.create({"lr": 0.1 * (rank + 1), "rank": rank})
+        cfg = sync_config(cfg, local_fields=["rank"])
+        assert cfg.lr == 0.1 and cfg.rank == rank
+        assert broadcast_object(f"rank={rank}", src=1) == "rank=1"
+    finally:
+        dist.destroy_process_group()
+
+
+class TestDistributedGather(unittest.TestCase):
+    """
+    Test the gather of objects with a local gloo process group.
+    """
+
+    def test_gather(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            init_file = Path(tmp_dir) / "init"
+            mp.spawn(run_gather, args=(init_file,), nprocs=WORLD_SIZE, join=True)
+
+    def test_not_distributed(self):
+        data = make_collection(0)
+        self.assertIs(gather_objects(data)[0], data)
+        self.assertEqual(len(data.gather_distributed()), len(data))
+        data = make_collection(0, cosypose_tc.PandasTensorCollection)
+        self.assertEqual(len(data.gather_distributed()), len(data))
+        self.assertEqual(broadcast_object(1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from happypose.toolbox.datasets.frame_cache import FrameCache
+from happypose.toolbox.datasets.scene_dataset import (
+    CameraData,
+    ObjectData,
+    ObservationInfos,
+    SceneDataset,
+    SceneObservation,
+)
+from happypose.toolbox.lib3d.transform import Transform
+
+
+class CountingSceneDataset(SceneDataset):
+    def __init__(self, n_frames: int, **kwargs):
+        frame_index = pd.DataFrame({"scene_id": 0, "view_id": np.arange(n_frames)})
+        super().__init__(frame_index, **kwargs)
+        self.n_loads = 0
+
+    def _load_scene_observation(self, image_infos: ObservationInfos):
+        self.n_loads += 1
+        view_id = int(image_infos.view_id)
+        rgb = np.full((24, 32, 3), view_id, dtype=np.uint8)
+        depth = np.full((24, 32), view_id / 10, dtype=np.float32)
+        return SceneObservation(
+            rgb=rgb,
+            depth=depth if self.load_depth else None,
+            segmentation=np.ones((24, 32), dtype=np.uint32),
+            infos=image_infos,
+            object_datas=[
+                ObjectData(label="obj", TWO=Transform(np.eye(4)), unique_id=1),
+            ],
+            camera_data=CameraData(K=np.eye(3), TWC=Transform(np.eye(4))),
+        )
+
+
+class TestFrameCache(unittest.TestCase):
+    """
+    Test the cache of the decoded frames of the scene datasets.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cached_observation(self):
+        ds = CountingSceneDataset(3, load_depth=True)
+        expected = [ds[n] for n in range(3)]
+        ds.frame_cache = FrameCache(self.cache_dir, namespace="test")
+        for _ in range(2):
+            for n in range(3):
+                obs = ds[n]
+                self.assertTrue(np.array_equal(obs.rgb, expected[n].rgb))
+                self.assertTrue(np.array_equal(obs.depth, expected[n].depth))
+                self.assertEqual(obs.depth.dtype, np.float32)
+                self.assertEqual(obs.infos.view_id, n)
+                self.assertEqual(obs.object_datas[0].label, "obj")
+        self.assertEqual(ds.n_loads, 3 + 3)
+
+        # The cached arrays are copy-on-write.
+        obs = ds[0]
+        obs.rgb[:] = 255
+        self.assertTrue(np.array_equal(ds[0].rgb, expected[0].rgb))
+
+        # The options of the dataset are part of the key.
+        ds.load_depth = False
+        self.assertIsNone(ds[0].depth)
+        self.assertEqual(ds.n_loads, 3 + 3 + 1)
+
+        # The cache is shared with the other instances of the dataset.
+        other_ds = CountingSceneDataset(3, load_depth=True)
+        other_ds.frame_cache = FrameCache(self.cache_dir, namespace="test")
+        other_ds[1]
+        self.assertEqual(other_ds.n_loads, 0)
+
+        ds.frame_cache.clear()
+        self.assertEqual(ds.frame_cache.size_bytes(), 0)
+        ds[0]
+        self.assertEqual(ds.n_loads, 3 + 3 + 2)
+
+    def test_evict(self):
+        ds = CountingSceneDataset(6)
+        ds.frame_cache = FrameCache(self.cache_dir)
+        ds[0]
+        frame_bytes = ds.frame_cache.size_bytes()
+        ds.frame_cache.max_bytes = 3 * frame_bytes
+        for n in range(1, 4):
+            time.sleep(0.01)
+            ds[n]
+        self.assertLessEqual(ds.frame_cache.size_bytes(), 3 * frame_bytes)
+        # Frame 0 is the least recently used.
+        n_loads = ds.n_loads
+        for n in (1, 2, 3):
+            ds[n]
+        self.assertEqual(ds.n_loads, n_loads)
+        ds[0]
+        self.assertEqual(ds.n_loads, n_loads + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
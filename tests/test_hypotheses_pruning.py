@@ -0,0 +1,123 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.inference.pruning import (
+    compute_hypotheses_agreement,
+    elementwise_box_iou,
+    prune_pose_hypotheses,
+)
+from happypose.toolbox.lib3d.camera_geometry import boxes_from_uv, project_points
+from happypose.toolbox.lib3d.rigid_mesh_database import MeshDataBase
+from happypose.toolbox.utils.rle_masks import RLEMasks
+from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
+
+
+class TestHypothesesPruning(unittest.TestCase):
+    """
+    Test the pruning of the pose hypotheses that disagree with the detections.
+    """
+
+    def setUp(self):
+        mesh_path = Path(__file__).parent / "data" / "obj_000001.ply"
+        object_dataset = RigidObjectDataset(
+            [RigidObject(label="obj", mesh_path=mesh_path, mesh_units="mm")],
+        )
+        self.mesh_db = MeshDataBase.from_object_ds(object_dataset).batched()
+        self.K = torch.tensor([[[600.0, 0, 320], [0, 600, 240], [0, 0, 1]]])
+
+        # Two detections of the same object, three hypotheses each.
+        TCO_gt = torch.eye(4).repeat(2, 1, 1)
+        TCO_gt[:, :3, 3] = torch.tensor([[0.1, 0.0, 0.6], [-0.1, 0.0, 0.6]])
+        points = self.mesh_db.select(["obj", "obj"]).sample_points(
+            200,
+            deterministic=True,
+        )
+        bboxes = boxes_from_uv(project_points(points, self.K.repeat(2, 1, 1), TCO_gt))
+
+        TCO = TCO_gt.repeat_interleave(3, dim=0)
+        # Hypothesis 1: too far, hypothesis 2: outside of the image.
+        TCO[1::3, 2, 3] *= 3
+        TCO[2::3, 0, 3] += 2.0
+        # All the hypotheses of the second detection are too far.
+        TCO[3, 2, 3] *= 2
+        infos = pd.DataFrame(
+            {
+                "batch_im_id": 0,
+                "label": "obj",
+                "instance_id": np.repeat([0, 1], 3),
+                "hypothesis_id": np.tile([0, 1, 2], 2),
+                "bbox_id": np.repeat([0, 1], 3),
+            },
+        )
+        self.bboxes = bboxes
+        self.data_TCO = PandasTensorCollection(
+            infos,
+            poses=TCO,
+            bboxes=bboxes.repeat_interleave(3, dim=0),
+        )
+
+    def test_box_iou(self):
+        boxes_a = torch.tensor([[0.0, 0, 10, 10], [0, 0, 10, 10], [0, 0, 10, 10]])
+        boxes_b = torch.tensor([[0.0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+        iou = elementwise_box_iou(boxes_a, boxes_b)
+        self.assertTrue(torch.allclose(iou, torch.tensor([1.0, 1 / 3, 0.0])))
+
+    def test_agreement(self):
+        agreement = compute_hypotheses_agreement(self.data_TCO, self.K, self.mesh_db)
+        self.assertGreater(agreement[0], 0.99)
+        self.assertLess(agreement[1], 0.2)
+        self.assertEqual(agreement[2], 0.0)
+        self.assertGreater(agreement[3], agreement[4])
+
+        # Masks of the detection boxes, the second one is empty.
+        masks = torch.zeros(2, 480, 640, dtype=torch.bool)
+        x1, y1, x2, y2 = self.bboxes[0].round().int().tolist()
+        masks[0, y1 : y2 + 1, x1 : x2 + 1] = True
+        agreement_masks = compute_hypotheses_agreement(
+            self.data_TCO,
+            self.K,
+            self.mesh_db,
+            masks=masks,
+        )
+        self.assertTrue(torch.allclose(agreement_masks[0], agreement[0]))
+        self.assertLess(agreement_masks[1], agreement[1])
+        self.assertTrue((agreement_masks[3:] == 0).all())
+
+        agreement_rle = compute_hypotheses_agreement(
+            self.data_TCO,
+            self.K,
+            self.mesh_db,
+            masks=RLEMasks.encode(masks),
+        )
+        self.assertTrue(torch.equal(agreement_rle, agreement_masks))
+
+    def test_prune(self):
+        data_TCO = prune_pose_hypotheses(
+            self.data_TCO,
+            self.K,
+            self.mesh_db,
+            threshold=0.5,
+        )
+        df = data_TCO.infos
+        self.assertEqual(df["instance_id"].tolist(), [0, 1])
+        self.assertEqual(df["hypothesis_id"].tolist(), [0, 0])
+        self.assertTrue(torch.equal(data_TCO.poses, self.data_TCO.poses[[0, 3]]))
+        self.assertIn("hypothesis_agreement", df)
+        self.assertNotIn("hypothesis_agreement", self.data_TCO.infos)
+
+        data_TCO = prune_pose_hypotheses(
+            self.data_TCO,
+            self.K,
+            self.mesh_db,
+            threshold=0.0,
+        )
+        self.assertEqual(len(data_TCO), len(self.data_TCO))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import torch
+
+from happypose.pose_estimators.megapose.models.pose_rigid import PosePredictor
+from happypose.pose_estimators.megapose.models.wide_resnet import WideResNet18
+from happypose.toolbox.inference.precision import InferencePrecision
+from happypose.toolbox.lib3d.rotations import compute_rotation_matrix_from_ortho6d
+
+
+class TestInferencePrecision(unittest.TestCase):
+    """
+    Test that reduced precision inference matches float32 within tolerance.
+    """
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.x = torch.rand(4, 9, 120, 160)
+
+    def make_model(self):
+        torch.manual_seed(0)
+        backbone = WideResNet18(n_inputs=9)
+        model = PosePredictor(backbone=backbone, renderer=None, mesh_db=None)
+        return model.eval()
+
+    def test_invalid_dtype(self):
+        with self.assertRaises(ValueError):
+            InferencePrecision(dtype="fp8")
+
+    def test_bf16_channels_last(self):
+        model = self.make_model()
+        with torch.no_grad():
+            outputs_fp32 = model.net_forward(self.x)["pose"]
+            model.set_inference_precision(
+                InferencePrecision(dtype="bf16", channels_last=True),
+            )
+            outputs_bf16 = model.net_forward(self.x)["pose"]
+
+        self.assertEqual(outputs_bf16.dtype, torch.float32)
+        self.assertTrue(
+            torch.allclose(outputs_fp32[:, 6:], outputs_bf16[:, 6:], atol=5e-2),
+        )
+        # Rotation updates differ by less than one degree.
+        R_fp32 = compute_rotation_matrix_from_ortho6d(outputs_fp32[:, :6])
+        R_bf16 = compute_rotation_matrix_from_ortho6d(outputs_bf16[:, :6])
+        trace = (R_fp32.transpose(-1, -2) @ R_bf16).diagonal(dim1=-2, dim2=-1).sum(-1)
+        angle = torch.acos(((trace - 1) / 2).clamp(-1, 1)).rad2deg()
+        self.assertTrue((angle < 1.0).all())
+
+    def test_state_dict_unchanged(self):
+        model = self.make_model()
+        keys = set(model.state_dict().keys())
+        model.set_inference_precision(InferencePrecision(channels_last=True))
+        self.assertEqual(keys, set(model.state_dict().keys()))
+
+
+if __name__ == "__main__":
+    unittest.main()
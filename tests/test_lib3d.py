@@ -1,9 +1,20 @@
 import unittest
+from pathlib import Path
 
 import numpy as np
 import pinocchio as pin
 import torch
 
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.lib3d.cropping import deepim_crops, deepim_crops_robust
+from happypose.toolbox.lib3d.mesh_ops import sample_points
+from happypose.toolbox.lib3d.multiview import (
+    MULTIVIEW_CAM_POSITIONS,
+    _get_views_TCO_pos_sphere,
+    make_TCO_multiview,
+)
+from happypose.toolbox.lib3d.nms3d import add_s_distances, nms3d
+from happypose.toolbox.lib3d.rigid_mesh_database import MeshDataBase
 from happypose.toolbox.lib3d.rotations import (
     angle_axis_to_rotation_matrix,
     compute_rotation_matrix_from_quaternions,
@@ -149,6 +160,234 @@ class TestTransformOps(unittest.TestCase):
         self.assertTrue(np.allclose(T_ts_inv.numpy(), T_arr_inv, atol=1e-6))
 
 
+class TestMultiview(unittest.TestCase):
+    """
+    Test the batched multiview poses against the per-sample panda3d reference.
+    """
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.bsz = 8
+        TCO = torch.stack(
+            [torch.Tensor(pin.SE3.Random().homogeneous) for _ in range(8)]
+        )
+        TCO[:, :3, 3] = torch.rand(self.bsz, 3) * 0.2 + torch.tensor([0, 0, 0.5])
+        self.TCO = TCO.double()
+        self.tCR = self.TCO[:, :3, 3]
+
+    def make_TCO_multiview_reference(self, multiview_type, remove_TCO_rendering):
+        TC0_CV = []
+        for TCO_n, tCR_n in zip(self.TCO.numpy(), self.tCR.numpy()):
+            TC0_CV_ = [] if remove_TCO_rendering else [np.eye(4)]
+            TC0_CV_ += _get_views_TCO_pos_sphere(
+                TCO_n,
+                tCR_n,
+                MULTIVIEW_CAM_POSITIONS[multiview_type],
+            )
+            TC0_CV.append(TC0_CV_)
+        TC0_CV = torch.as_tensor(np.stack(TC0_CV))
+        return invert_transform_matrices(TC0_CV) @ self.TCO.unsqueeze(1)
+
+    def test_make_TCO_multiview(self):
+        for multiview_type in MULTIVIEW_CAM_POSITIONS:
+            for remove_TCO_rendering in (False, True):
+                TCV_O = make_TCO_multiview(
+                    self.TCO,
+                    self.tCR,
+                    multiview_type=multiview_type,
+                    remove_TCO_rendering=remove_TCO_rendering,
+                )
+                TCV_O_ref = self.make_TCO_multiview_reference(
+                    multiview_type,
+                    remove_TCO_rendering,
+                )
+                self.assertEqual(TCV_O.shape, TCV_O_ref.shape)
+                self.assertEqual(TCV_O.dtype, self.TCO.dtype)
+                self.assertTrue(torch.allclose(TCV_O, TCV_O_ref, atol=1e-5))
+
+    def test_make_TCO_multiview_inplane_rotations(self):
+        TCV_O = make_TCO_multiview(
+            self.TCO,
+            self.tCR,
+            multiview_type="sphere_6views",
+            remove_TCO_rendering=True,
+            views_inplane_rotations=True,
+        )
+        self.assertEqual(TCV_O.shape, (self.bsz, 6 * 4, 4, 4))
+        # The second in-plane rotation flips the x and y axes of the first view.
+        TCV_O_flipped = TCV_O[:, 0].clone()
+        TCV_O_flipped[:, :2, :3] *= -1
+        self.assertTrue(torch.allclose(TCV_O[:, 2], TCV_O_flipped))
+
+    def test_make_TCO_multiview_single_view(self):
+        TCV_O = make_TCO_multiview(self.TCO, self.tCR, n_views=1)
+        self.assertTrue(torch.equal(TCV_O[:, 0], self.TCO))
+
+
+class TestNMS3D(unittest.TestCase):
+    """
+    Test the batched 3D NMS against a greedy loop over all the pairs.
+    """
+
+    def setUp(self):
+        torch.manual_seed(0)
+        n = 500
+        self.TCO = torch.eye(4).repeat(n, 1, 1)
+        self.TCO[:, :3, :3] = torch.stack(
+            [torch.Tensor(pin.SE3.Random().rotation) for _ in range(n)]
+        )
+        # Clusters of predictions around a few objects.
+        centers = torch.rand(20, 3) * 0.5
+        self.TCO[:, :3, 3] = centers[torch.randint(0, 20, (n,))]
+        self.TCO[:, :3, 3] += torch.randn(n, 3) * 0.02
+        self.scores = torch.rand(n)
+        self.group_ids = torch.randint(0, 3, (n,))
+        # Asymmetric object.
+        self.points = (torch.rand(1, 50, 3) - 0.5) * torch.tensor([0.1, 0.05, 0.02])
+        self.points = self.points.repeat(n, 1, 1)
+
+    def nms3d_reference(self, dists, threshold):
+        keep = []
+        is_suppressed = torch.zeros(len(self.scores), dtype=torch.bool)
+        for idx in torch.sort(self.scores, descending=True, stable=True).indices:
+            if is_suppressed[idx]:
+                continue
+            keep.append(int(idx))
+            same_group = self.group_ids == self.group_ids[idx]
+            is_suppressed |= same_group & (dists[idx] <= threshold)
+        return keep
+
+    def test_nms3d_translation(self):
+        t = self.TCO[:, :3, 3]
+        dists = torch.cdist(t, t)
+        for threshold in (0.01, 0.04, 0.2):
+            keep = nms3d(
+                self.TCO,
+                self.scores,
+                group_ids=self.group_ids,
+                threshold=threshold,
+            )
+            self.assertEqual(keep.tolist(), self.nms3d_reference(dists, threshold))
+
+    def test_nms3d_add_s(self):
+        n = len(self.TCO)
+        ids_i = torch.arange(n).repeat_interleave(n)
+        ids_j = torch.arange(n).repeat(n)
+        dists = add_s_distances(
+            self.TCO[ids_i],
+            self.TCO[ids_j],
+            self.points[ids_i],
+            batch_size=4096,
+        ).view(n, n)
+        keep = nms3d(
+            self.TCO,
+            self.scores,
+            group_ids=self.group_ids,
+            threshold=0.02,
+            criterion="add_s",
+            points=self.points,
+        )
+        self.assertEqual(keep.tolist(), self.nms3d_reference(dists, 0.02))
+
+    def test_nms3d_add_s_symmetries(self):
+        # Same translation, rotated by 180 degrees around z.
+        TCO = torch.eye(4).repeat(2, 1, 1)
+        TCO[1, :2, :2] = -torch.eye(2)
+        scores = torch.tensor([1.0, 0.5])
+        points = torch.zeros(1, 100, 3)
+        points[..., 0] = torch.linspace(0, 0.1, 100)
+        keep = nms3d(
+            TCO,
+            scores,
+            threshold=0.01,
+            criterion="add_s",
+            points=points.repeat(2, 1, 1),
+        )
+        self.assertEqual(keep.tolist(), [0, 1])
+        # The object is symmetric with respect to this rotation.
+        points = torch.cat([points, points * torch.tensor([-1, -1, 1])], dim=1)
+        keep = nms3d(
+            TCO,
+            scores,
+            threshold=0.01,
+            criterion="add_s",
+            points=points.repeat(2, 1, 1),
+        )
+        self.assertEqual(keep.tolist(), [0])
+
+
+class TestMeshesSampling(unittest.TestCase):
+    """
+    Test the cached deterministic sampling of the mesh points.
+    """
+
+    def test_sample_points(self):
+        data_dir = Path(__file__).parent.parent / "data" / "assets"
+        object_dataset = RigidObjectDataset(
+            [
+                RigidObject(label="cube", mesh_path=data_dir / "cube/model_vhacd.obj"),
+                RigidObject(
+                    label="sphere",
+                    mesh_path=data_dir / "sphere/sphere_smooth.obj",
+                ),
+            ],
+        )
+        mesh_db = MeshDataBase.from_object_ds(object_dataset).batched()
+        labels = ["sphere", "cube", "sphere"]
+        for _ in range(2):
+            for n_points in (10, 50):
+                meshes = mesh_db.select(labels)
+                points = meshes.sample_points(n_points, deterministic=True)
+                points_expected = sample_points(
+                    meshes.points,
+                    n_points,
+                    deterministic=True,
+                )
+                self.assertTrue(torch.equal(points, points_expected))
+        self.assertEqual(sorted(mesh_db._sampled_points.keys()), [10, 50])
+
+        mesh_db.double()
+        points = mesh_db.select(labels).sample_points(10, deterministic=True)
+        self.assertEqual(points.dtype, torch.double)
+        points = mesh_db.select([]).sample_points(10, deterministic=True)
+        self.assertEqual(points.shape[0], 0)
+
+
+class TestRoiCropping(unittest.TestCase):
+    """
+    Test the crops of the unique images with per-object image indices.
+    """
+
+    def test_crops_with_image_ids(self):
+        generator = torch.Generator().manual_seed(0)
+        images = torch.rand(2, 4, 48, 64, generator=generator)
+        images[:, 3][images[:, 3] < 0.2] = 0.0
+        image_ids = torch.tensor([1, 0, 1, 1])
+        K = torch.tensor([[50.0, 0, 32], [0, 50, 24], [0, 0, 1]]).repeat(4, 1, 1)
+        TCO = torch.eye(4).repeat(4, 1, 1)
+        TCO[:, :3, 3] = torch.tensor(
+            [[0.0, 0, 1], [0.1, 0, 1], [-0.1, 0.1, 2], [0, -0.1, 1.5]],
+        )
+        points = torch.rand(4, 20, 3, generator=generator) * 0.1 - 0.05
+        boxes = torch.tensor([[10.0, 10, 30, 30]]).repeat(4, 1)
+        kwargs = dict(obs_boxes=boxes, K=K, TCO_pred=TCO, O_vertices=points)
+
+        boxes_crop, crops = deepim_crops(images, image_ids=image_ids, **kwargs)
+        boxes_expected, crops_expected = deepim_crops(images[image_ids], **kwargs)
+        self.assertTrue(torch.equal(boxes_crop, boxes_expected))
+        self.assertTrue(torch.allclose(crops, crops_expected))
+
+        kwargs.update(tCR_in=TCO[:, :3, 3], output_size=(24, 32))
+        boxes_crop, crops = deepim_crops_robust(images, image_ids=image_ids, **kwargs)
+        boxes_expected, crops_expected = deepim_crops_robust(
+            images[image_ids],
+            **kwargs,
+        )
+        self.assertTrue(torch.equal(boxes_crop, boxes_expected))
+        self.assertTrue(torch.allclose(crops, crops_expected))
+        self.assertEqual(crops.shape, (4, 4, 24, 32))
+
+
 class TestsDistances(unittest.TestCase):
     # TODO
     pass
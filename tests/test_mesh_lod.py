@@ -0,0 +1,139 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import torch
+import trimesh
+
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.lib3d.mesh_lod import MeshLODs, decimate_mesh, export_mesh_ply
+from happypose.toolbox.lib3d.rigid_mesh_database import MeshDataBase
+from happypose.toolbox.lib3d.rotations import angle_axis_to_rotation_matrix
+from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.software_batch_renderer import SoftwareBatchRenderer
+from happypose.toolbox.renderer.types import Panda3dLightData
+
+
+class TestMeshLOD(unittest.TestCase):
+    """
+    Test the decimation of the meshes and the selection of their levels of detail.
+    """
+
+    def setUp(self):
+        self.mesh_path = Path(__file__).parent / "data" / "obj_000001.ply"
+        self.object_dataset = RigidObjectDataset(
+            [RigidObject(label="obj", mesh_path=self.mesh_path, mesh_units="mm")],
+        )
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.mesh_lods = MeshLODs(
+            self.object_dataset,
+            self.tmp_dir.name,
+            n_faces=(4000, 1000),
+        )
+        self.K = torch.tensor([[300.0, 0, 160], [0, 300, 120], [0, 0, 1]])
+
+    def test_decimate(self):
+        mesh = trimesh.load(str(self.mesh_path), process=False, force="mesh")
+        mesh_lod = decimate_mesh(mesh, 1000)
+        self.assertLessEqual(len(mesh_lod.faces), 1000)
+        self.assertGreater(len(mesh_lod.faces), 500)
+        # The vertices are vertices of the original mesh.
+        vertices = {tuple(v) for v in np.asarray(mesh.vertices).tolist()}
+        self.assertTrue(all(tuple(v) in vertices for v in mesh_lod.vertices.tolist()))
+        normals = np.linalg.norm(mesh_lod.vertex_normals, axis=-1)
+        self.assertTrue(np.allclose(normals, 1.0))
+
+        path = Path(self.tmp_dir.name) / "mesh.ply"
+        export_mesh_ply(mesh_lod, path)
+        mesh_loaded = trimesh.load(str(path), process=False, force="mesh")
+        self.assertTrue(np.allclose(mesh_loaded.vertices, mesh_lod.vertices))
+        self.assertTrue(np.array_equal(mesh_loaded.faces, mesh_lod.faces))
+
+    def test_levels(self):
+        levels = self.mesh_lods.get_levels("obj")
+        self.assertEqual(levels[0].mesh_path, self.mesh_path)
+        self.assertEqual(len(levels), 3)
+        self.assertTrue(levels[0].n_faces > levels[1].n_faces > levels[2].n_faces)
+        self.assertLessEqual(levels[2].n_faces, 1000)
+
+        # The levels are loaded from the cache.
+        mtime = levels[1].mesh_path.stat().st_mtime_ns
+        mesh_lods = MeshLODs(self.object_dataset, self.tmp_dir.name, (4000, 1000))
+        self.assertEqual(mesh_lods.get_levels("obj"), levels)
+        self.assertEqual(levels[1].mesh_path.stat().st_mtime_ns, mtime)
+
+        object_dataset = self.mesh_lods.make_object_dataset()
+        labels = [obj.label for obj in object_dataset.objects]
+        self.assertEqual(labels, ["obj", "obj_lod=1", "obj_lod=2"])
+        self.assertEqual(object_dataset[2].scale, 0.001)
+
+        object_dataset = self.mesh_lods.decimated_object_dataset(2000)
+        self.assertEqual(object_dataset[0].label, "obj")
+        self.assertEqual(object_dataset[0].mesh_path, levels[1].mesh_path)
+        mesh_db = MeshDataBase.from_object_ds(object_dataset)
+        self.assertAlmostEqual(
+            mesh_db.obj_dict["obj"].diameter_meters,
+            self.mesh_lods.label_to_infos["obj"]["diameter"],
+        )
+
+    def test_select_levels(self):
+        TCO = torch.eye(4).repeat(4, 1, 1)
+        TCO[:, 2, 3] = torch.tensor([0.1, 0.5, 5.0, -1.0])
+        levels = self.mesh_lods.select_levels(4 * ["obj"], TCO, self.K.repeat(4, 1, 1))
+        self.assertEqual(levels.tolist(), [0, 1, 2, 0])
+        labels = self.mesh_lods.select_labels(["obj"], TCO[[2]], self.K.unsqueeze(0))
+        self.assertEqual(labels, ["obj_lod=2"])
+
+        # Multiple views, the finest level of the views.
+        levels = self.mesh_lods.select_levels(
+            2 * ["obj"],
+            TCO[torch.tensor([[0, 2], [1, 2]])],
+            self.K.repeat(2, 2, 1, 1),
+        )
+        self.assertEqual(levels.tolist(), [0, 1])
+
+    def test_render(self):
+        n = 4
+        TCO = torch.eye(4).repeat(n, 1, 1)
+        TCO[:, :3, :3] = angle_axis_to_rotation_matrix(
+            torch.randn(n, 3, generator=torch.Generator().manual_seed(0)),
+        )[:, :3, :3]
+        TCO[:, 2, 3] = torch.linspace(0.5, 2.0, n)
+        render_kwargs = dict(
+            labels=n * ["obj"],
+            TCO=TCO,
+            K=self.K.repeat(n, 1, 1),
+            light_datas=n * [[Panda3dLightData(light_type="ambient")]],
+            resolution=(240, 320),
+            render_depth=True,
+            render_binary_mask=True,
+        )
+        levels = self.mesh_lods.select_levels(n * ["obj"], TCO, render_kwargs["K"])
+        self.assertTrue((levels > 0).all())
+        for renderer_cls, kwargs in (
+            (SoftwareBatchRenderer, {}),
+            (Panda3dBatchRenderer, {"n_workers": 1}),
+        ):
+            renderer = renderer_cls(self.object_dataset, **kwargs)
+            renderer_lod = renderer_cls(
+                self.object_dataset,
+                mesh_lods=self.mesh_lods,
+                **kwargs,
+            )
+            try:
+                renders = renderer.render(**render_kwargs)
+                renders_lod = renderer_lod.render(**render_kwargs)
+            finally:
+                renderer.stop()
+                renderer_lod.stop()
+            masks, masks_lod = renders.binary_masks, renders_lod.binary_masks
+            iou = (masks & masks_lod).sum() / (masks | masks_lod).sum()
+            self.assertGreater(iou, 0.9)
+            depth_errors = (renders.depths - renders_lod.depths)[masks & masks_lod]
+            self.assertLess(depth_errors.abs().median(), 2e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
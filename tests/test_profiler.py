@@ -0,0 +1,100 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from happypose.toolbox.utils.profiler import (
+    Profiler,
+    get_profiler,
+    profile,
+    profile_function,
+    profiling,
+)
+
+
+@profile_function("step")
+def step():
+    with profile("inner"):
+        time.sleep(0.001)
+
+
+class TestProfiler(unittest.TestCase):
+    """
+    Test the hierarchical profiler and its exports.
+    """
+
+    def test_disabled(self):
+        self.assertIsNone(get_profiler())
+        with profile("span"):
+            step()
+        self.assertIsNone(get_profiler())
+
+    def test_nested_spans(self):
+        with profiling() as profiler:
+            with profile("pipeline"):
+                for _ in range(3):
+                    step()
+                profiler.add_event("worker", time.time(), 0.5, thread="worker_0")
+        self.assertIsNone(get_profiler())
+
+        summary = profiler.summary()
+        self.assertEqual(
+            set(summary.keys()),
+            {"pipeline", "pipeline/step", "pipeline/step/inner", "pipeline/worker"},
+        )
+        self.assertEqual(summary["pipeline/step"]["count"], 3)
+        self.assertEqual(summary["pipeline/worker"]["p50_ms"], 500)
+        self.assertGreaterEqual(
+            summary["pipeline/step"]["total_ms"],
+            summary["pipeline/step/inner"]["total_ms"],
+        )
+        self.assertGreaterEqual(summary["pipeline/step/inner"]["p99_ms"], 1.0)
+
+        lines = profiler.summary_str().split("\n")
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[2].startswith("  step "))
+
+    def test_threads(self):
+        profiler = Profiler()
+
+        def run():
+            with profiler.span("thread_span"):
+                pass
+
+        with profiler.span("main"):
+            thread = threading.Thread(target=run, name="other")
+            thread.start()
+            thread.join()
+        # Spans of other threads are not nested in the spans of the main thread.
+        self.assertEqual(
+            sorted(event.path for event in profiler.events),
+            ["main", "thread_span"],
+        )
+
+    def test_chrome_trace(self):
+        with profiling() as profiler:
+            step()
+            profiler.add_event("render_worker", time.time(), 0.1, thread="worker_0")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "trace.json"
+            profiler.save_chrome_trace(path)
+            trace = json.loads(path.read_text())
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(len(events), 3)
+        self.assertEqual(
+            {e["name"] for e in events}, {"step", "inner", "render_worker"}
+        )
+        step_event = next(e for e in events if e["name"] == "step")
+        inner_event = next(e for e in events if e["name"] == "inner")
+        self.assertLessEqual(step_event["ts"], inner_event["ts"])
+        self.assertEqual(inner_event["args"]["path"], "step/inner")
+        thread_names = {
+            e["args"]["name"] for e in trace["traceEvents"] if e["ph"] == "M"
+        }
+        self.assertIn("worker_0", thread_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
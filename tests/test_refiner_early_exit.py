@@ -0,0 +1,166 @@
+import inspect
+import math
+import typing
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+import torch
+
+from happypose.pose_estimators.cosypose.cosypose.models.pose import PosePredictor
+from happypose.toolbox.inference.early_exit import (
+    RefinerConvergence,
+    forward_refiner_early_exit,
+    pose_update_magnitude,
+)
+from happypose.toolbox.inference.types import ObservationTensor
+from happypose.toolbox.lib3d.rotations import angle_axis_to_rotation_matrix
+from happypose.toolbox.utils.tensor_collection import PandasTensorCollection
+
+TARGET_TRANSLATION = torch.tensor([0.0, 0.0, 1.0])
+
+
+class ContractingRefiner(torch.nn.Module):
+    """Moves the translations towards a target, at a rate depending on the label."""
+
+    RATES: typing.ClassVar = {"fast": 1.0, "slow": 0.5}
+
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+        self.n_images = []
+
+    def forward(self, images, image_ids, K, labels, TCO, n_iterations=1):
+        assert len(image_ids) == len(labels)
+        self.batch_sizes.append(len(labels))
+        self.n_images.append(len(images))
+        outputs = {}
+        for n in range(1, n_iterations + 1):
+            rates = torch.tensor([self.RATES[label] for label in labels])
+            TCO_output = TCO.clone()
+            TCO_output[:, :3, 3] += rates.unsqueeze(-1) * (
+                TARGET_TRANSLATION - TCO[:, :3, 3]
+            )
+            outputs[f"iteration={n}"] = SimpleNamespace(
+                TCO_input=TCO,
+                TCO_output=TCO_output,
+                K=K,
+                K_crop=K,
+                boxes_rend=torch.zeros(len(labels), 4),
+                boxes_crop=torch.zeros(len(labels), 4),
+            )
+            TCO = TCO_output
+        return outputs
+
+
+class CosyPoseContractingRefiner(ContractingRefiner):
+    """ContractingRefiner with the signature of the cosypose refiner."""
+
+    def forward(self, images, K, labels, TCO, n_iterations=1):
+        assert len(images) == len(labels)
+        image_ids = torch.arange(len(labels))
+        return super().forward(images, image_ids, K, labels, TCO, n_iterations)
+
+
+def make_inputs(labels, n_images=1):
+    observation = ObservationTensor(
+        images=torch.zeros(n_images, 3, 8, 8),
+        K=torch.eye(3).repeat(n_images, 1, 1),
+    )
+    TCO = torch.eye(4).repeat(len(labels), 1, 1)
+    TCO[:, :3, 3] = torch.tensor([0.1, 0.0, 0.5])
+    infos = pd.DataFrame(
+        {"label": labels, "batch_im_id": [n % n_images for n in range(len(labels))]}
+    )
+    return observation, PandasTensorCollection(infos, poses=TCO)
+
+
+class TestRefinerEarlyExit(unittest.TestCase):
+    """
+    Test the early exit of the refiner at convergence.
+    """
+
+    def test_pose_update_magnitude(self):
+        TCO_input = torch.eye(4).repeat(2, 1, 1)
+        TCO_output = TCO_input.clone()
+        TCO_output[0] = angle_axis_to_rotation_matrix(torch.tensor([[0.0, 0.0, 0.3]]))
+        TCO_output[1, :3, 3] = torch.tensor([0.0, 0.03, 0.04])
+        angle, translation = pose_update_magnitude(TCO_input, TCO_output)
+        self.assertTrue(torch.allclose(angle, torch.tensor([0.3, 0.0]), atol=1e-3))
+        self.assertTrue(torch.allclose(translation, torch.tensor([0.0, 0.05])))
+
+        convergence = RefinerConvergence(rotation_deg=math.degrees(0.2))
+        converged = convergence.is_converged(TCO_input, TCO_output)
+        self.assertEqual(converged.tolist(), [False, False])
+        self.assertEqual(converged[:0].tolist(), [])
+
+    def test_early_exit(self):
+        labels = ["fast", "slow", "fast", "slow", "fast"]
+        observation, data_TCO_input = make_inputs(labels)
+        model = ContractingRefiner()
+        preds, _ = forward_refiner_early_exit(
+            model,
+            observation,
+            data_TCO_input,
+            n_iterations=5,
+            convergence=RefinerConvergence(translation=0.02),
+            bsz_objects=2,
+        )
+        self.assertEqual(list(preds.keys()), [f"iteration={n}" for n in range(1, 6)])
+        # fast: converged at the 2nd iteration, slow: update 0.5^n * 0.51m.
+        n_iterations = preds["iteration=5"].infos["n_refiner_iterations"]
+        self.assertEqual(n_iterations.tolist(), [2, 5, 2, 5, 2])
+        self.assertEqual(model.batch_sizes, [2, 2, 1, 2, 2, 1, 2, 2, 2])
+        # The image is not replicated for each object.
+        self.assertEqual(set(model.n_images), {1})
+
+        # The outputs are the same as refining every object.
+        TCO_expected = model(
+            images=observation.images,
+            image_ids=torch.zeros(5, dtype=torch.long),
+            K=torch.eye(3).repeat(5, 1, 1),
+            labels=labels,
+            TCO=data_TCO_input.poses,
+            n_iterations=5,
+        )["iteration=5"].TCO_output
+        self.assertTrue(torch.allclose(preds["iteration=5"].poses, TCO_expected))
+        self.assertEqual(len(preds["iteration=1"]), len(labels))
+
+    def test_early_exit_cosypose(self):
+        self.assertEqual(
+            inspect.signature(CosyPoseContractingRefiner.forward),
+            inspect.signature(PosePredictor.forward),
+        )
+        labels = ["fast", "slow", "fast"]
+        observation, data_TCO_input = make_inputs(labels, n_images=2)
+        observation.images[1] = 1.0
+        model = CosyPoseContractingRefiner()
+        preds, _ = forward_refiner_early_exit(
+            model,
+            observation,
+            data_TCO_input,
+            n_iterations=3,
+            convergence=RefinerConvergence(translation=0.02),
+            bsz_objects=2,
+        )
+        n_iterations = preds["iteration=3"].infos["n_refiner_iterations"]
+        self.assertEqual(n_iterations.tolist(), [2, 3, 2])
+        # The images are replicated for each object of the batch.
+        self.assertEqual(model.n_images, [2, 1, 2, 1, 1])
+
+    def test_no_convergence(self):
+        observation, data_TCO_input = make_inputs(["slow", "slow", "slow"])
+        preds, _ = forward_refiner_early_exit(
+            ContractingRefiner(),
+            observation,
+            data_TCO_input,
+            n_iterations=3,
+            convergence=RefinerConvergence(rotation_deg=0.0, translation=0.0),
+            bsz_objects=8,
+        )
+        n_iterations = preds["iteration=3"].infos["n_refiner_iterations"]
+        self.assertEqual(n_iterations.tolist(), [3, 3, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import torch
+
+import happypose.toolbox.utils.tensor_collection as tc
+from happypose.pose_estimators.cosypose.cosypose.evaluation.meters.detection_meters import (
+    DetectionMeter,
+)
+from happypose.pose_estimators.megapose.evaluation.data_utils import parse_obs_data
+from happypose.toolbox.datasets.scene_dataset import (
+    CameraData,
+    ObjectData,
+    ObservationInfos,
+    SceneObservation,
+)
+from happypose.toolbox.inference.utils import make_detections_from_model_outputs
+from happypose.toolbox.lib3d.transform import Transform
+from happypose.toolbox.utils.rle_masks import RLEMasks
+
+
+def dense_iou(masks_a, masks_b):
+    inter = (masks_a[:, None] & masks_b[None]).flatten(2).sum(-1)
+    union = (masks_a[:, None] | masks_b[None]).flatten(2).sum(-1)
+    return inter / union.clamp(min=1)
+
+
+class TestRLEMasks(unittest.TestCase):
+    """
+    Test the run-length encoded masks against the dense masks.
+    """
+
+    def setUp(self):
+        generator = torch.Generator().manual_seed(0)
+        self.masks = torch.rand(6, 23, 31, generator=generator) > 0.7
+        self.masks[0] = False
+        self.masks[1] = True
+        self.masks[2] = False
+        self.masks[2, 3:9, 5:20] = True
+        self.rle = RLEMasks.encode(self.masks)
+
+    def test_encode(self):
+        self.assertEqual(self.rle.shape, self.masks.shape)
+        self.assertTrue(torch.equal(self.rle.decode(), self.masks))
+        self.assertTrue(torch.equal(self.rle[[4, 2]].decode(), self.masks[[4, 2]]))
+        self.assertTrue(torch.equal(self.rle[3].decode(), self.masks[[3]]))
+        masks = RLEMasks.concatenate([self.rle[1:], self.rle[:2]])
+        self.assertTrue(torch.equal(masks.decode(), self.masks[[1, 2, 3, 4, 5, 0, 1]]))
+        # COCO convention, column-major and starting with the background.
+        coco = self.rle[2].to_coco()[0]
+        self.assertEqual(coco["size"], [23, 31])
+        self.assertEqual(coco["counts"][:3], [5 * 23 + 3, 6, 17])
+        self.assertTrue(
+            torch.equal(RLEMasks.from_coco([coco]).decode(), self.masks[[2]])
+        )
+
+    def test_area_bboxes(self):
+        self.assertTrue(torch.equal(self.rle.area(), self.masks.flatten(1).sum(-1)))
+        bboxes = self.rle.bboxes()
+        self.assertEqual(bboxes[0].tolist(), [0, 0, 0, 0])
+        self.assertEqual(bboxes[1].tolist(), [0, 0, 31, 23])
+        self.assertEqual(bboxes[2].tolist(), [5, 3, 20, 9])
+        for mask, bbox in zip(self.masks[3:], bboxes[3:]):
+            v, u = torch.nonzero(mask, as_tuple=True)
+            self.assertEqual(
+                bbox.tolist(), [u.min(), v.min(), u.max() + 1, v.max() + 1]
+            )
+
+    def test_iou(self):
+        iou = self.rle.iou(self.rle[[2, 3, 0]])
+        self.assertTrue(
+            torch.allclose(iou, dense_iou(self.masks, self.masks[[2, 3, 0]]))
+        )
+        iou = self.rle[1:].elementwise_iou(self.rle[:-1])
+        expected = dense_iou(self.masks[1:], self.masks[:-1]).diagonal()
+        self.assertTrue(torch.allclose(iou, expected))
+
+    def test_contains(self):
+        generator = torch.Generator().manual_seed(1)
+        ids = torch.randint(0, 6, (50,), generator=generator)
+        v = torch.randint(0, 23, (50,), generator=generator)
+        u = torch.randint(0, 31, (50,), generator=generator)
+        contains = self.rle.contains(ids.view(5, 10), v.view(5, 10), u.view(5, 10))
+        self.assertTrue(torch.equal(contains.flatten(), self.masks[ids, v, u]))
+
+    def test_segmentation(self):
+        segmentation = (
+            np.random.RandomState(0).randint(0, 4, (23, 31)).astype(np.uint32)
+        )
+        masks = RLEMasks.from_segmentation(segmentation, [3, 1, 7])
+        expected = segmentation == np.array([3, 1, 7])[:, None, None]
+        self.assertTrue(np.array_equal(masks.decode().numpy(), expected))
+
+        object_datas = [
+            ObjectData(label=label, TWO=Transform(np.eye(4)), unique_id=unique_id)
+            for label, unique_id in (("a", 3), ("b", 1))
+        ]
+        for obj in object_datas:
+            obj.bbox_modal = [0, 0, 1, 1]
+        observation = SceneObservation(
+            rgb=np.zeros((23, 31, 3), dtype=np.uint8),
+            segmentation=segmentation,
+            camera_data=CameraData(K=np.eye(3), TWC=Transform(np.eye(4))),
+            infos=ObservationInfos(scene_id=0, view_id=0),
+            object_datas=object_datas,
+        )
+        batch = SceneObservation.collate_fn(2 * [observation], rle_masks=True)
+        gt_masks = batch["gt_data"].masks
+        self.assertIsInstance(gt_masks, RLEMasks)
+        self.assertTrue(np.array_equal(gt_masks.decode().numpy(), 2 * [*expected[:2]]))
+        dense_masks = observation.as_pandas_tensor_collection().masks
+        self.assertTrue(torch.equal(dense_masks.bool(), gt_masks[:2].decode()))
+
+        # Binary masks loaded as RLEMasks, e.g. BOPDataset(rle_masks=True).
+        observation.segmentation = None
+        observation.binary_masks = {
+            unique_id: RLEMasks.from_segmentation(segmentation, [unique_id])
+            for unique_id in (3, 1)
+        }
+        data = parse_obs_data(observation, object_labels=["b"])
+        self.assertEqual(data.infos["label"].tolist(), ["b"])
+        self.assertTrue(torch.equal(data.masks.bool(), torch.as_tensor(expected[[1]])))
+
+    def test_detections(self):
+        masks = torch.rand(4, 1, 23, 31, generator=torch.Generator().manual_seed(2))
+        outputs = [
+            {
+                "boxes": torch.zeros(n, 4),
+                "labels": torch.ones(n, dtype=torch.int64),
+                "scores": torch.tensor([0.5, 0.9, 0.7, 0.8][:n]),
+                "masks": masks[:n],
+            }
+            for n in (4, 0, 2)
+        ]
+        kwargs = dict(output_masks=True, mask_th=0.6, one_instance_per_class=True)
+        detections = make_detections_from_model_outputs(outputs, {1: "a"}, **kwargs)
+        detections_rle = make_detections_from_model_outputs(
+            outputs,
+            {1: "a"},
+            rle_masks=True,
+            **kwargs,
+        )
+        self.assertIsInstance(detections_rle.masks, RLEMasks)
+        self.assertTrue(torch.equal(detections_rle.masks.decode(), detections.masks))
+        detections_rle = tc.concatenate([detections_rle, detections_rle[[1]]])
+        self.assertEqual(len(detections_rle.masks), 3)
+
+    def test_detection_meter(self):
+        meter = DetectionMeter(use_masks=True)
+        data = tc.PandasTensorCollection(pd.DataFrame(index=range(6)), masks=self.masks)
+        masks_gt = meter.get_rle_masks(data.float())
+        self.assertTrue(torch.equal(masks_gt.decode(), self.masks))
+        metrics = meter.compute_mask_metrics(self.rle[[3, 5, 1]], masks_gt[[3, 4, 1]])
+        expected = dense_iou(self.masks[[3, 5, 1]], self.masks[[3, 4, 1]]).diagonal()
+        self.assertTrue(torch.allclose(metrics["iou"], expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
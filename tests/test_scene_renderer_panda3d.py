@@ -12,7 +12,10 @@ from torch.testing import assert_close as tr_assert_close
 
 from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
 from happypose.toolbox.lib3d.transform import Transform
-from happypose.toolbox.renderer.panda3d_scene_renderer import Panda3dSceneRenderer
+from happypose.toolbox.renderer.panda3d_scene_renderer import (
+    Panda3dSceneRenderer,
+    stack_renderings,
+)
 from happypose.toolbox.renderer.types import (
     CameraRenderingData,
     Panda3dCameraData,
@@ -217,3 +220,135 @@ class TestPanda3DBatchRenderer:
                 render_normals=False,
                 render_binary_mask=True,
             )
+
+    @pytest.mark.order(4)
+    def test_scene_renderer_isolate_objects(self):
+        """
+        Render two objects in one frame, each camera seeing only one of them.
+        """
+        renderer = Panda3dSceneRenderer(asset_dataset=self.asset_dataset)
+
+        TWO_left = Transform(self.TWO.quaternion.coeffs(), (-0.1, 0, self.z_obj))
+        TWO_right = Transform(self.TWO.quaternion.coeffs(), (0.1, 0, self.z_obj))
+        object_datas = [
+            Panda3dObjectData(label=self.obj_label, TWO=TWO_left),
+            Panda3dObjectData(label=self.obj_label, TWO=TWO_right),
+        ]
+        renderings = renderer.render_scene(
+            object_datas,
+            self.camera_datas[:2],
+            light_datas=[],
+            render_depth=True,
+            isolate_objects=True,
+        )
+        assert len(renderings) == 2
+
+        u_left = int(self.K[0, 2] - 0.1 / self.z_obj * self.K[0, 0])
+        u_right = int(self.K[0, 2] + 0.1 / self.z_obj * self.K[0, 0])
+        v = self.height // 2
+        assert renderings[0].depth[v, u_left] > 0
+        assert renderings[0].depth[v, u_right] == 0
+        assert renderings[1].depth[v, u_left] == 0
+        assert renderings[1].depth[v, u_right] > 0
+
+        # Isolated renders match the renders of each object alone.
+        single_renderings = renderer.render_scene(
+            object_datas[:1],
+            self.camera_datas[:1],
+            light_datas=[],
+            render_depth=True,
+        )
+        assert (
+            tr_assert_close(
+                renderings[0].depth,
+                single_renderings[0].depth,
+                atol=1e-3,
+                rtol=1e-3,
+            )
+            is None
+        )
+
+    @pytest.mark.order(4)
+    def test_scene_renderer_single_frame(self):
+        """
+        Rgb, normals and depth rendered in one frame match the two-frame renders.
+        """
+        renderer = Panda3dSceneRenderer(asset_dataset=self.asset_dataset)
+        camera_datas = [
+            Panda3dCameraData(
+                K=self.K,
+                resolution=(self.height, self.width),
+                TWC=Transform((0, 0, 0, 1), (0, 0, 0.02 * n)),
+            )
+            for n in range(self.Nc)
+        ]
+        kwargs = dict(
+            render_normals=True,
+            render_depth=True,
+            render_binary_mask=True,
+        )
+        renderings = renderer.render_scene(
+            self.object_datas, camera_datas, self.light_datas, **kwargs
+        )
+        renderings_single_frame = renderer.render_scene(
+            self.object_datas,
+            camera_datas,
+            self.light_datas,
+            single_frame=True,
+            **kwargs,
+        )
+        stacked = stack_renderings(renderings)
+        stacked_single_frame = stack_renderings(renderings_single_frame)
+        for k in ("rgb", "normals", "depth", "binary_mask"):
+            array = getattr(stacked_single_frame, k)
+            assert array.shape[0] == self.Nc
+            assert array.flags["C_CONTIGUOUS"]
+            if k == "normals":
+                # A few silhouette pixels may be rasterized differently.
+                diff = np.abs(array.astype(int) - stacked.normals.astype(int))
+                assert (diff > 0).mean() < 1e-3
+            else:
+                assert np_assert_equal(array, getattr(stacked, k)) is None
+
+        # Renderings are views of one contiguous array per modality.
+        assert stacked_single_frame.rgb is renderings_single_frame[0].rgb.base
+        assert stacked_single_frame.depth is renderings_single_frame[0].depth.base
+
+    @pytest.mark.order(4)
+    def test_scene_renderer_depth_only(self):
+        """
+        Depth and masks rendered without rgb match the full renders.
+        """
+        renderer = Panda3dSceneRenderer(asset_dataset=self.asset_dataset)
+        kwargs = dict(render_depth=True, render_binary_mask=True)
+        renderings = renderer.render_scene(
+            self.object_datas, self.camera_datas, self.light_datas, **kwargs
+        )
+        renderings_depth_only = renderer.render_scene(
+            self.object_datas,
+            self.camera_datas,
+            self.light_datas,
+            render_rgb=False,
+            **kwargs,
+        )
+        stacked = stack_renderings(renderings)
+        stacked_depth_only = stack_renderings(renderings_depth_only)
+        assert stacked_depth_only.rgb is None
+        assert stacked_depth_only.depth.dtype == np.dtype(np.float32)
+        assert stacked_depth_only.binary_mask.dtype == np.dtype(bool)
+        # Only silhouette pixels differ, as multisampling is disabled.
+        mask_diff = stacked_depth_only.binary_mask != stacked.binary_mask
+        assert mask_diff.mean() < 1e-2
+        both = np.logical_and(stacked_depth_only.binary_mask, stacked.binary_mask)
+        depth_diff = np.abs(stacked_depth_only.depth - stacked.depth)[both]
+        assert np.median(depth_diff) < 1e-4
+
+        with pytest.raises(AssertionError):
+            renderer.render_scene(
+                self.object_datas,
+                self.camera_datas,
+                self.light_datas,
+                render_normals=True,
+                render_depth=True,
+                render_rgb=False,
+            )
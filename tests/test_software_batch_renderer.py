@@ -0,0 +1,145 @@
+"""Set of unit tests for the software batch renderer."""
+
+from pathlib import Path
+
+import pytest
+import torch
+
+from happypose.toolbox.datasets.object_dataset import RigidObject, RigidObjectDataset
+from happypose.toolbox.lib3d.rotations import angle_axis_to_rotation_matrix
+from happypose.toolbox.renderer.panda3d_batch_renderer import Panda3dBatchRenderer
+from happypose.toolbox.renderer.software_batch_renderer import (
+    SoftwareBatchRenderer,
+    rasterize,
+)
+from happypose.toolbox.renderer.types import Panda3dLightData
+
+
+class TestSoftwareBatchRenderer:
+    """Unit tests for the software renderer."""
+
+    @pytest.fixture(autouse=True)
+    def setUp(self) -> None:
+        self.obj_path = Path(__file__).parent.joinpath("data/obj_000001.ply")
+        self.asset_dataset = RigidObjectDataset(
+            [RigidObject(label="obj", mesh_path=self.obj_path, mesh_units="mm")],
+        )
+        self.resolution = (120, 160)
+        self.K = torch.tensor([[150.0, 0, 80], [0, 150, 60], [0, 0, 1]])
+
+    def make_render_kwargs(self, n: int):
+        generator = torch.Generator().manual_seed(0)
+        TCO = torch.eye(4).repeat(n, 1, 1)
+        TCO[:, :3, :3] = angle_axis_to_rotation_matrix(
+            torch.randn(n, 3, generator=generator),
+        )[:, :3, :3]
+        TCO[:, 2, 3] = torch.linspace(0.3, 0.5, n)
+        return dict(
+            labels=n * ["obj"],
+            TCO=TCO,
+            K=self.K.repeat(n, 1, 1),
+            light_datas=n * [[Panda3dLightData(light_type="ambient")]],
+            resolution=self.resolution,
+            render_depth=True,
+            render_binary_mask=True,
+        )
+
+    def test_rasterize(self):
+        """
+        The nearest triangle is seen, in the chunks of any size.
+        """
+        # A triangle covering the top-left half of the image at z=1,
+        # and a smaller triangle in front of it.
+        triangles = torch.tensor(
+            [
+                [[-1.0, -1.0, 1.0], [1.0, -1.0, 1.0], [-1.0, 1.0, 1.0]],
+                [[-0.5, -0.5, 0.5], [0.0, -0.5, 0.5], [-0.5, 0.0, 0.5]],
+                [[0.0, 0.0, 0.01], [1.0, 0.0, 0.01], [0.0, 1.0, 0.01]],
+            ],
+        )
+        image_ids = torch.tensor([0, 0, 1])
+        K = torch.tensor([[4.0, 0, 4], [0, 4, 4], [0, 0, 1]]).repeat(2, 1, 1)
+        triangle_ids, barycentrics, depth = rasterize(
+            triangles,
+            image_ids,
+            K,
+            (8, 8),
+        )
+        # The first triangle covers the pixel centers (j + 0.5, i + 0.5) with
+        # i + j < 7, the second one those with i + j < 3.
+        i, j = torch.meshgrid(torch.arange(8), torch.arange(8), indexing="ij")
+        covered, front = (i + j) < 7, (i + j) < 3
+        assert (triangle_ids[0][covered] >= 0).all()
+        assert (triangle_ids[0][(i + j) > 7] == -1).all()
+        assert (triangle_ids[0][front] == 1).all() and (depth[0][front] == 0.5).all()
+        back = covered & ((i + j) > 3)
+        assert (triangle_ids[0][back] == 0).all()
+        assert torch.allclose(depth[0][back], torch.tensor(1.0))
+        assert torch.allclose(barycentrics[0][covered].sum(-1), torch.tensor(1.0))
+        # The triangle of the second image is closer than z_near.
+        assert (triangle_ids[1] == -1).all() and (depth[1] == 0).all()
+
+        outputs_chunks = rasterize(triangles, image_ids, K, (8, 8), max_candidates=5)
+        for output, output_chunks in zip((triangle_ids, depth), outputs_chunks[::2]):
+            assert torch.equal(output, output_chunks)
+
+    def test_render(self):
+        """
+        Renders batches of images of the requested modalities.
+        """
+        renderer = SoftwareBatchRenderer(self.asset_dataset)
+        kwargs = self.make_render_kwargs(3)
+        renderings = renderer.render(**kwargs, render_normals=True)
+        h, w = self.resolution
+        assert renderings.rgbs.shape == (3, 3, h, w)
+        assert renderings.normals.shape == (3, 3, h, w)
+        assert renderings.depths.shape == (3, 1, h, w)
+        assert renderings.binary_masks.dtype == torch.bool
+        masks = renderings.binary_masks
+        assert masks.any() and not masks.all()
+        assert torch.equal(renderings.depths > 0, masks)
+        # Under an ambient light, the background is black.
+        assert (renderings.rgbs[masks.expand(-1, 3, -1, -1)] > 0).all()
+        assert (renderings.rgbs[~masks.expand(-1, 3, -1, -1)] == 0).all()
+
+        renderings_depth = renderer.render(**kwargs, render_rgb=False)
+        assert renderings_depth.rgbs is None
+        assert torch.equal(renderings_depth.depths, renderings.depths)
+
+        # The views of a multiview render are the same as single renders.
+        renderings_mv = renderer.render_multiview(
+            labels=["obj"],
+            TCV_O=kwargs["TCO"].unsqueeze(0),
+            KV=kwargs["K"].unsqueeze(0),
+            light_datas=kwargs["light_datas"][:1],
+            resolution=self.resolution,
+            render_depth=True,
+        )
+        assert torch.allclose(renderings_mv.depths, renderings.depths, atol=1e-5)
+        renderer.stop()
+
+    @pytest.mark.order(2)
+    def test_compare_panda3d(self):
+        """
+        The software renders match the panda3d renders.
+        """
+        kwargs = self.make_render_kwargs(4)
+        renderer = Panda3dBatchRenderer(self.asset_dataset, n_workers=1)
+        try:
+            renderings_ref = renderer.render(**kwargs, render_normals=True)
+        finally:
+            renderer.stop()
+        renderings = SoftwareBatchRenderer(self.asset_dataset).render(
+            **kwargs,
+            render_normals=True,
+        )
+        masks, masks_ref = renderings.binary_masks, renderings_ref.binary_masks
+        both = masks & masks_ref
+        assert both.sum() / (masks | masks_ref).sum() > 0.97
+        depth_errors = (renderings.depths - renderings_ref.depths).abs()[both]
+        assert depth_errors.median() < 1e-3
+        both = both.expand(-1, 3, -1, -1)
+        rgb_errors = (renderings.rgbs - renderings_ref.rgbs).abs()[both]
+        assert rgb_errors.mean() < 0.01
+        normals_errors = (renderings.normals - renderings_ref.normals).abs()[both]
+        assert (normals_errors < 0.05).float().mean() > 0.8
@@ -0,0 +1,98 @@
+import itertools
+import unittest
+
+import numpy as np
+import pandas as pd
+import torch
+
+from happypose.toolbox.utils.tensor_collection import (
+    PandasTensorCollection,
+    filter_top_pose_estimates,
+)
+
+
+def filter_top_pose_estimates_pandas(
+    data_TCO, top_K, group_cols, filter_field, ascending
+):
+    df = data_TCO.infos
+    df = (
+        df.sort_values(filter_field, ascending=ascending, kind="stable")
+        .groupby(group_cols)
+        .head(top_K)
+    )
+    return data_TCO[df.index.tolist()]
+
+
+class TestFilterTopPoseEstimates(unittest.TestCase):
+    """
+    Test the tensor top-K filtering against the pandas groupby.
+    """
+
+    def make_data_TCO(self, n, seed=0):
+        rng = np.random.default_rng(seed)
+        infos = pd.DataFrame(
+            {
+                "batch_im_id": rng.integers(0, 4, n),
+                "label": rng.choice(["obj_1", "obj_2", "obj_3"], n),
+                "instance_id": rng.integers(0, 5, n),
+                # Rounded scores, to have ties.
+                "coarse_logit": np.round(rng.normal(size=n), 1),
+            }
+        )
+        poses = torch.as_tensor(rng.normal(size=(n, 4, 4)))
+        return PandasTensorCollection(infos=infos, poses=poses)
+
+    def assert_same_estimates(self, data_TCO, data_TCO_ref):
+        pd.testing.assert_frame_equal(data_TCO.infos, data_TCO_ref.infos)
+        self.assertTrue(torch.equal(data_TCO.poses, data_TCO_ref.poses))
+
+    def test_filter_top_pose_estimates(self):
+        data_TCO = self.make_data_TCO(2000)
+        data_TCO_nan = self.make_data_TCO(2000)
+        data_TCO_nan.infos.loc[::50, "coarse_logit"] = np.nan
+        group_cols = ["batch_im_id", "label", "instance_id"]
+        for top_K, ascending, data_TCO in itertools.product(
+            (1, 3, 100),
+            (False, True),
+            (data_TCO, data_TCO_nan),
+        ):
+            with self.subTest(top_K=top_K, ascending=ascending):
+                kwargs = {
+                    "top_K": top_K,
+                    "group_cols": group_cols,
+                    "filter_field": "coarse_logit",
+                    "ascending": ascending,
+                }
+                self.assert_same_estimates(
+                    filter_top_pose_estimates(data_TCO, **kwargs),
+                    filter_top_pose_estimates_pandas(data_TCO, **kwargs),
+                )
+
+    def test_nan_groups(self):
+        data_TCO = self.make_data_TCO(100)
+        data_TCO.infos["instance_id"] = data_TCO.infos["instance_id"].astype(float)
+        data_TCO.infos.loc[::7, "instance_id"] = np.nan
+        kwargs = {
+            "top_K": 2,
+            "group_cols": ["label", "instance_id"],
+            "filter_field": "coarse_logit",
+            "ascending": False,
+        }
+        self.assert_same_estimates(
+            filter_top_pose_estimates(data_TCO, **kwargs),
+            filter_top_pose_estimates_pandas(data_TCO, **kwargs),
+        )
+
+    def test_empty(self):
+        data_TCO = self.make_data_TCO(0)
+        data_TCO = filter_top_pose_estimates(
+            data_TCO,
+            top_K=1,
+            group_cols=["batch_im_id", "label"],
+            filter_field="coarse_logit",
+        )
+        self.assertEqual(len(data_TCO), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()